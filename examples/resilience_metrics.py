@@ -173,13 +173,9 @@ def hydraulic_metrics(wn):
                             node_size=30, title='Link count in paths')
 
     # Calculate entropy for 1 day, all nodes
-    shat = []
-    G_flowrate_t = wn.get_graph()
-    for t in np.arange(0, 24*3600+1,3600):
-        attr = results.link['flowrate'].loc[t,:]
-        G_flowrate_t.weight_graph(link_attribute=attr)
-        entropy = wntr.metrics.entropy(G_flowrate_t)
-        shat.append(entropy[1])
+    flowrate = results.link['flowrate'].loc[0:24*3600,:]
+    [S, shat] = wntr.metrics.entropy_timeseries(flowrate, wn)
+    shat = shat.values
     plt.figure()
     plt.plot(shat)
     plt.ylabel('System Entropy')
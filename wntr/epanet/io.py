@@ -7,6 +7,7 @@ The wntr.epanet.io module contains methods for reading/writing EPANET input and
 
     InpFile
     BinFile
+    MemmapBinFile
 
 ----
 
@@ -24,6 +25,9 @@ import warnings
 import numpy as np
 import pandas as pd
 import difflib
+import hashlib
+import pickle
+import tempfile
 from collections import OrderedDict
 
 #from .time_utils import run_lineprofile
@@ -74,6 +78,23 @@ _VALVE_LABEL = '{:21s} {:20s} {:20s} {:>20s} {:4s} {:>20s} {:>20s}\n'
 _CURVE_ENTRY = ' {name:10s} {x:12f} {y:12f} {com:>3s}\n'
 _CURVE_LABEL = '{:11s} {:12s} {:12s}\n'
 
+# Positional forms of the entries above, used to format a whole section with map
+_JUNC_ROW = ' {:20} {:15.11g} {:15.11g} {:24} {:>3s}\n'
+_PIPE_ROW = ' {:20s} {:20s} {:20s} {:15.11g} {:15.11g} {:15.11g} {:15.11g} {:>20s} {:>3s}\n'
+_COORD_ROW = '{:10s} {:20.9f} {:20.9f}\n'
+_DEMAND_ROW = '{:10s} {:10s} {:10s}\n'
+
+# Sections whose text is reused by InpFile.write(..., cache_sections=True) while the
+# registries they are written from (and the common options, see InpFile._section_state)
+# have not changed. [VERTICES] is not cached since vertices are usually edited in place.
+_CACHED_SECTIONS = {'[JUNCTIONS]': ('_node_reg', '_pattern_reg'),
+                    '[PIPES]': ('_link_reg',),
+                    '[EMITTERS]': ('_node_reg',),
+                    '[DEMANDS]': ('_node_reg', '_pattern_reg'),
+                    '[QUALITY]': ('_node_reg',),
+                    '[COORDINATES]': ('_node_reg',),
+                    '[TAGS]': ('_node_reg', '_link_reg')}
+
 def _split_line(line):
     _vc = line.split(';', 1)
     _cmnt = None
@@ -89,6 +110,21 @@ def _split_line(line):
         _cmnt = _vc[1]
     return _vals, _cmnt
 
+def _split_section(lines):
+    """Split the (lnum, line) entries of a section into lists of words; comments and blank lines are dropped"""
+    rows = []
+    for lnum, line in lines:
+        current = line.split(';')[0].split()
+        if current:
+            rows.append(current)
+    return rows
+
+
+def _float_column(values):
+    """Convert a list of strings to a float numpy array"""
+    return np.array(values, dtype=float)
+
+
 def _is_number(s):
     """
     Checks if input is a number
@@ -228,6 +264,14 @@ class InpFile(object):
     This class provides read and write functionality for EPANET INP files.
     The EPANET Users Manual provides full documentation for the INP file format.
     """
+    # If True, the [JUNCTIONS], [PIPES], [COORDINATES], [VERTICES], [DEMANDS], and [PATTERNS]
+    # sections are read in bulk: the words of the lines are split into columns, the columns
+    # are converted to arrays (and to SI units) at once, and the junctions and pipes are added
+    # in batch. The model is the same as the one built line by line.
+    _bulk_read = True
+    # Text of the sections written with cache_sections=True, section -> (state, bytes)
+    _section_cache = None
+
     def __init__(self):
         self.sections = OrderedDict()
         for sec in _INP_SECTIONS:
@@ -237,7 +281,7 @@ class InpFile(object):
         self.top_comments = []
         self.curves = OrderedDict()
 
-    def read(self, inp_files, wn=None):
+    def read(self, inp_files, wn=None, cache_dir=None):
         """
         Method to read an EPANET INP file and load data into a water network model object.
 
@@ -246,6 +290,16 @@ class InpFile(object):
         inp_files : str or list
             An EPANET INP input file or list of INP files to be combined
 
+        cache_dir : str (optional)
+            Directory of the parsed model cache. If given, the model built from the INP files is
+            saved in the directory, keyed by the content of the INP files (in order) and the WNTR
+            version, and later reads of the same files load the saved model instead of parsing
+            the files. The raw lines of each section (the sections attribute) are not saved.
+            The cache is only used when the INP files are read into a new (empty) model.
+            Cache entries are loaded with pickle, so cache_dir must be a trusted directory
+            that only the user can write to.
+            If None, the cache is not used (default = None)
+
         Returns
         -------
         :class:`~wntr.network.model.WaterNetworkModel`
@@ -257,6 +311,17 @@ class InpFile(object):
         self.wn = wn
         if not isinstance(inp_files, list):
             inp_files = [inp_files]
+
+        if cache_dir is not None and not _is_new_model(wn):
+            logger.info('The parsed model cache is not used when reading into a model that is not empty')
+            cache_dir = None
+        if cache_dir is not None:
+            cache_key = _inp_cache_key(inp_files)
+            cache_file = os.path.join(cache_dir, cache_key + '.pkl')
+            if self._load_cache(cache_file, cache_key):
+                wn.name = inp_files[0]
+                return self.wn
+
         wn.name = inp_files[0]
 
         self.curves = OrderedDict()
@@ -276,8 +341,7 @@ class InpFile(object):
                 lnum += 1
                 edata['lnum'] = lnum
                 line = line.strip()
-                nwords = len(line.split())
-                if len(line) == 0 or nwords == 0:
+                if len(line) == 0:
                     # Blank line
                     continue
                 elif line.startswith('['):
@@ -316,10 +380,16 @@ class InpFile(object):
         self._read_curves()
 
         ### PATTERNS
-        self._read_patterns()
+        if self._bulk_read:
+            self._bulk_read_patterns()
+        else:
+            self._read_patterns()
 
         ### JUNCTIONS
-        self._read_junctions()
+        if self._bulk_read:
+            self._bulk_read_junctions()
+        else:
+            self._read_junctions()
 
         ### RESERVOIRS
         self._read_reservoirs()
@@ -328,7 +398,10 @@ class InpFile(object):
         self._read_tanks()
 
         ### PIPES
-        self._read_pipes()
+        if self._bulk_read:
+            self._bulk_read_pipes()
+        else:
+            self._read_pipes()
 
         ### PUMPS
         self._read_pumps()
@@ -337,7 +410,10 @@ class InpFile(object):
         self._read_valves()
 
         ### COORDINATES
-        self._read_coordinates()
+        if self._bulk_read:
+            self._bulk_read_coordinates()
+        else:
+            self._read_coordinates()
 
         ### SOURCES
         self._read_sources()
@@ -361,14 +437,20 @@ class InpFile(object):
         self._read_energy()
 
         ### DEMANDS
-        self._read_demands()
+        if self._bulk_read:
+            self._bulk_read_demands()
+        else:
+            self._read_demands()
 
         ### EMITTERS
         self._read_emitters()
 
         self._read_mixing()
         self._read_report()
-        self._read_vertices()
+        if self._bulk_read:
+            self._bulk_read_vertices()
+        else:
+            self._read_vertices()
         self._read_labels()
 
         ### Parse Backdrop
@@ -382,19 +464,73 @@ class InpFile(object):
         
         ### Finish tags
         self._read_end()
+
+        if cache_dir is not None:
+            self._save_cache(cache_file, cache_key)
         
         return self.wn
 
-    def write(self, filename, wn, units=None):
+    def _save_cache(self, cache_file, cache_key):
+        wn = self.wn
+        inpfile_state = dict((key, val) for key, val in self.__dict__.items() if key != 'sections')
+        cache_dir = os.path.dirname(cache_file)
+        tmp_name = None
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            # write to a temporary file and rename it so that other processes never read a partial entry
+            with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tmp', delete=False) as f:
+                tmp_name = f.name
+                pickle.dump({'version': wntr.__version__, 'key': cache_key}, f, pickle.HIGHEST_PROTOCOL)
+                pickler = _ModelPickler(f, {id(wn): 'wn', id(self): 'inpfile'})
+                pickler.dump((wn.__dict__, inpfile_state))
+            getattr(os, 'replace', os.rename)(tmp_name, cache_file)
+        except Exception as e:
+            logger.warning('Unable to save the parsed model cache %s: %s', cache_file, e)
+            if tmp_name is not None and os.path.isfile(tmp_name):
+                os.remove(tmp_name)
+
+    def _load_cache(self, cache_file, cache_key):
+        if not os.path.isfile(cache_file):
+            return False
+        try:
+            with open(cache_file, 'rb') as f:
+                header = pickle.load(f)
+                if header.get('version') != wntr.__version__ or header.get('key') != cache_key:
+                    logger.info('Ignoring the outdated parsed model cache %s', cache_file)
+                    return False
+                unpickler = _ModelUnpickler(f, {'wn': self.wn, 'inpfile': self})
+                wn_state, inpfile_state = unpickler.load()
+        except Exception as e:
+            logger.warning('Unable to load the parsed model cache %s: %s', cache_file, e)
+            return False
+        self.wn.__dict__.update(wn_state)
+        self.__dict__.update(inpfile_state)
+        self.sections = OrderedDict()
+        for sec in _INP_SECTIONS:
+            self.sections[sec] = []
+        return True
+
+    def write(self, filename, wn, units=None, cache_sections=False):
         """
         Write a water network model into an EPANET INP file.
 
+        The file is built in memory and written in a single call.
+
         Parameters
         ----------
         filename : str
             Name of the EPANET INP file.
         units : str, int or FlowUnits
             Name of the units being written to the EPANET INP file.
+        cache_sections : bool
+            If True, the text of the large element sections ([JUNCTIONS], [PIPES], [DEMANDS], 
+            [COORDINATES], etc.) is kept by this InpFile object and reused by the next write of 
+            the same model if the nodes, links, or patterns used by the section have not changed 
+            (changes are detected when attributes are set and elements are added or removed; 
+            the simulation state, such as node head and link flow, is ignored, and in-place 
+            changes to lists and arrays, such as node coordinates, are not detected). 
+            Default = False.
         
 		"""
 
@@ -416,40 +552,67 @@ class InpFile(object):
             self.flow_units = FlowUnits.GPM
         if self.mass_units is None:
             self.mass_units = MassUnits.mg
-        with io.open(filename, 'wb') as f:
-            self._write_title(f, wn)
-            self._write_junctions(f, wn)
-            self._write_reservoirs(f, wn)
-            self._write_tanks(f, wn)
-            self._write_pipes(f, wn)
-            self._write_pumps(f, wn)
-            self._write_valves(f, wn)
-
-            self._write_tags(f, wn)
-            self._write_demands(f, wn)
-            self._write_status(f, wn)
-            self._write_patterns(f, wn)
-            self._write_curves(f, wn)
-            self._write_controls(f, wn)
-            self._write_rules(f, wn)
-            self._write_energy(f, wn)
-            self._write_emitters(f, wn)
-
-            self._write_quality(f, wn)
-            self._write_sources(f, wn)
-            self._write_reactions(f, wn)
-            self._write_mixing(f, wn)
-
-            self._write_times(f, wn)
-            self._write_report(f, wn)
-            self._write_options(f, wn)
-
-            self._write_coordinates(f, wn)
-            self._write_vertices(f, wn)
-            self._write_labels(f, wn)
-            self._write_backdrop(f, wn)
-
-            self._write_end(f, wn)
+        if cache_sections and self._section_cache is None:
+            self._section_cache = {}
+
+        f = io.BytesIO()
+        def write_section(section, write_function):
+            if not cache_sections:
+                write_function(f, wn)
+                return
+            state = self._section_state(section, wn)
+            cached = self._section_cache.get(section, None)
+            if cached is None or cached[0] != state:
+                section_f = io.BytesIO()
+                write_function(section_f, wn)
+                cached = (state, section_f.getvalue())
+                self._section_cache[section] = cached
+            f.write(cached[1])
+
+        self._write_title(f, wn)
+        write_section('[JUNCTIONS]', self._write_junctions)
+        self._write_reservoirs(f, wn)
+        self._write_tanks(f, wn)
+        write_section('[PIPES]', self._write_pipes)
+        self._write_pumps(f, wn)
+        self._write_valves(f, wn)
+
+        write_section('[TAGS]', self._write_tags)
+        write_section('[DEMANDS]', self._write_demands)
+        self._write_status(f, wn)
+        self._write_patterns(f, wn)
+        self._write_curves(f, wn)
+        self._write_controls(f, wn)
+        self._write_rules(f, wn)
+        self._write_energy(f, wn)
+        write_section('[EMITTERS]', self._write_emitters)
+
+        write_section('[QUALITY]', self._write_quality)
+        self._write_sources(f, wn)
+        self._write_reactions(f, wn)
+        self._write_mixing(f, wn)
+
+        self._write_times(f, wn)
+        self._write_report(f, wn)
+        self._write_options(f, wn)
+
+        write_section('[COORDINATES]', self._write_coordinates)
+        self._write_vertices(f, wn)
+        self._write_labels(f, wn)
+        self._write_backdrop(f, wn)
+
+        self._write_end(f, wn)
+
+        with io.open(filename, 'wb') as fout:
+            fout.write(f.getvalue())
+
+    def _section_state(self, section, wn):
+        """The values that the text of a cached section depends on"""
+        state = [self.flow_units, self.mass_units, wn.options.hydraulic.pattern, wn.options.quality.mode]
+        for reg_name in _CACHED_SECTIONS[section]:
+            reg = getattr(wn, reg_name)
+            state.append((reg._cache_token, reg._version, reg._attribute_version))
+        return state
 
     ### Network Components
 
@@ -498,18 +661,41 @@ class InpFile(object):
 #            print(line)
 #            raise e
 
+    def _bulk_read_junctions(self):
+        rows = _split_section(self.sections['[JUNCTIONS]'])
+        if self.wn.options.hydraulic.pattern:
+            default_pattern = self.wn.options.hydraulic.pattern
+        else:
+            default_pattern = None
+        patterns = []
+        for current in rows:
+            if len(current) > 3:
+                patterns.append(current[3])
+            elif default_pattern is not None:
+                patterns.append(default_pattern)
+            else:
+                patterns.append(self.wn.patterns.default_pattern)
+        elevations = _float_column([current[1] for current in rows])
+        base_demands = _float_column([current[2] if len(current) > 2 else '0' for current in rows])
+        self.wn.add_junctions([current[0] for current in rows],
+                              to_si(self.flow_units, base_demands, HydParam.Demand),
+                              patterns,
+                              to_si(self.flow_units, elevations, HydParam.Elevation),
+                              demand_category='EN2 base')
+
     def _write_junctions(self, f, wn):
         f.write('[JUNCTIONS]\n'.encode('ascii'))
         f.write(_JUNC_LABEL.format(';ID', 'Elevation', 'Demand', 'Pattern').encode('ascii'))
-        nnames = list(wn.junction_name_list)
-        # nnames.sort()
-        for junction_name in nnames:
-            junction = wn.nodes[junction_name]
+        nnames = []
+        elevations = []
+        base_demands = []
+        patterns = []
+        for junction_name, junction in wn.junctions():
             if junction.demand_timeseries_list:
-                base_demands = junction.demand_timeseries_list.base_demand_list(category='EN2 base')
+                junction_base_demands = junction.demand_timeseries_list.base_demand_list(category='EN2 base')
                 demand_patterns = junction.demand_timeseries_list.pattern_list(category='EN2 base')
-                if base_demands:
-                    base_demand = base_demands[0]
+                if junction_base_demands:
+                    base_demand = junction_base_demands[0]
                 else:
                     base_demand = 0.0
                 if demand_patterns:
@@ -522,14 +708,14 @@ class InpFile(object):
             else:
                 base_demand = 0.0
                 demand_pattern = None
-            E = {'name': junction_name,
-                 'elev': from_si(self.flow_units, junction.elevation, HydParam.Elevation),
-                 'dem': from_si(self.flow_units, base_demand, HydParam.Demand),
-                 'pat': '',
-                 'com': ';'}
-            if demand_pattern is not None:
-                E['pat'] = str(demand_pattern)
-            f.write(_JUNC_ENTRY.format(**E).encode('ascii'))
+            nnames.append(junction_name)
+            elevations.append(junction.elevation)
+            base_demands.append(base_demand)
+            patterns.append('' if demand_pattern is None else str(demand_pattern))
+        elevations = from_si(self.flow_units, np.array(elevations, dtype=float), HydParam.Elevation).tolist()
+        base_demands = from_si(self.flow_units, np.array(base_demands, dtype=float), HydParam.Demand).tolist()
+        f.write(''.join(map(_JUNC_ROW.format, nnames, elevations, base_demands, patterns,
+                            [';']*len(nnames))).encode('ascii'))
         f.write('\n'.encode('ascii'))
 
     def _read_reservoirs(self):
@@ -639,26 +825,55 @@ class InpFile(object):
                             float(current[6]),
                             LinkStatus[current[7].upper()])
 
+    def _bulk_read_pipes(self):
+        rows = _split_section(self.sections['[PIPES]'])
+        statuses = []
+        check_valve_flags = []
+        for current in rows:
+            status = current[7].upper()
+            if status == 'CV':
+                statuses.append(LinkStatus.Open)
+                check_valve_flags.append(True)
+            else:
+                statuses.append(LinkStatus[status])
+                check_valve_flags.append(False)
+        lengths = _float_column([current[3] for current in rows])
+        diameters = _float_column([current[4] for current in rows])
+        self.wn.add_pipes([current[0] for current in rows],
+                          [current[1] for current in rows],
+                          [current[2] for current in rows],
+                          to_si(self.flow_units, lengths, HydParam.Length),
+                          to_si(self.flow_units, diameters, HydParam.PipeDiameter),
+                          _float_column([current[5] for current in rows]),
+                          _float_column([current[6] for current in rows]),
+                          statuses,
+                          check_valve_flags)
+
     def _write_pipes(self, f, wn):
         f.write('[PIPES]\n'.encode('ascii'))
         f.write(_PIPE_LABEL.format(';ID', 'Node1', 'Node2', 'Length', 'Diameter',
                                    'Roughness', 'Minor Loss', 'Status').encode('ascii'))
-        lnames = list(wn.pipe_name_list)
-        # lnames.sort()
-        for pipe_name in lnames:
-            pipe = wn.links[pipe_name]
-            E = {'name': pipe_name,
-                 'node1': pipe.start_node_name,
-                 'node2': pipe.end_node_name,
-                 'len': from_si(self.flow_units, pipe.length, HydParam.Length),
-                 'diam': from_si(self.flow_units, pipe.diameter, HydParam.PipeDiameter),
-                 'rough': pipe.roughness,
-                 'mloss': pipe.minor_loss,
-                 'status': str(pipe.initial_status),
-                 'com': ';'}
-            if pipe.cv:
-                E['status'] = 'CV'
-            f.write(_PIPE_ENTRY.format(**E).encode('ascii'))
+        lnames = []
+        node1 = []
+        node2 = []
+        lengths = []
+        diameters = []
+        roughnesses = []
+        minor_losses = []
+        statuses = []
+        for pipe_name, pipe in wn.pipes():
+            lnames.append(pipe_name)
+            node1.append(pipe.start_node_name)
+            node2.append(pipe.end_node_name)
+            lengths.append(pipe.length)
+            diameters.append(pipe.diameter)
+            roughnesses.append(pipe.roughness)
+            minor_losses.append(pipe.minor_loss)
+            statuses.append('CV' if pipe.cv else str(pipe.initial_status))
+        lengths = from_si(self.flow_units, np.array(lengths, dtype=float), HydParam.Length).tolist()
+        diameters = from_si(self.flow_units, np.array(diameters, dtype=float), HydParam.PipeDiameter).tolist()
+        f.write(''.join(map(_PIPE_ROW.format, lnames, node1, node2, lengths, diameters, roughnesses,
+                            minor_losses, statuses, [';']*len(lnames))).encode('ascii'))
         f.write('\n'.encode('ascii'))
 
     def _read_pumps(self):
@@ -826,13 +1041,12 @@ class InpFile(object):
         entry = '{:10s} {:10s}\n'
         label = '{:10s} {:10s}\n'
         f.write(label.format(';ID', 'Flow coefficient').encode('ascii'))
-        njunctions = list(wn.junction_name_list)
-        # njunctions.sort()
-        for junction_name in njunctions:
-            junction = wn.nodes[junction_name]
+        lines = []
+        for junction_name, junction in wn.junctions():
             if junction._emitter_coefficient:
                 val = from_si(self.flow_units, junction._emitter_coefficient, HydParam.Flow)
-                f.write(entry.format(junction_name, str(val)).encode('ascii'))
+                lines.append(entry.format(junction_name, str(val)))
+        f.write(''.join(lines).encode('ascii'))
         f.write('\n'.encode('ascii'))
 
     ### System Operation
@@ -896,6 +1110,48 @@ class InpFile(object):
             f.write('\n'.encode('ascii'))
         f.write('\n'.encode('ascii'))
 
+    def _bulk_read_demands(self):
+        rows = []
+        categories = []
+        for lnum, line in self.sections['[DEMANDS]']:
+            ldata = line.split(';')
+            current = ldata[0].split()
+            if current == []:
+                continue
+            rows.append(current)
+            if len(ldata) > 1:
+                categories.append(ldata[1])
+            else:
+                categories.append(None)
+        base_demands = _float_column([current[1] for current in rows])
+        base_demands = to_si(self.flow_units, base_demands, HydParam.Demand).tolist()
+        patterns = {}
+        for current, base_demand, category in zip(rows, base_demands, categories):
+            node = self.wn.get_node(current[0])
+            if len(current) == 2:
+                pattern = None
+            else:
+                pattern_name = current[2]
+                if pattern_name not in patterns:
+                    patterns[pattern_name] = self.wn.get_pattern(pattern_name)
+                pattern = patterns[pattern_name]
+            node.demand_timeseries_list.append((base_demand, pattern, category))
+
+    def _bulk_read_patterns(self):
+        rows = _split_section(self.sections['[PATTERNS]'])
+        values = _float_column([value for current in rows for value in current[1:]]).tolist()
+        _patterns = OrderedDict()
+        start = 0
+        for current in rows:
+            end = start + len(current) - 1
+            pattern_name = current[0]
+            if pattern_name not in _patterns:
+                _patterns[pattern_name] = values[start:end]
+            else:
+                _patterns[pattern_name].extend(values[start:end])
+            start = end
+        self._add_patterns(_patterns)
+
     def _read_patterns(self):
         _patterns = OrderedDict()
         for lnum, line in self.sections['[PATTERNS]']:
@@ -912,6 +1168,9 @@ class InpFile(object):
             else:
                 for i in current[1:]:
                     _patterns[pattern_name].append(float(i))
+        self._add_patterns(_patterns)
+
+    def _add_patterns(self, _patterns):
         for pattern_name, pattern in _patterns.items():
             # add the patterns to the water newtork model
             self.wn.add_pattern(pattern_name, pattern)
@@ -930,18 +1189,13 @@ class InpFile(object):
         num_columns = 6
         f.write('[PATTERNS]\n'.encode('ascii'))
         f.write('{:10s} {:10s}\n'.format(';ID', 'Multipliers').encode('ascii'))
-        patterns = list(wn.pattern_name_list)
-        # patterns.sort()
-        for pattern_name in patterns:
-            pattern = wn.get_pattern(pattern_name)
-            count = 0
-            for i in pattern.multipliers:
-                if count % num_columns == 0:
-                    f.write('\n{:s} {:f}'.format(pattern_name, i).encode('ascii'))
-                else:
-                    f.write(' {:f}'.format(i).encode('ascii'))
-                count += 1
-            f.write('\n'.encode('ascii'))
+        lines = []
+        for pattern_name, pattern in wn.patterns():
+            multipliers = list(map('{:f}'.format, pattern.multipliers))
+            for start in range(0, len(multipliers), num_columns):
+                lines.append('\n{:s} {:s}'.format(pattern_name, ' '.join(multipliers[start:start+num_columns])))
+            lines.append('\n')
+        f.write(''.join(lines).encode('ascii'))
         f.write('\n'.encode('ascii'))
 
     def _read_energy(self):
@@ -1348,21 +1602,21 @@ class InpFile(object):
 
     def _write_demands(self, f, wn):
         f.write('[DEMANDS]\n'.encode('ascii'))
-        entry = '{:10s} {:10s} {:10s}\n'
         label = '{:10s} {:10s} {:10s}\n'
         f.write(label.format(';ID', 'Demand', 'Pattern').encode('ascii'))
-        nodes = list(wn.junction_name_list)
-        # nodes.sort()
-        for node in nodes:
-            demands = wn.get_node(node).demand_timeseries_list
-            for ct, demand in enumerate(demands):
+        pattern_names = set(wn.pattern_name_list)
+        nodes = []
+        base_demands = []
+        patterns = []
+        for node, junction in wn.junctions():
+            for demand in junction.demand_timeseries_list:
                 if demand.category == 'EN2 base': continue
-                E = {'node': node,
-                     'base': from_si(self.flow_units, demand.base_value, HydParam.Demand),
-                     'pat': ''}
-                if demand.pattern_name in wn.pattern_name_list:
-                    E['pat'] = demand.pattern_name
-                f.write(entry.format(E['node'], str(E['base']), E['pat']).encode('ascii'))
+                nodes.append(node)
+                base_demands.append(demand.base_value)
+                pattern_name = demand.pattern_name
+                patterns.append(pattern_name if pattern_name in pattern_names else '')
+        base_demands = from_si(self.flow_units, np.array(base_demands, dtype=float), HydParam.Demand).tolist()
+        f.write(''.join(map(_DEMAND_ROW.format, nodes, map(str, base_demands), patterns)).encode('ascii'))
         f.write('\n'.encode('ascii'))
 
     ### Water Quality
@@ -1386,10 +1640,8 @@ class InpFile(object):
         f.write('[QUALITY]\n'.encode('ascii'))
         entry = '{:10s} {:10s}\n'
         label = '{:10s} {:10s}\n'
-        nnodes = list(wn.nodes.keys())
-        # nnodes.sort()
-        for node_name in nnodes:
-            node = wn.nodes[node_name]
+        lines = []
+        for node_name, node in wn.nodes():
             if node.initial_quality:
                 if wn.options.quality.mode == 'CHEMICAL':
                     quality = from_si(self.flow_units, node.initial_quality, QualParam.Concentration, mass_units=self.mass_units)
@@ -1397,7 +1649,8 @@ class InpFile(object):
                     quality = from_si(self.flow_units, node.initial_quality, QualParam.WaterAge)
                 else:
                     quality = node.initial_quality
-                f.write(entry.format(node_name, str(quality)).encode('ascii'))
+                lines.append(entry.format(node_name, str(quality)))
+        f.write(''.join(lines).encode('ascii'))
         f.write('\n'.encode('ascii'))
 
     def _read_reactions(self):
@@ -1931,14 +2184,44 @@ class InpFile(object):
 
     def _write_coordinates(self, f, wn):
         f.write('[COORDINATES]\n'.encode('ascii'))
-        entry = '{:10s} {:20.9f} {:20.9f}\n'
         label = '{:10s} {:10s} {:10s}\n'
         f.write(label.format(';Node', 'X-Coord', 'Y-Coord').encode('ascii'))
+        names = []
+        x = []
+        y = []
         for name, node in wn.nodes():
             val = node.coordinates
-            f.write(entry.format(name, val[0], val[1]).encode('ascii'))
+            names.append(name)
+            x.append(val[0])
+            y.append(val[1])
+        f.write(''.join(map(_COORD_ROW.format, names, x, y)).encode('ascii'))
         f.write('\n'.encode('ascii'))
 
+    def _bulk_read_coordinates(self):
+        rows = _split_section(self.sections['[COORDINATES]'])
+        x = _float_column([current[1] for current in rows]).tolist()
+        y = _float_column([current[2] for current in rows]).tolist()
+        for current, node_x, node_y in zip(rows, x, y):
+            node = self.wn.get_node(current[0])
+            node.coordinates = (node_x, node_y)
+
+    def _bulk_read_vertices(self):
+        rows = []
+        for lnum, line in self.sections['[VERTICES]']:
+            line = line.split(';')[0].strip()
+            current = line.split()
+            if current == []:
+                continue
+            if len(current) != 3:
+                logger.warning('Invalid VERTICES line: %s', line)
+                continue
+            rows.append(current)
+        x = _float_column([current[1] for current in rows]).tolist()
+        y = _float_column([current[2] for current in rows]).tolist()
+        for current, vertex_x, vertex_y in zip(rows, x, y):
+            link = self.wn.get_link(current[0])
+            link._vertices.append((vertex_x, vertex_y))
+
     def _read_vertices(self):
         for lnum, line in self.sections['[VERTICES]']:
             line = line.split(';')[0].strip()
@@ -1954,15 +2237,17 @@ class InpFile(object):
 
     def _write_vertices(self, f, wn):
         f.write('[VERTICES]\n'.encode('ascii'))
-        entry = '{:10s} {:20.9f} {:20.9f}\n'
         label = '{:10s} {:10s} {:10s}\n'
         f.write(label.format(';Link', 'X-Coord', 'Y-Coord').encode('ascii'))
-        lnames = list(wn.pipe_name_list)
-        # lnames.sort()
-        for pipe_name in lnames:
-            pipe = wn.links[pipe_name]
+        names = []
+        x = []
+        y = []
+        for pipe_name, pipe in wn.pipes():
             for vert in pipe._vertices:
-                f.write(entry.format(pipe_name, vert[0], vert[1]).encode('ascii'))
+                names.append(pipe_name)
+                x.append(vert[0])
+                y.append(vert[1])
+        f.write(''.join(map(_COORD_ROW.format, names, x, y)).encode('ascii'))
         f.write('\n'.encode('ascii'))
 
     def _read_labels(self):
@@ -2024,18 +2309,17 @@ class InpFile(object):
         entry = '{:10s} {:10s} {:10s}\n'
         label = '{:10s} {:10s} {:10s}\n'
         f.write(label.format(';type', 'name', 'tag').encode('ascii'))
-        nnodes = list(wn.node_name_list)
-        # nnodes.sort()
-        for node_name in nnodes:
-            node = wn.nodes[node_name]
+        lines = []
+        for node_name, node in wn.nodes():
             if node.tag:
-                f.write(entry.format('NODE', node_name, node.tag).encode('ascii'))
+                lines.append(entry.format('NODE', node_name, node.tag))
         nlinks = list(wn.link_name_list)
         nlinks.sort()
         for link_name in nlinks:
             link = wn.links[link_name]
             if link.tag:
-                f.write(entry.format('LINK', link_name, link.tag).encode('ascii'))
+                lines.append(entry.format('LINK', link_name, link.tag))
+        f.write(''.join(lines).encode('ascii'))
         f.write('\n'.encode('ascii'))
 
     ### End of File
@@ -2064,6 +2348,46 @@ class InpFile(object):
         f.write('[END]\n'.encode('ascii'))
 
 
+def _is_new_model(wn):
+    """True if wn has no elements, controls or sources and the default options"""
+    return wn.num_nodes == 0 and wn.num_links == 0 and wn.num_patterns == 0 and \
+        wn.num_curves == 0 and wn.num_controls == 0 and len(wn._sources) == 0 and \
+        wn.options == WaterNetworkOptions()
+
+
+def _inp_cache_key(inp_files):
+    """Key of the parsed model cache; hash of the WNTR version and the content of each INP file"""
+    digest = hashlib.sha256()
+    digest.update(wntr.__version__.encode('utf-8'))
+    for filename in inp_files:
+        file_digest = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                file_digest.update(chunk)
+        digest.update(file_digest.digest())
+    return digest.hexdigest()
+
+
+class _ModelPickler(pickle.Pickler):
+    """Pickler that saves references to the model (and its InpFile) as persistent ids"""
+    def __init__(self, f, persistent_ids):
+        pickle.Pickler.__init__(self, f, pickle.HIGHEST_PROTOCOL)
+        self._persistent_ids = persistent_ids
+
+    def persistent_id(self, obj):
+        return self._persistent_ids.get(id(obj))
+
+
+class _ModelUnpickler(pickle.Unpickler):
+    """Unpickler that resolves the persistent ids saved by _ModelPickler"""
+    def __init__(self, f, objects):
+        pickle.Unpickler.__init__(self, f)
+        self._objects = objects
+
+    def persistent_load(self, pid):
+        return self._objects[pid]
+
+
 class _EpanetRule(object):
     """contains the text for an EPANET rule"""
     def __init__(self, ruleID, inp_units=None, mass_units=None):
@@ -2545,6 +2869,190 @@ class BinFile(object):
         """
         pass
 
+    def _to_si(self, result_type, values, element_index=None):
+        """Convert values (periods x elements) of a result type to SI units"""
+        if result_type in [ResultType.quality, ResultType.linkquality]:
+            if self.quality_type is QualType.Chem:
+                return QualParam.Concentration._to_si(self.flow_units, values, mass_units=self.mass_units)
+            elif self.quality_type is QualType.Age:
+                return QualParam.WaterAge._to_si(self.flow_units, values, mass_units=self.mass_units)
+            return values
+        elif result_type == ResultType.demand:
+            return HydParam.Demand._to_si(self.flow_units, values)
+        elif result_type == ResultType.flowrate:
+            return HydParam.Flow._to_si(self.flow_units, values)
+        elif result_type == ResultType.head:
+            return HydParam.HydraulicHead._to_si(self.flow_units, values)
+        elif result_type == ResultType.pressure:
+            return HydParam.Pressure._to_si(self.flow_units, values)
+        elif result_type == ResultType.velocity:
+            return HydParam.Velocity._to_si(self.flow_units, values)
+        elif result_type == ResultType.status:
+            status = values.copy()
+            if self.convert_status:
+                status[values <= 2] = 0
+                status[values == 3] = 1
+                status[values >= 5] = 1
+                status[values == 4] = 2
+            return status
+        elif result_type == ResultType.setting:
+            settings = values.copy()
+            linktype = self._link_type_codes
+            if element_index is not None:
+                linktype = linktype[element_index]
+            for code, param in [(EN.PRV, HydParam.Pressure), (EN.PSV, HydParam.Pressure),
+                                (EN.PBV, HydParam.Pressure), (EN.FCV, HydParam.Flow)]:
+                mask = linktype == code
+                settings[..., mask] = to_si(self.flow_units, settings[..., mask], param)
+            return settings
+        return values
+
+    def _read_prolog(self, fin):
+        """Read the prolog and energy sections of a binary file; the file is left at the start of the
+        extended period results."""
+        dt_str = '|S{}'.format(self.idlen)
+        ftype = self.ftype
+        idlen = self.idlen
+        logger.debug('... read prolog information ...')
+        prolog = np.fromfile(fin, dtype=np.int32, count=15)
+        magic1 = prolog[0]
+        version = prolog[1]
+        nnodes = prolog[2]
+        ntanks = prolog[3]
+        nlinks = prolog[4]
+        npumps = prolog[5]
+        nvalve = prolog[6]
+        wqopt = QualType(prolog[7])
+        srctrace = prolog[8]
+        flowunits = FlowUnits(prolog[9])
+        presunits = PressureUnits(prolog[10])
+        statsflag = StatisticsType(prolog[11])
+        reportstart = prolog[12]
+        reportstep = prolog[13]
+        duration = prolog[14]
+        logger.debug('EPANET/Toolkit version %d',version)
+        logger.debug('Nodes: %d; Tanks/Resrv: %d Links: %d; Pumps: %d; Valves: %d',
+                     nnodes, ntanks, nlinks, npumps, nvalve)
+        logger.debug('WQ opt: %s; Trace Node: %s; Flow Units %s; Pressure Units %s',
+                     wqopt, srctrace, flowunits, presunits)
+        logger.debug('Statistics: %s; Report Start %d, step %d; Duration=%d sec',
+                     statsflag, reportstart, reportstep, duration)
+
+        # Ignore the title lines
+        np.fromfile(fin, dtype=np.uint8, count=240)
+        inpfile = np.fromfile(fin, dtype=np.uint8, count=260)
+        rptfile = np.fromfile(fin, dtype=np.uint8, count=260)
+        chemical = str(np.fromfile(fin, dtype=dt_str, count=1)[0])
+#            wqunits = ''.join([chr(f) for f in np.fromfile(fin, dtype=np.uint8, count=idlen) if f!=0 ])
+        wqunits = str(np.fromfile(fin, dtype=dt_str, count=1)[0])
+        mass = wqunits.split('/',1)[0]
+        if mass in ['mg', 'ug', u'mg', u'ug']:
+            massunits = MassUnits[mass]
+        else:
+            massunits = MassUnits.mg            
+        self.flow_units = flowunits
+        self.pres_units = presunits
+        self.quality_type = wqopt
+        self.mass_units = massunits
+        self.num_nodes = nnodes
+        self.num_tanks = ntanks
+        self.num_links = nlinks
+        self.num_pumps = npumps
+        self.num_valves = nvalve
+        self.report_start = reportstart
+        self.report_step = reportstep
+        self.duration = duration
+        self.chemical = chemical
+        self.chem_units = wqunits
+        self.inp_file = inpfile
+        self.rpt_file = rptfile
+        nodenames = []
+        linknames = []
+        nodenames = np.array(np.fromfile(fin, dtype=dt_str, count=nnodes), dtype=str).tolist()
+        linknames = np.array(np.fromfile(fin, dtype=dt_str, count=nlinks), dtype=str).tolist()
+        self.node_names = nodenames
+        self.link_names = linknames
+        linkstart = np.array(np.fromfile(fin, dtype=np.int32, count=nlinks), dtype=int)
+        linkend = np.array(np.fromfile(fin, dtype=np.int32, count=nlinks), dtype=int)
+        linktype = np.fromfile(fin, dtype=np.int32, count=nlinks)
+        tankidxs = np.fromfile(fin, dtype=np.int32, count=ntanks)
+        tankarea = np.fromfile(fin, dtype=np.dtype(ftype), count=ntanks)
+        elevation = np.fromfile(fin, dtype=np.dtype(ftype), count=nnodes)
+        linklen = np.fromfile(fin, dtype=np.dtype(ftype), count=nlinks)
+        diameter = np.fromfile(fin, dtype=np.dtype(ftype), count=nlinks)
+        """
+        self.save_network_desc_line('link_start', linkstart)
+        self.save_network_desc_line('link_end', linkend)
+        self.save_network_desc_line('link_type', linktype)
+        self.save_network_desc_line('tank_node_index', tankidxs)
+        self.save_network_desc_line('tank_area', tankarea)
+        self.save_network_desc_line('node_elevation', elevation)
+        self.save_network_desc_line('link_length', linklen)
+        self.save_network_desc_line('link_diameter', diameter)
+        """
+        logger.debug('... read energy data ...')
+        for i in range(npumps):
+            pidx = int(np.fromfile(fin,dtype=np.int32, count=1))
+            energy = np.fromfile(fin, dtype=np.dtype(ftype), count=6)
+            self.save_energy_line(pidx, linknames[pidx-1], energy)
+        peakenergy = np.fromfile(fin, dtype=np.dtype(ftype), count=1)
+        self.peak_energy = peakenergy
+
+        logger.debug('... read EP simulation data ...')
+        reporttimes = np.arange(reportstart, duration+reportstep, reportstep)
+        nrptsteps = len(reporttimes)
+        statsN = nrptsteps
+        if statsflag in [StatisticsType.Maximum, StatisticsType.Minimum, StatisticsType.Range]:
+            nrptsteps = 1
+            reporttimes = [reportstart + reportstep]
+        self.num_periods = nrptsteps
+        self.report_times = reporttimes
+
+        # set up results metadata dictionary
+        """
+        if wqopt == QualType.Age:
+            self.results.meta['quality_mode'] = 'AGE'
+            self.results.meta['quality_units'] = 's'
+        elif wqopt == QualType.Trace:
+            self.results.meta['quality_mode'] = 'TRACE'
+            self.results.meta['quality_units'] = '%'
+            self.results.meta['quality_trace'] = srctrace
+        elif wqopt == QualType.Chem:
+            self.results.meta['quality_mode'] = 'CHEMICAL'
+            self.results.meta['quality_units'] = wqunits
+            self.results.meta['quality_chem'] = chemical
+        self.results.time = reporttimes
+        self.save_network_desc_line('report_times', reporttimes)
+        self.save_network_desc_line('node_elevation', pd.Series(data=elevation, index=nodenames))
+        self.save_network_desc_line('link_length', pd.Series(data=linklen, index=linknames))
+        self.save_network_desc_line('link_diameter', pd.Series(data=diameter, index=linknames))
+        self.save_network_desc_line('stats_mode', statsflag)
+        self.save_network_desc_line('stats_N', statsN)
+        nodetypes = np.array(['Junction']*self.num_nodes, dtype='|S10')
+        nodetypes[tankidxs-1] = 'Tank'
+        nodetypes[tankidxs[tankarea==0]-1] = 'Reservoir'
+        linktypes = np.array(['Pipe']*self.num_links)
+        linktypes[ linktype == EN.PUMP ] = 'Pump'
+        linktypes[ linktype > EN.PUMP ] = 'Valve'
+        self.save_network_desc_line('link_type', pd.Series(data=linktypes, index=linknames, copy=True))
+        linktypes[ linktype == EN.CVPIPE ] = 'CV'
+        linktypes[ linktype == EN.FCV ] = 'FCV'
+        linktypes[ linktype == EN.PRV ] = 'PRV'
+        linktypes[ linktype == EN.PSV ] = 'PSV'
+        linktypes[ linktype == EN.PBV ] = 'PBV'
+        linktypes[ linktype == EN.TCV ] = 'TCV'
+        linktypes[ linktype == EN.GPV ] = 'GPV'
+        self.save_network_desc_line('link_subtype', pd.Series(data=linktypes, index=linknames, copy=True))
+        self.save_network_desc_line('node_type', pd.Series(data=nodetypes, index=nodenames, copy=True))
+        self.save_network_desc_line('node_names', np.array(nodenames, dtype=str))
+        self.save_network_desc_line('link_names', np.array(linknames, dtype=str))
+        names = np.array(nodenames, dtype=str)
+        self.save_network_desc_line('link_start', pd.Series(data=names[linkstart-1], index=linknames, copy=True))
+        self.save_network_desc_line('link_end', pd.Series(data=names[linkend-1], index=linknames, copy=True))
+        """
+        self._magic_number = magic1
+        self._link_type_codes = linktype
+
 #    @run_lineprofile()
     def read(self, filename, custom_handlers=False):
         """Read a binary file and create a results object.
@@ -2571,147 +3079,17 @@ class BinFile(object):
             
         """
         logger.debug('Read binary EPANET data from %s',filename)
-        dt_str = '|S{}'.format(self.idlen)
         with open(filename, 'rb') as fin:
+            self._read_prolog(fin)
             ftype = self.ftype
-            idlen = self.idlen
-            logger.debug('... read prolog information ...')
-            prolog = np.fromfile(fin, dtype=np.int32, count=15)
-            magic1 = prolog[0]
-            version = prolog[1]
-            nnodes = prolog[2]
-            ntanks = prolog[3]
-            nlinks = prolog[4]
-            npumps = prolog[5]
-            nvalve = prolog[6]
-            wqopt = QualType(prolog[7])
-            srctrace = prolog[8]
-            flowunits = FlowUnits(prolog[9])
-            presunits = PressureUnits(prolog[10])
-            statsflag = StatisticsType(prolog[11])
-            reportstart = prolog[12]
-            reportstep = prolog[13]
-            duration = prolog[14]
-            logger.debug('EPANET/Toolkit version %d',version)
-            logger.debug('Nodes: %d; Tanks/Resrv: %d Links: %d; Pumps: %d; Valves: %d',
-                         nnodes, ntanks, nlinks, npumps, nvalve)
-            logger.debug('WQ opt: %s; Trace Node: %s; Flow Units %s; Pressure Units %s',
-                         wqopt, srctrace, flowunits, presunits)
-            logger.debug('Statistics: %s; Report Start %d, step %d; Duration=%d sec',
-                         statsflag, reportstart, reportstep, duration)
-
-            # Ignore the title lines
-            np.fromfile(fin, dtype=np.uint8, count=240)
-            inpfile = np.fromfile(fin, dtype=np.uint8, count=260)
-            rptfile = np.fromfile(fin, dtype=np.uint8, count=260)
-            chemical = str(np.fromfile(fin, dtype=dt_str, count=1)[0])
-#            wqunits = ''.join([chr(f) for f in np.fromfile(fin, dtype=np.uint8, count=idlen) if f!=0 ])
-            wqunits = str(np.fromfile(fin, dtype=dt_str, count=1)[0])
-            mass = wqunits.split('/',1)[0]
-            if mass in ['mg', 'ug', u'mg', u'ug']:
-                massunits = MassUnits[mass]
-            else:
-                massunits = MassUnits.mg            
-            self.flow_units = flowunits
-            self.pres_units = presunits
-            self.quality_type = wqopt
-            self.mass_units = massunits
-            self.num_nodes = nnodes
-            self.num_tanks = ntanks
-            self.num_links = nlinks
-            self.num_pumps = npumps
-            self.num_valves = nvalve
-            self.report_start = reportstart
-            self.report_step = reportstep
-            self.duration = duration
-            self.chemical = chemical
-            self.chem_units = wqunits
-            self.inp_file = inpfile
-            self.rpt_file = rptfile
-            nodenames = []
-            linknames = []
-            nodenames = np.array(np.fromfile(fin, dtype=dt_str, count=nnodes), dtype=str).tolist()
-            linknames = np.array(np.fromfile(fin, dtype=dt_str, count=nlinks), dtype=str).tolist()
-            self.node_names = nodenames
-            self.link_names = linknames
-            linkstart = np.array(np.fromfile(fin, dtype=np.int32, count=nlinks), dtype=int)
-            linkend = np.array(np.fromfile(fin, dtype=np.int32, count=nlinks), dtype=int)
-            linktype = np.fromfile(fin, dtype=np.int32, count=nlinks)
-            tankidxs = np.fromfile(fin, dtype=np.int32, count=ntanks)
-            tankarea = np.fromfile(fin, dtype=np.dtype(ftype), count=ntanks)
-            elevation = np.fromfile(fin, dtype=np.dtype(ftype), count=nnodes)
-            linklen = np.fromfile(fin, dtype=np.dtype(ftype), count=nlinks)
-            diameter = np.fromfile(fin, dtype=np.dtype(ftype), count=nlinks)
-            """
-            self.save_network_desc_line('link_start', linkstart)
-            self.save_network_desc_line('link_end', linkend)
-            self.save_network_desc_line('link_type', linktype)
-            self.save_network_desc_line('tank_node_index', tankidxs)
-            self.save_network_desc_line('tank_area', tankarea)
-            self.save_network_desc_line('node_elevation', elevation)
-            self.save_network_desc_line('link_length', linklen)
-            self.save_network_desc_line('link_diameter', diameter)
-            """
-            logger.debug('... read energy data ...')
-            for i in range(npumps):
-                pidx = int(np.fromfile(fin,dtype=np.int32, count=1))
-                energy = np.fromfile(fin, dtype=np.dtype(ftype), count=6)
-                self.save_energy_line(pidx, linknames[pidx-1], energy)
-            peakenergy = np.fromfile(fin, dtype=np.dtype(ftype), count=1)
-            self.peak_energy = peakenergy
-
-            logger.debug('... read EP simulation data ...')
-            reporttimes = np.arange(reportstart, duration+reportstep, reportstep)
-            nrptsteps = len(reporttimes)
-            statsN = nrptsteps
-            if statsflag in [StatisticsType.Maximum, StatisticsType.Minimum, StatisticsType.Range]:
-                nrptsteps = 1
-                reporttimes = [reportstart + reportstep]
-            self.num_periods = nrptsteps
-            self.report_times = reporttimes
-
-            # set up results metadata dictionary
-            """
-            if wqopt == QualType.Age:
-                self.results.meta['quality_mode'] = 'AGE'
-                self.results.meta['quality_units'] = 's'
-            elif wqopt == QualType.Trace:
-                self.results.meta['quality_mode'] = 'TRACE'
-                self.results.meta['quality_units'] = '%'
-                self.results.meta['quality_trace'] = srctrace
-            elif wqopt == QualType.Chem:
-                self.results.meta['quality_mode'] = 'CHEMICAL'
-                self.results.meta['quality_units'] = wqunits
-                self.results.meta['quality_chem'] = chemical
-            self.results.time = reporttimes
-            self.save_network_desc_line('report_times', reporttimes)
-            self.save_network_desc_line('node_elevation', pd.Series(data=elevation, index=nodenames))
-            self.save_network_desc_line('link_length', pd.Series(data=linklen, index=linknames))
-            self.save_network_desc_line('link_diameter', pd.Series(data=diameter, index=linknames))
-            self.save_network_desc_line('stats_mode', statsflag)
-            self.save_network_desc_line('stats_N', statsN)
-            nodetypes = np.array(['Junction']*self.num_nodes, dtype='|S10')
-            nodetypes[tankidxs-1] = 'Tank'
-            nodetypes[tankidxs[tankarea==0]-1] = 'Reservoir'
-            linktypes = np.array(['Pipe']*self.num_links)
-            linktypes[ linktype == EN.PUMP ] = 'Pump'
-            linktypes[ linktype > EN.PUMP ] = 'Valve'
-            self.save_network_desc_line('link_type', pd.Series(data=linktypes, index=linknames, copy=True))
-            linktypes[ linktype == EN.CVPIPE ] = 'CV'
-            linktypes[ linktype == EN.FCV ] = 'FCV'
-            linktypes[ linktype == EN.PRV ] = 'PRV'
-            linktypes[ linktype == EN.PSV ] = 'PSV'
-            linktypes[ linktype == EN.PBV ] = 'PBV'
-            linktypes[ linktype == EN.TCV ] = 'TCV'
-            linktypes[ linktype == EN.GPV ] = 'GPV'
-            self.save_network_desc_line('link_subtype', pd.Series(data=linktypes, index=linknames, copy=True))
-            self.save_network_desc_line('node_type', pd.Series(data=nodetypes, index=nodenames, copy=True))
-            self.save_network_desc_line('node_names', np.array(nodenames, dtype=str))
-            self.save_network_desc_line('link_names', np.array(linknames, dtype=str))
-            names = np.array(nodenames, dtype=str)
-            self.save_network_desc_line('link_start', pd.Series(data=names[linkstart-1], index=linknames, copy=True))
-            self.save_network_desc_line('link_end', pd.Series(data=names[linkend-1], index=linknames, copy=True))
-            """
+            nnodes = self.num_nodes
+            nlinks = self.num_links
+            nodenames = self.node_names
+            linknames = self.link_names
+            linktype = self._link_type_codes
+            reporttimes = self.report_times
+            nrptsteps = self.num_periods
+            magic1 = self._magic_number
             if custom_handlers is True:
                 logger.debug('... set up results object ...')
                 self.setup_ep_results(reporttimes, nodenames, linknames)
@@ -2806,22 +3184,299 @@ class BinFile(object):
                 self.results.link['frictionfact'] = df['frictionfactor']
                 self.results.link['rxnrate'] = df['reactionrate']
                 
-            logger.debug('... read epilog ...')
-            # Read the averages and then the number of periods for checks
-            averages = np.fromfile(fin, dtype=np.dtype(ftype), count=4)
-            self.averages = averages
-            np.fromfile(fin, dtype=np.int32, count=1)
-            warnflag = np.fromfile(fin, dtype=np.int32, count=1)
-            magic2 = np.fromfile(fin, dtype=np.int32, count=1)
-            if magic1 != magic2:
-                logger.critical('The magic number did not match -- binary incomplete or incorrectly read. If you believe this file IS complete, please try a different float type. Current type is "%s"',ftype)
-            #print numperiods, warnflag, magic
-            if warnflag != 0:
-                logger.warning('Warnings were issued during simulation')
-        self.finalize_save(magic1==magic2, warnflag)
+            good_read, warnflag = self._read_epilog(fin)
+        self.finalize_save(good_read, warnflag)
         
         return self.results
 
+    def _read_epilog(self, fin):
+        """Read the epilog of a binary file; returns (good_read, warnflag)"""
+        logger.debug('... read epilog ...')
+        ftype = self.ftype
+        # Read the averages and then the number of periods for checks
+        averages = np.fromfile(fin, dtype=np.dtype(ftype), count=4)
+        self.averages = averages
+        np.fromfile(fin, dtype=np.int32, count=1)
+        warnflag = np.fromfile(fin, dtype=np.int32, count=1)
+        magic2 = np.fromfile(fin, dtype=np.int32, count=1)
+        if self._magic_number != magic2:
+            logger.critical('The magic number did not match -- binary incomplete or incorrectly read. If you believe this file IS complete, please try a different float type. Current type is "%s"',ftype)
+        #print numperiods, warnflag, magic
+        if warnflag != 0:
+            logger.warning('Warnings were issued during simulation')
+        return self._magic_number == magic2, warnflag
+
+    def read_to_sink(self, filename, sink):
+        """Read a binary file one report period at a time and pass the results to a result sink.
+
+        Only one report period is held in memory. The result types of the reader (see result_types) 
+        are passed to the sink, converted to SI units, with the ResultType member names as keys 
+        (e.g., 'pressure' and 'flowrate'). See wntr.sim.sinks.
+
+        Parameters
+        ----------
+        filename : str
+            An EPANET BIN output file
+        sink : ResultSink
+            The result sink
+
+        Returns
+        -------
+        object
+            returns a WaterNetworkResults object, with the node and link results set by the sink
+
+        """
+        logger.debug('Read binary EPANET data from %s to a result sink',filename)
+        node_types = [ResultType.demand, ResultType.head, ResultType.pressure, ResultType.quality]
+        link_types = [ResultType.flowrate, ResultType.velocity, ResultType.headloss, ResultType.linkquality,
+                      ResultType.status, ResultType.setting, ResultType.rxnrate, ResultType.frictionfact]
+        with open(filename, 'rb') as fin:
+            self._read_prolog(fin)
+            nnodes = self.num_nodes
+            nlinks = self.num_links
+            sink.setup(self.node_names, self.link_names)
+            node_offsets = [(result_type, i*nnodes) for i, result_type in enumerate(node_types)
+                            if result_type in self.items]
+            link_offsets = [(result_type, 4*nnodes + i*nlinks) for i, result_type in enumerate(link_types)
+                            if result_type in self.items]
+            for ts in range(self.num_periods):
+                data = np.fromfile(fin, dtype=np.dtype(self.ftype), count=4*nnodes+8*nlinks)
+                node = dict((result_type.name, self._to_si(result_type, data[start:start+nnodes]))
+                            for result_type, start in node_offsets)
+                link = dict((result_type.name, self._to_si(result_type, data[start:start+nlinks]))
+                            for result_type, start in link_offsets)
+                sink.save(int(self.report_times[ts]), node, link)
+            good_read, warnflag = self._read_epilog(fin)
+        self.finalize_save(good_read, warnflag)
+        self.results.network_name = self.inp_file
+        sink.finalize(self.results)
+        return self.results
+
+
+class MemmapBinFile(BinFile):
+    """
+    Memory-mapped EPANET binary output file reader class.
+
+    The extended period results are not read into memory. Instead, the file is
+    memory-mapped and the results are exposed as a structured :class:`numpy.memmap`
+    (:attr:`data`) with one record per report period. The record fields are the
+    :class:`~wntr.epanet.util.ResultType` member names, and each field holds the
+    values (in EPANET units) of all nodes or all links for that period.
+
+    Values are only read from the file, and converted to SI units, for the result
+    types, nodes, links, and report times selected in :meth:`get_results`,
+    :meth:`iter_periods`, or :meth:`read`, so metrics can be computed over
+    outputs that do not fit in memory.
+
+    Parameters
+    ----------
+    filename : str, optional
+        An EPANET BIN output file to open, see :meth:`open`
+    result_types : list of :class:`~wntr.epanet.util.ResultType`, default=None
+        Result types returned by :meth:`read`. If ``None``, all results are returned.
+    convert_status : bool, default=True
+        Convert the EPANET link status (8 values) to simpler WNTR status (3 values).
+
+    """
+    _node_result_types = [ResultType.demand, ResultType.head, ResultType.pressure, ResultType.quality]
+    _link_result_types = [ResultType.flowrate, ResultType.velocity, ResultType.headloss, ResultType.linkquality,
+                          ResultType.status, ResultType.setting, ResultType.rxnrate, ResultType.frictionfact]
+
+    def __init__(self, filename=None, result_types=None, convert_status=True):
+        super(MemmapBinFile, self).__init__(result_types=result_types, convert_status=convert_status)
+        self.filename = None
+        self.data = None
+        self._node_index = None
+        self._link_index = None
+        if filename is not None:
+            self.open(filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self, filename):
+        """Read the prolog of a binary file and memory-map the extended period results.
+
+        Parameters
+        ----------
+        filename : str
+            An EPANET BIN output file
+
+        """
+        logger.debug('Memory-map binary EPANET data from %s', filename)
+        with open(filename, 'rb') as fin:
+            self._read_prolog(fin)
+            offset = fin.tell()
+        fields = [(member.name, self.ftype, (self.num_nodes,)) for member in self._node_result_types]
+        fields += [(member.name, self.ftype, (self.num_links,)) for member in self._link_result_types]
+        dtype = np.dtype(fields)
+
+        # The epilog holds 4 averages, the number of periods, the warning flag, and the magic number
+        file_size = os.path.getsize(filename)
+        num_periods = min(self.num_periods, max(file_size - offset - 28, 0) // dtype.itemsize)
+        if num_periods < self.num_periods:
+            logger.warning('Missing results from report periods %d to %d', num_periods, self.num_periods-1)
+        else:
+            magic2 = np.memmap(filename, dtype=np.int32, mode='r', offset=file_size-4, shape=(1,))[0]
+            if self._magic_number != magic2:
+                logger.critical('The magic number did not match -- binary incomplete or incorrectly read. If you believe this file IS complete, please try a different float type. Current type is "%s"', self.ftype)
+
+        self.filename = filename
+        self.report_times = np.asarray(self.report_times)[:num_periods]
+        self.num_periods = num_periods
+        self._node_index = dict(zip(self.node_names, range(self.num_nodes)))
+        self._link_index = dict(zip(self.link_names, range(self.num_links)))
+        if num_periods > 0:
+            self.data = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=(num_periods,))
+        else:
+            self.data = np.zeros(0, dtype=dtype)
+        return self
+
+    def close(self):
+        """Release the memory map (arrays returned by the reader remain valid)."""
+        self.data = None
+
+    def _get_periods(self, start_time=None, end_time=None):
+        """Slice of the report periods between start_time and end_time (inclusive, in seconds)"""
+        start = 0
+        stop = self.num_periods
+        if start_time is not None:
+            start = np.searchsorted(self.report_times, start_time, side='left')
+        if end_time is not None:
+            stop = np.searchsorted(self.report_times, end_time, side='right')
+        return slice(start, max(start, stop))
+
+    def _get_element_index(self, result_type, names):
+        """Indices of the selected nodes or links (None selects all of them)"""
+        if names is None:
+            return None
+        if isinstance(names, six.string_types):
+            names = [names]
+        if result_type.is_node:
+            index = self._node_index
+        else:
+            index = self._link_index
+        try:
+            return np.array([index[name] for name in names], dtype=int)
+        except KeyError as e:
+            raise KeyError('{} is not in the binary file'.format(e))
+
+    def _get_values(self, result_type, element_index, periods):
+        values = self.data[periods][result_type.name]
+        if element_index is not None:
+            values = values[..., element_index]
+        return self._to_si(result_type, np.array(values, dtype=float), element_index)
+
+    def get_results(self, result_type, names=None, start_time=None, end_time=None):
+        """Read the values of one result type.
+
+        Parameters
+        ----------
+        result_type : :class:`~wntr.epanet.util.ResultType` or str
+            The result type (e.g., ResultType.pressure or 'pressure')
+        names : list of str, optional
+            Names of the nodes or links; if None, all nodes or links are returned
+        start_time : int, optional
+            First report time (in seconds) to return; if None, starts at the first report period
+        end_time : int, optional
+            Last report time (in seconds) to return; if None, ends at the last report period
+
+        Returns
+        -------
+        pandas.DataFrame
+            Values in SI units, indexed by report time, with one column per node or link
+
+        """
+        if isinstance(result_type, six.string_types):
+            result_type = ResultType[result_type]
+        if self.data is None:
+            raise RuntimeError('No binary file is open')
+        periods = self._get_periods(start_time, end_time)
+        element_index = self._get_element_index(result_type, names)
+        if element_index is None:
+            if result_type.is_node:
+                columns = self.node_names
+            else:
+                columns = self.link_names
+        else:
+            columns = list(names) if not isinstance(names, six.string_types) else [names]
+        values = self._get_values(result_type, element_index, periods)
+        return pd.DataFrame(data=values, index=self.report_times[periods], columns=columns)
+
+    def iter_periods(self, result_types=None, nodes=None, links=None, start_time=None, end_time=None):
+        """Iterate over the report periods.
+
+        Only one period is read from the file (and converted to SI units) at a time.
+
+        Parameters
+        ----------
+        result_types : list of :class:`~wntr.epanet.util.ResultType` or str, optional
+            Result types to return; if None, the result types given when the reader was created are returned
+        nodes : list of str, optional
+            Names of the nodes; if None, all nodes are returned
+        links : list of str, optional
+            Names of the links; if None, all links are returned
+        start_time : int, optional
+            First report time (in seconds)
+        end_time : int, optional
+            Last report time (in seconds)
+
+        Yields
+        ------
+        (time, values) : tuple
+            The report time (in seconds) and a dictionary of numpy arrays keyed by result type name
+
+        """
+        if self.data is None:
+            raise RuntimeError('No binary file is open')
+        if result_types is None:
+            result_types = self.items
+        result_types = [ResultType[rt] if isinstance(rt, six.string_types) else rt for rt in result_types]
+        selection = [(rt, self._get_element_index(rt, nodes if rt.is_node else links)) for rt in result_types]
+        periods = self._get_periods(start_time, end_time)
+        for period in range(periods.start, periods.stop):
+            values = {}
+            for result_type, element_index in selection:
+                values[result_type.name] = self._get_values(result_type, element_index, period)
+            yield self.report_times[period], values
+
+    def read(self, filename=None, nodes=None, links=None, start_time=None, end_time=None):
+        """Read the selected results into a results object.
+
+        Parameters
+        ----------
+        filename : str, optional
+            An EPANET BIN output file; if None, the open file is used
+        nodes : list of str, optional
+            Names of the nodes; if None, all nodes are returned
+        links : list of str, optional
+            Names of the links; if None, all links are returned
+        start_time : int, optional
+            First report time (in seconds)
+        end_time : int, optional
+            Last report time (in seconds)
+
+        Returns
+        -------
+        :class:`~wntr.sim.results.SimulationResults`
+            Results for the result types given when the reader was created
+
+        """
+        if filename is not None:
+            self.open(filename)
+        self.results.node = {}
+        self.results.link = {}
+        self.results.network_name = self.inp_file
+        for result_type in self.items:
+            if result_type.is_node:
+                self.results.node[result_type.name] = self.get_results(result_type, nodes, start_time, end_time)
+            elif result_type.is_link:
+                self.results.link[result_type.name] = self.get_results(result_type, links, start_time, end_time)
+        return self.results
+
 
 class NoSectionError(Exception):
     pass
@@ -482,6 +482,139 @@ class ENepanet():
         return fValue.value
 
 
+    def ENgetnodevalues(self, iCode, values):
+        """Retrieves a parameter value for all nodes
+
+        Parameters
+        -------------
+        iCode : int
+            Node parameter code (see toolkit.optNodeParams)
+        values : numpy array
+            Array (of length equal to the number of nodes) in which the
+            values are stored, in node index order
+
+        """
+        fValue = ctypes.c_float()
+        pValue = byref(fValue)
+        getnodevalue = self.ENlib.ENgetnodevalue
+        for i in range(len(values)):
+            errcode = getnodevalue(i+1, iCode, pValue)
+            if errcode:
+                self.errcode = errcode
+                self._error()
+            values[i] = fValue.value
+        return values
+
+    def ENgetlinkvalues(self, iCode, values):
+        """Retrieves a parameter value for all links
+
+        Parameters
+        -------------
+        iCode : int
+            Link parameter code (see toolkit.optLinkParams)
+        values : numpy array
+            Array (of length equal to the number of links) in which the
+            values are stored, in link index order
+
+        """
+        fValue = ctypes.c_float()
+        pValue = byref(fValue)
+        getlinkvalue = self.ENlib.ENgetlinkvalue
+        for i in range(len(values)):
+            errcode = getlinkvalue(i+1, iCode, pValue)
+            if errcode:
+                self.errcode = errcode
+                self._error()
+            values[i] = fValue.value
+        return values
+
+    def ENgetnodeid(self, iIndex):
+        """Retrieves the ID of a node
+
+        Parameters
+        -------------
+        iIndex : int
+            Node index
+
+        Returns
+        ---------
+        Node ID
+
+        """
+        sId = ctypes.create_string_buffer(32)
+        self.errcode = self.ENlib.ENgetnodeid(iIndex, sId)
+        self._error()
+        return sId.value.decode('ascii')
+
+    def ENgetlinkid(self, iIndex):
+        """Retrieves the ID of a link
+
+        Parameters
+        -------------
+        iIndex : int
+            Link index
+
+        Returns
+        ---------
+        Link ID
+
+        """
+        sId = ctypes.create_string_buffer(32)
+        self.errcode = self.ENlib.ENgetlinkid(iIndex, sId)
+        self._error()
+        return sId.value.decode('ascii')
+
+    def ENgetlinktype(self, iIndex):
+        """Retrieves the type code of a link
+
+        Parameters
+        -------------
+        iIndex : int
+            Link index
+
+        Returns
+        ---------
+        Link type code (see toolkit.optLinkTypes)
+
+        """
+        iCode = ctypes.c_int()
+        self.errcode = self.ENlib.ENgetlinktype(iIndex, byref(iCode))
+        self._error()
+        return iCode.value
+
+    def ENgettimeparam(self, iCode):
+        """Retrieves the value of a time parameter
+
+        Parameters
+        -------------
+        iCode : int
+            Time parameter code (see toolkit.optTimeParams)
+
+        Returns
+        ---------
+        Value of the time parameter (seconds)
+
+        """
+        lValue = ctypes.c_long()
+        self.errcode = self.ENlib.ENgettimeparam(iCode, byref(lValue))
+        self._error()
+        return lValue.value
+
+    def ENgetqualtype(self):
+        """Retrieves the type of water quality analysis
+
+        Returns
+        ---------
+        Water quality analysis code (see toolkit.optQualTypes) and the
+        index of the trace node (0 if the analysis is not a trace)
+
+        """
+        iQualcode = ctypes.c_int()
+        iTracenode = ctypes.c_int()
+        self.errcode = self.ENlib.ENgetqualtype(byref(iQualcode), byref(iTracenode))
+        self._error()
+        return iQualcode.value, iTracenode.value
+
     def ENsaveinpfile(self, inpfile):
         """Saves EPANET input file
 
@@ -8,14 +8,14 @@ The wntr.metrics.economic module contains economic metrics.
     annual_network_cost
     annual_ghg_emissions
     pump_energy
-
+    pump_cost
 
 """
 from wntr.network import Tank, Pipe, Pump, Valve
 import numpy as np 
 import pandas as pd 
 import logging
-import scipy
+from wntr.metrics.hydraulic import _element_values
 
 logger = logging.getLogger(__name__)
 
@@ -256,15 +256,23 @@ def pump_energy(flowrate, head, wn):
         pump = wn.get_link('pump1')
         pump.energy_price = 3.61e-8  # $/J
 
+    Efficiency curves are interpolated linearly in the pump flow rate; the 
+    efficiency at flow rates outside the curve is the efficiency at the 
+    nearest end of the curve, as in EPANET.  The energy is computed with 
+    whole-array operations, so results of an ensemble of scenarios can be 
+    used at once, see :class:`~wntr.metrics.hydraulic.todini_index`.
+
     Parameters
     ----------
-    flowrate : pandas DataFrame
+    flowrate : pandas DataFrame or numpy array
         A pandas Dataframe containing pump flowrates 
-        (index = times, columns = pump names).
+        (index = times, columns = pump names), or an array 
+        (..., times, links) with links ordered as wn.link_name_list.
     
-    head : pandas DataFrame
+    head : pandas DataFrame or numpy array
         A pandas Dataframe containing node head 
-        (index = times, columns = node names).
+        (index = times, columns = node names), or an array
+        (..., times, nodes) with nodes ordered as wn.node_name_list.
         
      wn: wntr WaterNetworkModel
         Water network model.  The water network model is needed to 
@@ -272,42 +280,36 @@ def pump_energy(flowrate, head, wn):
 
     Returns
     -------
-    A tuple of pandas DataFrames: the first DataFrame contains pump energy in Watts,
-    the second contains pump cost is $/s (index = times, columns = pump names).
+    A pandas DataFrame that contains pump energy in Watts (index = times, 
+    columns = pump names), or an array (..., times, pumps) for array inputs.
     """
     
     # TODO: Need to get this unit tested and not just functionally tested
     if wn.options.energy.demand_charge is not None and wn.options.energy.demand_charge != 0:
         raise ValueError('WNTR does not support demand charge yet.')
 
-    pumps = wn.pump_name_list
-    time = flowrate.index
+    pumps = [wn.get_link(name) for name in wn.pump_name_list]
     
-    headloss = pd.DataFrame(data=None, index=time, columns=pumps)
-    for pump_name, pump in wn.pumps():
-        start_node = pump.start_node_name
-        end_node = pump.end_node_name
-        start_head = head.loc[:,start_node]
-        end_head = head.loc[:,end_node]
-        headloss.loc[:,pump_name] = end_head - start_head
-
-    efficiency_dict = {}
-    for pump_name, pump in wn.pumps():
-        if pump.efficiency is None:
-            efficiency_dict[pump_name] = [wn.options.energy.global_efficiency/100.0 for i in time]
-        else:
-            raise NotImplementedError('WNTR does not support pump efficiency curves yet.')
-            curve = wn.get_curve(pump.efficiency)
-            x = [point[0] for point in curve.points]
-            y = [point[1]/100.0 for point in curve.points]
-            interp = scipy.interpolate.interp1d(x, y, kind='linear')
-            efficiency_dict[pump_name] = interp(np.array(flowrate.loc[:, pump_name]))
+    start_head = _element_values(head, [pump.start_node_name for pump in pumps], wn.node_name_list)
+    end_head = _element_values(head, [pump.end_node_name for pump in pumps], wn.node_name_list)
+    headloss = end_head - start_head
+    flow = _element_values(flowrate, [pump.name for pump in pumps], wn.link_name_list)
 
-    efficiency = pd.DataFrame(data=efficiency_dict, index=time, columns=pumps)
+    efficiency = np.empty(flow.shape)
+    efficiency[...] = wn.options.energy.global_efficiency/100.0
+    for i, pump in enumerate(pumps):
+        if pump.efficiency is not None:
+            curve = pump.efficiency
+            if not hasattr(curve, 'points'):
+                curve = wn.get_curve(curve)
+            points = sorted(curve.points)
+            x = [point[0] for point in points]
+            y = [point[1]/100.0 for point in points]
+            efficiency[..., i] = np.interp(flow[..., i], x, y)
 
-    energy = 1000.0 * 9.81 * headloss * flowrate / efficiency
+    energy = 1000.0 * 9.81 * headloss * flow / efficiency
     
-    return energy
+    return _pump_frame(energy, flowrate, pumps)
 
 def pump_cost(flowrate, head, wn):
     """
@@ -315,13 +317,15 @@ def pump_cost(flowrate, head, wn):
     
     Parameters
     ----------
-    flowrate : pandas DataFrame
+    flowrate : pandas DataFrame or numpy array
         A pandas Dataframe containing pump flowrates 
-        (index = times, columns = pump names).
+        (index = times, columns = pump names), or an array, 
+        see :class:`~wntr.metrics.economic.pump_energy`.
     
-    head : pandas DataFrame
+    head : pandas DataFrame or numpy array
         A pandas Dataframe containing node head 
-        (index = times, columns = node names).
+        (index = times, columns = node names), or an array, 
+        see :class:`~wntr.metrics.economic.pump_energy`.
         
     wn: wntr WaterNetworkModel
         Water network model.  The water network model is needed to 
@@ -329,31 +333,33 @@ def pump_cost(flowrate, head, wn):
         
     Returns
     -----------
-    Pump cost (float)
+    A pandas DataFrame that contains pump cost in $/s (index = times, 
+    columns = pump names), or an array (..., times, pumps) for array inputs.
     
     """
-    time = flowrate.index
-    pumps = wn.pump_name_list
+    pumps = [wn.get_link(name) for name in wn.pump_name_list]
     energy = pump_energy(flowrate, head, wn)
     
-    price_dict = {}
-    for pump_name, pump in wn.pumps():
+    price = []
+    for pump in pumps:
         if pump.energy_price is None and pump.energy_pattern is None:
             if wn.options.energy.global_pattern is None:
-                price_dict[pump_name] = [wn.options.energy.global_price for i in time]
+                price.append(wn.options.energy.global_price)
             else:
                 raise NotImplementedError('WNTR does not support price patterns yet.')
         elif pump.energy_pattern is None:
-            if wn.energy.global_pattern is None:
-                price_dict[pump_name] = [pump.energy_price for i in time]
+            if wn.options.energy.global_pattern is None:
+                price.append(pump.energy_price)
             else:
                 raise NotImplementedError('WNTR does not support price patterns yet.')
         else:
             raise NotImplementedError('WNTR does not support price patterns yet.')
-            
-    price = pd.DataFrame(data=price_dict, index=time, columns=pumps)
     
-    pump_cost =energy * price
+    pump_cost = energy * np.array(price)
     
     return pump_cost
-    
+
+def _pump_frame(values, flowrate, pumps):
+    if isinstance(flowrate, pd.DataFrame):
+        return pd.DataFrame(data=values, index=flowrate.index, columns=[pump.name for pump in pumps])
+    return values
@@ -10,15 +10,18 @@ The wntr.metrics.hydraulic module contains hydraulic metrics.
     water_service_availability
     todini_index
     entropy
+    entropy_timeseries
 
 """
 import wntr.network
-from wntr.network.graph import _all_simple_paths
+from wntr.network.graph import _all_simple_paths, _topological_order
 import numpy as np
 import pandas as pd
 import networkx as nx
+import scipy.sparse
 import math
-from collections import Counter
+import binascii
+from collections import Counter, OrderedDict
 import sys
 if sys.version_info >= (3,0):
     from functools import reduce
@@ -49,13 +52,10 @@ def expected_demand(wn, start_time=None, end_time=None, timestep=None):
     if timestep is None:
         timestep = wn.options.time.report_timestep
         
-    exp_demand = {}
-    for name, junc in wn.junctions():
-        exp_demand[name] = junc.demand_timeseries_list.get_values(start_time, 
-                  end_time, timestep) * wn.options.hydraulic.demand_multiplier
-    
+    demands = wn.get_compiled_demands()
     tsteps = np.arange(start_time, end_time+timestep, timestep)
-    exp_demand = pd.DataFrame(index=tsteps, data=exp_demand)
+    exp_demand = demands.at(tsteps) * wn.options.hydraulic.demand_multiplier
+    exp_demand = pd.DataFrame(index=tsteps, data=exp_demand, columns=demands.junction_names)
     
     return exp_demand
 
@@ -168,23 +168,30 @@ def todini_index(head, pressure, demand, flowrate, wn, Pstar):
     Todini index defines resilience at a specific time as a measure of surplus
     power at each node and measures relative energy redundancy.
 
+    The index is computed with whole-array operations, so results of an 
+    ensemble of scenarios can be scored at once: the DataFrames can be 
+    stacked (e.g. with a (scenario, time) MultiIndex, using pd.concat), 
+    or numpy arrays with a leading scenario axis can be used.
+
     Parameters
     ----------
-    head : pandas DataFrame
+    head : pandas DataFrame or numpy array
         A pandas Dataframe containing node head 
-        (index = times, columns = node names).
+        (index = times, columns = node names), or an array 
+        (..., times, nodes) with nodes ordered as wn.node_name_list.
         
-    pressure : pandas DataFrame
+    pressure : pandas DataFrame or numpy array
         A pandas Dataframe containing node pressure 
-        (index = times, columns = node names).
+        (index = times, columns = node names), or an array like head.
         
-    demand : pandas DataFrame
+    demand : pandas DataFrame or numpy array
         A pandas Dataframe containing node demand 
-        (index = times, columns = node names).
+        (index = times, columns = node names), or an array like head.
         
-    flowrate : pandas DataFrame
+    flowrate : pandas DataFrame or numpy array
         A pandas Dataframe containing pump flowrates 
-        (index = times, columns = pump names).
+        (index = times, columns = pump names), or an array 
+        (..., times, links) with links ordered as wn.link_name_list.
 
     wn : wntr WaterNetworkModel
         Water network model.  The water network model is needed to 
@@ -195,46 +202,53 @@ def todini_index(head, pressure, demand, flowrate, wn, Pstar):
 
     Returns
     -------
-    A pandas Series that contains a time-series of Todini indexes
+    A pandas Series that contains a time-series of Todini indexes 
+    (index = head index), or an array (..., times) for array inputs
     """
+    junctions = wn.junction_name_list
+    reservoirs = wn.reservoir_name_list
+    pumps = [wn.get_link(name) for name in wn.pump_name_list]
+    nodes = wn.node_name_list
+    links = wn.link_name_list
+    
+    h = _element_values(head, junctions, nodes) # m
+    p = _element_values(pressure, junctions, nodes)
+    q = _element_values(demand, junctions, nodes) # m3/s
+    POut = np.sum(q*h, axis=-1)
+    PExp = np.sum(q*(Pstar + h - p), axis=-1)
 
-    POut = {}
-    PExp = {}
-    PInRes = {}
-    PInPump = {}
+    H = _element_values(head, reservoirs, nodes) # m
+    Q = _element_values(demand, reservoirs, nodes) # m3/s
+    PInRes = -np.sum(Q*H, axis=-1) # switch sign on Q.
 
-    time = head.index
-    
-    for name in wn.junction_name_list:
-        h = np.array(head.loc[:,name]) # m
-        p = np.array(pressure.loc[:,name])
-        e = h - p # m
-        q = np.array(demand.loc[:,name]) # m3/s
-        POut[name] = q*h
-        PExp[name] = q*(Pstar+e)
-
-    for name, node in wn.nodes(wntr.network.Reservoir):
-        H = np.array(head.loc[:,name]) # m
-        Q = np.array(demand.loc[:,name]) # m3/s
-        PInRes[name] = -Q*H # switch sign on Q.
-
-    for name, link in wn.links(wntr.network.Pump):
-        start_node = link.start_node_name
-        end_node = link.end_node_name
-        h_start = np.array(head.loc[:,start_node]) # (m)
-        h_end = np.array(head.loc[:,end_node]) # (m)
-        h = h_start - h_end # (m)
-        q = np.array(flowrate.loc[:,name]) # (m^3/s)
-        PInPump[name] = q*(abs(h)) # assumes that pumps always add energy to the system
-
-    todini = (sum(POut.values()) - sum(PExp.values()))/  \
-        (sum(PInRes.values()) + sum(PInPump.values()) - sum(PExp.values()))
-
-    todini = pd.Series(data = todini.tolist(), index = time)
+    h_start = _element_values(head, [pump.start_node_name for pump in pumps], nodes) # (m)
+    h_end = _element_values(head, [pump.end_node_name for pump in pumps], nodes) # (m)
+    q = _element_values(flowrate, [pump.name for pump in pumps], links) # (m^3/s)
+    PInPump = np.sum(q*np.abs(h_start - h_end), axis=-1) # assumes that pumps always add energy to the system
+
+    todini = (POut - PExp)/(PInRes + PInPump - PExp)
+
+    if isinstance(head, pd.DataFrame):
+        todini = pd.Series(data=todini, index=head.index)
 
     return todini
 
-def entropy(G, sources=None, sinks=None):
+def _element_values(data, names, all_names):
+    """
+    Values of the named elements (columns) of a DataFrame, or of the last axis of 
+    an array that is ordered as all_names; returns an array (..., len(names))
+    """
+    if isinstance(data, pd.DataFrame):
+        columns = data.columns.get_indexer(names)
+        if (columns < 0).any():
+            raise KeyError('Results are missing for: ' + ', '.join(
+                str(name) for name, column in zip(names, columns) if column < 0))
+        return data.values[:, columns]
+    
+    index = dict((name, i) for i, name in enumerate(all_names))
+    return np.asarray(data)[..., [index[name] for name in names]]
+
+def entropy(G, sources=None, sinks=None, collapse_series=False):
     """
     Compute entropy, equations from [AwGB90]_.
 
@@ -244,6 +258,12 @@ def entropy(G, sources=None, sinks=None):
     when a network component fails.  A network that carries maximum entropy
     flow is considered reliable with multiple alternate paths.
 
+    If the graph is acyclic, the number of paths through each link and the 
+    links in those paths are computed by dynamic programming over the graph 
+    (see :class:`~wntr.metrics.hydraulic.entropy_timeseries`). Otherwise, 
+    all simple paths between the sources and sinks are enumerated, which 
+    is only practical for small networks.
+
     Parameters
     ----------
     G : NetworkX or WNTR graph
@@ -256,6 +276,11 @@ def entropy(G, sources=None, sinks=None):
     sinks : list of strings, optional (default = all nodes)
         List of node names to use as sinks.
 
+    collapse_series : bool, optional (default = False)
+        If True, series links (with the same flow direction) are collapsed 
+        before the paths are counted.  The results are the same, but the 
+        computation is faster for networks with many series pipes.
+
     Returns
     -------
     A tuple which includes:
@@ -271,7 +296,383 @@ def entropy(G, sources=None, sinks=None):
 
     if sinks is None:
         sinks = G.nodes()
+    sinks = list(sinks)
+
+    node_names = list(G.nodes())
+    junctions = [G.node[name]['type'] == 'Junction' for name in node_names]
+    edges = list(G.edges(keys=True, data=True))
+    flow = np.array([data['weight'] for (node1, node2, name, data) in edges], dtype=float)
+    
+    engine = _FlowEntropy(node_names, junctions, [node1 for (node1, node2, name, data) in edges], 
+                          [node2 for (node1, node2, name, data) in edges], sources, sinks, collapse_series)
+    result = engine.compute(flow, np.ones(len(edges), dtype=bool), np.ones(len(edges), dtype=bool))
+    if result is None:
+        return _entropy_simple_paths(G, sources, sinks)
+    
+    S, S_ave = result
+    S = pd.Series(dict(zip(sinks, S))) # convert S to a series
+    
+    return [S, S_ave]
+
+def entropy_timeseries(flowrate, wn, sources=None, sinks=None, collapse_series=False):
+    """
+    Compute entropy, equations from [AwGB90]_, at each time in flowrate.
+
+    See :class:`~wntr.metrics.hydraulic.entropy`.  The graph is directed by 
+    the flow direction at each time; links without flow are not part of 
+    any path.  The network structure is built once and the path counts are 
+    computed by dynamic programming over the flow direction graph, which 
+    is acyclic for a hydraulic solution: the number of paths from the 
+    sources to a node is the sum over its upstream links, and the links in 
+    those paths are tracked as sets of upstream nodes.  The path counts are 
+    reused for all times with the same flow directions.
+
+    Parameters
+    ----------
+    flowrate : pandas DataFrame
+        A pandas Dataframe containing link flowrates 
+        (index = times, columns = link names).
+
+    wn : wntr WaterNetworkModel
+        Water network model.  The water network model is needed to 
+        find the start and end node of each link.
+
+    sources : list of strings, optional (default = all reservoirs)
+        List of node names to use as sources.
+
+    sinks : list of strings, optional (default = all nodes)
+        List of node names to use as sinks.
+
+    collapse_series : bool, optional (default = False)
+        If True, series links (with the same flow direction) are collapsed 
+        before the paths are counted.  The results are the same, but the 
+        computation is faster for networks with many series pipes.
+
+    Returns
+    -------
+    A tuple which includes:
+        - A pandas DataFrame that contains entropy for each node 
+          (index = times, columns = sinks)
+        - A pandas Series that contains system entropy 
+          (index = times)
+    """
+    if sources is None:
+        sources = wn.reservoir_name_list
+    if sinks is None:
+        sinks = wn.node_name_list
+    sinks = list(sinks)
+
+    node_names = wn.node_name_list
+    junctions = [wn.get_node(name).node_type == 'Junction' for name in node_names]
+    link_names = list(flowrate.columns)
+    links = [wn.get_link(name) for name in link_names]
+    engine = _FlowEntropy(node_names, junctions, [link.start_node_name for link in links], 
+                          [link.end_node_name for link in links], sources, sinks, collapse_series)
+
+    S = np.full((len(flowrate.index), len(sinks)), np.nan)
+    S_ave = np.full(len(flowrate.index), np.nan)
+    for t, flow in enumerate(flowrate.values):
+        result = engine.compute(flow, flow >= 0, flow != 0)
+        if result is None:
+            logger.warning('The flow direction graph at time {} has a cycle, entropy is not computed'.format(
+                flowrate.index[t]))
+            continue
+        S[t, :], S_ave[t] = result
+
+    S = pd.DataFrame(data=S, index=flowrate.index, columns=sinks)
+    S_ave = pd.Series(data=S_ave, index=flowrate.index)
+
+    return [S, S_ave]
+
+class _FlowEntropy(object):
+    """
+    Entropy [AwGB90]_ by dynamic programming over the flow direction graph.
 
+    For the link(s) from node i to node j, the paths of NDij are the paths 
+    from the sources to j that visit node i (as in the enumeration of the 
+    simple paths), that is the paths from the sources to i followed by the
+    paths from i to j, so
+    
+        - NDij = F(i)*B(i), where F(i) is the number of paths from the sources 
+          to node i and B(i) is the number of paths from i to j
+        - the sum of the link degrees (dk) over the paths is 
+          FL(i)*B(i) + F(i)*BL(i), where FL(i) is the sum over the paths to i 
+          of the number of links, counting parallel links 1/m times, and BL(i)
+          is the same sum over the paths from i to j
+        - the number of distinct links in the paths is D(i) + Dj(i), where D(i)
+          is the number of links (node pairs) upstream of i, found from the 
+          set of nodes upstream of i (a bitset over the topological order), 
+          and Dj(i) is the number of links in the paths from i to j (a bitset 
+          over the links)
+
+    and aij = NDij*(D(i) + Dj(i))/(FL(i)*B(i) + F(i)*BL(i)).  B, BL, and Dj 
+    are computed for each sink j over the nodes between its upstream nodes 
+    and j.  Series nodes (one link in, one link out) are collapsed into the 
+    link between the first upstream and downstream nodes that are not series
+    nodes, if collapse_series is True; their values follow from the values 
+    of the upstream node.
+
+    The path structure only depends on the flow direction, so it is cached.
+    """
+
+    def __init__(self, node_names, junctions, link_start, link_end, sources, sinks, collapse_series=False):
+        node_index = dict((name, i) for i, name in enumerate(node_names))
+        self.num_nodes = len(node_names)
+        self.start = np.array([node_index[name] for name in link_start], dtype=int)
+        self.end = np.array([node_index[name] for name in link_end], dtype=int)
+        self.sources = set(node_index[name] for name in sources)
+        self.sinks = [node_index[name] for name in sinks]
+        self.junctions = junctions
+        self.collapse_series = collapse_series
+        self._structures = {}
+
+    def compute(self, flow, forward, included):
+        """
+        Entropy of each sink and system entropy
+        
+        Parameters
+        ----------
+        flow : numpy array
+            Flow of each link
+        forward : numpy array of bool
+            True if the flow goes from the start to the end node of the link
+        included : numpy array of bool
+            True if the link is part of the flow direction graph
+        
+        Returns
+        -------
+        S (numpy array over the sinks), S_ave; or None if the graph has a cycle
+        """
+        key = forward.tobytes() + included.tobytes()
+        if key not in self._structures:
+            self._structures[key] = self._path_structure(forward, included)
+        structure = self._structures[key]
+        if structure is None:
+            return None
+        S, term_sink, term_links, log_a = structure
+
+        flow = np.abs(flow)
+        q = term_links.dot(flow) # total flow of the links in each term
+        Q = np.bincount(term_sink, weights=q, minlength=len(S)) # total flow into each sink
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p = q/Q[term_sink]
+            terms = np.where(p > 0, -p*np.log(p) + p*log_a, 0.0)
+        S = S + np.bincount(term_sink, weights=terms, minlength=len(S))
+
+        # Equation 3
+        Q0 = flow.sum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Qj = Q/Q0
+            mask = ~np.isnan(S) & (Qj > 0) & np.array([j not in self.sources for j in self.sinks], dtype=bool)
+        S_ave = float(np.sum(Qj[mask]*S[mask] - Qj[mask]*np.log(Qj[mask])))
+
+        return S, S_ave
+
+    def _path_structure(self, forward, included):
+        """
+        Returns the initial entropy of each sink (0, or nan for sinks that are not 
+        computed), and the terms (sink, links, log(aij)) of Equation 7
+        """
+        link_ids = np.flatnonzero(included)
+        start = np.where(forward, self.start, self.end)[link_ids].tolist()
+        end = np.where(forward, self.end, self.start)[link_ids].tolist()
+        link_ids = link_ids.tolist()
+        num_nodes = self.num_nodes
+
+        # group parallel links into node pairs
+        pairs = OrderedDict()
+        for link_id, u, v in zip(link_ids, start, end):
+            pairs.setdefault((u, v), []).append(link_id)
+        in_degree = [0]*num_nodes
+        out_degree = [0]*num_nodes
+        out_pairs = [[] for i in range(num_nodes)]
+        for (u, v), links in pairs.items():
+            out_pairs[u].append((v, links))
+            out_degree[u] += len(links)
+            in_degree[v] += len(links)
+        scale = 1 # least common multiple of the number of parallel links
+        for links in pairs.values():
+            scale = scale*len(links)//_gcd_int(scale, len(links))
+
+        series = [self.collapse_series and in_degree[i] == 1 and out_degree[i] == 1 and i not in self.sources
+                  for i in range(num_nodes)]
+
+        # edges between the nodes that are not series nodes: 
+        # (start, end, number of parallel links, series nodes, links)
+        edges = []
+        num_series = 0
+        for (u, v), links in pairs.items():
+            if series[u]:
+                continue
+            chain = []
+            while series[v]:
+                chain.append((v, links))
+                v, links = out_pairs[v][0]
+            num_series += len(chain)
+            if len(chain) == 0:
+                edges.append((u, v, len(links), chain, links))
+            else:
+                edges.append((u, v, 1, chain, links))
+        if num_series < sum(series):
+            return None # cycle of series nodes, not reached from the other nodes
+
+        dag_nodes = [i for i in range(num_nodes) if not series[i]]
+        dag_index = dict((i, k) for k, i in enumerate(dag_nodes))
+        order = _topological_order(len(dag_nodes), [dag_index[e[0]] for e in edges], [dag_index[e[1]] for e in edges])
+        if order is None:
+            return None
+        order = [dag_nodes[k] for k in order]
+
+        in_edges = [[] for i in range(num_nodes)]
+        for edge in edges:
+            in_edges[edge[1]].append(edge)
+
+        # number of paths (F) and scaled sum of path lengths (FL) from the sources
+        F = [0]*num_nodes
+        FL = [0]*num_nodes
+        for i in self.sources:
+            F[i] = 1
+        for v in order:
+            for (u, v, m, chain, links) in in_edges[v]:
+                F[v] += m*F[u]
+                FL[v] += m*FL[u] + F[u]*scale*(len(chain) + 1)
+        
+        # number of distinct links (node pairs) upstream of each node
+        position = dict((v, k) for k, v in enumerate(order))
+        weights = np.zeros(len(order), dtype=np.int64)
+        for v in order:
+            weights[position[v]] = sum(len(chain) + 1 for (u, v, m, chain, links) in in_edges[v] if F[u] > 0)
+        byte_weights = np.zeros(8*((len(order) + 7)//8), dtype=np.int64)
+        byte_weights[:len(order)] = weights
+        byte_weights = byte_weights.reshape(-1, 8)[:, ::-1].ravel()
+        remaining = [0]*num_nodes
+        for (u, v, m, chain, links) in edges:
+            remaining[u] += 1
+        upstream = {}
+        D = [0]*num_nodes
+        for v in order:
+            upstream_nodes = set(u for (u, v, m, chain, links) in in_edges[v] if F[u] > 0)
+            if F[v] > 0:
+                bits = 1 << position[v]
+                for u in upstream_nodes:
+                    bits |= upstream[u]
+                if len(upstream_nodes) == 0:
+                    D[v] = 0
+                elif len(upstream_nodes) == 1:
+                    D[v] = D[upstream_nodes.pop()] + weights[position[v]]
+                else:
+                    D[v] = _weighted_bit_count(bits, byte_weights)
+                upstream[v] = bits
+            for (u, v, m, chain, links) in in_edges[v]:
+                remaining[u] -= 1
+                if remaining[u] == 0 and u in upstream:
+                    del upstream[u]
+
+        # terms of Equation 7
+        sink_index = {}
+        S = np.full(len(self.sinks), np.nan)
+        for k, j in enumerate(self.sinks):
+            if j in self.sources:
+                S[k] = 0 # nodej is the source
+            elif self.junctions[j]:
+                sink_index.setdefault(j, []).append(k)
+        term_sink = []
+        term_links = []
+        log_a = []
+        def add_term(j, ND, D, L, links):
+            for k in sink_index.get(j, []):
+                S[k] = 0
+                term_sink.append(k)
+                term_links.append(links)
+                log_a.append(math.log(ND) + math.log(D) + math.log(scale) - math.log(L))
+
+        # paths from the upstream nodes of each sink to the sink: 
+        # {sink: {upstream node: (B, BL, Dj)}}
+        out_edges = [[] for i in range(num_nodes)]
+        for k, edge in enumerate(edges):
+            out_edges[edge[0]].append(k)
+        edge_weights = np.zeros(8*((len(edges) + 7)//8), dtype=np.int64)
+        edge_weights[:len(edges)] = [len(chain) + 1 for (u, v, m, chain, links) in edges]
+        edge_weights = edge_weights.reshape(-1, 8)[:, ::-1].ravel()
+        downstream = {}
+        for v in sink_index:
+            if v not in position:
+                continue
+            upstream_nodes = [u for (u, v, m, chain, links) in in_edges[v] if F[u] > 0 and len(chain) == 0]
+            if len(upstream_nodes) == 0:
+                continue
+            # the nodes on the paths from the upstream nodes to v can reach v and are 
+            # not before the first upstream node in the topological order
+            first = min(position[u] for u in upstream_nodes)
+            window = set([v])
+            stack = [v]
+            while stack:
+                w = stack.pop()
+                for (u, w, m, chain, links) in in_edges[w]:
+                    if u not in window and F[u] > 0 and position[u] >= first:
+                        window.add(u)
+                        stack.append(u)
+            B = {v: 1}
+            BL = {v: 0}
+            bits = {v: 0}
+            for w in sorted(window, key=position.get, reverse=True)[1:]:
+                b = 0
+                bl = 0
+                w_bits = 0
+                for k in out_edges[w]:
+                    (w, x, m, chain, links) = edges[k]
+                    if x in B:
+                        b += m*B[x]
+                        bl += m*BL[x] + B[x]*scale*(len(chain) + 1)
+                        w_bits |= bits[x] | (1 << k)
+                B[w] = b
+                BL[w] = bl
+                bits[w] = w_bits
+            downstream[v] = dict((u, (B[u], BL[u], _weighted_bit_count(bits[u], edge_weights))) 
+                                 for u in upstream_nodes)
+
+        for (u, v, m, chain, links) in edges:
+            if F[u] == 0:
+                continue
+            for i, (node, chain_links) in enumerate(chain):
+                add_term(node, F[u], D[u] + i + 1, FL[u] + F[u]*scale*(i + 1), chain_links)
+            if len(chain) > 0:
+                # the last series node only reaches v through the link to v
+                add_term(v, F[u], D[u] + len(chain) + 1, FL[u] + F[u]*scale*(len(chain) + 1), links)
+            elif v in downstream:
+                B, BL, Dj = downstream[v][u]
+                add_term(v, F[u]*B, D[u] + Dj, FL[u]*B + F[u]*BL, links)
+
+        indptr = np.cumsum([0] + [len(links) for links in term_links])
+        indices = [link for links in term_links for link in links]
+        term_links = scipy.sparse.csr_matrix((np.ones(len(indices)), indices, indptr), 
+                                             shape=(len(term_sink), len(self.start)))
+
+        return S, np.array(term_sink, dtype=int), term_links, np.array(log_a)
+
+def _gcd_int(x, y):
+    while y:
+        x, y = y, x % y
+    return x
+
+def _weighted_bit_count(bits, byte_weights):
+    """
+    Sum of the weights of the set bits of a Python int; byte_weights are the weights 
+    in the order of np.unpackbits (the weights of bits 7 to 0, then 15 to 8, ...)
+    """
+    if bits == 0:
+        return 0
+    # the bytes of the int, least significant first (int.to_bytes is not available in Python 2)
+    hex_bits = '%x' % bits
+    hex_bits = '0'*(len(hex_bits) % 2) + hex_bits
+    bits = np.unpackbits(np.frombuffer(binascii.unhexlify(hex_bits), dtype=np.uint8)[::-1])
+    return int(np.dot(bits, byte_weights[:len(bits)]))
+
+def _entropy_simple_paths(G, sources, sinks):
+    """
+    Entropy by enumeration of the simple paths between the sources and sinks 
+    (used if the graph has a cycle)
+    """
     S = {}
     Q = {}
     for nodej in sinks:
@@ -8,18 +8,157 @@ The wntr.metrics.water_security module contains water security metrics.
     mass_contaminant_consumed
     volume_contaminant_consumed
     extent_contaminant
+    ContaminationImpact
 
 """
 import numpy as np
 import wntr.network
 import pandas as pd
 import logging
+from wntr.metrics.hydraulic import _element_values
 
 logger = logging.getLogger(__name__)
 
+class ContaminationImpact(object):
+    """
+    Vectorized water security metrics for one or many contamination scenarios.
+
+    Pipe lengths and the index of each pipe's start and end node are 
+    computed once, so results of an ensemble of contamination scenarios 
+    (e.g. injections at many locations) can be evaluated in a single call 
+    using numpy arrays shaped (scenarios, times, elements).  Leading 
+    dimensions are optional; arrays shaped (times, elements) return the 
+    results of a single scenario.  The time step of each report time is the 
+    interval to the next report time (the last interval is repeated), so 
+    report times do not need to be evenly spaced.
+
+    Parameters
+    ----------
+    wn : wntr WaterNetworkModel
+        Water network model.  The water network model is needed to 
+        get pipe length, and pipe start and end node.
+
+    times : list or array of floats
+        Report times in seconds (e.g. the index of the simulation results)
+
+    node_names : list of strings, optional (default = all nodes)
+        Node names, in the order of the last axis of demand and quality. 
+        Pipes that connect to nodes not in this list are never considered 
+        contaminated from that end.
+
+    pipe_names : list of strings, optional (default = all pipes)
+        Pipe names, in the order of the last axis of flowrate.
+    """
+
+    def __init__(self, wn, times, node_names=None, pipe_names=None):
+        if node_names is None:
+            node_names = wn.node_name_list
+        if pipe_names is None:
+            pipe_names = wn.pipe_name_list
+        self.node_names = list(node_names)
+        self.pipe_names = list(pipe_names)
+        self.times = np.asarray(times, dtype=float)
+        self.timestep = _timestep(self.times)
+
+        # Pipe endpoints index node_names; endpoints that are not in node_names 
+        # point to an extra, never contaminated, node
+        node_index = dict((name, i) for i, name in enumerate(self.node_names))
+        missing = len(self.node_names)
+        pipes = [wn.get_link(name) for name in self.pipe_names]
+        self.start_node_index = np.array([node_index.get(pipe.start_node_name, missing) for pipe in pipes], dtype=int)
+        self.end_node_index = np.array([node_index.get(pipe.end_node_name, missing) for pipe in pipes], dtype=int)
+        self.pipe_length = np.array([pipe.length for pipe in pipes], dtype=float)
+
+    def mass_consumed(self, demand, quality):
+        """
+        Mass of contaminant consumed [USEPA15]_.
+
+        Parameters
+        ----------
+        demand : numpy array
+            Node demand (..., times, nodes)
+
+        quality : numpy array
+            Node water quality (..., times, nodes)
+
+        Returns
+        -------
+        A numpy array (..., times, nodes) containing mass consumed
+        """
+        demand = np.asarray(demand)
+        dt = self.timestep[:, np.newaxis]
+        return np.where(demand > 0, demand*dt*np.asarray(quality), 0.0) # m3/s * s * kg/m3 - > kg
+
+    def volume_consumed(self, demand, quality, detection_limit):
+        """
+        Volume of contaminant consumed [USEPA15]_.
+
+        Parameters
+        ----------
+        demand : numpy array
+            Node demand (..., times, nodes)
+
+        quality : numpy array
+            Node water quality (..., times, nodes)
+
+        detection_limit : float
+            Contaminant detection limit
+
+        Returns
+        -------
+        A numpy array (..., times, nodes) containing volume consumed
+        """
+        demand = np.asarray(demand)
+        dt = self.timestep[:, np.newaxis]
+        mask = (demand > 0) & (np.asarray(quality) > detection_limit)
+        return np.where(mask, demand*dt, 0.0) # m3/s * s - > m3
+
+    def extent(self, quality, flowrate, detection_limit):
+        """
+        Extent of contaminant in the pipes [USEPA15]_.
+
+        Parameters
+        ----------
+        quality : numpy array
+            Node water quality (..., times, nodes)
+
+        flowrate : numpy array
+            Pipe flowrate (..., times, pipes)
+
+        detection_limit : float
+            Contaminant detection limit
+
+        Returns
+        -------
+        A numpy array (..., times) containing extent of contamination (m)
+        """
+        quality = np.asarray(quality)
+        flowrate = np.asarray(flowrate)
+        node_contam = np.zeros(quality.shape[:-1] + (len(self.node_names) + 1,), dtype=bool)
+        np.greater(quality, detection_limit, out=node_contam[..., :-1])
+        
+        # a pipe is contaminated if water flows in from a contaminated node
+        link_contam = ((flowrate > 0) & np.take(node_contam, self.start_node_index, axis=-1)) | \
+                      ((flowrate < 0) & np.take(node_contam, self.end_node_index, axis=-1))
+        
+        # time index at which each pipe is first contaminated (num_times if never), 
+        # the extent is the cumulative length of pipes first contaminated at each time
+        num_times = link_contam.shape[-2]
+        first = np.where(link_contam.any(axis=-2), link_contam.argmax(axis=-2), num_times)
+        num_scenarios = int(np.prod(first.shape[:-1]))
+        first = first.reshape(num_scenarios, len(self.pipe_names)) + (num_times + 1)*np.arange(num_scenarios)[:, np.newaxis]
+        length = np.bincount(first.ravel(), weights=np.tile(self.pipe_length, num_scenarios), 
+                             minlength=num_scenarios*(num_times + 1))
+        EC = np.cumsum(length.reshape(num_scenarios, num_times + 1)[:, :-1], axis=-1)
+        
+        return EC.reshape(link_contam.shape[:-1])
+
 def mass_contaminant_consumed(demand, quality):
     """ Mass of contaminant consumed [USEPA15]_.
     
+    The time step of each row is the interval to the next time in the 
+    index (the last interval is repeated).
+    
     Parameters
     ----------
     demand : pandas DataFrame
@@ -35,15 +174,18 @@ def mass_contaminant_consumed(demand, quality):
     A pandas DataFrame containing mass consumed
     """
     
-    maskD = np.greater(demand, 0) # positive demand
-    deltaT = quality.index[1] # this assumes constant timedelta
-    MC = demand*deltaT*quality*maskD # m3/s * s * kg/m3 - > kg
+    q = _element_values(demand, quality.columns, None) # m3/s
+    deltaT = _timestep(quality.index)[:, np.newaxis] # s
+    MC = np.where(q > 0, q*deltaT*quality.values, 0.0) # m3/s * s * kg/m3 - > kg
     
-    return MC
+    return pd.DataFrame(MC, index=quality.index, columns=quality.columns)
 
 def volume_contaminant_consumed(demand, quality, detection_limit):
     """ Volume of contaminant consumed [USEPA15]_.
     
+    The time step of each row is the interval to the next time in the 
+    index (the last interval is repeated).
+    
     Parameters
     ----------
     demand : pandas DataFrame
@@ -62,12 +204,12 @@ def volume_contaminant_consumed(demand, quality, detection_limit):
     A pandas DataFrame containing volume consumed
     """
     
-    maskQ = np.greater(quality, detection_limit)
-    maskD = np.greater(demand, 0) # positive demand
-    deltaT = quality.index[1] # this assumes constant timedelta
-    VC = demand*deltaT*maskQ*maskD # m3/s * s * bool - > m3
+    q = _element_values(demand, quality.columns, None) # m3/s
+    deltaT = _timestep(quality.index)[:, np.newaxis] # s
+    mask = (q > 0) & (quality.values > detection_limit)
+    VC = np.where(mask, q*deltaT, 0.0) # m3/s * s - > m3
     
-    return VC
+    return pd.DataFrame(VC, index=quality.index, columns=quality.columns)
 
 def extent_contaminant(quality, flowrate, wn, detection_limit):
     """ 
@@ -77,7 +219,8 @@ def extent_contaminant(quality, flowrate, wn, detection_limit):
     ----------
     quality : pandas DataFrame
         A pandas Dataframe containing water quality 
-        (index = times, columns = junction names).
+        (index = times, columns = node names).  Pipes that connect to nodes
+        that are not included are never considered contaminated from that end.
     
     flowrate : pandas DataFrame
         A pandas Dataframe containing flowrate 
@@ -94,34 +237,22 @@ def extent_contaminant(quality, flowrate, wn, detection_limit):
     -------
     A pandas Series with extent of contaminantion (m)
     """
-    pipe_names = wn.pipe_name_list
-    link_length = []
-    link_start_node = []
-    link_end_node = []
-    for name in pipe_names:
-        link = wn.get_link(name)
-        link_start_node.append(link.start_node_name)
-        link_end_node.append(link.end_node_name)
-        link_length.append(link.length)
-    link_start_node = pd.Series(index=pipe_names, data=link_start_node)
-    link_end_node = pd.Series(index=pipe_names, data=link_end_node)
-    link_length = pd.Series(index=pipe_names, data=link_length)
-    
-    # flow_dir, pos_flow, neg_flow, link_contam are indexed by pipe names (col) 
-    # and times (rows)
-    flow_dir = np.sign(flowrate.loc[:,pipe_names])
-    node_contam = quality > detection_limit
-    pos_flow = np.array(node_contam.loc[:,link_start_node])
-    neg_flow = np.array(node_contam.loc[:,link_end_node])
-    link_contam = ((flow_dir>0)&pos_flow) | ((flow_dir<0)&neg_flow)
-    
-    # contam_len is cummax over time (has the node ever been contaminated)
-    contam_len = (link_contam * link_length).cummax()
-    
-    # EC is a time series with the sum across nodes
-    EC = contam_len.sum(axis=1)
-    
-    return EC
+    impact = ContaminationImpact(wn, quality.index, quality.columns)
+    q = _element_values(flowrate, impact.pipe_names, None)
+    EC = impact.extent(quality.values, q, detection_limit)
+    
+    return pd.Series(EC, index=quality.index)
+
+def _timestep(times):
+    """
+    Interval from each time to the next, the last interval is repeated
+    """
+    times = np.asarray(times, dtype=float)
+    if len(times) < 2:
+        return np.zeros(len(times))
+    timestep = np.diff(times)
+    
+    return np.append(timestep, timestep[-1])
     
 #def cumulative_dose():
 #    """
@@ -3,9 +3,10 @@ The wntr.network package contains methods to define a water network model,
 network controls, and graph representation of the network.
 """
 from .base import Node, Link, NodeType, LinkType, LinkStatus
-from .elements import Junction, Reservoir, Tank, Pipe, Pump, Valve, Pattern, TimeSeries, Demands, Curve, Source
+from .elements import Junction, Reservoir, Tank, Pipe, Pump, Valve, Pattern, TimeSeries, Demands, CompiledDemands, \
+    Curve, Source
 from .model import WaterNetworkModel
 from .options import WaterNetworkOptions
 from .controls import Comparison, ControlPriority, TimeOfDayCondition, SimTimeCondition, ValueCondition, \
     TankLevelCondition, RelativeCondition, OrCondition, AndCondition, ControlAction, Control, ControlManager, Rule
-from .graph import WntrMultiDiGraph
+from .graph import WntrMultiDiGraph, SparseGraph
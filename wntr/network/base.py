@@ -12,12 +12,15 @@ the network model.
     Node
     Link
     Registry
+    ElementColumns
+    ChangeTracker
     NodeType
     LinkType
     LinkStatus
 
 """
 import logging
+import numpy as np
 import six
 from six import string_types
 import types
@@ -36,6 +39,13 @@ import abc
 
 logger = logging.getLogger(__name__)
 
+# Attributes of nodes and links that hold the simulation state; the simulators set them 
+# at every time step. Setting them does not mark the element as changed (for checkpoints
+# and cached INP sections), see Registry._element_changed.
+_NODE_STATE_ATTRIBUTES = frozenset(['head', 'demand', 'leak_demand', 'leak_status', '_head', '_demand', 
+                                    '_leak_demand', '_leak_status', '_prev_head'])
+_LINK_STATE_ATTRIBUTES = frozenset(['_flow', '_internal_status', '_prev_setting'])
+
 
 class AbstractModel(object):
     """
@@ -88,6 +98,9 @@ class Node(six.with_metaclass(abc.ABCMeta, object)):
 
 
     """
+    _pattern_reg = None
+    _node_reg = None
+
     def __init__(self, wn, name):
         self._name = name
         self._head = None
@@ -108,6 +121,16 @@ class Node(six.with_metaclass(abc.ABCMeta, object)):
         self._coordinates = [0,0]
         self._source = None
 
+    def __setattr__(self, name, value):
+        reg = self._node_reg
+        if reg is not None:
+            if name in _NODE_STATE_ATTRIBUTES:
+                if not reg._state_changed:
+                    reg._state_changed = True
+            else:
+                reg._element_changed(self, name)
+        object.__setattr__(self, name, value)
+
     def _compare(self, other):
         if not type(self) == type(other):
             return False
@@ -123,29 +146,48 @@ class Node(six.with_metaclass(abc.ABCMeta, object)):
     def __repr__(self):
         return "<Node '{}'>".format(self._name)
 
+    def _get_state_value(self, attribute):
+        # the simulation state is stored in the node columns if columnar storage is enabled
+        columns = self._node_reg._columns
+        if columns is not None:
+            row = columns.get_row(self._name)
+            if row is not None:
+                return columns.get_value(attribute, row)
+        return self.__dict__['_' + attribute]
+
+    def _set_state_value(self, attribute, value):
+        columns = self._node_reg._columns
+        if columns is not None:
+            row = columns.get_row(self._name)
+            if row is not None:
+                columns.set_value(attribute, row, value)
+                return
+        # the simulation state is not tracked (see _NODE_STATE_ATTRIBUTES)
+        self.__dict__['_' + attribute] = value
+
     @property
     def head(self):
         """float: The current head at the node"""
-        return self._head
+        return self._get_state_value('head')
     @head.setter
     def head(self, value):
-        self._head = value
+        self._set_state_value('head', value)
 
     @property
     def demand(self):
         """float: The current demand at the node"""
-        return self._demand
+        return self._get_state_value('demand')
     @demand.setter
     def demand(self, value):
-        self._demand = value
+        self._set_state_value('demand', value)
 
     @property
     def leak_demand(self):
         """float: The current demand at the node"""
-        return self._leak_demand
+        return self._get_state_value('leak_demand')
     @leak_demand.setter
     def leak_demand(self, value):
-        self._leak_demand = value
+        self._set_state_value('leak_demand', value)
 
     @property
     def leak_status(self):
@@ -243,6 +285,9 @@ class Link(six.with_metaclass(abc.ABCMeta, object)):
         Name of the end node
     
     """
+    _pattern_reg = None
+    _link_reg = None
+
     def __init__(self, wn, link_name, start_node_name, end_node_name):
         # Set the registries
         self._options = wn._options
@@ -271,6 +316,16 @@ class Link(six.with_metaclass(abc.ABCMeta, object)):
         self._setting = None
         self._flow = None
 
+    def __setattr__(self, name, value):
+        reg = self._link_reg
+        if reg is not None:
+            if name in _LINK_STATE_ATTRIBUTES:
+                if not reg._state_changed:
+                    reg._state_changed = True
+            else:
+                reg._element_changed(self, name)
+        object.__setattr__(self, name, value)
+
     def _compare(self, other):
         """
         Parameters
@@ -365,6 +420,12 @@ class Link(six.with_metaclass(abc.ABCMeta, object)):
     @property
     def flow(self):
         """float: Current flow through the link (read only)"""
+        # the simulation state is stored in the link columns if columnar storage is enabled
+        columns = self._link_reg._columns
+        if columns is not None:
+            row = columns.get_row(self._link_name)
+            if row is not None:
+                return columns.get_value('flow', row)
         return self._flow
     
     @property
@@ -428,13 +489,68 @@ class Registry(MutableMapping):
     wn : :class:`~wntr.network.model.WaterNetworkModel`
         WaterNetworkModel object
     """
-    
+    # Names of the OrderedSets that hold subsets of the keys (e.g., junction names)
+    _subsets = ()
+    # The ChangeTracker of the model checkpoint, or None
+    _tracker = None
+    # Incremented when the registry (or, for patterns, a demand or time series) is changed
+    _version = 0
+    # Incremented when an attribute of a node or link in the registry is set
+    _attribute_version = 0
+    # Set to True when the simulation state of a node or link in the registry is set
+    _state_changed = False
+    # The ElementColumns that store the simulation state of the elements, or None
+    _columns = None
+
     def __init__(self, wn):
         if not isinstance(wn, AbstractModel):
             raise ValueError('Registry must be initialized with a model')
 #        self._m = model
         self._data = OrderedDict()
         self._usage = OrderedDict()
+        # Identifies the registry in cached INP sections (see InpFile.write); unlike id(),
+        # the token is not reused while a cache refers to it, and copies get a new token
+        self._cache_token = object()
+
+    def __getstate__(self):
+        # A checkpoint only applies to the model it was set on; it is not pickled or copied
+        state = self.__dict__.copy()
+        state.pop('_tracker', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def _track_key(self, key, deleting=False):
+        """Record the state of key before it is changed (if a checkpoint is set)"""
+        if self._tracker is not None:
+            self._tracker.save_registry_key(self, key, deleting)
+
+    def _mark_changed(self):
+        """Mark objects compiled from the registry (e.g., compiled demands) as out of date"""
+        self._version += 1
+
+    def _element_changed(self, obj, name):
+        """Record the state of an element before its attribute name is set (called by the element)"""
+        self._attribute_version += 1
+        if self._tracker is not None:
+            self._tracker.save_object(obj)
+
+    def _add_column_row(self, key, obj):
+        """Add a row for obj to the columns (if columnar storage is enabled)"""
+        if self._columns is not None:
+            self._columns.add(key, dict((attribute, obj.__dict__.get('_' + attribute, None))
+                                        for attribute in self._columns.attributes))
+
+    def _remove_column_row(self, key, obj):
+        """Remove the row of obj from the columns and store the values in obj (if columnar storage is enabled)"""
+        if self._columns is not None and key in self._columns:
+            obj.__dict__.update(('_' + attribute, value) for attribute, value in self._columns.remove(key).items())
+
+    def _track_usage(self, key):
+        """Record the usage of key before it is changed (if a checkpoint is set)"""
+        if self._tracker is not None:
+            self._tracker.save_key(self._usage, key, OrderedSet)
 
     def _finalize_(self, wn):
         self._options = wn._options
@@ -460,9 +576,13 @@ class Registry(MutableMapping):
     def __setitem__(self, key, value):
         if not isinstance(key, string_types):
             raise ValueError('Registry keys must be strings')
+        self._track_key(key)
+        self._mark_changed()
         self._data[key] = value
     
     def __delitem__(self, key):
+        self._track_key(key, deleting=True)
+        self._mark_changed()
         try:
             if self._usage and key in self._usage and len(self._usage[key]) > 0:
                 raise RuntimeError('cannot remove %s %s, still used by %s', 
@@ -558,12 +678,14 @@ class Registry(MutableMapping):
         """if key in usage, clear usage[key]"""
         if not key:
             return
+        self._track_usage(key)
         self._usage[key].clear()
     
     def add_usage(self, key, *args):
         """add args to usage[key]"""
         if not key:
             return
+        self._track_usage(key)
         if not key in self._usage:
             self._usage[key] = OrderedSet()
         for arg in args:
@@ -573,6 +695,7 @@ class Registry(MutableMapping):
         """remove args from usage[key]"""
         if not key:
             return
+        self._track_usage(key)
         for arg in args:
             self._usage[key].discard(arg)
         if len(self._usage[key]) < 1:
@@ -593,6 +716,325 @@ class Registry(MutableMapping):
         return l
 
 
+class ElementColumns(object):
+    """
+    Columnar storage of element attributes.
+
+    Each attribute is stored in a float numpy array (a column) with one row 
+    per element, so that the attribute of all elements can be read or 
+    written at once. Rows are assigned when elements are added; the rows of 
+    removed elements are reused. Missing values (None) are stored as NaN.
+
+    Parameters
+    ----------
+    attributes : list of strings
+        Names of the attributes
+    capacity : int (optional)
+        Initial number of rows (default = 16)
+    """
+
+    def __init__(self, attributes, capacity=16):
+        self._rows = OrderedDict()  # element name -> row
+        self._free_rows = []
+        self._num_rows = 0  # number of rows in use or free
+        self._columns = OrderedDict((attribute, np.full(capacity, np.nan)) for attribute in attributes)
+        # Incremented when rows are assigned or freed
+        self._version = 0
+        # Attributes whose values were set, and whether rows were assigned or freed, since 
+        # the columns were saved by a checkpoint (see _save)
+        self._dirty = set()
+        self._rows_changed = False
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, name):
+        return name in self._rows
+
+    def __repr__(self):
+        return '<ElementColumns: {} elements, attributes={}>'.format(len(self._rows), list(self._columns.keys()))
+
+    @property
+    def attributes(self):
+        """list of strings: The names of the attributes"""
+        return list(self._columns.keys())
+
+    @property
+    def names(self):
+        """list of strings: The names of the elements"""
+        return list(self._rows.keys())
+
+    def add(self, name, values=None):
+        """
+        Add a row for an element.
+
+        Parameters
+        ----------
+        name : string
+            Element name
+        values : dict (optional)
+            Attribute values of the element; attributes that are not 
+            included are set to None (default = None)
+
+        Returns
+        -------
+        int
+            The row of the element
+        """
+        row = self._rows.get(name, None)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                row = self._num_rows
+                self._num_rows += 1
+                capacity = len(next(iter(self._columns.values()))) if self._columns else 0
+                if row >= capacity:
+                    for attribute, column in self._columns.items():
+                        new_column = np.full(max(2*capacity, 16), np.nan)
+                        new_column[:capacity] = column
+                        self._columns[attribute] = new_column
+            self._rows[name] = row
+            self._version += 1
+            self._rows_changed = True
+        for attribute, column in self._columns.items():
+            value = None if values is None else values.get(attribute, None)
+            column[row] = np.nan if value is None else value
+        return row
+
+    def remove(self, name):
+        """
+        Remove the row of an element.
+
+        Returns
+        -------
+        dict
+            The attribute values of the element
+        """
+        row = self._rows.pop(name)
+        values = dict((attribute, self.get_value(attribute, row)) for attribute in self._columns)
+        self._free_rows.append(row)
+        self._version += 1
+        self._rows_changed = True
+        return values
+
+    def get_row(self, name):
+        """Returns the row of an element, or None if the element does not have a row"""
+        return self._rows.get(name, None)
+
+    def get_rows(self, names):
+        """Returns the rows of a list of elements as an array of int"""
+        rows = self._rows
+        return np.fromiter((rows[name] for name in names), dtype=int, count=len(names))
+
+    def get_value(self, attribute, row):
+        """Returns the value of an attribute in a row (None if the value is missing)"""
+        value = self._columns[attribute][row]
+        if value != value:
+            return None
+        return value
+
+    def set_value(self, attribute, row, value):
+        """Sets the value of an attribute in a row"""
+        self._dirty.add(attribute)
+        self._columns[attribute][row] = np.nan if value is None else value
+
+    def column(self, attribute):
+        """
+        Returns the column of an attribute. The column is indexed by the rows 
+        of the elements (see get_rows); it is not copied, and it is replaced 
+        when elements are added beyond the capacity of the columns.
+        """
+        # the column may be changed in place
+        self._dirty.add(attribute)
+        return self._columns[attribute]
+
+    def get_values(self, attribute, names=None):
+        """
+        Returns the values of an attribute (missing values are NaN).
+
+        Parameters
+        ----------
+        attribute : string
+            Attribute name
+        names : list of strings (optional)
+            Element names; if None, all elements are included in the order 
+            they were added (default = None)
+
+        Returns
+        -------
+        numpy array
+        """
+        if names is None:
+            names = self.names
+        return self._columns[attribute][self.get_rows(names)]
+
+    def set_values(self, attribute, values, names=None):
+        """
+        Sets the values of an attribute (NaN values are missing).
+
+        Parameters
+        ----------
+        attribute : string
+            Attribute name
+        values : float or array
+            Attribute values
+        names : list of strings (optional)
+            Element names; if None, all elements are included in the order 
+            they were added (default = None)
+        """
+        if names is None:
+            names = self.names
+        if values is None:
+            values = np.nan
+        self._dirty.add(attribute)
+        self._columns[attribute][self.get_rows(names)] = values
+
+    def _save(self):
+        """Save the rows and values for a checkpoint; changes are recorded from now on"""
+        self._dirty = set()
+        self._rows_changed = False
+        return (OrderedDict(self._rows), list(self._free_rows), self._num_rows,
+                dict((attribute, column[:self._num_rows].copy()) for attribute, column in self._columns.items()))
+
+    def _restore(self, saved):
+        """
+        Restore the rows and values saved by _save; only the columns that were 
+        changed since then are copied
+        """
+        rows, free_rows, num_rows, values = saved
+        if self._rows_changed:
+            self._rows = OrderedDict(rows)
+            self._free_rows = list(free_rows)
+            self._num_rows = num_rows
+            self._version += 1
+            attributes = list(self._columns.keys())
+        else:
+            attributes = list(self._dirty)
+        for attribute in attributes:
+            column = self._columns[attribute]
+            column[:num_rows] = values[attribute]
+            column[num_rows:] = np.nan
+        self._dirty = set()
+        self._rows_changed = False
+
+
+class ChangeTracker(object):
+    """
+    Change tracker used by model checkpoints.
+
+    The tracker records the state of model objects the first time they are
+    changed after the checkpoint (copy-on-write), so that restoring the
+    checkpoint only touches the objects that were changed. Objects record
+    themselves through :meth:`save_object` (nodes, links, time series,
+    demands and sources), :meth:`save_key` (controls, sources and registry
+    usage), and :meth:`save_registry_key` (registry entries).
+    Objects that are not listed above are not tracked; these are saved
+    when the checkpoint is set, see
+    :meth:`~wntr.network.model.WaterNetworkModel.checkpoint`.
+    """
+    def __init__(self):
+        self._objects = OrderedDict()  # id(obj) -> (obj, state)
+        self._keys = OrderedDict()  # id(mapping) -> (mapping, OrderedDict of key -> (present, value))
+        self._orders = OrderedDict()  # id(mapping) -> (mapping, list of keys)
+        self._registry_keys = OrderedDict()  # id(registry) -> (registry, OrderedSet of keys)
+        self._registry_subsets = OrderedDict()  # id(registry) -> (registry, dict of subset name -> OrderedSet)
+        self.saved_state = None  # state saved by the model when the checkpoint was set
+
+    @property
+    def num_changes(self):
+        """int: The number of objects and keys recorded since the checkpoint"""
+        return len(self._objects) + sum(len(keys) for mapping, keys in self._keys.values())
+
+    def save_object(self, obj, state=None):
+        """
+        Record the state of an object (by default, a shallow copy of its
+        __dict__) if it was not recorded already.
+        """
+        if id(obj) in self._objects:
+            return
+        if state is None:
+            state = obj.__dict__.copy()
+        self._objects[id(obj)] = (obj, state)
+
+    def save_key(self, mapping, key, copy_value=None):
+        """
+        Record the value of a key in a mapping (or that the key is not
+        present) if it was not recorded already.
+        """
+        entry = self._keys.get(id(mapping), None)
+        if entry is None:
+            entry = (mapping, OrderedDict())
+            self._keys[id(mapping)] = entry
+        saved = entry[1]
+        if key in saved:
+            return
+        if key in mapping:
+            value = mapping[key]
+            if copy_value is not None:
+                value = copy_value(value)
+            saved[key] = (True, value)
+        else:
+            saved[key] = (False, None)
+
+    def save_order(self, mapping):
+        """Record the order of the keys in a mapping if it was not recorded already"""
+        if id(mapping) not in self._orders:
+            self._orders[id(mapping)] = (mapping, list(mapping.keys()))
+
+    def save_registry_subsets(self, registry):
+        """Record the subsets of a registry (e.g., junction names) if they were not recorded already"""
+        if id(registry) not in self._registry_subsets:
+            subsets = dict((name, OrderedSet(getattr(registry, name))) for name in registry._subsets)
+            self._registry_subsets[id(registry)] = (registry, subsets)
+
+    def save_registry_key(self, registry, key, deleting=False):
+        """
+        Record the entry and usage of a key in a registry. If the key is
+        being deleted, the order of the registry is also recorded (the cost of
+        this is proportional to the size of the registry).
+        """
+        self.save_key(registry._data, key)
+        self.save_key(registry._usage, key, OrderedSet)
+        entry = self._registry_keys.get(id(registry), None)
+        if entry is None:
+            entry = (registry, OrderedSet())
+            self._registry_keys[id(registry)] = entry
+        entry[1].add(key)
+        if deleting:
+            self.save_order(registry._data)
+            self.save_registry_subsets(registry)
+
+    def restore(self):
+        """Revert all recorded changes"""
+        for obj, state in self._objects.values():
+            obj.__dict__.clear()
+            obj.__dict__.update(state)
+
+        for mapping, saved in self._keys.values():
+            for key, (present, value) in saved.items():
+                if present:
+                    mapping[key] = value
+                else:
+                    mapping.pop(key, None)
+
+        for mapping, order in self._orders.values():
+            order_set = set(order)
+            items = [(key, mapping[key]) for key in order if key in mapping]
+            items.extend((key, value) for key, value in mapping.items() if key not in order_set)
+            mapping.clear()
+            mapping.update(items)
+
+        for registry, subsets in self._registry_subsets.values():
+            for name, subset in subsets.items():
+                setattr(registry, name, OrderedSet(subset))
+        for registry, keys in self._registry_keys.values():
+            for key in keys:
+                if key not in registry._data:
+                    for name in registry._subsets:
+                        getattr(registry, name).discard(key)
+
+
 class NodeType(enum.IntEnum):
     """
     Enum class for node types.
@@ -620,7 +1062,7 @@ class NodeType(enum.IntEnum):
         return self.name
 
     def __eq__(self, other):
-        return int(self) == int(other) and (isinstance(other, int) or \
+        return int(self) == int(other) and (isinstance(other, (int, np.integer)) or \
                self.__class__.__name__ == other.__class__.__name__)
 
 
@@ -665,7 +1107,7 @@ class LinkType(enum.IntEnum):
         return self.name
 
     def __eq__(self, other):
-        return int(self) == int(other) and (isinstance(other, int) or \
+        return int(self) == int(other) and (isinstance(other, (int, np.integer)) or \
                self.__class__.__name__ == other.__class__.__name__)
 
 
@@ -703,6 +1145,6 @@ class LinkStatus(enum.IntEnum):
         return self.name
 
     def __eq__(self, other):
-        return int(self) == int(other) and (isinstance(other, int) or \
+        return int(self) == int(other) and (isinstance(other, (int, np.integer)) or \
                self.__class__.__name__ == other.__class__.__name__)
 
@@ -28,6 +28,7 @@ simulation.
 """
 import math
 import enum
+import heapq
 import numpy as np
 import logging
 import six
@@ -36,6 +37,7 @@ import abc
 from wntr.utils.ordered_set import OrderedSet
 from collections import OrderedDict, Iterable
 from .elements import Tank, Junction, Valve, Pump, Reservoir, Pipe
+from .base import Node, Link
 from wntr.utils.doc_inheritor import DocInheritor
 import warnings
 
@@ -512,6 +514,31 @@ class TimeOfDayCondition(ControlCondition):
             self._backtrack = 0
             return False
 
+    def _earliest_true_time(self):
+        """
+        Returns a lower bound on the simulation time at which evaluate can return True given the
+        time of the previous solve (float('inf') if evaluate can not return True anymore), or None if
+        the condition has to be evaluated at every check. Used by the ControlManager to index
+        time controls.
+        """
+        start = self._model.options.time.start_clocktime
+        prev_time = self._model._prev_shifted_time
+        first_time = self._first_day * 86400.
+        if not self._repeat:
+            if self._relation is Comparison.eq:
+                if prev_time - first_time >= self._threshold:
+                    return float('inf')
+                return self._threshold + first_time - start
+            elif self._relation is Comparison.gt:
+                return self._threshold + first_time - start
+            return None
+        if self._relation is Comparison.eq:
+            # evaluate is True when int(t - threshold) % 86400 increases past the threshold between the
+            # previous and the current time, i.e., within one second of 2*threshold + k*86400
+            k = math.floor((prev_time - 1 - 2*self._threshold) / 86400.) + 1
+            return max(2*self._threshold + k*86400. - 1, first_time) - start
+        return None
+
 
 @DocInheritor({'requires', 'evaluate', 'name'})
 class SimTimeCondition(ControlCondition):
@@ -643,6 +670,32 @@ class SimTimeCondition(ControlCondition):
             self._backtrack = 0
             return False
 
+    def _earliest_true_time(self):
+        """
+        Returns a lower bound on the simulation time at which evaluate can return True given the
+        time of the previous solve (float('inf') if evaluate can not return True anymore), or None if
+        the condition has to be evaluated at every check. Used by the ControlManager to index
+        time controls.
+        """
+        prev_time = self._model._prev_sim_time
+        if self._relation is Comparison.eq:
+            if not self._repeat:
+                if prev_time >= self._threshold:
+                    return float('inf')
+                return self._threshold
+            earliest = float('inf')
+            if prev_time < self._threshold:
+                earliest = self._threshold
+            if self._repeat > self._threshold:
+                # after the threshold, evaluate is True when (t - threshold) % repeat increases past
+                # the threshold between the previous and the current time, i.e., at 2*threshold + k*repeat
+                k = math.floor((prev_time - 2*self._threshold) / self._repeat) + 1
+                earliest = min(earliest, 2*self._threshold + k*self._repeat)
+            return earliest - 1
+        elif self._relation in {Comparison.gt, Comparison.ge} and not self._repeat:
+            return self._threshold
+        return None
+
 
 @DocInheritor({'requires', 'evaluate', 'name'})
 class ValueCondition(ControlCondition):
@@ -964,7 +1017,9 @@ class OrCondition(ControlCondition):
         return np.max([self._condition_1.backtrack, self._condition_2.backtrack])
 
     def requires(self):
-        return self._condition_1.requires().update(self._condition_2.requires())
+        req = self._condition_1.requires()
+        req.update(self._condition_2.requires())
+        return req
 
 
 @DocInheritor({'requires', 'evaluate', 'backtrack'})
@@ -1026,7 +1081,9 @@ class AndCondition(ControlCondition):
         return np.min([self._condition_1.backtrack, self._condition_2.backtrack])
 
     def requires(self):
-        return self._condition_1.requires().update(self._condition_2.requires())
+        req = self._condition_1.requires()
+        req.update(self._condition_2.requires())
+        return req
 
 
 class _CloseCVCondition(ControlCondition):
@@ -1930,17 +1987,83 @@ class Control(Rule):
         return control
 
 
+# Conditions that only depend on attributes of the network elements they require
+_VALUE_CONDITIONS = (ValueCondition, RelativeCondition, _CloseCVCondition, _OpenCVCondition, _ClosePowerPumpCondition,
+                     _OpenPowerPumpCondition, _CloseHeadPumpCondition, _OpenHeadPumpCondition, _ClosePRVCondition,
+                     _OpenPRVCondition, _ActivePRVCondition, _OpenFCVCondition, _ActiveFCVCondition)
+
+
+def _watched_objects(condition, in_or=False):
+    """
+    Returns the network elements watched by a value-based condition, or None if the condition can not be indexed
+    by the elements it requires.
+    """
+    if isinstance(condition, (AndCondition, OrCondition)):
+        in_or = in_or or isinstance(condition, OrCondition)
+        objs = _watched_objects(condition._condition_1, in_or)
+        objs2 = _watched_objects(condition._condition_2, in_or)
+        if objs is None or objs2 is None:
+            return None
+        objs.update(objs2)
+        return objs
+    if not isinstance(condition, _VALUE_CONDITIONS):
+        return None
+    if in_or and isinstance(condition, TankLevelCondition):
+        # the backtrack of an OrCondition may come from a TankLevelCondition that was evaluated at a previous check
+        return None
+    objs = condition.requires()
+    for obj in objs:
+        if not isinstance(obj, (Node, Link)):
+            return None
+    return objs
+
+
+class _ChangeObserver(Observer):
+    """
+    Records the objects changed by control actions for an indexed ControlManager.
+    """
+    def __init__(self, manager):
+        self._manager = manager
+
+    def update(self, subject):
+        obj, attr = subject.target()
+        self._manager._changed_objects.add(obj)
+
+
 class ControlManager(Observer):
     """
     A class for managing controls and identifying changes made by those controls.
+
+    If a water network model is given, the controls are indexed so that :meth:`check` only evaluates the conditions
+    that can have changed since the previous check. The conditions of time controls (SimTimeCondition and
+    TimeOfDayCondition) are kept in a heap keyed by the earliest time at which they can be satisfied, and
+    the conditions that only depend on node and link attributes (e.g., ValueCondition, RelativeCondition, and the
+    conditions of the check valve, pump, and valve controls) are only evaluated when one of the elements they
+    require changed. The elements changed by a hydraulic solve must be reported with :meth:`mark_changed`;
+    the elements changed by the control actions of this ControlManager (and of the controls given to
+    :meth:`observe_actions`) are recorded automatically. All other controls are evaluated at every check.
+    The number of evaluated and skipped controls is counted in num_evaluated and num_skipped.
+
+    Parameters
+    ----------
+    wn: WaterNetworkModel (optional)
+        The model providing the simulation time used to index the controls. If None, every control is
+        evaluated at every check (default = None).
     """
-    def __init__(self):
+    def __init__(self, wn=None):
         self._controls = OrderedSet()
         """OrderedSet of ControlBase"""
 
         self._previous_values = OrderedDict()  # {(obj, attr): value}
         self._changed = OrderedSet()  # set of (obj, attr) that has been changed from _previous_values
 
+        self._wn = wn
+        self._index = None  # built by _build_index at the first check
+        self._changed_objects = set()  # objects changed since the last check
+        self._change_observer = _ChangeObserver(self)
+        self.num_evaluated = 0
+        self.num_skipped = 0
+
     def __iter__(self):
         return iter(self._controls)
 
@@ -1967,11 +2090,41 @@ class ControlManager(Observer):
         control: ControlBase
         """
         self._controls.add(control)
+        self._index = None
         for action in control.actions():
             action.subscribe(self)
+            if self._wn is not None:
+                action.subscribe(self._change_observer)
             obj, attr = action.target()
             self._previous_values[(obj, attr)] = getattr(obj, attr)
 
+    def observe_actions(self, control):
+        """
+        Record the objects changed by the actions of a control that is not registered with this ControlManager
+        (e.g., a control registered with another ControlManager of the same simulation) so that the
+        indexed conditions requiring them are evaluated at the next check.
+
+        Parameters
+        ----------
+        control: ControlBase
+        """
+        if self._wn is None:
+            return
+        for action in control.actions():
+            action.subscribe(self._change_observer)
+
+    def mark_changed(self, objects):
+        """
+        Mark objects (nodes and links) whose attributes changed outside of the control actions, e.g., by a
+        hydraulic solve, so that the indexed conditions requiring them are evaluated at the next check.
+
+        Parameters
+        ----------
+        objects: Iterable of object
+        """
+        if self._wn is not None:
+            self._changed_objects.update(objects)
+
     def reset(self):
         """
         Reset the _previous_values. This should be called before activating any control actions so that changes made
@@ -2015,8 +2168,11 @@ class ControlManager(Observer):
         control: ControlBase
         """
         self._controls.remove(control)
+        self._index = None
         for action in control.actions():
             action.unsubscribe(self)
+            if self._wn is not None:
+                action.unsubscribe(self._change_observer)
             obj, attr = action.target()
             self._previous_values.pop((obj, attr))
             self._changed.discard((obj, attr))
@@ -2030,9 +2186,93 @@ class ControlManager(Observer):
         controls_to_run: list of tuple
             The tuple is (ControlBase, backtrack)
         """
+        if self._wn is not None:
+            return self._check_indexed()
         controls_to_run = []
         for c in self._controls:
             do, back = c.is_control_action_required()
             if do:
                 controls_to_run.append((c, back))
+        self.num_evaluated += len(self._controls)
+        return controls_to_run
+
+    def _build_index(self):
+        position = OrderedDict()
+        always = []
+        buckets = {}
+        pending = set()
+        time_heap = []
+        for i, control in enumerate(self._controls):
+            position[control] = i
+            if not isinstance(control, Rule) or len(control._else_actions) > 0:
+                # the else actions are run whenever the condition is False
+                always.append(control)
+                continue
+            condition = control._condition
+            if isinstance(condition, (SimTimeCondition, TimeOfDayCondition)):
+                earliest = condition._earliest_true_time()
+                if earliest is None:
+                    always.append(control)
+                elif earliest != float('inf'):
+                    time_heap.append((earliest, i, control))
+            else:
+                objs = _watched_objects(condition)
+                if objs is None:
+                    always.append(control)
+                    continue
+                for obj in objs:
+                    buckets.setdefault(obj, []).append(control)
+                pending.add(control)
+        heapq.heapify(time_heap)
+        self._index = {'position': position, 'always': always, 'buckets': buckets, 'time_heap': time_heap,
+                       'value_controls': frozenset(pending)}
+        # value-based controls are evaluated at the first check; afterwards the value-based controls whose
+        # condition was satisfied at their last evaluation are kept in _active
+        self._pending = pending
+        self._active = set()
+        self._changed_objects = set()
+
+    def _check_indexed(self):
+        if self._index is None:
+            self._build_index()
+        position = self._index['position']
+        time_heap = self._index['time_heap']
+
+        to_evaluate = self._pending
+        self._pending = set()
+        buckets = self._index['buckets']
+        for obj in self._changed_objects:
+            if obj in buckets:
+                to_evaluate.update(buckets[obj])
+        self._changed_objects = set()
+        to_evaluate.update(self._index['always'])
+        due = []
+        sim_time = self._wn.sim_time
+        while len(time_heap) > 0 and time_heap[0][0] <= sim_time:
+            due.append(heapq.heappop(time_heap)[2])
+        to_evaluate.update(due)
+
+        controls_to_run = []
+        value_controls = self._index['value_controls']
+        active = self._active
+        for c in sorted(to_evaluate, key=position.__getitem__):
+            do, back = c.is_control_action_required()
+            if do:
+                controls_to_run.append((c, back))
+                if c in value_controls:
+                    active.add(c)
+            else:
+                active.discard(c)
+        for c in due:
+            earliest = c._condition._earliest_true_time()
+            if earliest != float('inf'):
+                heapq.heappush(time_heap, (earliest, position[c], c))
+        # the conditions of the skipped value-based controls would evaluate the same as at their last evaluation;
+        # no backtracking is needed since the elements they require did not change
+        skipped_active = [(c, 0) for c in active if c not in to_evaluate]
+        if len(skipped_active) > 0:
+            controls_to_run.extend(skipped_active)
+            controls_to_run.sort(key=lambda i: position[i[0]])
+        self.num_evaluated += len(to_evaluate)
+        self.num_skipped += len(position) - len(to_evaluate)
         return controls_to_run
@@ -24,6 +24,7 @@ demands, curves, and sources.
     Pattern
     TimeSeries
     Demands
+    CompiledDemands
     Curve
     Source
 
@@ -34,6 +35,7 @@ import logging
 import math
 import six
 import copy
+import scipy.sparse
 from scipy.optimize import fsolve
 
 if sys.version_info[0] == 2:
@@ -1160,6 +1162,8 @@ class TimeSeries(object):
         If `base` or `pattern` are invalid types
     
     """
+    _pattern_reg = None
+
     def __init__(self, model, base, pattern_name=None, category=None):
         if not isinstance(base, (int, float, complex)):
             raise ValueError('TimeSeries->base must be a number')
@@ -1171,6 +1175,14 @@ class TimeSeries(object):
         if base is None: base = 0.0
         self._base = base
         self._category = category
+
+    def __setattr__(self, name, value):
+        reg = self._pattern_reg
+        if reg is not None:
+            if reg._tracker is not None:
+                reg._tracker.save_object(self)
+            reg._mark_changed()
+        object.__setattr__(self, name, value)
         
     def __nonzero__(self):
         return self._base
@@ -1295,22 +1307,34 @@ class Demands(MutableSequence):
     in demand objects or demand tuples as ``(base_demand, pattern, category_name)``
     """
     
+    _pattern_reg = None
+
     def __init__(self, patterns, *args):
         self._list = []
         self._pattern_reg = patterns
         for object in args:
             self.append(object)
 
+    def _track(self):
+        """Record the list of demands before it is changed (if a checkpoint is set)"""
+        reg = self._pattern_reg
+        if reg is not None:
+            if reg._tracker is not None:
+                reg._tracker.save_object(self, dict(self.__dict__, _list=list(self._list)))
+            reg._mark_changed()
+
     def __getitem__(self, index):
         """Get the demand at index <==> y = S[index]"""
         return self._list.__getitem__(index)
     
     def __setitem__(self, index, obj):
         """Set demand and index <==> S[index] = object"""
+        self._track()
         return self._list.__setitem__(index, self.to_ts(obj))
     
     def __delitem__(self, index):
         """Remove demand at index <==> del S[index]"""
+        self._track()
         return self._list.__delitem__(index)
 
     def __len__(self):
@@ -1371,19 +1395,23 @@ class Demands(MutableSequence):
     
     def insert(self, index, obj):
         """S.insert(index, object) - insert object before index"""
+        self._track()
         self._list.insert(index, self.to_ts(obj))
     
     def append(self, obj):
         """S.append(object) - append object to the end"""
+        self._track()
         self._list.append(self.to_ts(obj))
     
     def extend(self, iterable):
         """S.extend(iterable) - extend list by appending elements from the iterable"""
+        self._track()
         for obj in iterable:
             self._list.append(self.to_ts(obj))
 
     def clear(self):
         """S.clear() - remove all entries"""
+        self._track()
         self._list = []
 
     def at(self, time, category=None):
@@ -1453,7 +1481,181 @@ class Demands(MutableSequence):
             for ct, t in enumerate(demand_times):
                 demand_values[ct] += dem(t)
         return demand_values
-        
+
+
+class CompiledDemands(object):
+    """
+    Compiled junction demands.
+
+    The demands of all junctions are compiled into a sparse (junction x pattern) 
+    matrix of base demands, summed over the demand entries of each junction, 
+    and a dense (pattern x pattern step) matrix of pattern multipliers. 
+    The demands at a time, or at a vector of times, are then computed with 
+    one matrix product rather than by evaluating each demand entry.
+
+    The compiled demands are rebuilt automatically when junctions are added 
+    or removed, or when demands, time series, patterns, the default pattern, 
+    or the pattern time options change. Changes made to a multipliers array 
+    in place (e.g., ``pattern.multipliers[0] = 2.0``) are not detected; 
+    set the multipliers instead (e.g., ``pattern.multipliers = values``).
+    The demand multiplier is not applied.
+
+    Use :meth:`~wntr.network.model.WaterNetworkModel.get_compiled_demands` 
+    to get the compiled demands of a model.
+
+    Parameters
+    ----------
+    wn : :class:`~wntr.network.model.WaterNetworkModel`
+        WaterNetworkModel object
+    """
+
+    def __init__(self, wn):
+        self._wn = wn
+        self._state = None
+        self._compile()
+
+    def __repr__(self):
+        return '<CompiledDemands: {} junctions, {} patterns>'.format(len(self._junction_names),
+                                                                     len(self._patterns))
+
+    @property
+    def junction_names(self):
+        """The names of the junctions, in the order of the demand values"""
+        self._update()
+        return list(self._junction_names)
+
+    def _get_state(self):
+        options = self._wn._options
+        return (self._wn._node_reg._version, self._wn._pattern_reg._version, options.hydraulic.pattern,
+                options.time.pattern_start, options.time.pattern_timestep)
+
+    def _is_current(self):
+        if self._state != self._get_state():
+            return False
+        for pattern, multipliers, wrap, time_options, time_values in self._patterns:
+            if pattern._multipliers is not multipliers or pattern.wrap != wrap or \
+                    pattern._time_options is not time_options:
+                return False
+            if time_options is not None and \
+                    (time_options.pattern_start, time_options.pattern_timestep) != time_values:
+                return False
+        return True
+
+    def _update(self):
+        if not self._is_current():
+            self._compile()
+
+    def _compile(self):
+        node_reg = self._wn._node_reg
+        junction_names = list(node_reg._junctions)
+
+        # Row 0 of the multiplier matrix is used for demands without a pattern
+        patterns = []
+        pattern_ids = {}
+        multipliers = [np.ones(1)]
+        rows = []
+        cols = []
+        base = []
+        for junction_id, junction_name in enumerate(junction_names):
+            for demand in node_reg._data[junction_name].demand_timeseries_list:
+                pattern = demand.pattern
+                if not pattern:
+                    pattern_id = 0
+                else:
+                    pattern_id = pattern_ids.get(id(pattern), None)
+                    if pattern_id is None:
+                        if len(pattern._multipliers) > 1 and pattern._time_options is None:
+                            raise RuntimeError('Pattern->time_options cannot be None at runtime')
+                        pattern_id = len(multipliers)
+                        pattern_ids[id(pattern)] = pattern_id
+                        multipliers.append(np.asarray(pattern._multipliers, dtype=float))
+                        patterns.append(pattern)
+                rows.append(junction_id)
+                cols.append(pattern_id)
+                base.append(demand.base_value)
+
+        num_patterns = len(multipliers)
+        self._num_steps = np.array([len(m) for m in multipliers], dtype=int)
+        self._multipliers = np.zeros((num_patterns, self._num_steps.max()))
+        for pattern_id, m in enumerate(multipliers):
+            self._multipliers[pattern_id, :len(m)] = m
+        # A pattern with one multiplier is constant
+        self._wrap = np.array([True] + [pattern.wrap for pattern in patterns]) | (self._num_steps == 1)
+        self._pattern_start = np.zeros(num_patterns)
+        self._pattern_timestep = np.ones(num_patterns)
+        for pattern_id, pattern in enumerate(patterns, 1):
+            if self._num_steps[pattern_id] > 1:
+                self._pattern_start[pattern_id] = pattern._time_options.pattern_start
+                self._pattern_timestep[pattern_id] = pattern._time_options.pattern_timestep
+        # duplicate (junction, pattern) entries are summed
+        self._base_demands = scipy.sparse.csr_matrix((base, (rows, cols)),
+                                                     shape=(len(junction_names), num_patterns))
+
+        self._junction_names = junction_names
+        self._patterns = []
+        for pattern in patterns:
+            time_options = pattern._time_options
+            time_values = None
+            if time_options is not None:
+                time_values = (time_options.pattern_start, time_options.pattern_timestep)
+            self._patterns.append((pattern, pattern._multipliers, pattern.wrap, time_options, time_values))
+        self._state = self._get_state()
+
+    def _get_pattern_values(self, times):
+        """Returns the multipliers of each pattern at each time, shape (len(times), number of patterns)"""
+        steps = np.floor_divide(times[:, np.newaxis] + self._pattern_start,
+                                self._pattern_timestep).astype(int)
+        num_steps = self._num_steps
+        in_range = (steps >= 0) & (steps < num_steps)
+        steps = np.where(self._wrap, steps % num_steps, np.where(in_range, steps, 0))
+        values = self._multipliers[np.arange(len(num_steps)), steps]
+        values[~(self._wrap | in_range)] = 0.0
+        return values
+
+    def at(self, time):
+        """
+        Returns the demand of each junction at a time, or at each time of a 
+        vector of times.
+
+        Parameters
+        ----------
+        time : int or array of int
+            Time in seconds
+
+        Returns
+        -------
+        numpy array
+            Demands in the order of junction_names. If time is a vector, 
+            the shape is (number of times, number of junctions)
+        """
+        self._update()
+        times = np.asarray(time, dtype=float)
+        values = self._base_demands.dot(self._get_pattern_values(times.reshape(-1)).T).T
+        if times.ndim == 0:
+            return values[0]
+        return values
+    __call__ = at
+
+    def get_values(self, start_time, end_time, time_step):
+        """
+        Returns the demand of each junction for a range of times.
+
+        Parameters
+        ----------
+        start_time : int
+            Start time in seconds
+        end_time : int
+            End time in seconds
+        time_step : int
+            Time step
+
+        Returns
+        -------
+        numpy array
+            Demands, shape (number of times, number of junctions)
+        """
+        return self.at(np.arange(start_time, end_time + time_step, time_step))
+
 
 class Curve(object):
     """
@@ -1601,6 +1803,8 @@ class Source(object):
         (default = None).
     """
 
+    _pattern_reg = None
+
 #    def __init__(self, name, node_registry, pattern_registry):
     def __init__(self, model, name, node_name, source_type, strength, pattern=None):
         self._strength_timeseries = TimeSeries(model._pattern_reg, strength, pattern, name)
@@ -1612,6 +1816,12 @@ class Source(object):
         self.node_name = node_name
         self.source_type = source_type
 
+    def __setattr__(self, name, value):
+        reg = self._pattern_reg
+        if reg is not None and reg._tracker is not None:
+            reg._tracker.save_object(self)
+        object.__setattr__(self, name, value)
+
     def __eq__(self, other):
         if not type(self) == type(other):
             return False
@@ -6,6 +6,8 @@ model as a NetworkX MultiDiGraph, and compute topographic metrics on the graph.
 import networkx as nx
 import numpy as np
 import pandas as pd
+import scipy.sparse
+from collections import Counter
 import logging
 
 logger = logging.getLogger(__name__)
@@ -35,28 +37,27 @@ class WntrMultiDiGraph(nx.MultiDiGraph):
         
         """
 
-        for node_name in self.nodes():
+        for node_name, data in self.nodes(data=True):
             try:
-                value = node_attribute[node_name]
-
-                nx.set_node_attributes(self, name='weight', values={node_name: value})
+                data['weight'] = node_attribute[node_name]
             except:
                 pass
 
-        for (node1, node2, link_name) in list(self.edges(keys=True)):
+        reversed_edges = []
+        for (node1, node2, link_name, data) in self.edges(keys=True, data=True):
             try:
                 value = link_attribute[link_name]
 
                 if value < 0: # change the direction of the link and value
-                    link_type = self[node1][node2][link_name]['type'] # 'type' should be the only other attribute on G.edge
-                    self.remove_edge(node1, node2, link_name)
-                    self.add_edge(node2, node1, link_name)
-                    nx.set_edge_attributes(self, name='type', values={(node2, node1, link_name): link_type})
-                    nx.set_edge_attributes(self, name='weight', values={(node2, node1, link_name): -value})
+                    # 'type' should be the only other attribute on G.edge
+                    reversed_edges.append((node1, node2, link_name, {'type': data['type'], 'weight': -value}))
                 else:
-                    nx.set_edge_attributes(self, name='weight', values={(node1, node2, link_name): value})
+                    data['weight'] = value
             except:
                     pass
+        
+        self.remove_edges_from([(node1, node2, link_name) for (node1, node2, link_name, data) in reversed_edges])
+        self.add_edges_from([(node2, node1, link_name, data) for (node1, node2, link_name, data) in reversed_edges])
 
     def terminal_nodes(self):
         """
@@ -82,27 +83,25 @@ class WntrMultiDiGraph(nx.MultiDiGraph):
         """
         Get bridge links (uses an undirected graph)
 
-        Parameters
-        ----------
-        G : graph
-            A networkx graph
+        A link is a bridge if removing it increases the number of connected 
+        components. Bridges are found in linear time with a depth first search 
+        that tracks the lowpoint of each node [Tarj74]_; parallel links 
+        between the same two nodes are not bridges.
 
         Returns
         -------
         List of links that are bridges
         
+        References
+        ----------
+        .. [Tarj74] Tarjan, R.E. (1974). A note on finding the bridges of a 
+           graph. Information Processing Letters, 2(6), 160-161.
         """
-        n = nx.number_connected_components(self.to_undirected())
-        bridges = []
-        for (node1, node2, link_name) in list(self.edges(keys=True)):
-            # if node1 and node2 have a neighbor in common, no bridge
-            if len(set(self.neighbors(node1)) & set(self.neighbors(node2))) == 0:
-                self.remove_edge(node1, node2, key=link_name)
-                if nx.number_connected_components(self.to_undirected()) > n:
-                    bridges.append(link_name)
-                self.add_edge(node1, node2, key=link_name)
-
-        return bridges
+        node_names, link_names, start, end = _link_arrays(self)
+        indptr, indices, link_ids = _undirected_csr(len(node_names), start, end)
+        is_bridge = _bridges(indptr, indices, link_ids, len(link_names))
+        
+        return [name for name, bridge in zip(link_names, is_bridge) if bridge]
 
     def central_point_dominance(self):
         """
@@ -170,21 +169,42 @@ class WntrMultiDiGraph(nx.MultiDiGraph):
         """
         Count all links in a simple path between sources and sinks
 
+        If the graph is acyclic (e.g. a graph weighted by flow direction), 
+        paths are counted by dynamic programming: the count of a link from 
+        node u to node v is the number of paths from the sources to u times 
+        the number of paths from v to the sinks. Otherwise, all simple paths 
+        are enumerated.
+
         Parameters
         -----------
         sources : list
             List of source nodes
         sinks : list
             List of sink nodes
-        sinks : list
-            List of sink nodes
 
         Returns
         -------
         Dictionary with the number of times each link is involved in a path
         
         """
-        link_names = [name for (node1, node2, name) in list(self.edges(keys=True))]
+        edges = list(self.edges(keys=True))
+        link_names = [name for (node1, node2, name) in edges]
+        
+        node_names = list(self.nodes())
+        node_index = dict((name, i) for i, name in enumerate(node_names))
+        start = [node_index[node1] for (node1, node2, name) in edges]
+        end = [node_index[node2] for (node1, node2, name) in edges]
+        order = _topological_order(len(node_names), start, end)
+        if order is not None:
+            # paths are counted between links (each parallel link is a path)
+            # and each link is counted once for every parallel link 
+            # between the same nodes, as in the simple path enumeration
+            num_parallel = Counter(zip(start, end))
+            from_sources = _path_counts(order, start, end, [node_index[n] for n in sources])
+            to_sinks = _path_counts(order[::-1], end, start, [node_index[n] for n in sinks])
+            counts = [from_sources[u]*num_parallel[(u, v)]*to_sinks[v] for u, v in zip(start, end)]
+            return pd.Series(data=counts, index=link_names)
+        
         link_count = pd.Series(data = 0, index=link_names)
 
         for sink in sinks:
@@ -200,6 +220,299 @@ class WntrMultiDiGraph(nx.MultiDiGraph):
         return link_count
 
 
+def _topological_order(num_nodes, start, end):
+    """
+    Topological order of the nodes of a directed multigraph given by link start and end node ids
+    
+    Returns
+    -------
+    List of node ids, or None if the graph has a cycle
+    """
+    out_links = [[] for i in range(num_nodes)]
+    in_degree = [0]*num_nodes
+    for u, v in zip(start, end):
+        out_links[u].append(v)
+        in_degree[v] += 1
+    order = [i for i in range(num_nodes) if in_degree[i] == 0]
+    for u in order: # order grows while it is iterated
+        for v in out_links[u]:
+            in_degree[v] -= 1
+            if in_degree[v] == 0:
+                order.append(v)
+    if len(order) < num_nodes:
+        return None
+    return order
+
+
+def _path_counts(order, start, end, sources):
+    """
+    Number of paths (one per parallel link) from the sources to each node of an acyclic graph
+    
+    Parameters
+    ----------
+    order : list of int
+        Topological order of the nodes (see _topological_order)
+    start, end : list of int
+        Start and end node id of each link
+    sources : list of int
+        Source node ids
+    
+    Returns
+    -------
+    List of int (Python ints, so large counts are exact)
+    """
+    in_links = [[] for i in range(len(order))]
+    for u, v in zip(start, end):
+        in_links[v].append(u)
+    counts = [0]*len(order)
+    for i in sources:
+        counts[i] = 1
+    for v in order:
+        for u in in_links[v]:
+            counts[v] += counts[u]
+    return counts
+
+
+class SparseGraph(object):
+    """
+    Lightweight sparse representation of a water network model graph.
+
+    The graph is stored as the start and end node index of each link, i.e. 
+    the coordinates of a COO sparse matrix; scipy.sparse adjacency and 
+    incidence matrices are built from these arrays. Use 
+    :class:`~wntr.network.model.WaterNetworkModel.get_sparse_graph` to 
+    create the graph of a water network model.
+
+    Parameters
+    ----------
+    node_names : list of strings
+        Node names, in the order of the matrix rows and columns
+    link_names : list of strings
+        Link names
+    start_node_index : array of int
+        Index of the start node of each link
+    end_node_index : array of int
+        Index of the end node of each link
+    """
+
+    def __init__(self, node_names, link_names, start_node_index, end_node_index):
+        self.node_names = list(node_names)
+        self.link_names = list(link_names)
+        self.node_index = dict((name, i) for i, name in enumerate(self.node_names))
+        self.link_index = dict((name, i) for i, name in enumerate(self.link_names))
+        self.start_node_index = np.asarray(start_node_index, dtype=int)
+        self.end_node_index = np.asarray(end_node_index, dtype=int)
+
+    def __repr__(self):
+        return '<SparseGraph: {} nodes, {} links>'.format(self.num_nodes, self.num_links)
+
+    @property
+    def num_nodes(self):
+        """Number of nodes"""
+        return len(self.node_names)
+
+    @property
+    def num_links(self):
+        """Number of links"""
+        return len(self.link_names)
+
+    def adjacency(self, weight=None, directed=True, format='csr'):
+        """
+        Adjacency matrix (num_nodes x num_nodes); the weights of parallel links are summed
+
+        Parameters
+        ----------
+        weight : array or pandas Series (optional)
+            Weight of each link (in the order of link_names, or indexed by 
+            link name). If None, each link has weight 1 (default = None)
+        directed : bool (optional)
+            If False, each link is added in both directions (default = True)
+        format : string (optional)
+            scipy.sparse format, e.g. 'csr' or 'coo' (default = 'csr')
+
+        Returns
+        -------
+        scipy.sparse matrix
+        """
+        data = self._link_values(weight)
+        rows = self.start_node_index
+        cols = self.end_node_index
+        if not directed:
+            rows, cols = np.concatenate((rows, cols)), np.concatenate((cols, rows))
+            data = np.concatenate((data, data))
+        A = scipy.sparse.coo_matrix((data, (rows, cols)), shape=(self.num_nodes, self.num_nodes))
+        
+        return A.asformat(format)
+
+    def incidence(self, format='csr'):
+        """
+        Link-node incidence matrix (num_links x num_nodes), -1 at the start node 
+        and 1 at the end node of each link
+        """
+        rows = np.concatenate((np.arange(self.num_links), np.arange(self.num_links)))
+        cols = np.concatenate((self.start_node_index, self.end_node_index))
+        data = np.concatenate((-np.ones(self.num_links), np.ones(self.num_links)))
+        A = scipy.sparse.coo_matrix((data, (rows, cols)), shape=(self.num_links, self.num_nodes))
+        
+        return A.asformat(format)
+
+    def weight_timeseries(self, flowrate, format='csr'):
+        """
+        Directed adjacency matrices weighted by flowrate at each time
+
+        As in :class:`~wntr.network.graph.WntrMultiDiGraph.weight_graph`, the 
+        direction of a link is reversed if the flowrate is negative and the 
+        weight is the absolute flowrate. The directions and weights are 
+        computed for all times at once.
+
+        Parameters
+        ----------
+        flowrate : pandas DataFrame
+            Link flowrates (index = times, columns = link names)
+        format : string (optional)
+            scipy.sparse format, e.g. 'csr' or 'coo' (default = 'csr')
+
+        Returns
+        -------
+        List of scipy.sparse matrices, one for each time
+        """
+        link_ids = [self.link_index[name] for name in flowrate.columns]
+        flow = flowrate.values
+        start = self.start_node_index[link_ids]
+        end = self.end_node_index[link_ids]
+        rows = np.where(flow < 0, end, start)
+        cols = np.where(flow < 0, start, end)
+        weight = np.abs(flow)
+        shape = (self.num_nodes, self.num_nodes)
+        
+        return [scipy.sparse.coo_matrix((weight[t], (rows[t], cols[t])), shape=shape).asformat(format) 
+                for t in range(flow.shape[0])]
+
+    def terminal_nodes(self):
+        """
+        Get all nodes with degree 1
+
+        Returns
+        -------
+        List of terminal node names
+        """
+        degree = np.bincount(self.start_node_index, minlength=self.num_nodes) + \
+            np.bincount(self.end_node_index, minlength=self.num_nodes)
+        
+        return [self.node_names[i] for i in np.flatnonzero(degree == 1)]
+
+    def bridges(self):
+        """
+        Get bridge links, see :class:`~wntr.network.graph.WntrMultiDiGraph.bridges`
+
+        Returns
+        -------
+        List of links that are bridges
+        """
+        indptr, indices, link_ids = _undirected_csr(self.num_nodes, self.start_node_index, self.end_node_index)
+        is_bridge = _bridges(indptr, indices, link_ids, self.num_links)
+        
+        return [name for name, bridge in zip(self.link_names, is_bridge) if bridge]
+
+    def _link_values(self, values):
+        if values is None:
+            return np.ones(self.num_links)
+        if isinstance(values, pd.Series):
+            return values.reindex(self.link_names).values.astype(float)
+        return np.asarray(values, dtype=float)
+
+
+def _link_arrays(G):
+    """
+    Node names, link names, and the start and end node index of each link of a multigraph
+    """
+    node_names = list(G.nodes())
+    node_index = dict((name, i) for i, name in enumerate(node_names))
+    edges = list(G.edges(keys=True))
+    link_names = [k for u, v, k in edges]
+    start = np.fromiter((node_index[u] for u, v, k in edges), dtype=int, count=len(edges))
+    end = np.fromiter((node_index[v] for u, v, k in edges), dtype=int, count=len(edges))
+    
+    return node_names, link_names, start, end
+
+
+def _undirected_csr(num_nodes, start, end):
+    """
+    Undirected CSR adjacency of a multigraph, with one entry per link in each direction
+    
+    Returns
+    -------
+    indptr, indices, link_ids
+        The neighbors of node i are indices[indptr[i]:indptr[i+1]] and 
+        link_ids gives the index of the link to each neighbor
+    """
+    num_links = len(start)
+    rows = np.concatenate((start, end))
+    cols = np.concatenate((end, start))
+    link_ids = np.concatenate((np.arange(num_links), np.arange(num_links)))
+    order = np.argsort(rows, kind='mergesort')
+    indptr = np.zeros(num_nodes+1, dtype=int)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=num_nodes))
+
+    return indptr, cols[order], link_ids[order]
+
+
+def _bridges(indptr, indices, link_ids, num_links):
+    """
+    Tarjan's lowpoint bridge search on an undirected CSR adjacency (see _undirected_csr)
+    
+    The search is iterative and skips the link used to reach a node (not the 
+    parent node), so parallel links are never bridges.
+    
+    Returns
+    -------
+    List of bool, True for the links that are bridges
+    """
+    indptr = indptr.tolist()
+    indices = indices.tolist()
+    link_ids = link_ids.tolist()
+    num_nodes = len(indptr) - 1
+
+    disc = [-1]*num_nodes # discovery order
+    low = [0]*num_nodes # lowest discovery order reachable with one back link
+    parent_link = [-1]*num_nodes
+    next_neighbor = indptr[:-1]
+    is_bridge = [False]*num_links
+    counter = 0
+    for root in range(num_nodes):
+        if disc[root] != -1:
+            continue
+        disc[root] = low[root] = counter
+        counter += 1
+        stack = [root]
+        while stack:
+            u = stack[-1]
+            i = next_neighbor[u]
+            if i < indptr[u+1]:
+                next_neighbor[u] = i + 1
+                link = link_ids[i]
+                if link == parent_link[u]:
+                    continue
+                v = indices[i]
+                if disc[v] == -1:
+                    disc[v] = low[v] = counter
+                    counter += 1
+                    parent_link[v] = link
+                    stack.append(v)
+                elif disc[v] < low[u]:
+                    low[u] = disc[v]
+            else:
+                stack.pop()
+                if stack:
+                    p = stack[-1]
+                    if low[u] < low[p]:
+                        low[p] = low[u]
+                    if low[u] > disc[p]:
+                        is_bridge[parent_link[u]] = True
+
+    return is_bridge
+
+
 def _all_simple_paths(G, source, target, cutoff=None):
     """
     Adaptation of nx.all_simple_paths for multigraphs
@@ -16,6 +16,8 @@ model.
 """
 import logging
 import six
+import copy
+import enum
 
 import sys
 if sys.version_info[0] == 2:
@@ -27,12 +29,13 @@ import numpy as np
 import networkx as nx
 
 from .options import WaterNetworkOptions
-from .base import Link, Registry, LinkStatus, AbstractModel
+from .base import Link, Registry, LinkStatus, AbstractModel, ChangeTracker, ElementColumns, \
+    _NODE_STATE_ATTRIBUTES, _LINK_STATE_ATTRIBUTES
 from .elements import Junction, Reservoir, Tank
 from .elements import Pipe, Pump, HeadPump, PowerPump
 from .elements import Valve, PRValve, PSValve, PBValve, TCValve, FCValve, GPValve
-from .elements import Pattern, TimeSeries, Demands, Curve, Source
-from .graph import WntrMultiDiGraph
+from .elements import Pattern, TimeSeries, Demands, CompiledDemands, Curve, Source
+from .graph import WntrMultiDiGraph, SparseGraph
 from .controls import ControlPriority, _ControlType, TimeOfDayCondition, SimTimeCondition, ValueCondition, \
     TankLevelCondition, RelativeCondition, OrCondition, AndCondition, _CloseCVCondition, _OpenCVCondition, \
     _ClosePowerPumpCondition, _OpenPowerPumpCondition, _CloseHeadPumpCondition, _OpenHeadPumpCondition, \
@@ -55,9 +58,11 @@ class WaterNetworkModel(AbstractModel):
     inp_file_name: string (optional)
         Directory and filename of EPANET inp file to load into the
         WaterNetworkModel object.
+    cache_dir: string (optional)
+        Directory of the parsed model cache, see :meth:`read_inpfile`.
     """
 
-    def __init__(self, inp_file_name=None):
+    def __init__(self, inp_file_name=None, cache_dir=None):
 
         # Network name
         self.name = None
@@ -80,6 +85,9 @@ class WaterNetworkModel(AbstractModel):
 
         # NetworkX Graph to store the pipe connectivity and node coordinates
 
+        # Compiled junction demands, see get_compiled_demands
+        self._compiled_demands = None
+
         self._Htol = 0.00015  # Head tolerance in meters.
         self._Qtol = 2.8e-5  # Flow tolerance in m^3/s.
 
@@ -87,7 +95,7 @@ class WaterNetworkModel(AbstractModel):
 
         self._inpfile = None
         if inp_file_name:
-            self.read_inpfile(inp_file_name)
+            self.read_inpfile(inp_file_name, cache_dir=cache_dir)
             
         # To be deleted and/or renamed and/or moved
         # Time parameters
@@ -360,6 +368,28 @@ class WaterNetworkModel(AbstractModel):
         self._node_reg.add_junction(name, base_demand, demand_pattern, 
                                     elevation, coordinates, demand_category)
 
+    def add_junctions(self, names, base_demands=None, demand_patterns=None,
+                      elevations=None, demand_category=None):
+        """
+        Adds junctions to the water network model in batch, see
+        :meth:`~wntr.network.model.NodeRegistry.add_junctions`
+
+        Parameters
+        -------------------
+        names : list of strings
+            Names of the junctions.
+        base_demands : list or array of floats
+            Base demand at each junction (default = 0.0).
+        demand_patterns : list
+            Name of the demand pattern (or the Pattern object, or None) of each junction (default = None).
+        elevations : list or array of floats
+            Elevation of each junction (default = 0.0).
+        demand_category  : string
+            Name of the demand category
+        """
+        self._node_reg.add_junctions(names, base_demands, demand_patterns,
+                                     elevations, demand_category)
+
     def add_tank(self, name, elevation=0.0, init_level=3.048,
                  min_level=0.0, max_level=6.096, diameter=15.24,
                  min_vol=None, vol_curve=None, coordinates=None):
@@ -450,6 +480,42 @@ class WaterNetworkModel(AbstractModel):
         if check_valve_flag:
             self._check_valves.append(name)
 
+    def add_pipes(self, names, start_node_names, end_node_names, lengths=None,
+                  diameters=None, roughnesses=None, minor_losses=None, statuses=None,
+                  check_valve_flags=None):
+        """
+        Adds pipes to the water network model in batch, see
+        :meth:`~wntr.network.model.LinkRegistry.add_pipes`
+
+        Parameters
+        ----------
+        names : list of strings
+            Names of the pipes.
+        start_node_names : list of strings
+             Name of the start node of each pipe.
+        end_node_names : list of strings
+             Name of the end node of each pipe.
+        lengths : list or array of floats, optional
+            Length of each pipe (default = 304.8).
+        diameters : list or array of floats, optional
+            Diameter of each pipe (default = 0.3048).
+        roughnesses : list or array of floats, optional
+            Roughness coefficient of each pipe (default = 100).
+        minor_losses : list or array of floats, optional
+            Minor loss coefficient of each pipe (default = 0.0).
+        statuses : list, optional
+            Status of each pipe, 'Open' or 'Closed' (default = 'OPEN').
+        check_valve_flags : list of bools, optional
+            True for the pipes that have a check valve (default = False).
+        
+        """
+        names = list(names)
+        self._link_reg.add_pipes(names, start_node_names, end_node_names, lengths,
+                                 diameters, roughnesses, minor_losses, statuses,
+                                 check_valve_flags)
+        if check_valve_flags is not None:
+            self._check_valves.extend(name for name, flag in zip(names, check_valve_flags) if flag)
+
 
     def add_pump(self, name, start_node_name, end_node_name, pump_type='POWER',
                  pump_parameter=50.0, speed=1.0, pattern=None):
@@ -586,6 +652,7 @@ class WaterNetworkModel(AbstractModel):
         if pattern and isinstance(pattern, six.string_types):
             pattern = self.get_pattern(pattern)
         source = Source(self, name, node_name, source_type, quality, pattern)
+        self._track_key(self._sources, source.name)
         self._sources[source.name] = source
         self._pattern_reg.add_usage(source.strength_timeseries.pattern_name, (source.name, 'Source'))
         self._node_reg.add_usage(source.node_name, (source.name, 'Source'))
@@ -603,6 +670,7 @@ class WaterNetworkModel(AbstractModel):
         """
         if name in self._controls:
             raise ValueError('The name provided for the control is already used. Please either remove the control with that name first or use a different name for this control.')
+        self._track_key(self._controls, name)
         self._controls[name] = control_object
     
     
@@ -664,10 +732,12 @@ class WaterNetworkModel(AbstractModel):
         source = self._sources[name]
         self._pattern_reg.remove_usage(source.strength_timeseries.pattern_name, (source.name, 'Source'))
         self._node_reg.remove_usage(source.node_name, (source.name, 'Source'))            
+        self._track_key(self._sources, name, deleting=True)
         del self._sources[name]
         
     def remove_control(self, name): 
         """Removes a control from the water network model"""
+        self._track_key(self._controls, name, deleting=True)
         del self._controls[name]
 
     def _discard_control(self, name):
@@ -680,6 +750,8 @@ class WaterNetworkModel(AbstractModel):
         name : string
            The name of the control object to be removed.
         """
+        if name in self._controls:
+            self._track_key(self._controls, name, deleting=True)
         try:
             del self._controls[name]
         except KeyError:
@@ -776,6 +848,22 @@ class WaterNetworkModel(AbstractModel):
         
         """
         return self._controls[name]
+
+    def get_compiled_demands(self):
+        """Get the compiled junction demands
+        
+        The compiled demands are created once and are rebuilt automatically 
+        when demands or patterns change, see 
+        :class:`~wntr.network.elements.CompiledDemands`.
+        
+        Returns
+        -------
+        CompiledDemands
+        
+        """
+        if getattr(self, '_compiled_demands', None) is None:
+            self._compiled_demands = CompiledDemands(self)
+        return self._compiled_demands
     
     ### # 
     ### Get controls from the model (move?)
@@ -1209,19 +1297,38 @@ class WaterNetworkModel(AbstractModel):
         """
         graph = WntrMultiDiGraph()
         
-        for name, node in self.nodes():
-            graph.add_node(name)
-            nx.set_node_attributes(graph, name='pos', values={name: node.coordinates})
-            nx.set_node_attributes(graph, name='type', values={name:node.node_type})
+        graph.add_nodes_from((name, {'pos': node.coordinates, 'type': node.node_type}) 
+                             for name, node in self.nodes())
+        graph.add_edges_from((link.start_node_name, link.end_node_name, name, {'type': link.link_type}) 
+                             for name, link in self.links())
         
+        return graph
+    
+    def get_sparse_graph(self):
+        """
+        Returns a lightweight sparse graph of the water network model
+
+        The graph holds the start and end node index of each link, with 
+        node and link index maps, and builds scipy.sparse adjacency and 
+        incidence matrices. This is faster and uses less memory than 
+        :class:`~wntr.network.model.WaterNetworkModel.get_graph` 
+        for large networks.
+
+        Returns
+        --------
+        SparseGraph
+        """
+        node_names = self.node_name_list
+        node_index = dict((name, i) for i, name in enumerate(node_names))
+        link_names = []
+        start = []
+        end = []
         for name, link in self.links():
-            start_node = link.start_node_name
-            end_node = link.end_node_name
-            graph.add_edge(start_node, end_node, key=name)
-            nx.set_edge_attributes(graph, name='type', 
-                        values={(start_node, end_node, name):link.link_type})
+            link_names.append(name)
+            start.append(node_index[link.start_node_name])
+            end.append(node_index[link.end_node_name])
         
-        return graph
+        return SparseGraph(node_names, link_names, start, end)
     
     def assign_demand(self, demand, pattern_prefix='ResetDemand'):
         """
@@ -1331,6 +1438,10 @@ class WaterNetworkModel(AbstractModel):
         for all nodes with the specified attribute.
 
         """
+        columns = self._node_reg._columns
+        if columns is not None and attribute in columns.attributes:
+            names = [name for name, node in self.nodes(node_type)]
+            return self._query_column(columns, attribute, names, operation, value, OrderedDict)
         node_attribute_dict = OrderedDict()
         for name, node in self.nodes(node_type):
             try:
@@ -1384,6 +1495,10 @@ class WaterNetworkModel(AbstractModel):
         for all links with the specified attribute.
 
         """
+        columns = self._link_reg._columns
+        if columns is not None and attribute in columns.attributes:
+            names = [name for name, link in self.links(link_type)]
+            return self._query_column(columns, attribute, names, operation, value, dict)
         link_attribute_dict = {}
         for name, link in self.links(link_type):
             try:
@@ -1397,6 +1512,198 @@ class WaterNetworkModel(AbstractModel):
                 pass
         return link_attribute_dict
 
+    def _query_column(self, columns, attribute, names, operation, value, dict_type):
+        values = columns.get_values(attribute, names)
+        if operation == None and value == None:
+            # missing values are None, as in the node and link objects
+            return dict_type((name, (None if v != v else v)) for name, v in zip(names, values))
+        with np.errstate(invalid='ignore'):
+            mask = operation(values, value)
+        return dict_type((names[i], values[i]) for i in np.flatnonzero(mask))
+
+    def copy(self):
+        """
+        Returns an independent copy of the water network model.
+
+        The copy is made element by element without pickling the model; 
+        objects that are shared by the elements (registries, options, 
+        patterns, curves, and controls) are shared in the same way by the 
+        elements of the copy. A checkpoint set on this model is not copied.
+
+        Returns
+        -------
+        WaterNetworkModel
+        """
+        return _copy_object(self, {})
+
+    @property
+    def columnar(self):
+        """bool: True if columnar storage is enabled, see enable_columnar_storage"""
+        return self._node_reg._columns is not None
+
+    @property
+    def node_columns(self):
+        """ElementColumns: The node columns (head, demand, and leak_demand), or None if columnar storage is not enabled"""
+        return self._node_reg._columns
+
+    @property
+    def link_columns(self):
+        """ElementColumns: The link columns (flow), or None if columnar storage is not enabled"""
+        return self._link_reg._columns
+
+    def enable_columnar_storage(self):
+        """
+        Stores the simulation state of the nodes (head, demand, and 
+        leak_demand) and links (flow) in columns (see 
+        :class:`~wntr.network.base.ElementColumns`) rather than in the 
+        node and link objects.
+
+        The node and link attributes read and write their row of the 
+        columns, while the simulator and query_node_attribute/
+        query_link_attribute read and write entire columns, which avoids 
+        copying the state of each element at each time step.
+        Other attributes are still stored in the node and link objects.
+        """
+        if self._node_reg._columns is not None:
+            return
+        node_columns = ElementColumns(['head', 'demand', 'leak_demand'], capacity=max(len(self._node_reg), 16))
+        link_columns = ElementColumns(['flow'], capacity=max(len(self._link_reg), 16))
+        self._node_reg._columns = node_columns
+        self._link_reg._columns = link_columns
+        for name, node in self._node_reg():
+            self._node_reg._add_column_row(name, node)
+        for name, link in self._link_reg():
+            self._link_reg._add_column_row(name, link)
+
+    def disable_columnar_storage(self):
+        """
+        Stores the simulation state of the nodes and links in the node and 
+        link objects again, see enable_columnar_storage.
+        """
+        if self._node_reg._columns is None:
+            return
+        for name, node in self._node_reg():
+            self._node_reg._remove_column_row(name, node)
+        for name, link in self._link_reg():
+            self._link_reg._remove_column_row(name, link)
+        self._node_reg._columns = None
+        self._link_reg._columns = None
+
+    def _set_tracker(self, tracker):
+        self._node_reg._tracker = tracker
+        self._link_reg._tracker = tracker
+        self._pattern_reg._tracker = tracker
+        self._curve_reg._tracker = tracker
+
+    def _track_key(self, mapping, key, deleting=False):
+        """Record the state of a control or source before it is changed (if a checkpoint is set)"""
+        tracker = self._node_reg._tracker
+        if tracker is not None:
+            tracker.save_key(mapping, key)
+            if deleting:
+                tracker.save_order(mapping)
+
+    @property
+    def has_checkpoint(self):
+        """bool: True if a checkpoint is set, see checkpoint"""
+        return self._node_reg._tracker is not None
+
+    def checkpoint(self):
+        """
+        Sets a checkpoint that the model can be reverted to with 
+        restore_checkpoint. Setting a checkpoint replaces the previous 
+        checkpoint.
+
+        After the checkpoint is set, nodes, links, demands, time series, 
+        sources, controls, and registry entries (e.g., nodes and links that 
+        are added or removed) are saved the first time they are changed. 
+        Restoring the checkpoint only reverts the changed objects, so the 
+        cost is proportional to the number of changes (e.g., a few leaks or 
+        pump outages) rather than to the size of the network. Removing a 
+        node, link, control, or source also saves the order of the 
+        corresponding registry.
+
+        The simulation state of the nodes and links (e.g., head, demand, 
+        and flow, which the simulators set at every time step) is not 
+        tracked; it is saved when the checkpoint is set and restored if it 
+        was changed. Options, patterns, curves, and the model attributes 
+        (e.g., sim_time) are saved when the checkpoint is set (without 
+        copying their values) and the ones whose attributes were set are 
+        restored. The node and link columns (if columnar storage is enabled)
+        are copied when the checkpoint is set; only the columns that were 
+        changed are restored. The internal state of control
+        objects and changes made to objects in place without using the 
+        model, element, or registry methods (e.g., appending to a list of 
+        vertices or changing the array of pattern multipliers) are not 
+        tracked.
+        """
+        options = self._options
+        options_state = (options.__getstate__(), 
+                         [(sub, sub.__dict__.copy()) for sub in options.__getstate__()])
+        pattern_states = [(pattern, pattern.__dict__.copy()) for name, pattern in self._pattern_reg()]
+        curve_states = [(curve, curve.__dict__.copy()) for name, curve in self._curve_reg()]
+        simulation_states = [(reg, _simulation_state(reg, attributes)) for reg, attributes in 
+                             ((self._node_reg, _NODE_STATE_ATTRIBUTES), (self._link_reg, _LINK_STATE_ATTRIBUTES))]
+        columns_state = [(reg, reg._columns, None if reg._columns is None else reg._columns._save()) 
+                         for reg in (self._node_reg, self._link_reg)]
+        tracker = ChangeTracker()
+        tracker.saved_state = (self.__dict__.copy(), list(self._check_valves), options_state, 
+                               pattern_states, curve_states, simulation_states, columns_state)
+        self._node_reg._state_changed = False
+        self._link_reg._state_changed = False
+        self._set_tracker(tracker)
+
+    def restore_checkpoint(self):
+        """
+        Reverts all changes made to the model since the checkpoint was set 
+        (see checkpoint). The checkpoint remains set, so the model can be 
+        changed and restored again.
+        """
+        tracker = self._node_reg._tracker
+        if tracker is None:
+            raise RuntimeError('A checkpoint has not been set')
+        self._set_tracker(None)
+        tracker.restore()
+
+        model_state, check_valves, options_state, pattern_states, curve_states, simulation_states, \
+            columns_state = tracker.saved_state
+        self.__dict__.update(model_state)
+        self._check_valves = list(check_valves)
+        # only the options, patterns, and curves whose attributes were set are restored
+        self._options.__setstate__(options_state[0])
+        for sub, state in options_state[1]:
+            _restore_attributes(sub, state)
+        for pattern, state in pattern_states:
+            _restore_attributes(pattern, state)
+        for curve, state in curve_states:
+            _restore_attributes(curve, state)
+        for reg, states in simulation_states:
+            if reg._state_changed:
+                for obj, state in states:
+                    obj.__dict__.update(state)
+                reg._state_changed = False
+        for reg, columns, saved in columns_state:
+            if reg._columns is not columns:
+                # columnar storage was enabled or disabled
+                reg._columns = columns
+                if columns is not None:
+                    columns._rows_changed = True
+            if columns is not None:
+                columns._restore(saved)
+        # objects restored above bypass the registries, so compiled demands (and cached INP
+        # sections) are rebuilt
+        self._node_reg._mark_changed()
+        self._link_reg._mark_changed()
+        self._pattern_reg._mark_changed()
+
+        new_tracker = ChangeTracker()
+        new_tracker.saved_state = tracker.saved_state
+        self._set_tracker(new_tracker)
+
+    def discard_checkpoint(self):
+        """Removes the checkpoint (changes are no longer tracked)"""
+        self._set_tracker(None)
+
     def reset_initial_values(self):
         """
         Resets all initial values in the network
@@ -1437,7 +1744,10 @@ class WaterNetworkModel(AbstractModel):
             link.setting = link.initial_setting
             link._prev_setting = None
 
-    def read_inpfile(self, filename):
+        if self._link_reg._columns is not None:
+            self._link_reg._columns.set_values('flow', None)
+
+    def read_inpfile(self, filename, cache_dir=None):
         """
         Defines water network model components from an EPANET INP file
 
@@ -1445,13 +1755,18 @@ class WaterNetworkModel(AbstractModel):
         ----------
         filename : string
             Name of the INP file.
+        cache_dir : string (optional)
+            Directory of the parsed model cache. If given, the model is loaded from the
+            cache when the INP file content and WNTR version match a cache entry, and
+            saved to the cache otherwise. The cache is only used if the model is empty, and
+            cache_dir must be a trusted directory (see :meth:`~wntr.epanet.io.InpFile.read`).
 
         """
         inpfile = wntr.epanet.InpFile()
-        inpfile.read(filename, wn=self)
+        inpfile.read(filename, wn=self, cache_dir=cache_dir)
         self._inpfile = inpfile
 
-    def write_inpfile(self, filename, units=None):
+    def write_inpfile(self, filename, units=None, cache_sections=False):
         """
         Writes the current water network model to an EPANET INP file
 
@@ -1461,6 +1776,10 @@ class WaterNetworkModel(AbstractModel):
             Name of the inp file.
         units : str, int or FlowUnits
             Name of the units being written to the inp file.
+        cache_sections : bool
+            If True, the text of the large sections is reused by the next write if the 
+            elements in the section have not changed, see 
+            :meth:`~wntr.epanet.io.InpFile.write`. Default = False.
 
         """
         if self._inpfile is None:
@@ -1468,7 +1787,7 @@ class WaterNetworkModel(AbstractModel):
             self._inpfile = wntr.epanet.InpFile()
         if units is None:
             units = self._options.hydraulic.en2_units
-        self._inpfile.write(filename, self, units=units)
+        self._inpfile.write(filename, self, units=units, cache_sections=cache_sections)
     
     ### #
     ### Move to morph
@@ -1778,6 +2097,132 @@ class WaterNetworkModel(AbstractModel):
         return (pipe, new_junction1, new_junction2, new_pipe)
 
 
+_ATOMIC_TYPES = (type(None), bool, int, float, complex, str, bytes, type, 
+                 np.integer, np.floating, np.bool_) + six.integer_types + six.string_types
+
+# How instances of each class are copied by _copy_object
+_ATOMIC, _LIST, _DICT, _TUPLE, _ARRAY, _OBJECT, _DEEPCOPY = range(7)
+_COPY_KINDS = {list: _LIST, dict: _DICT, OrderedDict: _DICT, tuple: _TUPLE, np.ndarray: _ARRAY}
+
+
+def _copy_kind(cls):
+    kind = _COPY_KINDS.get(cls, None)
+    if kind is None:
+        if issubclass(cls, _ATOMIC_TYPES) or issubclass(cls, enum.Enum):
+            kind = _ATOMIC
+        elif cls.__module__.startswith('wntr.') and cls.__dictoffset__ != 0 and \
+                not any(c.__dict__.get('__slots__', None) for c in cls.__mro__) and \
+                not hasattr(cls, '__deepcopy__'):
+            # instances of wntr classes are copied by copying their __dict__
+            kind = _OBJECT
+        else:
+            kind = _DEEPCOPY
+        _COPY_KINDS[cls] = kind
+    return kind
+
+
+def _float_list(values, n, default):
+    """List of n python floats from a list or array of values (or the default if values is None)"""
+    if values is None:
+        return [float(default)]*n
+    values = np.asarray(values, dtype=float).tolist()
+    if len(values) != n:
+        raise ValueError('Expected {} values, got {}'.format(n, len(values)))
+    return values
+
+
+def _list_of(values, n, default):
+    if values is None:
+        return [default]*n
+    values = list(values)
+    if len(values) != n:
+        raise ValueError('Expected {} values, got {}'.format(n, len(values)))
+    return values
+
+
+def _clone_element(obj, attributes):
+    """
+    Shallow copy of an element with some attributes replaced; used to create 
+    elements in batch. Neither __init__ nor __setattr__ of the new element 
+    is called.
+    """
+    y = object.__new__(obj.__class__)
+    state = y.__dict__
+    state.update(obj.__dict__)
+    state.update(attributes)
+    return y
+
+
+def _simulation_state(reg, attributes):
+    """The simulation state attributes of the elements in a registry, see WaterNetworkModel.checkpoint"""
+    attributes = [attribute for attribute in attributes if attribute.startswith('_')]
+    states = []
+    for obj in reg._data.values():
+        state = obj.__dict__
+        states.append((obj, dict((attribute, state[attribute]) for attribute in attributes if attribute in state)))
+    return states
+
+
+def _restore_attributes(obj, state):
+    """Restores the __dict__ of obj from a shallow copy if any attribute was set since it was copied"""
+    current = obj.__dict__
+    if len(current) != len(state) or any(current.get(key, current) is not value for key, value in state.items()):
+        current.clear()
+        current.update(state)
+
+
+def _copy_object(obj, memo):
+    """
+    Copy an object for WaterNetworkModel.copy. Lists, dicts (keys and 
+    values), numpy arrays, and instances of wntr classes are copied 
+    directly; other objects are copied with copy.deepcopy (sharing the 
+    memo). Registry checkpoints are not copied.
+    """
+    cls = obj.__class__
+    kind = _COPY_KINDS.get(cls, None)
+    if kind is None:
+        kind = _copy_kind(cls)
+    if kind == _ATOMIC:
+        return obj
+    y = memo.get(id(obj), None)
+    if y is not None:
+        return y
+    if kind == _OBJECT:
+        y = object.__new__(cls)
+        memo[id(obj)] = y
+        state = y.__dict__
+        for k, v in obj.__dict__.items():
+            if _COPY_KINDS.get(v.__class__, None) == _ATOMIC:
+                state[k] = v
+                continue
+            v_copy = memo.get(id(v), None)
+            if v_copy is None:
+                v_copy = _copy_object(v, memo)
+            state[k] = v_copy
+        # registry checkpoints
+        state.pop('_tracker', None)
+    elif kind == _LIST:
+        y = []
+        memo[id(obj)] = y
+        y.extend([_copy_object(v, memo) for v in obj])
+    elif kind == _DICT:
+        y = cls()
+        memo[id(obj)] = y
+        for k, v in obj.items():
+            # keys may be model objects (e.g., the observers of control actions)
+            y[_copy_object(k, memo)] = _copy_object(v, memo)
+    elif kind == _TUPLE:
+        y = tuple([_copy_object(v, memo) for v in obj])
+        memo[id(obj)] = y
+    elif kind == _ARRAY:
+        y = obj.copy()
+        memo[id(obj)] = y
+    else:
+        y = copy.deepcopy(obj, memo)
+        memo[id(obj)] = y
+    return y
+
+
 class PatternRegistry(Registry):
     """A registry for patterns."""
     def _finalize_(self, model):
@@ -1868,6 +2313,8 @@ class PatternRegistry(Registry):
 
 class CurveRegistry(Registry):
     """A registry for curves."""
+    _subsets = ('_pump_curves', '_efficiency_curves', '_headloss_curves', '_volume_curves')
+
     def __init__(self, model):
         super(CurveRegistry, self).__init__(model)
         self._pump_curves = OrderedSet()
@@ -1882,6 +2329,7 @@ class CurveRegistry(Registry):
     def __setitem__(self, key, value):
         if not isinstance(key, six.string_types):
             raise ValueError('Registry keys must be strings')
+        self._track_key(key)
         self._data[key] = value
         if value is not None:
             self.set_curve_type(key, value.curve_type)
@@ -1891,6 +2339,8 @@ class CurveRegistry(Registry):
         with a curve that is used for more than one type, which would be really weird"""
         if curve_type is None:
             return
+        if self._tracker is not None:
+            self._tracker.save_registry_subsets(self)
         curve_type = curve_type.upper()
         if curve_type == 'HEAD':
             self._pump_curves.add(key)
@@ -2044,6 +2494,7 @@ class SourceRegistry(Registry):
         self._sources = None
 
     def __delitem__(self, key):
+        self._track_key(key, deleting=True)
         try:
             if self._usage and key in self._usage and len(self._usage[key]) > 0:
                 raise RuntimeError('cannot remove %s %s, still used by %s'%( 
@@ -2063,6 +2514,8 @@ class SourceRegistry(Registry):
 
 class NodeRegistry(Registry):
     """A registry for nodes."""
+    _subsets = ('_junctions', '_reservoirs', '_tanks')
+
     def __init__(self, model):
         super(NodeRegistry, self).__init__(model)
         self._junctions = OrderedSet()
@@ -2071,12 +2524,22 @@ class NodeRegistry(Registry):
     
     def _finalize_(self, model):
         super(self.__class__, self)._finalize_(model)
-        self._node_reg = None
+        # nodes are created with the registry as the model, so they refer to the registry
+        self._node_reg = self
+
+    def _element_changed(self, obj, name):
+        super(NodeRegistry, self)._element_changed(obj, name)
+        if name == 'demand_timeseries_list' and self._pattern_reg is not None:
+            # compiled demands are rebuilt
+            self._pattern_reg._mark_changed()
     
     def __setitem__(self, key, value):
         if not isinstance(key, six.string_types):
             raise ValueError('Registry keys must be strings')
+        self._track_key(key)
+        self._mark_changed()
         self._data[key] = value
+        self._add_column_row(key, value)
         if isinstance(value, Junction):
             self._junctions.add(key)
         elif isinstance(value, Tank):
@@ -2085,6 +2548,8 @@ class NodeRegistry(Registry):
             self._reservoirs.add(key)
     
     def __delitem__(self, key):
+        self._track_key(key, deleting=True)
+        self._mark_changed()
         try:
             if self._usage and key in self._usage and len(self._usage[key]) > 0:
                 raise RuntimeError('cannot remove %s %s, still used by %s'%(
@@ -2094,6 +2559,7 @@ class NodeRegistry(Registry):
             elif key in self._usage:
                 self._usage.pop(key)
             node = self._data.pop(key)
+            self._remove_column_row(key, node)
             self._junctions.discard(key)
             self._reservoirs.discard(key)
             self._tanks.discard(key)
@@ -2172,6 +2638,75 @@ class NodeRegistry(Registry):
         if coordinates is not None:
             junction.coordinates = coordinates
 
+    def add_junctions(self, names, base_demands=None, demand_patterns=None,
+                      elevations=None, demand_category=None):
+        """
+        Adds junctions to the water network model in batch.
+
+        The result is the same as calling :meth:`add_junction` for each 
+        junction. The first junction is created with :meth:`add_junction` 
+        and the others are copies of it with their own name, elevation, and 
+        demand, which avoids the per-attribute overhead of creating each 
+        junction. If a checkpoint is set, :meth:`add_junction` is called for 
+        each junction.
+
+        Parameters
+        -------------------
+        names : list of strings
+            Names of the junctions.
+        base_demands : list or array of floats
+            Base demand at each junction (default = 0.0).
+        demand_patterns : list
+            Name of the demand pattern (or the Pattern object, or None) of each junction (default = None).
+        elevations : list or array of floats
+            Elevation of each junction (default = 0.0).
+        demand_category : string
+            Name of the demand category
+                
+        """
+        names = list(names)
+        n = len(names)
+        base_demands = _float_list(base_demands, n, 0.0)
+        elevations = _float_list(elevations, n, 0.0)
+        demand_patterns = _list_of(demand_patterns, n, None)
+        if n == 0:
+            return
+        if self._tracker is not None:
+            for name, base_demand, demand_pattern, elevation in zip(names, base_demands, demand_patterns, elevations):
+                self.add_junction(name, base_demand, demand_pattern, elevation, None, demand_category)
+            return
+
+        self.add_junction(names[0], base_demands[0], demand_patterns[0], elevations[0], None, demand_category)
+        template = self._data[names[0]]
+        template_demands = template.demand_timeseries_list
+        template_demand = template_demands[0]
+
+        pattern_reg = self._pattern_reg
+        data = self._data
+        junctions = self._junctions
+        columns = self._columns
+        for name, base_demand, demand_pattern, elevation in zip(names[1:], base_demands[1:], demand_patterns[1:],
+                                                                elevations[1:]):
+            if demand_pattern is None:
+                pattern = pattern_reg.default_pattern
+            else:
+                pattern = demand_pattern
+                pattern_reg.add_usage(demand_pattern, (name, 'Junction'))
+            demand = _clone_element(template_demand, {'_base': base_demand, '_pattern': pattern})
+            demands = _clone_element(template_demands, {'_list': [demand]})
+            junction = _clone_element(template, {'_name': name,
+                                                 '_coordinates': [0, 0],
+                                                 'elevation': elevation,
+                                                 'demand_timeseries_list': demands,
+                                                 '_leak_start_control_name': 'junction'+name+'start_leak_control',
+                                                 '_leak_end_control_name': 'junction'+name+'end_leak_control'})
+            data[name] = junction
+            junctions.add(name)
+            if columns is not None:
+                self._add_column_row(name, junction)
+        self._mark_changed()
+        pattern_reg._mark_changed()
+
     def add_tank(self, name, elevation=0.0, init_level=3.048,
                  min_level=0.0, max_level=6.096, diameter=15.24,
                  min_vol=None, vol_curve=None, coordinates=None):
@@ -2330,6 +2865,7 @@ class NodeRegistry(Registry):
 class LinkRegistry(Registry):
     """A registry for links."""
     __subsets = ['_pipes', '_pumps', '_head_pumps', '_power_pumps', '_prvs', '_psvs', '_pbvs', '_tcvs', '_fcvs', '_gpvs', '_valves']
+    _subsets = tuple(__subsets)
 
     def __init__(self, model):
         super(LinkRegistry, self).__init__(model)
@@ -2347,12 +2883,16 @@ class LinkRegistry(Registry):
     
     def _finalize_(self, model):
         super(self.__class__, self)._finalize_(model)
-        self._link_reg = None
+        # links are created with the registry as the model, so they refer to the registry
+        self._link_reg = self
 
     def __setitem__(self, key, value):
         if not isinstance(key, six.string_types):
             raise ValueError('Registry keys must be strings')
+        self._track_key(key)
+        self._mark_changed()
         self._data[key] = value
+        self._add_column_row(key, value)
         if isinstance(value, Pipe):
             self._pipes.add(key)
         elif isinstance(value, Pump):
@@ -2377,6 +2917,8 @@ class LinkRegistry(Registry):
                 self._gpvs.add(key)
     
     def __delitem__(self, key):
+        self._track_key(key, deleting=True)
+        self._mark_changed()
         try:
             if self._usage and key in self._usage and len(self._usage[key]) > 0:
                 raise RuntimeError('cannot remove %s %s, still used by %s', 
@@ -2386,6 +2928,7 @@ class LinkRegistry(Registry):
             elif key in self._usage:
                 self._usage.pop(key)
             link = self._data.pop(key)
+            self._remove_column_row(key, link)
             self._node_reg.remove_usage(link.start_node_name, (link.name, link.link_type))
             self._node_reg.remove_usage(link.end_node_name, (link.name, link.link_type))
             if isinstance(link, GPValve):
@@ -2479,6 +3022,98 @@ class LinkRegistry(Registry):
         pipe.cv = check_valve_flag
         self[name] = pipe
 
+    def add_pipes(self, names, start_node_names, end_node_names, lengths=None,
+                  diameters=None, roughnesses=None, minor_losses=None, statuses=None,
+                  check_valve_flags=None):
+        """
+        Adds pipes to the water network model in batch.
+
+        The result is the same as calling :meth:`add_pipe` for each pipe. 
+        The first pipe is created with :meth:`add_pipe` and the others are 
+        copies of it with their own name, nodes, and attributes, which 
+        avoids the per-attribute overhead of creating each pipe. If a 
+        checkpoint is set, :meth:`add_pipe` is called for each pipe.
+
+        Parameters
+        ----------
+        names : list of strings
+            Names of the pipes.
+        start_node_names : list of strings
+             Name of the start node of each pipe.
+        end_node_names : list of strings
+             Name of the end node of each pipe.
+        lengths : list or array of floats, optional
+            Length of each pipe (default = 304.8).
+        diameters : list or array of floats, optional
+            Diameter of each pipe (default = 0.3048).
+        roughnesses : list or array of floats, optional
+            Roughness coefficient of each pipe (default = 100).
+        minor_losses : list or array of floats, optional
+            Minor loss coefficient of each pipe (default = 0.0).
+        statuses : list, optional
+            Status of each pipe, 'Open' or 'Closed' (default = 'OPEN').
+        check_valve_flags : list of bools, optional
+            True for the pipes that have a check valve (default = False).
+        
+        """
+        names = list(names)
+        n = len(names)
+        start_node_names = _list_of(start_node_names, n, None)
+        end_node_names = _list_of(end_node_names, n, None)
+        lengths = _float_list(lengths, n, 304.8)
+        diameters = _float_list(diameters, n, 0.3048)
+        roughnesses = _float_list(roughnesses, n, 100)
+        minor_losses = _float_list(minor_losses, n, 0.0)
+        statuses = [LinkStatus[status] if isinstance(status, str) else status
+                    for status in _list_of(statuses, n, 'OPEN')]
+        check_valve_flags = _list_of(check_valve_flags, n, False)
+        if n == 0:
+            return
+        if self._tracker is not None:
+            for args in zip(names, start_node_names, end_node_names, lengths, diameters, roughnesses,
+                            minor_losses, statuses, check_valve_flags):
+                self.add_pipe(*args)
+            return
+
+        self.add_pipe(names[0], start_node_names[0], end_node_names[0], lengths[0], diameters[0],
+                      roughnesses[0], minor_losses[0], statuses[0], check_valve_flags[0])
+        template = self._data[names[0]]
+
+        node_reg = self._node_reg
+        node_usage = node_reg._usage
+        data = self._data
+        pipes = self._pipes
+        columns = self._columns
+        for name, start_node_name, end_node_name, length, diameter, roughness, minor_loss, status, cv in \
+                zip(names[1:], start_node_names[1:], end_node_names[1:], lengths[1:], diameters[1:],
+                    roughnesses[1:], minor_losses[1:], statuses[1:], check_valve_flags[1:]):
+            start_node = node_reg[start_node_name]
+            end_node = node_reg[end_node_name]
+            # same as node_reg.add_usage (there is no checkpoint)
+            for node_name in (start_node_name, end_node_name):
+                usage = node_usage.get(node_name, None)
+                if usage is None:
+                    usage = node_usage[node_name] = OrderedSet()
+                usage.add((name, 'Pipe'))
+            if not isinstance(status, LinkStatus):
+                status = LinkStatus[status]
+            pipe = _clone_element(template, {'_link_name': name,
+                                             '_start_node': start_node,
+                                             '_end_node': end_node,
+                                             '_vertices': [],
+                                             'length': length,
+                                             'diameter': diameter,
+                                             'roughness': roughness,
+                                             'minor_loss': minor_loss,
+                                             '_initial_status': status,
+                                             '_user_status': status,
+                                             'cv': cv})
+            data[name] = pipe
+            pipes.add(name)
+            if columns is not None:
+                self._add_column_row(name, pipe)
+        self._mark_changed()
+
     def add_pump(self, name, start_node_name, end_node_name, pump_type='POWER',
                  pump_parameter=50.0, speed=1.0, pattern=None):
         """
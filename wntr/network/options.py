@@ -408,6 +408,16 @@ class ResultsOptions(object):
         Output node information in report file
     links : bool, default False
         Output link information in report file
+    float_dtype : str, default 'float64'
+        Float type of the WNTRSimulator results ('float64' or 'float32')
+    compact_status : bool, default False
+        If True, the WNTRSimulator link status results are stored as int8 
+        codes (the LinkStatus values) instead of int64; 
+        wntr.sim.results.LINK_STATUS_CODES maps the codes to LinkStatus
+    lazy_derived : bool, default False
+        If True, the WNTRSimulator does not store the pressure and velocity 
+        results; these are computed from the head and flowrate results 
+        each time they are accessed (see wntr.sim.results.ResultsDict)
     
     """
     def __init__(self):
@@ -466,6 +476,9 @@ class ResultsOptions(object):
                            'reaction': {},
                            'f-factor': {},
                            }        
+        self.float_dtype = 'float64'
+        self.compact_status = False
+        self.lazy_derived = False
         
     def __eq__(self, other):
         if not type(self) == type(other):
@@ -4,6 +4,8 @@ simulations using the water network model.
 """
 from wntr.sim.core import WaterNetworkSimulator, WNTRSimulator
 from wntr.sim.results import SimulationResults
-from wntr.sim.solvers import NewtonSolver
+from wntr.sim.solvers import NewtonSolver, GGASolver
 from wntr.sim.hydraulics import HydraulicModel
-from wntr.sim.epanet import EpanetSimulator
\ No newline at end of file
+from wntr.sim.epanet import EpanetSimulator
+from wntr.sim.ensemble import ScenarioEnsemble, Scenario, Leak, PipeBreak, PumpOutage, DemandScaling
+from wntr.sim.sinks import ResultSink, ChunkedFileSink, ReductionSink, SubsetSink
@@ -4,15 +4,19 @@ from wntr.network.model import *
 from wntr.sim.solvers import *
 from wntr.sim.results import *
 from wntr.network.model import *
-from wntr.network.controls import ControlManager, _ControlType
+from wntr.network.controls import ControlManager, _ControlType, SimTimeCondition, TimeOfDayCondition, \
+    TankLevelCondition
 import numpy as np
+import pandas as pd
 import warnings
 import time
 import sys
 import logging
 import scipy.sparse
 import scipy.sparse.csr
+import scipy.sparse.csgraph
 import itertools
+import math
 
 logger = logging.getLogger(__name__)
 
@@ -97,6 +101,10 @@ class WNTRSimulator(WaterNetworkSimulator):
     WNTR simulator class.
     The WNTR simulator uses a custom newton solver and linear solvers from scipy.sparse.
 
+    The hydraulic model is built the first time run_sim is called. If run_sim is called again
+    (e.g., after a pipe is split or a leak is added), the existing hydraulic model is rebuilt in
+    place (see HydraulicModel.rebuild_structure).
+
     Parameters
     ----------
     wn : WaterNetworkModel object
@@ -112,6 +120,8 @@ class WNTRSimulator(WaterNetworkSimulator):
         super(WNTRSimulator, self).__init__(wn, mode)
         self._internal_graph = None
         self._node_pairs_with_multiple_links = None
+        self._internal_graph_changed = True
+        self._isolated_junctions_and_links = None
         self._presolve_controls = ControlManager()
         self._rules = ControlManager()
         self._postsolve_controls = ControlManager()
@@ -128,7 +138,12 @@ class WNTRSimulator(WaterNetworkSimulator):
         s = int(s)
         return str(h)+':'+str(m)+':'+str(s)
 
-    def run_sim(self, solver_options={}, convergence_error=True):
+    @property
+    def solver(self):
+        """The solver (NewtonSolver or GGASolver) used in the most recent call to run_sim (None before the first run)."""
+        return self._solver
+
+    def run_sim(self, solver_options={}, convergence_error=True, sink=None):
         """
         Run an extended period simulation (hydraulics only).
 
@@ -137,18 +152,50 @@ class WNTRSimulator(WaterNetworkSimulator):
         solver_options: dict
             Solver options are specified using the following dictionary keys:
 
+            * SOLVER: 'NEWTON' to solve the full system of hydraulic equations at each newton iteration or 'GGA'
+              to use the Global Gradient Algorithm, which eliminates flows, demands, and fixed heads and solves
+              a reduced symmetric positive definite system in the junction heads (default = 'NEWTON')
             * MAXITER: the maximum number of iterations for each hydraulic solve (each timestep and trial) (default = 100)
             * TOL: tolerance for the hydraulic equations (default = 1e-6)
             * BT_RHO: the fraction by which the step length is reduced at each iteration of the line search (default = 0.5)
             * BT_MAXITER: the maximum number of iterations for each line search (default = 20)
             * BACKTRACKING: whether or not to use a line search (default = True)
             * BT_START_ITER: the newton iteration at which a line search should start being used (default = 2)
+            * LINEAR_SOLVER: 'SPSOLVE' to call scipy.sparse.linalg.spsolve at every iteration or 'SPLU' to compute
+              the COLAMD column ordering and the CSC structure of the jacobian once per simulation and reuse them
+              for every factorization (default = 'SPSOLVE')
+            * REUSE_FACTORIZATION: whether or not to reuse the previous LU factorization (chord/Shamanskii
+              iterations) while the residual norm decreases by at least REUSE_RATIO per iteration; a step from
+              the previous factorization that does not decrease the residual norm is rejected and the jacobian
+              is refactorized, also before BT_START_ITER; requires LINEAR_SOLVER = 'SPLU' (default = False)
+            * REUSE_RATIO: see REUSE_FACTORIZATION (default = 0.5)
+            * PREDICTOR: whether or not to warm start the newton solver at each new time by applying the
+              known changes in demands, tank heads, and reservoir heads to the last solution and extrapolating
+              the solutions at the two previous times (see HydraulicModel.predict_solution) (default = False)
+            * ADAPTIVE_TIMESTEP: whether or not to jump directly to the next event while the levels of all tanks
+              are constant (the net inflow of every tank is zero). The next time is then the earliest of the next
+              report time, the next pattern step, and the next time at which a time control can be activated
+              (each rounded up to the hydraulic timestep); the events within the step (time controls, rules)
+              are found by backing up the simulation as in the fixed timestep. While any tank level changes,
+              the hydraulic timestep is used and tank level controls are located from the net inflows of the
+              tanks. The results at the report times are the same as with the fixed timestep (default = False)
+
+            The number of newton iterations and LU factorizations are available after the simulation
+            through the num_iterations, num_factorizations, and num_reused_factorizations attributes of
+            the solver (WNTRSimulator.solver). The number of newton iterations used to solve each time
+            (summed over all trials) is stored in results.solver_iterations. The number of controls evaluated
+            and skipped by the control managers at each time is stored in results.control_evaluations (see
+            ControlManager).
 
         convergence_error: bool (optional)
             If convergence_error is True, an error will be raised if the
             simulation does not converge. If convergence_error is False,
             a warning will be issued and results.error_code will be set to 2
             if the simulation does not converge.  Default = True.
+        sink: ResultSink (optional)
+            If a result sink is given (see wntr.sim.sinks), the node and link results at each report
+            time are passed to the sink instead of being kept until the end of the simulation, and
+            results.node and results.link are set by the sink. Default = None.
         """
         logger_level = logger.getEffectiveLevel()
 
@@ -181,9 +228,10 @@ class WNTRSimulator(WaterNetworkSimulator):
 
         self._time_per_step = []
 
-        self._presolve_controls = ControlManager()
-        self._postsolve_controls = ControlManager()
-        self._rules = ControlManager()
+        # the controls are indexed so that only the conditions that can have changed are evaluated at each check
+        self._presolve_controls = ControlManager(self._wn)
+        self._postsolve_controls = ControlManager(self._wn)
+        self._rules = ControlManager(self._wn)
 
         def categorize_control(control):
             if control.epanet_control_type in {_ControlType.presolve, _ControlType.pre_and_postsolve}:
@@ -198,6 +246,12 @@ class WNTRSimulator(WaterNetworkSimulator):
         for c in (self._wn._get_all_tank_controls() + self._wn._get_cv_controls() + self._wn._get_pump_controls() +
                   self._wn._get_valve_controls()):
             categorize_control(c)
+        control_managers = [self._presolve_controls, self._rules, self._postsolve_controls]
+        for mgr in control_managers:
+            for other_mgr in control_managers:
+                if other_mgr is not mgr:
+                    for c in other_mgr:
+                        mgr.observe_actions(c)
 
         if logger_level <= 1:
             logger.log(1, 'collected presolve controls:')
@@ -212,11 +266,26 @@ class WNTRSimulator(WaterNetworkSimulator):
 
             logger.log(1, 'initializing hydraulic model')
 
-        model = HydraulicModel(self._wn, self.mode)
-        self._model = model
-        model.initialize_results_dict()
-
-        self._solver = NewtonSolver(model.num_nodes, model.num_links, model.num_leaks, model, options=solver_options)
+        if self._model is not None and self._model._wn is self._wn and self._model.mode == self.mode:
+            # the model of the previous run is rebuilt with the changes made to the water network model
+            model = self._model
+            model.rebuild_structure()
+        else:
+            model = HydraulicModel(self._wn, self.mode)
+            self._model = model
+        model.initialize_results_dict(sink)
+        self._node_objects = [self._wn.get_node(model._node_id_to_name[i]) for i in range(model.num_nodes)]
+        self._link_objects = [self._wn.get_link(model._link_id_to_name[i]) for i in range(model.num_links)]
+        self._tank_objects = [tank for tank_name, tank in self._wn.tanks()]
+        self._X_marked = None
+
+        solver_type = solver_options.get('SOLVER', 'NEWTON').upper()
+        if solver_type == 'NEWTON':
+            self._solver = NewtonSolver(model.num_nodes, model.num_links, model.num_leaks, model, options=solver_options)
+        elif solver_type == 'GGA':
+            self._solver = GGASolver(model.num_nodes, model.num_links, model.num_leaks, model, options=solver_options)
+        else:
+            raise ValueError('SOLVER must be either "NEWTON" or "GGA".')
 
         results = SimulationResults()
         results.error_code = 0
@@ -237,6 +306,31 @@ class WNTRSimulator(WaterNetworkSimulator):
 
         X_init = np.concatenate((head0, demand0, flow0, leak_demand0))
 
+        adaptive_timestep = solver_options.get('ADAPTIVE_TIMESTEP', False)
+        if adaptive_timestep:
+            # (start, step) of the patterns that are not constant
+            self._pattern_steps = set()
+            for pattern_name, pattern in self._wn.patterns():
+                time_options = pattern._time_options
+                if len(pattern.multipliers) > 1 and time_options is not None:
+                    self._pattern_steps.add((time_options.pattern_start, time_options.pattern_timestep))
+
+        # Solutions at the two previously solved times; used by the predictor
+        use_predictor = solver_options.get('PREDICTOR', False)
+        X_last = None
+        U_last = None
+        X_prev = None
+        U_prev = None
+        # Number of newton iterations (summed over all trials) used to solve each time
+        solved_times = []
+        iterations_per_step = []
+        step_iterations = 0
+        # Number of controls evaluated and skipped by the control managers at each time
+        evaluated_per_step = []
+        skipped_per_step = []
+        num_evaluated = 0
+        num_skipped = 0
+
         self._initialize_internal_graph()
 
         if self._wn.sim_time == 0:
@@ -282,7 +376,7 @@ class WNTRSimulator(WaterNetworkSimulator):
                     The tank levels/heads must be done before checking the controls because the TankLevelControls
                     depend on the tank levels. These will be updated again after we determine the next actual timestep.
                     """
-                    self._model.update_tank_heads()
+                    self._update_tank_heads()
                 trial = 0
 
                 # check which presolve controls need to be activated before the next hydraulic timestep
@@ -310,7 +404,7 @@ class WNTRSimulator(WaterNetworkSimulator):
                         old_time = self._wn.sim_time
                         self._wn.sim_time = rule_iter * self._wn.options.time.rule_timestep
                         if not first_step:
-                            self._model.update_tank_heads()
+                            self._update_tank_heads()
                         rule_iter += 1
                         rules_to_run = self._rules.check()
                         rules_to_run.sort(key=lambda i: i[0]._priority)
@@ -360,7 +454,7 @@ class WNTRSimulator(WaterNetworkSimulator):
                             rule_iter += 1
                             self._wn.sim_time -= backtrack
                             if not first_step:
-                                self._model.update_tank_heads()
+                                self._update_tank_heads()
                             rules_to_run = self._rules.check()
                             rules_to_run.sort(key=lambda i: i[0]._priority)
                             for rule, rule_back in rules_to_run:
@@ -388,7 +482,7 @@ class WNTRSimulator(WaterNetworkSimulator):
                             self._wn.sim_time = rule_iter * self._wn.options.time.rule_timestep
                             rule_iter += 1
                             if not first_step:
-                                self._model.update_tank_heads()
+                                self._update_tank_heads()
                             rules_to_run = self._rules.check()
                             rules_to_run.sort(key=lambda i: i[0]._priority)
                             for rule, rule_back in rules_to_run:
@@ -425,14 +519,18 @@ class WNTRSimulator(WaterNetworkSimulator):
                     logger.debug('no isolated junctions or links found')
             model.set_isolated_junctions_and_links(isolated_junctions, isolated_links)
             if not first_step and not resolve:
-                model.update_tank_heads()
+                self._update_tank_heads()
             model.set_network_inputs_by_id()
             model.set_jacobian_constants()
 
+            if use_predictor and not resolve and X_last is not None:
+                X_init = model.predict_solution(X_last, U_last, X_prev, U_prev)
+
             # Solve
             if logger_level <= logging.DEBUG:
                 logger.debug('solving')
             [self._X, num_iters, solver_status, message] = self._solver.solve(model.get_hydraulic_equations, model.get_jacobian, X_init)
+            step_iterations += num_iters
             if solver_status == 0:
                 if convergence_error:
                     logger.error('Simulation did not converge. ' + message)
@@ -447,6 +545,7 @@ class WNTRSimulator(WaterNetworkSimulator):
             if logger_level <= logging.DEBUG:
                 logger.debug('storing results in network')
             model.store_results_in_network(self._X)
+            self._mark_solution_changes(self._X)
 
             if logger_level <= logging.DEBUG:
                 logger.debug('checking postsolve controls')
@@ -490,11 +589,23 @@ class WNTRSimulator(WaterNetworkSimulator):
                 if len(results.time) > 0 and int(self._wn.sim_time) == results.time[-1]:
                     raise RuntimeError('Simulation already solved this timestep')
                 results.time.append(int(self._wn.sim_time))
+            solved_times.append(self._wn.sim_time)
+            iterations_per_step.append(step_iterations)
+            step_iterations = 0
+            evaluated_per_step.append(sum(mgr.num_evaluated for mgr in control_managers) - num_evaluated)
+            skipped_per_step.append(sum(mgr.num_skipped for mgr in control_managers) - num_skipped)
+            num_evaluated += evaluated_per_step[-1]
+            num_skipped += skipped_per_step[-1]
+            X_prev, U_prev = X_last, U_last
+            X_last, U_last = self._X, model.get_network_inputs()
             model.update_network_previous_values()
             first_step = False
-            self._wn.sim_time += self._wn.options.time.hydraulic_timestep
-            overstep = float(self._wn.sim_time) % self._wn.options.time.hydraulic_timestep
-            self._wn.sim_time -= overstep
+            if adaptive_timestep:
+                self._wn.sim_time = self._get_next_event_time()
+            else:
+                self._wn.sim_time += self._wn.options.time.hydraulic_timestep
+                overstep = float(self._wn.sim_time) % self._wn.options.time.hydraulic_timestep
+                self._wn.sim_time -= overstep
 
             if self._wn.sim_time > self._wn.options.time.duration:
                 break
@@ -502,10 +613,86 @@ class WNTRSimulator(WaterNetworkSimulator):
             self._time_per_step.append(time.time()-start_step_time)
 
         model.get_results(results)
+        results.solver_iterations = pd.Series(iterations_per_step, index=solved_times, dtype=int)
+        results.control_evaluations = pd.DataFrame({'evaluated': evaluated_per_step, 'skipped': skipped_per_step},
+                                                   index=solved_times, columns=['evaluated', 'skipped'], dtype=int)
         self._wn.options.time.report_timestep = orig_report_timestep
         self._wn.options.time.hydraulic_timestep = orig_hydraulic_timestep
         return results
 
+    def _ceil_to_timestep(self, t):
+        hydraulic_timestep = self._wn.options.time.hydraulic_timestep
+        overstep = float(t) % hydraulic_timestep
+        if overstep == 0:
+            return t
+        return t + hydraulic_timestep - overstep
+
+    def _get_next_event_time(self):
+        """
+        Get the next time to solve with the adaptive timestep. This is called after the solution at the
+        current time has been stored; every time returned is also solved with the fixed timestep.
+        """
+        t = self._wn.sim_time
+        time_options = self._wn.options.time
+        next_time = t + time_options.hydraulic_timestep
+        next_time -= float(next_time) % time_options.hydraulic_timestep
+        if type(time_options.report_timestep) is str:
+            # every solved time is reported
+            return next_time
+        for tank in self._tank_objects:
+            if tank.demand != 0:
+                # the tank levels change at every hydraulic timestep; tank level controls are located within
+                # the timestep from the net inflows of the tanks (see TankLevelCondition)
+                return next_time
+
+        report_timestep = time_options.report_timestep
+        next_report = t + report_timestep
+        next_report -= float(next_report) % report_timestep
+        events = [next_report]
+        for pattern_start, pattern_timestep in self._pattern_steps:
+            events.append((math.floor((t + pattern_start) / pattern_timestep) + 1) * pattern_timestep - pattern_start)
+        for control in self._presolve_controls:
+            condition = getattr(control, '_condition', None)
+            if isinstance(condition, TankLevelCondition):
+                continue
+            if not isinstance(condition, (SimTimeCondition, TimeOfDayCondition)) or \
+                    getattr(control, '_else_actions', None):
+                return next_time
+            earliest = condition._earliest_true_time()
+            if earliest is None:
+                return next_time
+            if earliest > t:
+                events.append(earliest)
+        return max(self._ceil_to_timestep(min(events)), next_time)
+
+    def _update_tank_heads(self):
+        heads = [tank.head for tank in self._tank_objects]
+        self._model.update_tank_heads()
+        changed = [tank for tank, head in zip(self._tank_objects, heads) if tank.head != head]
+        if len(changed) > 0:
+            for mgr in [self._presolve_controls, self._rules, self._postsolve_controls]:
+                mgr.mark_changed(changed)
+
+    def _mark_solution_changes(self, x):
+        """
+        Mark the nodes and links whose head, demand, flow, or leak demand changed in the last solve so that
+        the control managers evaluate the conditions requiring them.
+        """
+        num_nodes = self._model.num_nodes
+        num_links = self._model.num_links
+        if self._X_marked is None or len(self._X_marked) != len(x):
+            changed = self._node_objects + self._link_objects
+        else:
+            diff = x != self._X_marked
+            node_ids = set(np.nonzero(diff[:num_nodes] | diff[num_nodes:2*num_nodes])[0])
+            for leak_idx in np.nonzero(diff[2*num_nodes+num_links:])[0]:
+                node_ids.add(self._model._leak_ids[leak_idx])
+            link_ids = np.nonzero(diff[2*num_nodes:2*num_nodes+num_links])[0]
+            changed = [self._node_objects[i] for i in node_ids] + [self._link_objects[i] for i in link_ids]
+        self._X_marked = np.array(x)
+        for mgr in [self._presolve_controls, self._rules, self._postsolve_controls]:
+            mgr.mark_changed(changed)
+
     def _initialize_internal_graph(self):
         n_links = {}
         rows = []
@@ -532,7 +719,8 @@ class WNTRSimulator(WaterNetworkSimulator):
                 vals.append(1)
                 vals.append(1)
 
-        self._internal_graph = scipy.sparse.csr_matrix((vals, (rows, cols)))
+        self._internal_graph = scipy.sparse.csr_matrix((vals, (rows, cols)),
+                                                       shape=(self._model.num_nodes, self._model.num_nodes))
 
         ndx_map = {}
         for link_name, link in self._wn.links():
@@ -547,9 +735,22 @@ class WNTRSimulator(WaterNetworkSimulator):
             ndx_map[link] = (ndx1, ndx2)
         self._map_link_to_internal_graph_data_ndx = ndx_map
 
-        self._number_of_connections = [0 for i in range(self._model.num_nodes)]
-        for node_id in self._model._node_ids:
-            self._number_of_connections[node_id] = self._internal_graph.indptr[node_id+1] - self._internal_graph.indptr[node_id]
+        # link-node incidence matrix; used to find the links connected to isolated junctions
+        link_ids = []
+        node_ids = []
+        for link_name, link in self._wn.links():
+            link_id = self._model._link_name_to_id[link_name]
+            link_ids.append(link_id)
+            node_ids.append(self._model._node_name_to_id[link.start_node_name])
+            link_ids.append(link_id)
+            node_ids.append(self._model._node_name_to_id[link.end_node_name])
+        self._link_node_incidence = scipy.sparse.csr_matrix((np.ones(len(link_ids)), (link_ids, node_ids)),
+                                                            shape=(self._model.num_links, self._model.num_nodes))
+        self._source_node_ids = np.array([self._model._node_name_to_id[name] for name in
+                                          itertools.chain(self._wn.tank_name_list, self._wn.reservoir_name_list)],
+                                         dtype=int)
+        self._internal_graph_changed = True
+        self._isolated_junctions_and_links = None
 
         self._node_pairs_with_multiple_links = {}
         for from_node_id, to_node_id in n_links.keys():
@@ -573,9 +774,11 @@ class WNTRSimulator(WaterNetworkSimulator):
     def _update_internal_graph(self):
         data = self._internal_graph.data
         ndx_map = self._map_link_to_internal_graph_data_ndx
+        status_changed = False
         for mgr in [self._presolve_controls, self._rules, self._postsolve_controls]:
             for obj, attr in mgr.get_changes():
                 if 'status' == attr:
+                    status_changed = True
                     if obj.status == wntr.network.LinkStatus.closed:
                         ndx1, ndx2 = ndx_map[obj]
                         data[ndx1] = 0
@@ -584,6 +787,9 @@ class WNTRSimulator(WaterNetworkSimulator):
                         ndx1, ndx2 = ndx_map[obj]
                         data[ndx1] = 1
                         data[ndx2] = 1
+        if not status_changed:
+            return
+        self._internal_graph_changed = True
 
         for key, link_list in self._node_pairs_with_multiple_links.items():
             from_node_id = key[0]
@@ -599,57 +805,29 @@ class WNTRSimulator(WaterNetworkSimulator):
                     data[ndx2] = 1
 
     def _get_isolated_junctions_and_links(self):
-
-        node_set = [1 for i in range(self._model.num_nodes)]
-
-        def grab_group(node_id):
-            node_set[node_id] = 0
-            nodes_to_explore = set()
-            nodes_to_explore.add(node_id)
-            indptr = self._internal_graph.indptr
-            indices = self._internal_graph.indices
-            data = self._internal_graph.data
-            num_connections = self._number_of_connections
-
-            while len(nodes_to_explore) != 0:
-                node_being_explored = nodes_to_explore.pop()
-                ndx = indptr[node_being_explored]
-                number_of_connections = num_connections[node_being_explored]
-                vals = data[ndx:ndx+number_of_connections]
-                cols = indices[ndx:ndx+number_of_connections]
-                for i, val in enumerate(vals):
-                    if val == 1:
-                        col = cols[i]
-                        if node_set[col] ==1:
-                            node_set[col] = 0
-                            nodes_to_explore.add(col)
-
-        for tank_name, tank in self._wn.nodes(wntr.network.Tank):
-            tank_id = self._model._node_name_to_id[tank_name]
-            if node_set[tank_id] == 1:
-                grab_group(tank_id)
-            else:
-                continue
-
-        for reservoir_name, reservoir in self._wn.nodes(wntr.network.Reservoir):
-            reservoir_id = self._model._node_name_to_id[reservoir_name]
-            if node_set[reservoir_id] == 1:
-                grab_group(reservoir_id)
-            else:
-                continue
-
-        isolated_junction_ids = [i for i in range(len(node_set)) if node_set[i] == 1]
-        isolated_junctions = set()
-        isolated_links = set()
-        for j_id in isolated_junction_ids:
-            j = self._model._node_id_to_name[j_id]
-            isolated_junctions.add(j)
-            connected_links = self._wn.get_links_for_node(j)
-            for l in connected_links:
-                isolated_links.add(l)
-        isolated_junctions = list(isolated_junctions)
-        isolated_links = list(isolated_links)
-
+        """
+        Get the junctions that are not connected to a tank or reservoir through open links and the links
+        connected to those junctions. The previous result is returned if no link status changed since the
+        last call.
+        """
+        if not self._internal_graph_changed and self._isolated_junctions_and_links is not None:
+            return self._isolated_junctions_and_links
+
+        # the internal graph keeps the entries of closed links as explicit zeros
+        graph = self._internal_graph.copy()
+        graph.eliminate_zeros()
+        n_components, labels = scipy.sparse.csgraph.connected_components(graph, directed=False)
+        isolated_nodes = ~np.in1d(labels, labels[self._source_node_ids])
+        isolated_junction_ids = np.flatnonzero(isolated_nodes)
+        isolated_link_ids = np.flatnonzero(self._link_node_incidence.dot(isolated_nodes.astype(float)))
+
+        node_id_to_name = self._model._node_id_to_name
+        link_id_to_name = self._model._link_id_to_name
+        isolated_junctions = [node_id_to_name[i] for i in isolated_junction_ids]
+        isolated_links = [link_id_to_name[i] for i in isolated_link_ids]
+
+        self._isolated_junctions_and_links = (isolated_junctions, isolated_links)
+        self._internal_graph_changed = False
         return isolated_junctions, isolated_links
 
 
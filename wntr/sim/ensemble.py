@@ -0,0 +1,371 @@
+"""
+The wntr.sim.ensemble module includes methods to run an ensemble of
+scenarios (e.g., Monte Carlo realizations of pipe breaks) in parallel.
+"""
+import pickle
+import logging
+from wntr.sim.core import WNTRSimulator
+from wntr.sim.results import SimulationResults
+
+try:
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+except ImportError:
+    ProcessPoolExecutor = None
+    as_completed = None
+
+logger = logging.getLogger(__name__)
+
+
+class Leak(object):
+    """
+    Leak at an existing junction or tank, see :meth:`~wntr.network.elements.Junction.add_leak`.
+
+    Parameters
+    ----------
+    node_name : string
+        Name of the junction or tank
+    area : float
+        Area of the leak in m^2
+    discharge_coeff : float (optional)
+        Leak discharge coefficient (default = 0.75)
+    start_time : int (optional)
+        Start time of the leak in seconds (default = None)
+    end_time : int (optional)
+        Time at which the leak is fixed in seconds (default = None)
+    """
+
+    def __init__(self, node_name, area, discharge_coeff=0.75, start_time=None, end_time=None):
+        self.node_name = node_name
+        self.area = area
+        self.discharge_coeff = discharge_coeff
+        self.start_time = start_time
+        self.end_time = end_time
+
+    def __repr__(self):
+        return "<Leak: '{}', area={}, start_time={}, end_time={}>".format(self.node_name, self.area,
+                                                                        self.start_time, self.end_time)
+
+    def apply(self, wn):
+        """Apply the leak to a water network model"""
+        node = wn.get_node(self.node_name)
+        node.add_leak(wn, area=self.area, discharge_coeff=self.discharge_coeff,
+                      start_time=self.start_time, end_time=self.end_time)
+
+
+class PipeBreak(object):
+    """
+    Pipe break, modeled by splitting the pipe (see
+    :meth:`~wntr.network.model.WaterNetworkModel.split_pipe`) and adding a
+    leak at the new junction.
+
+    Parameters
+    ----------
+    pipe_name : string
+        Name of the pipe
+    area : float
+        Area of the leak in m^2
+    discharge_coeff : float (optional)
+        Leak discharge coefficient (default = 0.75)
+    start_time : int (optional)
+        Start time of the break in seconds (default = None)
+    end_time : int (optional)
+        Time at which the break is fixed in seconds (default = None)
+    split_at_point : float (optional)
+        Relative position of the break along the pipe, between 0 and 1 (default = 0.5)
+    """
+
+    def __init__(self, pipe_name, area, discharge_coeff=0.75, start_time=None, end_time=None,
+                 split_at_point=0.5):
+        self.pipe_name = pipe_name
+        self.area = area
+        self.discharge_coeff = discharge_coeff
+        self.start_time = start_time
+        self.end_time = end_time
+        self.split_at_point = split_at_point
+
+    def __repr__(self):
+        return "<PipeBreak: '{}', area={}, start_time={}, end_time={}>".format(self.pipe_name, self.area,
+                                                                             self.start_time, self.end_time)
+
+    @property
+    def leak_node_name(self):
+        """Name of the junction added at the break"""
+        return self.pipe_name + '_leak_node'
+
+    def apply(self, wn):
+        """Apply the pipe break to a water network model"""
+        wn.split_pipe(self.pipe_name, self.pipe_name + '_B', self.leak_node_name,
+                      split_at_point=self.split_at_point)
+        node = wn.get_node(self.leak_node_name)
+        node.add_leak(wn, area=self.area, discharge_coeff=self.discharge_coeff,
+                      start_time=self.start_time, end_time=self.end_time)
+
+
+class PumpOutage(object):
+    """
+    Pump outage, see :meth:`~wntr.network.elements.Pump.add_outage`.
+
+    Parameters
+    ----------
+    pump_name : string
+        Name of the pump
+    start_time : int
+        The time at which the outage starts in seconds
+    end_time : int
+        The time at which the outage stops in seconds
+    """
+
+    def __init__(self, pump_name, start_time, end_time):
+        self.pump_name = pump_name
+        self.start_time = start_time
+        self.end_time = end_time
+
+    def __repr__(self):
+        return "<PumpOutage: '{}', start_time={}, end_time={}>".format(self.pump_name, self.start_time,
+                                                                     self.end_time)
+
+    def apply(self, wn):
+        """Apply the pump outage to a water network model"""
+        pump = wn.get_link(self.pump_name)
+        pump.add_outage(wn, self.start_time, self.end_time)
+
+
+class DemandScaling(object):
+    """
+    Scale the base demands of junctions.
+
+    Parameters
+    ----------
+    multiplier : float
+        Demand multiplier
+    junction_names : list of strings (optional)
+        Names of the junctions to scale. If None, all junctions are scaled (default = None)
+    """
+
+    def __init__(self, multiplier, junction_names=None):
+        self.multiplier = multiplier
+        self.junction_names = junction_names
+
+    def __repr__(self):
+        return "<DemandScaling: multiplier={}, junction_names={}>".format(self.multiplier, self.junction_names)
+
+    def apply(self, wn):
+        """Apply the demand scaling to a water network model"""
+        if self.junction_names is None:
+            junction_names = wn.junction_name_list
+        else:
+            junction_names = self.junction_names
+        for junction_name in junction_names:
+            junction = wn.get_node(junction_name)
+            for demand in junction.demand_timeseries_list:
+                demand.base_value = demand.base_value*float(self.multiplier)
+
+
+class Scenario(object):
+    """
+    A named list of mutations (e.g., :class:`Leak`, :class:`PipeBreak`,
+    :class:`PumpOutage`, and :class:`DemandScaling`) that are applied to a
+    copy of the base water network model. Any object with an ``apply(wn)``
+    method can be used as a mutation.
+
+    Parameters
+    ----------
+    name : string
+        Name of the scenario
+    mutations : list (optional)
+        List of mutations (default = None)
+    """
+
+    def __init__(self, name, mutations=None):
+        self.name = name
+        if mutations is None:
+            mutations = []
+        self.mutations = list(mutations)
+
+    def __repr__(self):
+        return "<Scenario: '{}', mutations={}>".format(self.name, self.mutations)
+
+    def add_mutation(self, mutation):
+        """Add a mutation to the scenario"""
+        self.mutations.append(mutation)
+
+    def apply(self, wn):
+        """Apply all mutations to a water network model"""
+        for mutation in self.mutations:
+            mutation.apply(wn)
+
+
+# Base model and run options of the worker process; set once per worker by _initialize_worker
+_worker_state = None
+
+
+def _initialize_worker(base_model, options):
+    global _worker_state
+    _worker_state = {'base_model': base_model, 'options': options, 'wn': None, 'sim': None}
+
+
+def _clear_worker():
+    global _worker_state
+    _worker_state = None
+
+
+def _run_scenario(scenario):
+    if _worker_state is None:
+        raise RuntimeError('The ensemble worker was not initialized')
+    options = _worker_state['options']
+    wn = _worker_state['wn']
+    if wn is None:
+        # The base model is unpickled once per worker; the changes made by
+        # each scenario (and its simulation) are reverted with the checkpoint
+        wn = pickle.loads(_worker_state['base_model'])
+        wn.checkpoint()
+        _worker_state['wn'] = wn
+        # The simulator (and its hydraulic model) is reused; the hydraulic model is rebuilt
+        # in place with the nodes, links, and leaks added by each scenario
+        _worker_state['sim'] = WNTRSimulator(wn, mode=options['mode'])
+    else:
+        wn.restore_checkpoint()
+    scenario.apply(wn)
+
+    sim = _worker_state['sim']
+    results = sim.run_sim(solver_options=options['solver_options'],
+                          convergence_error=options['convergence_error'])
+
+    metric = options['metric']
+    if metric is not None:
+        return metric(wn, results)
+    return _compact_results(results, options['node_results'], options['link_results'])
+
+
+def _compact_results(results, node_results, link_results):
+    compact = SimulationResults()
+    compact.timestamp = results.timestamp
+    compact.network_name = results.network_name
+    compact.solver_iterations = results.solver_iterations
+    compact.control_evaluations = results.control_evaluations
+    if node_results is None:
+        compact.node = results.node
+    else:
+        compact.node = dict((key, results.node[key]) for key in node_results)
+    if link_results is None:
+        compact.link = results.link
+    else:
+        compact.link = dict((key, results.link[key]) for key in link_results)
+    return compact
+
+
+class ScenarioEnsemble(object):
+    """
+    Run an ensemble of scenarios with the WNTRSimulator.
+
+    The base water network model is pickled once and transferred to each
+    worker process when the worker starts. For each scenario, the worker
+    restores the base model (see
+    :meth:`~wntr.network.model.WaterNetworkModel.restore_checkpoint`),
+    applies the scenario mutations, and runs the simulation. Only the requested results (or the output of a
+    metric function) are sent back to the parent process.
+
+    Parameters
+    ----------
+    wn : WaterNetworkModel
+        Base water network model; it is not modified
+    scenarios : list of Scenario
+        Scenarios to run; scenario names must be unique
+    mode : string (optional)
+        Simulation mode, 'DD' or 'PDD' (default = 'DD')
+    solver_options : dict (optional)
+        Solver options passed to :meth:`~wntr.sim.core.WNTRSimulator.run_sim`
+    convergence_error : bool (optional)
+        Passed to :meth:`~wntr.sim.core.WNTRSimulator.run_sim` (default = True)
+    node_results : list of strings (optional)
+        Node results to return for each scenario, e.g. ['pressure', 'demand'].
+        If None, all node results are returned (default = None)
+    link_results : list of strings (optional)
+        Link results to return for each scenario, e.g. ['flowrate'].
+        If None, all link results are returned (default = None)
+    metric : function (optional)
+        Function, metric(wn, results), used to reduce the results of each
+        scenario in the worker process. The function must be defined at the
+        module level so that it can be pickled. If a metric is given, its
+        output is returned instead of the simulation results (default = None)
+    """
+
+    def __init__(self, wn, scenarios, mode='DD', solver_options=None, convergence_error=True,
+                 node_results=None, link_results=None, metric=None):
+        names = [scenario.name for scenario in scenarios]
+        if len(set(names)) != len(names):
+            raise ValueError('Scenario names must be unique')
+        self._wn = wn
+        self.scenarios = list(scenarios)
+        if solver_options is None:
+            solver_options = {}
+        self._options = {'mode': mode,
+                         'solver_options': solver_options,
+                         'convergence_error': convergence_error,
+                         'node_results': node_results,
+                         'link_results': link_results,
+                         'metric': metric}
+
+    def run_iter(self, max_workers=None):
+        """
+        Run the scenarios and yield the results of each scenario as it completes.
+
+        Parameters
+        ----------
+        max_workers : int (optional)
+            Number of worker processes. If None, the number of processors on
+            the machine is used. If max_workers = 1, the scenarios are run in
+            the calling process (default = None)
+
+        Yields
+        ------
+        (name, results) : tuple
+            Scenario name and compact SimulationResults (or the output of the metric)
+        """
+        base_model = pickle.dumps(self._wn, protocol=pickle.HIGHEST_PROTOCOL)
+
+        if max_workers == 1 or ProcessPoolExecutor is None:
+            if ProcessPoolExecutor is None:
+                logger.warning('concurrent.futures is not available, scenarios are run serially')
+            _initialize_worker(base_model, self._options)
+            try:
+                for scenario in self.scenarios:
+                    yield scenario.name, _run_scenario(scenario)
+            finally:
+                _clear_worker()
+            return
+
+        try:
+            executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_initialize_worker,
+                                           initargs=(base_model, self._options))
+        except TypeError:
+            # Python < 3.7 does not support initializer; forked workers inherit the state of this process
+            _initialize_worker(base_model, self._options)
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            futures = dict((executor.submit(_run_scenario, scenario), scenario.name)
+                           for scenario in self.scenarios)
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            executor.shutdown(wait=True)
+            _clear_worker()
+
+    def run(self, max_workers=None):
+        """
+        Run the scenarios.
+
+        Parameters
+        ----------
+        max_workers : int (optional)
+            Number of worker processes, see :meth:`run_iter` (default = None)
+
+        Returns
+        -------
+        results : dict
+            Compact SimulationResults (or the output of the metric) for each scenario, keyed by scenario name
+        """
+        results = {}
+        for name, scenario_results in self.run_iter(max_workers):
+            results[name] = scenario_results
+        return results
@@ -1,5 +1,12 @@
 from wntr.sim.core import WaterNetworkSimulator
+from wntr.sim.results import SimulationResults
 import wntr.epanet.io
+from wntr.epanet.util import EN, FlowUnits, MassUnits, QualType, ResultType
+import numpy as np
+import pandas as pd
+import tempfile
+import os
+from collections import OrderedDict
 import logging
 
 logger = logging.getLogger(__name__)
@@ -52,7 +59,8 @@ class EpanetSimulator(WaterNetworkSimulator):
         if self.reader is None:
             self.reader = wntr.epanet.io.BinFile(result_types=result_types)
 
-    def run_sim(self, file_prefix='temp', save_hyd=False, use_hyd=False, hydfile=None):
+    def run_sim(self, file_prefix='temp', save_hyd=False, use_hyd=False, hydfile=None, in_memory=False,
+                sink=None, cache_sections=False):
         """
         Run the EPANET simulator.
 
@@ -69,10 +77,32 @@ class EpanetSimulator(WaterNetworkSimulator):
             Will save hydraulics to ``file_prefix + '.hyd'`` or to file specified in `hydfile_name`
         hydfile : str
             Optionally specify a filename for the hydraulics file other than the `file_prefix`
+        in_memory : bool
+            If True, the simulation is run without the report and binary output files, and the
+            other arguments are ignored. The INP file is written to a uniquely named temporary file
+            (in /dev/shm if available) that is removed after it is loaded, and the results are
+            collected at each report time through the toolkit step functions (ENrunH/ENnextH,
+            or ENrunQ/ENnextQ for water quality) and the node and link value getters. The
+            reaction rate and friction factor are not available, and the status of active
+            valves is reported as open. Since each value is retrieved with a toolkit call, only the
+            result types of the reader (see result_types) are collected. Default = False.
+        sink : ResultSink
+            If a result sink is given (see wntr.sim.sinks), the results of each report time are passed
+            to the sink (as they are read from the binary output file, or collected from the toolkit 
+            if in_memory is True) instead of being kept in memory, and results.node and results.link 
+            are set by the sink. The keys of the results are the ResultType member names (e.g., 
+            'pressure' and 'flowrate'). Default = None.
+        cache_sections : bool
+            If True, the text of the large sections of the INP file is reused by the next run if the 
+            elements in the section have not changed, see 
+            :meth:`~wntr.epanet.io.InpFile.write`. Default = False.
 
         """
+        if in_memory:
+            return self._run_sim_in_memory(sink, cache_sections)
+
         inpfile = file_prefix + '.inp'
-        self._wn.write_inpfile(inpfile, units=self._wn.options.hydraulic.en2_units)
+        self._wn.write_inpfile(inpfile, units=self._wn.options.hydraulic.en2_units, cache_sections=cache_sections)
         enData = wntr.epanet.toolkit.ENepanet()
         rptfile = file_prefix + '.rpt'
         outfile = file_prefix + '.bin'
@@ -95,5 +125,137 @@ class EpanetSimulator(WaterNetworkSimulator):
         enData.ENclose()
         logger.debug('Completed run')
         #os.sys.stderr.write('Finished Closing\n')
+        if sink is not None:
+            return self.reader.read_to_sink(outfile, sink)
         return self.reader.read(outfile)
 
+    def _run_sim_in_memory(self, sink=None, cache_sections=False):
+        if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+            tmpdir = '/dev/shm'
+        else:
+            tmpdir = None
+        fd, inpfile = tempfile.mkstemp(prefix='wntr_', suffix='.inp', dir=tmpdir)
+        os.close(fd)
+        enData = wntr.epanet.toolkit.ENepanet()
+        try:
+            self._wn.write_inpfile(inpfile, units=self._wn.options.hydraulic.en2_units, cache_sections=cache_sections)
+            enData.ENopen(inpfile, os.devnull, '')
+        finally:
+            os.remove(inpfile)
+        try:
+            results = self._get_toolkit_results(enData, sink)
+        finally:
+            enData.ENclose()
+        logger.debug('Completed run')
+        return results
+
+    def _get_toolkit_results(self, enData, sink=None):
+        """Run the simulation loaded in enData and collect the results at each report time"""
+        num_nodes = enData.ENgetcount(EN.NODECOUNT)
+        num_links = enData.ENgetcount(EN.LINKCOUNT)
+        node_names = [enData.ENgetnodeid(i) for i in range(1, num_nodes+1)]
+        link_names = [enData.ENgetlinkid(i) for i in range(1, num_links+1)]
+        link_types = np.array([enData.ENgetlinktype(i) for i in range(1, num_links+1)], dtype=int)
+        link_lengths = enData.ENgetlinkvalues(EN.LENGTH, np.zeros(num_links))
+        duration = enData.ENgettimeparam(EN.DURATION)
+        report_start = enData.ENgettimeparam(EN.REPORTSTART)
+        report_step = enData.ENgettimeparam(EN.REPORTSTEP)
+        report_times = np.arange(report_start, duration+report_step, report_step)
+        report_times = report_times[report_times <= duration]
+        quality_type = QualType(enData.ENgetqualtype()[0])
+
+        reader = self.reader
+        reader.flow_units = FlowUnits(enData.ENgetflowunits())
+        reader.quality_type = quality_type
+        if self._wn.options.quality.wq_units.split('/', 1)[0] == 'ug':
+            reader.mass_units = MassUnits.ug
+        else:
+            reader.mass_units = MassUnits.mg
+        reader._link_type_codes = link_types
+
+        # Each value is retrieved with a toolkit call, so only the result types of the reader are collected
+        result_types = self.reader.items
+        node_params = [(result_type, code) for result_type, code in
+                       [(ResultType.demand, EN.DEMAND), (ResultType.head, EN.HEAD),
+                        (ResultType.pressure, EN.PRESSURE), (ResultType.quality, EN.QUALITY)]
+                       if result_type in result_types]
+        link_params = [(result_type, code) for result_type, code in
+                       [(ResultType.flowrate, EN.FLOW), (ResultType.velocity, EN.VELOCITY),
+                        (ResultType.headloss, EN.HEADLOSS), (ResultType.linkquality, EN.LINKQUAL),
+                        (ResultType.status, EN.STATUS), (ResultType.setting, EN.SETTING)]
+                       if result_type in result_types]
+        num_periods = len(report_times)
+        # with a sink, only the values of the current report time are kept
+        num_rows = 1 if sink is not None else num_periods
+        node_values = OrderedDict((result_type, np.zeros((num_rows, num_nodes))) for result_type, code in node_params)
+        link_values = OrderedDict((result_type, np.zeros((num_rows, num_links))) for result_type, code in link_params)
+        if quality_type is QualType.none:
+            # the quality results are zero
+            node_params = [p for p in node_params if p[0] != ResultType.quality]
+            link_params = [p for p in link_params if p[0] != ResultType.linkquality]
+        # the headloss in the binary output file is per 1000 length units for pipes
+        pipes = link_types <= EN.PIPE
+        headloss_factors = 1000.0/link_lengths[pipes]
+
+        def convert(result_type, values):
+            if result_type == ResultType.headloss:
+                values[..., pipes] *= headloss_factors
+            if result_type == ResultType.status:
+                # the toolkit status is already 0 (closed) or 1 (open)
+                return values
+            return reader._to_si(result_type, values)
+
+        if sink is not None:
+            sink.setup(node_names, link_names)
+
+        def save_period(t):
+            if t < report_start or (t - report_start) % report_step != 0:
+                return
+            period = (t - report_start) // report_step
+            if period >= num_periods:
+                return
+            row = 0 if sink is not None else period
+            for result_type, code in node_params:
+                enData.ENgetnodevalues(code, node_values[result_type][row])
+            for result_type, code in link_params:
+                enData.ENgetlinkvalues(code, link_values[result_type][row])
+            if sink is not None:
+                sink.save(int(t),
+                          dict((result_type.name, convert(result_type, values[0]))
+                               for result_type, values in node_values.items()),
+                          dict((result_type.name, convert(result_type, values[0]))
+                               for result_type, values in link_values.items()))
+
+        if quality_type is QualType.none:
+            enData.ENopenH()
+            enData.ENinitH(0)
+            while True:
+                save_period(enData.ENrunH())
+                if enData.ENnextH() <= 0:
+                    break
+            enData.ENcloseH()
+        else:
+            # the water quality solver reads the hydraulics from EPANET's scratch hydraulics file
+            enData.ENsolveH()
+            enData.ENopenQ()
+            enData.ENinitQ(0)
+            while True:
+                save_period(enData.ENrunQ())
+                if enData.ENnextQ() <= 0:
+                    break
+            enData.ENcloseQ()
+
+        results = SimulationResults()
+        results.network_name = self._wn.name
+        if sink is not None:
+            sink.finalize(results)
+            return results
+        results.node = {}
+        results.link = {}
+        for result_type, values in node_values.items():
+            results.node[result_type.name] = pd.DataFrame(data=convert(result_type, values),
+                                                          index=report_times, columns=node_names)
+        for result_type, values in link_values.items():
+            results.link[result_type.name] = pd.DataFrame(data=convert(result_type, values),
+                                                          index=report_times, columns=link_names)
+        return results
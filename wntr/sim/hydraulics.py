@@ -3,9 +3,11 @@ import pandas as pd
 import numpy as np
 import scipy.sparse as sparse
 import math
+import itertools
 import warnings
 import logging
 from wntr.network.model import WaterNetworkModel
+from wntr.sim.results import ResultsDict, DerivedResult
 from wntr.network.base import NodeType, LinkType, LinkStatus
 from wntr.network.elements import Junction, Tank, Reservoir, Pipe, HeadPump, PowerPump, PRValve, PSValve, FCValve, \
     TCValve, GPValve, PBValve
@@ -73,6 +75,12 @@ class HydraulicModel(object):
 
         # network input objects
         # these objects use node/link ids rather than names
+        self._initialize_network_inputs()
+
+        # Initialize Jacobian
+        self._set_jacobian_structure()
+
+    def _initialize_network_inputs(self):
         self.tank_head = {}
         self.reservoir_head = {}
         self.junction_demand = np.zeros(self.num_junctions)
@@ -86,9 +94,6 @@ class HydraulicModel(object):
         self.isolated_link_names = []
         self.isolated_link_ids = []
 
-        # Initialize Jacobian
-        self._set_jacobian_structure()
-
     def _initialize_global_constants(self):
         # Hazen-Williams resistance coefficient in SI units (it equals 4.727 in EPANET GPM units).
         # See Table 3.1 in EPANET 2 User manual.
@@ -284,7 +289,24 @@ class HydraulicModel(object):
             self.in_link_ids_for_nodes[end_node_id].append(l)
             l += 1
 
-    def _set_node_attributes(self):
+    def _set_node_attributes(self, node_old_ids=None):
+        """
+        Set the node attributes. If node_old_ids (the previous id of each node, -1 for new nodes; see
+        rebuild_structure) is given, the pdd smoothing polynomials of the existing junctions are reused
+        unless the nominal or minimum pressure of the junction changed.
+        """
+        if node_old_ids is not None:
+            junction_old_ids = node_old_ids[:self.num_junctions]
+            kept = junction_old_ids >= 0
+            old_ids = junction_old_ids[kept]
+            old_nominal_pressures = self.nominal_pressures
+            old_minimum_pressures = self.minimum_pressures
+            old_pdd_arrays = [self.pdd_poly1_coeffs_a, self.pdd_poly1_coeffs_b, self.pdd_poly1_coeffs_c,
+                              self.pdd_poly1_coeffs_d, self.pdd_poly2_coeffs_a, self.pdd_poly2_coeffs_b,
+                              self.pdd_poly2_coeffs_c, self.pdd_poly2_coeffs_d]
+            old_pdd_poly1_coeffs = self.pdd_poly1_coeffs
+            old_pdd_poly2_coeffs = self.pdd_poly2_coeffs
+
         self.node_elevations = np.zeros(self.num_nodes)
         self.nominal_pressures = np.ones(self.num_junctions)
         self.minimum_pressures = np.zeros(self.num_junctions)
@@ -307,13 +329,27 @@ class HydraulicModel(object):
         # {node_id: (a,b,c,d)} where the ordering of the coefficients goes from the 3rd order term to the 0th order term
         self.leak_poly_coeffs = {}
 
+        if node_old_ids is not None:
+            new_ids = np.nonzero(kept)[0]
+            new_pdd_arrays = [self.pdd_poly1_coeffs_a, self.pdd_poly1_coeffs_b, self.pdd_poly1_coeffs_c,
+                              self.pdd_poly1_coeffs_d, self.pdd_poly2_coeffs_a, self.pdd_poly2_coeffs_b,
+                              self.pdd_poly2_coeffs_c, self.pdd_poly2_coeffs_d]
+            for new_array, old_array in zip(new_pdd_arrays, old_pdd_arrays):
+                new_array[new_ids] = old_array[old_ids]
+            for node_id, old_id in zip(new_ids, old_ids):
+                self.pdd_poly1_coeffs[node_id] = old_pdd_poly1_coeffs[old_id]
+                self.pdd_poly2_coeffs[node_id] = old_pdd_poly2_coeffs[old_id]
+
         for node_name, node in self._wn.junctions():
             node_id = self._node_name_to_id[node_name]
             self.node_elevations[node_id] = node.elevation
             self.nominal_pressures[node_id] = node.nominal_pressure
             self.minimum_pressures[node_id] = node.minimum_pressure
-            self.get_pdd_poly1_coeffs(node, node_id)
-            self.get_pdd_poly2_coeffs(node, node_id)
+            old_id = -1 if node_old_ids is None else junction_old_ids[node_id]
+            if (old_id < 0 or old_nominal_pressures[old_id] != node.nominal_pressure or
+                    old_minimum_pressures[old_id] != node.minimum_pressure):
+                self.get_pdd_poly1_coeffs(node, node_id)
+                self.get_pdd_poly2_coeffs(node, node_id)
             if node._leak:
                 self.leak_Cd[node_id] = node.leak_discharge_coeff
                 self.leak_area[node_id] = node.leak_area
@@ -351,12 +387,13 @@ class HydraulicModel(object):
             end_node_id = self._node_name_to_id[end_node_name]
             self.link_start_nodes[link_id] = start_node_id
             self.link_end_nodes[link_id] = end_node_id
-            if link_id in self._pipe_ids:
+            link_type = self.link_types[link_id]
+            if link_type == LinkType.Pipe:
                 self.pipe_resistance_coefficients[link_id] = (self._Hw_k*(link.roughness**(-1.852)) *
                                                               (link.diameter**(-4.871))*link.length)  # Hazen-Williams
                 self.pipe_minor_loss_coefficients[link_id] = 8.0*link.minor_loss/(self._g*math.pi**2*link.diameter**4)
                 self.pipe_diameters[link_id] = link.diameter
-            elif link_id in self._valve_ids:
+            elif link_type == LinkType.Valve:
                 """
                 There is a discrepancy between Epanet and the Epanet Manual on how open valves are treated. The manual
                 states: Open valves are assigned an r-value by assuming the open valve acts as a smooth pipe (f = 0.02)
@@ -368,22 +405,22 @@ class HydraulicModel(object):
                 """
                 self.pipe_minor_loss_coefficients[link_id] = 8.0*link.minor_loss/(self._g*math.pi**2*link.diameter**4)
                 self.pipe_diameters[link_id] = link.diameter
-                if link_id in self._tcv_ids:
+                if link.valve_type == 'TCV':
                     """
                     The minor loss on a TCV is used when the valve is open; The setting is used when it is active.
                     The setting on a TCV appears to work just as the minor loss on a pipe. TCVs do allow reverse flow.
                     Thus, they act just like a pipe, but with only a minor loss - no Hazen-Williams, DW, CM.
                     """
                     self.pipe_resistance_coefficients[link_id] = 8.0*link.setting/(self._g*math.pi**2*link.diameter**4)
-                elif link_id in self._prv_ids:
+                elif link.valve_type == 'PRV':
                     self.pipe_resistance_coefficients[link_id] = 0.0
-                elif link_id in self._fcv_ids:
+                elif link.valve_type == 'FCV':
                     self.pipe_resistance_coefficients[link_id] = 0.0
                 else:
                     raise ValueError('Currently only PRVs, FCVs, and TCVs are supported.')
             else:
                 self.pipe_resistance_coefficients[link_id] = 0
-            if link_id in self._pump_ids:
+            if link_type == LinkType.Pump:
                 if link.pump_type == 'HEAD':
                     A, B, C = link.get_head_curve_coefficients()
                     self.head_curve_coefficients[link_id] = (A, B, C)
@@ -398,6 +435,55 @@ class HydraulicModel(object):
                     self.pump_powers[link_id] = link.power
                     self.max_pump_flows[link_id] = None
 
+        self._set_link_class_arrays()
+
+    def _set_link_class_arrays(self):
+        """
+        Build the index and coefficient arrays used to evaluate the pump and valve
+        headloss equations with masked numpy operations rather than python loops.
+        """
+        self.link_start_node_array = np.array(self.link_start_nodes, dtype=int)
+        self.link_end_node_array = np.array(self.link_end_nodes, dtype=int)
+        self.head_pump_id_array = np.array(self.head_pump_ids, dtype=int)
+        self.power_pump_id_array = np.array(self.power_pump_ids, dtype=int)
+        self.prv_id_array = np.array(self._prv_ids, dtype=int)
+        self.fcv_id_array = np.array(self._fcv_ids, dtype=int)
+        self.tcv_id_array = np.array(self._tcv_ids, dtype=int)
+
+        n_hp = len(self.head_pump_ids)
+        self.head_pump_A = np.zeros(n_hp)
+        self.head_pump_B = np.zeros(n_hp)
+        self.head_pump_C = np.zeros(n_hp)
+        # True if the pump curve is extended with a line below q_bar (C > 1); False if it is smoothed with a
+        # polynomial between pump_q1 and pump_q2 (C <= 1)
+        self.head_pump_line_mask = np.zeros(n_hp, dtype=bool)
+        self.head_pump_q_bar = np.zeros(n_hp)
+        self.head_pump_h_bar = np.zeros(n_hp)
+        self.head_pump_poly_a = np.zeros(n_hp)
+        self.head_pump_poly_b = np.zeros(n_hp)
+        self.head_pump_poly_c = np.zeros(n_hp)
+        self.head_pump_poly_d = np.zeros(n_hp)
+        for ndx, link_id in enumerate(self.head_pump_ids):
+            A, B, C = self.head_curve_coefficients[link_id]
+            self.head_pump_A[ndx] = A
+            self.head_pump_B[ndx] = B
+            self.head_pump_C[ndx] = C
+            if C > 1:
+                self.head_pump_line_mask[ndx] = True
+                self.head_pump_q_bar[ndx], self.head_pump_h_bar[ndx] = self.pump_line_params[link_id]
+            else:
+                a, b, c, d = self.pump_poly_coefficients[link_id]
+                self.head_pump_poly_a[ndx] = a
+                self.head_pump_poly_b[ndx] = b
+                self.head_pump_poly_c[ndx] = c
+                self.head_pump_poly_d[ndx] = d
+
+        self.power_pump_powers = np.array([self.pump_powers[link_id] for link_id in self.power_pump_ids], dtype=float)
+
+        # These are updated in set_network_inputs_by_id
+        self.link_status_array = np.ones(self.num_links, dtype=int)
+        self.valve_setting_array = np.zeros(self.num_links)
+
     def _form_node_balance_matrix(self):
         # The node balance matrix should never be modified! It is also used in the jacobian!
         values = []
@@ -415,11 +501,162 @@ class HydraulicModel(object):
         self.node_balance_matrix = sparse.coo_matrix((values, (rows, cols)), shape=(self.num_nodes, self.num_links))
 
     def _form_link_headloss_matrix(self):
-        headloss_matrix = np.matrix(np.zeros((self.num_links, self.num_nodes)))
-        for link_id in self._link_ids:
-            headloss_matrix[link_id, self.link_start_nodes[link_id]] = 1.0
-            headloss_matrix[link_id, self.link_end_nodes[link_id]] = -1.0
-        self.link_headloss_matrix = sparse.coo_matrix(headloss_matrix)
+        link_ids = np.arange(self.num_links)
+        values = np.concatenate((np.ones(self.num_links), -np.ones(self.num_links)))
+        rows = np.concatenate((link_ids, link_ids))
+        cols = np.concatenate((self.link_start_node_array, self.link_end_node_array))
+        # entries are sorted by link and then by node
+        order = np.lexsort((cols, rows))
+        self.link_headloss_matrix = sparse.coo_matrix((values[order], (rows[order], cols[order])),
+                                                      shape=(self.num_links, self.num_nodes))
+
+    def rebuild_structure(self):
+        """
+        Rebuild the model in place after the water network model was modified.
+
+        This is a full rebuild, not an incremental update: the name/id maps, the incidence
+        matrices, the attributes of all nodes and links, the network inputs, and the jacobian
+        structure are formed again from the water network model, so its cost grows with the size
+        of the network, not with the number of changes. Nodes and links keep the order of the
+        water network model, so the rebuilt model is identical to a new HydraulicModel. Only the
+        pdd smoothing polynomials of the existing junctions are reused (they are computed for new
+        junctions and for junctions whose nominal or minimum pressure changed).
+
+        Returns
+        -------
+        changed: bool
+            True if nodes, links, or leaks were added or removed
+        """
+        node_old_ids, changed = self._update_name_id_maps()
+        self._column_rows = None
+
+        if changed:
+            self.num_leaks = len(self._leak_ids)
+            self.node_balance_residual = np.ones(self.num_nodes)
+            self.demand_or_head_residual = np.ones(self.num_nodes)
+            self.headloss_residual = np.ones(self.num_links)
+            self.leak_demand_residual = np.ones(self.num_leaks)
+
+        self._set_node_attributes(node_old_ids)
+        self._set_link_attributes()
+        if changed:
+            self._form_node_balance_matrix()
+            self._form_link_headloss_matrix()
+
+        self._initialize_network_inputs()
+        self._set_jacobian_structure()
+        return changed
+
+    def _update_name_id_maps(self):
+        """
+        Update the name/id maps from the water network model.
+
+        Returns
+        -------
+        node_old_ids: numpy array
+            The previous id of each node (-1 for new nodes and for nodes whose type changed)
+        changed: bool
+            True if nodes, links, or leaks were added or removed
+        """
+        wn = self._wn
+        old_num_nodes = self.num_nodes
+        old_num_links = self.num_links
+        old_node_name_to_id = self._node_name_to_id
+        old_node_types = np.array(self.node_types, dtype=int)
+        old_link_name_to_id = self._link_name_to_id
+        old_link_start_nodes = self.link_start_node_array
+        old_link_end_nodes = self.link_end_node_array
+        old_leak_ids = self._leak_ids
+
+        self.num_nodes = wn.num_nodes
+        self.num_links = wn.num_links
+        self.num_junctions = wn.num_junctions
+        self.num_tanks = wn.num_tanks
+        self.num_reservoirs = wn.num_reservoirs
+        self.num_pipes = wn.num_pipes
+        self.num_pumps = wn.num_pumps
+        self.num_valves = wn.num_valves
+        n_jt = self.num_junctions + self.num_tanks
+
+        # Nodes
+        node_names = wn.junction_name_list + wn.tank_name_list + wn.reservoir_name_list
+        self.node_types = ([NodeType.Junction]*self.num_junctions + [NodeType.Tank]*self.num_tanks +
+                           [NodeType.Reservoir]*self.num_reservoirs)
+        node_old_ids = np.array([old_node_name_to_id.get(name, -1) for name in node_names], dtype=int)
+        node_old_ids[old_node_types[node_old_ids] != np.array(self.node_types, dtype=int)] = -1
+
+        self._node_id_to_name = dict(enumerate(node_names))
+        self._node_name_to_id = dict(zip(node_names, range(self.num_nodes)))
+        self._node_ids = list(range(self.num_nodes))
+        self._junction_ids = list(range(self.num_junctions))
+        self._tank_ids = list(range(self.num_junctions, n_jt))
+        self._reservoir_ids = list(range(n_jt, self.num_nodes))
+
+        # Leaks
+        self._leak_ids = []
+        self._leak_idx = {}
+        self.leak_status = dict.fromkeys(self._node_ids, False)
+        self.could_have_leak = dict.fromkeys(self._node_ids, False)
+        for node_id, node_name in enumerate(node_names[:n_jt]):
+            if wn.get_node(node_name)._leak:
+                self._leak_idx[node_id] = len(self._leak_ids)
+                self._leak_ids.append(node_id)
+                self.could_have_leak[node_id] = True
+
+        # Links
+        self._link_id_to_name = {}
+        self._link_name_to_id = {}
+        self.power_pump_ids = []
+        self.head_pump_ids = []
+        self._prv_ids = []
+        self._psv_ids = []
+        self._pbv_ids = []
+        self._fcv_ids = []
+        self._tcv_ids = []
+        self.out_link_ids_for_nodes = [[] for i in range(self.num_nodes)]
+        self.in_link_ids_for_nodes = [[] for i in range(self.num_nodes)]
+        link_start_nodes = np.zeros(self.num_links, dtype=int)
+        link_end_nodes = np.zeros(self.num_links, dtype=int)
+        link_old_ids = -np.ones(self.num_links, dtype=int)
+        subtype_ids = {'HEAD': self.head_pump_ids, 'POWER': self.power_pump_ids, 'PRV': self._prv_ids,
+                       'PSV': self._psv_ids, 'PBV': self._pbv_ids, 'FCV': self._fcv_ids, 'TCV': self._tcv_ids}
+        for l, (link_name, link) in enumerate(itertools.chain(wn.pipes(), wn.pumps(), wn.valves())):
+            self._link_id_to_name[l] = link_name
+            self._link_name_to_id[link_name] = l
+            link_old_ids[l] = old_link_name_to_id.get(link_name, -1)
+            if l >= self.num_pipes + self.num_pumps:
+                if link.valve_type not in subtype_ids:
+                    raise RuntimeError('Valve type not recognized: '+link.valve_type)
+                subtype_ids[link.valve_type].append(l)
+            elif l >= self.num_pipes:
+                if link.pump_type not in subtype_ids:
+                    raise RuntimeError('Pump type not recognized.')
+                subtype_ids[link.pump_type].append(l)
+            start_node_id = self._node_name_to_id[link.start_node_name]
+            end_node_id = self._node_name_to_id[link.end_node_name]
+            link_start_nodes[l] = start_node_id
+            link_end_nodes[l] = end_node_id
+            self.out_link_ids_for_nodes[start_node_id].append(l)
+            self.in_link_ids_for_nodes[end_node_id].append(l)
+        n_pp = self.num_pipes + self.num_pumps
+        self._link_ids = list(range(self.num_links))
+        self._pipe_ids = list(range(self.num_pipes))
+        self._pump_ids = list(range(self.num_pipes, n_pp))
+        self._valve_ids = list(range(n_pp, self.num_links))
+        self.link_types = ([LinkType.Pipe]*self.num_pipes + [LinkType.Pump]*self.num_pumps +
+                           [LinkType.Valve]*self.num_valves)
+
+        # A link whose start or end node changed (or is a new node) counts as removed and added
+        kept = link_old_ids >= 0
+        moved = ((node_old_ids[link_start_nodes[kept]] != old_link_start_nodes[link_old_ids[kept]]) |
+                 (node_old_ids[link_end_nodes[kept]] != old_link_end_nodes[link_old_ids[kept]]))
+        link_old_ids[np.nonzero(kept)[0][moved]] = -1
+
+        changed = not (self.num_nodes == old_num_nodes and self.num_links == old_num_links and
+                       np.array_equal(node_old_ids, np.arange(self.num_nodes)) and
+                       np.array_equal(link_old_ids, np.arange(self.num_links)) and
+                       self._leak_ids == old_leak_ids)
+        return node_old_ids, changed
 
     def _set_jacobian_structure(self):
         """
@@ -532,33 +769,12 @@ class HydraulicModel(object):
 
         # jac_F will be a coo_matrix for easy updating.
         # Note that it might need to be converted to csr before doing arithmetic
-        values = []
-        rows = []
-        cols = []
-        for link_id in self._pipe_ids:
-            values.append(-1.0)
-            rows.append(link_id)
-            cols.append(self.link_start_nodes[link_id])
-        for link_id in self._pump_ids:
-            values.append(1.0)
-            rows.append(link_id)
-            cols.append(self.link_start_nodes[link_id])
-        for link_id in self._valve_ids:
-            values.append(-1.0)
-            rows.append(link_id)
-            cols.append(self.link_start_nodes[link_id])
-        for link_id in self._pipe_ids:
-            values.append(1.0)
-            rows.append(link_id)
-            cols.append(self.link_end_nodes[link_id])
-        for link_id in self._pump_ids:
-            values.append(-1.0)
-            rows.append(link_id)
-            cols.append(self.link_end_nodes[link_id])
-        for link_id in self._valve_ids:
-            values.append(1.0)
-            rows.append(link_id)
-            cols.append(self.link_end_nodes[link_id])
+        # the first num_links entries are the start nodes and the last num_links entries are the end nodes
+        start_values = -np.ones(self.num_links)
+        start_values[self._pump_ids] = 1.0
+        values = np.concatenate((start_values, -start_values))
+        rows = np.concatenate((np.arange(self.num_links), np.arange(self.num_links)))
+        cols = np.concatenate((self.link_start_node_array, self.link_end_node_array))
         self.jac_F = sparse.coo_matrix((values, (rows, cols)), shape=(self.num_links, self.num_nodes))
         self.standard_jac_F_data = np.array(values)
         big_jac_values = np.concatenate((big_jac_values, self.jac_F.data))
@@ -658,14 +874,12 @@ class HydraulicModel(object):
                                             self.standard_jac_F_data[:self.num_links])
         self.jac_F.data[self.num_links:] = ((1.0-self.isolated_link_array)*self.closed_link_array *
                                             self.standard_jac_F_data[self.num_links:])
-        for link_id in self._prv_ids:
-            if self.link_status[link_id] == LinkStatus.active:
-                self.jac_F.data[link_id] = 0
+        active_prv_ids = self.prv_id_array[self.link_status_array[self.prv_id_array] == int(LinkStatus.Active)]
+        self.jac_F.data[active_prv_ids] = 0
 
-        for link_id in self._fcv_ids:
-            if self.link_status[link_id] == LinkStatus.Active:
-                self.jac_F.data[link_id] = 0
-                self.jac_F.data[self.num_links+link_id] = 0
+        active_fcv_ids = self.fcv_id_array[self.link_status_array[self.fcv_id_array] == int(LinkStatus.Active)]
+        self.jac_F.data[active_fcv_ids] = 0
+        self.jac_F.data[self.num_links+active_fcv_ids] = 0
 
         # self.jac_G.data = (self.isolated_link_array + (1.0 - self.closed_link_array) -
         #                        self.isolated_link_array * (1.0 - self.closed_link_array))
@@ -683,6 +897,31 @@ class HydraulicModel(object):
         jacobian: scipy.sparse.coo_matrix
             Returns the jacobian headloss equations.
         """
+        self.update_jacobian_blocks(x)
+
+        self.jacobian_values = np.concatenate((self.jac_A.data,self.jac_B.data,self.jac_C.data,self.jac_D.data,
+                                             self.jac_E.data,self.jac_F.data,self.jac_G.data,self.jac_H.data,
+                                             self.jac_I.data))
+
+        self.jacobian = sparse.coo_matrix((self.jacobian_values, (self.jacobian_rows, self.jacobian_cols)),
+                                          shape=self.jacobian_shape)
+
+
+        # return (self.jac_A, self.jac_B, self.jac_C, self.jac_D, self.jac_E, self.jac_F, self.jac_G_inv, self.jac_H,
+        #         self.jac_I, self.jac_AinvB, self.jac_AinvC)
+        # self.check_jac(x)
+        return self.jacobian
+
+    def update_jacobian_blocks(self, x):
+        """
+        Update the blocks of the jacobian that depend on x (jac_D, jac_F, jac_G, and jac_H) without
+        assembling the jacobian.
+
+        Parameters
+        ----------
+        x : numpy array
+            values of heads, demands, flows, and leak flowrates
+        """
 
         heads = x[:self.num_nodes]
         flows = x[self.num_nodes*2:2*self.num_nodes+self.num_links]
@@ -714,12 +953,12 @@ class HydraulicModel(object):
             last_segment[np.bitwise_not((P > (minP+delta))*(P <= (nomP-delta)))] = 0.0
             self.jac_D.data[:n_j] = self.jac_D.data[:n_j] + last_segment*(1-self.isolated_junction_array)
 
-        for link_id in self.power_pump_ids:
-            if self.isolated_link_array[link_id] == 1 or self.closed_link_array[link_id] == 0:
-                pass
-            else:
-                self.jac_F.data[link_id] = 1000.0*self._g*flows[link_id]
-                self.jac_F.data[self.num_links+link_id] = -1000.0*self._g*flows[link_id]
+        inactive = (self.isolated_link_array == 1) | (self.closed_link_array == 0)
+        status = self.link_status_array
+
+        ids = self.power_pump_id_array[np.logical_not(inactive[self.power_pump_id_array])]
+        self.jac_F.data[ids] = 1000.0*self._g*flows[ids]
+        self.jac_F.data[self.num_links+ids] = -1000.0*self._g*flows[ids]
 
         pf = abs(flows[:self.num_pipes])
         coeff = self.pipe_resistance_coefficients[:self.num_pipes]
@@ -740,58 +979,51 @@ class HydraulicModel(object):
                                             )
                                             )
 
-        for link_id in self.head_pump_ids:
-            if self.isolated_link_array[link_id] == 1 or self.closed_link_array[link_id] == 0:
-                self.jac_G.data[link_id] = 1.0
-            else:
-                A,B,C = self.head_curve_coefficients[link_id]
-                if C > 1:
-                    q_bar, h_bar = self.pump_line_params[link_id]
-                    if flows[link_id] >= q_bar:
-                        self.jac_G.data[link_id] = (-B * C * flows[link_id] ** (C - 1.0))
-                    else:
-                        self.jac_G.data[link_id] = self.pump_m
-                else:
-                    if flows[link_id] <= self.pump_q1:
-                        self.jac_G.data[link_id] = self.pump_m
-                    elif flows[link_id] <= self.pump_q2:
-                        a,b,c,d = self.pump_poly_coefficients[link_id]
-                        self.jac_G.data[link_id] = (3.0 * a * flows[link_id] ** 2 + 2.0 * b * flows[link_id] + c)
-                    else:
-                        self.jac_G.data[link_id] = (-B * C * flows[link_id] ** (C - 1.0))
-                # self.jac_G_inv.data[link_id] = 1.0 / self.jac_G_inv.data[link_id]
-        for link_id in self.power_pump_ids:
-            if self.isolated_link_array[link_id] == 1 or self.closed_link_array[link_id] == 0:
-                self.jac_G.data[link_id] = 1.0
-            else:
-                start_node_id = self.link_start_nodes[link_id]
-                end_node_id = self.link_end_nodes[link_id]
-                self.jac_G.data[link_id] = (1000.0*self._g*heads[start_node_id] - 1000.0*self._g*heads[end_node_id])
-                # self.jac_G_inv.data[link_id] = 1.0 / self.jac_G_inv.data[link_id]
-        for link_id in self._prv_ids:
-            if self.isolated_link_array[link_id] == 1 or self.closed_link_array[link_id] == 0:
-                self.jac_G.data[link_id] = 1.0
-            elif self.link_status[link_id] == LinkStatus.opened:
-                self.jac_G.data[link_id] = 2.0*self.pipe_minor_loss_coefficients[link_id]*abs(flows[link_id])
-                # self.jac_G_inv.data[link_id] = 1.0 / self.jac_G_inv.data[link_id]
-            elif self.link_status[link_id] == LinkStatus.active:
-                self.jac_G.data[link_id] = 0.0
-
-        for link_id in self._tcv_ids:
-            if self.isolated_link_array[link_id] == 1 or self.closed_link_array[link_id] == 0:
-                self.jac_G.data[link_id] = 1.0
-            elif self.link_status[link_id] == LinkStatus.Opened:
-                self.jac_G.data[link_id] = 2.0*self.pipe_minor_loss_coefficients[link_id]*abs(flows[link_id])
-            elif self.link_status[link_id] == LinkStatus.Active:
-                self.jac_G.data[link_id] = 2.0*self.pipe_resistance_coefficients[link_id]*abs(flows[link_id])
-
-        for link_id in self._fcv_ids:
-            if self.isolated_link_array[link_id] == 1 or self.closed_link_array[link_id] == 0:
-                self.jac_G.data[link_id] = 1.0
-            elif self.link_status[link_id] == LinkStatus.Opened:
-                self.jac_G.data[link_id] = 2.0*self.pipe_minor_loss_coefficients[link_id]*abs(flows[link_id])
-            elif self.link_status[link_id] == LinkStatus.Active:
-                self.jac_G.data[link_id] = 1.0
+        ids = self.head_pump_id_array
+        if len(ids) > 0:
+            link_flow = flows[ids]
+            B = self.head_pump_B
+            C = self.head_pump_C
+            q_bar = self.head_pump_q_bar
+            line_deriv = np.where(link_flow >= q_bar,
+                                  -B*C*np.maximum(link_flow, q_bar)**(C - 1.0),
+                                  self.pump_m)
+            poly_deriv = np.where(link_flow <= self.pump_q1,
+                                  self.pump_m,
+                                  np.where(link_flow <= self.pump_q2,
+                                           3.0*self.head_pump_poly_a*link_flow**2 +
+                                           2.0*self.head_pump_poly_b*link_flow + self.head_pump_poly_c,
+                                           -B*C*np.maximum(link_flow, self.pump_q2)**(C - 1.0)))
+            self.jac_G.data[ids] = np.where(inactive[ids], 1.0,
+                                            np.where(self.head_pump_line_mask, line_deriv, poly_deriv))
+
+        ids = self.power_pump_id_array
+        if len(ids) > 0:
+            self.jac_G.data[ids] = np.where(inactive[ids], 1.0,
+                                            1000.0*self._g*heads[self.link_start_node_array[ids]] -
+                                            1000.0*self._g*heads[self.link_end_node_array[ids]])
+
+        ids = self.prv_id_array
+        if len(ids) > 0:
+            self.jac_G.data[ids] = np.select(
+                [inactive[ids], status[ids] == int(LinkStatus.Opened), status[ids] == int(LinkStatus.Active)],
+                [1.0, 2.0*self.pipe_minor_loss_coefficients[ids]*abs(flows[ids]), 0.0],
+                default=self.jac_G.data[ids])
+
+        ids = self.tcv_id_array
+        if len(ids) > 0:
+            self.jac_G.data[ids] = np.select(
+                [inactive[ids], status[ids] == int(LinkStatus.Opened), status[ids] == int(LinkStatus.Active)],
+                [1.0, 2.0*self.pipe_minor_loss_coefficients[ids]*abs(flows[ids]),
+                 2.0*self.pipe_resistance_coefficients[ids]*abs(flows[ids])],
+                default=self.jac_G.data[ids])
+
+        ids = self.fcv_id_array
+        if len(ids) > 0:
+            self.jac_G.data[ids] = np.select(
+                [inactive[ids], status[ids] == int(LinkStatus.Opened), status[ids] == int(LinkStatus.Active)],
+                [1.0, 2.0*self.pipe_minor_loss_coefficients[ids]*abs(flows[ids]), 1.0],
+                default=self.jac_G.data[ids])
 
         for ndx, node_id in enumerate(self._leak_ids):
             if not self.leak_status[node_id]:
@@ -822,19 +1054,6 @@ class HydraulicModel(object):
                     self.jac_H.data[ndx] = -0.5*self.leak_Cd[node_id]*self.leak_area[node_id]*\
                                            math.sqrt(2.0*self._g)*P**(-0.5)
 
-        self.jacobian_values = np.concatenate((self.jac_A.data,self.jac_B.data,self.jac_C.data,self.jac_D.data,
-                                             self.jac_E.data,self.jac_F.data,self.jac_G.data,self.jac_H.data,
-                                             self.jac_I.data))
-
-        self.jacobian = sparse.coo_matrix((self.jacobian_values, (self.jacobian_rows, self.jacobian_cols)),
-                                          shape=self.jacobian_shape)
-
-
-        # return (self.jac_A, self.jac_B, self.jac_C, self.jac_D, self.jac_E, self.jac_F, self.jac_G_inv, self.jac_H,
-        #         self.jac_I, self.jac_AinvB, self.jac_AinvC)
-        # self.check_jac(x)
-        return self.jacobian
-
     def get_node_balance_residual(self, flow, demand, leak_demand):
         """
         Mass balance at all the nodes
@@ -885,75 +1104,75 @@ class HydraulicModel(object):
 
         get_pipe_headloss_residual()
 
+        inactive = (self.isolated_link_array == 1) | (self.closed_link_array == 0)
+        status = self.link_status_array
+
         def get_pump_headloss_residual():
-            for link_id in self._pump_ids:
-                link_flow = flow[link_id]
-                if self.link_status[link_id] == LinkStatus.closed or link_id in self.isolated_link_ids:
-                    self.headloss_residual[link_id] = link_flow
-                else:
-                    start_node_id = self.link_start_nodes[link_id]
-                    end_node_id = self.link_end_nodes[link_id]
-
-                    if link_id in self.head_curve_coefficients.keys():
-                        A,B,C = self.head_curve_coefficients[link_id]
-                        if C > 1:
-                            q_bar, h_bar = self.pump_line_params[link_id]
-                            if link_flow >= q_bar:
-                                pump_headgain = A - B*link_flow**C
-                            else:
-                                pump_headgain = self.pump_m*(link_flow - q_bar) + h_bar
-                        else:
-                            if link_flow <= self.pump_q1:
-                                pump_headgain = self.pump_m*link_flow + A
-                            elif link_flow <= self.pump_q2:
-                                a, b, c, d = self.pump_poly_coefficients[link_id]
-                                pump_headgain = a*link_flow**3 + b*link_flow**2 + c*link_flow + d
-                            else:
-                                pump_headgain = A - B*link_flow**C
-                        self.headloss_residual[link_id] = pump_headgain - (head[end_node_id] - head[start_node_id])
-                    elif link_id in self.pump_powers.keys():
-                        self.headloss_residual[link_id] = self.pump_powers[link_id] + (head_diff_vector[link_id])*flow[link_id]*self._g*1000.0
-                    else:
-                        raise RuntimeError('Only power and head pumps are currently supported.')
+            ids = self.head_pump_id_array
+            if len(ids) > 0:
+                link_flow = flow[ids]
+                A = self.head_pump_A
+                B = self.head_pump_B
+                C = self.head_pump_C
+                q_bar = self.head_pump_q_bar
+                # The flows are clipped before being raised to the power C so that branches which are not
+                # selected by np.where do not produce nan's for negative flows.
+                line_headgain = np.where(link_flow >= q_bar,
+                                         A - B*np.maximum(link_flow, q_bar)**C,
+                                         self.pump_m*(link_flow - q_bar) + self.head_pump_h_bar)
+                poly_headgain = np.where(link_flow <= self.pump_q1,
+                                         self.pump_m*link_flow + A,
+                                         np.where(link_flow <= self.pump_q2,
+                                                  self.head_pump_poly_a*link_flow**3 +
+                                                  self.head_pump_poly_b*link_flow**2 +
+                                                  self.head_pump_poly_c*link_flow + self.head_pump_poly_d,
+                                                  A - B*np.maximum(link_flow, self.pump_q2)**C))
+                pump_headgain = np.where(self.head_pump_line_mask, line_headgain, poly_headgain)
+                self.headloss_residual[ids] = np.where(inactive[ids], link_flow,
+                                                       pump_headgain + head_diff_vector[ids])
+
+            ids = self.power_pump_id_array
+            if len(ids) > 0:
+                link_flow = flow[ids]
+                self.headloss_residual[ids] = np.where(inactive[ids], link_flow,
+                                                       self.power_pump_powers +
+                                                       head_diff_vector[ids]*link_flow*self._g*1000.0)
         get_pump_headloss_residual()
 
         def get_valve_headloss_residual():
-            for link_id in self._prv_ids:
-                link_flow = flow[link_id]
-                end_node_id = self.link_end_nodes[link_id]
-                if self.link_status[link_id] == LinkStatus.Closed or link_id in self.isolated_link_ids:
-                    self.headloss_residual[link_id] = link_flow
-                elif self.link_status[link_id] == LinkStatus.Active:
-                    self.headloss_residual[link_id] = head[end_node_id] - (self.valve_settings[link_id]+self.node_elevations[end_node_id])
-                elif self.link_status[link_id] == LinkStatus.Opened:
-                    coeff = self.pipe_minor_loss_coefficients[link_id]
-                    pipe_headloss = coeff*abs(flow[link_id])**2
-                    self.headloss_residual[link_id] = pipe_headloss - (head_diff_vector[link_id])
-
-            for link_id in self._fcv_ids:
-                link_flow = flow[link_id]
-                if self.link_status[link_id] == LinkStatus.Closed or link_id in self.isolated_link_ids:
-                    self.headloss_residual[link_id] = link_flow
-                elif self.link_status[link_id] == LinkStatus.Active:
-                    self.headloss_residual[link_id] = link_flow - self.valve_settings[link_id]
-                elif self.link_status[link_id] == LinkStatus.Opened:
-                    coeff = self.pipe_minor_loss_coefficients[link_id]
-                    pipe_headloss = np.sign(link_flow) * coeff * abs(link_flow) ** 2
-                    self.headloss_residual[link_id] = pipe_headloss - (head_diff_vector[link_id])
-
-            for link_id in self._tcv_ids:
-                link_flow = flow[link_id]
-                if self.link_status[link_id] == LinkStatus.Closed or link_id in self.isolated_link_ids:
-                    self.headloss_residual[link_id] = link_flow
-                elif self.link_status[link_id] == LinkStatus.Active:
-                    coeff = self.pipe_resistance_coefficients[link_id]
-                    pipe_headloss = np.sign(link_flow) * coeff * abs(link_flow) ** 2
-                    self.headloss_residual[link_id] = pipe_headloss - (head_diff_vector[link_id])
-                elif self.link_status[link_id] == LinkStatus.Opened:
-                    coeff = self.pipe_minor_loss_coefficients[link_id]
-                    pipe_headloss = np.sign(link_flow) * coeff * abs(link_flow) ** 2
-                    self.headloss_residual[link_id] = pipe_headloss - (head_diff_vector[link_id])
-
+            ids = self.prv_id_array
+            if len(ids) > 0:
+                link_flow = flow[ids]
+                end_node_ids = self.link_end_node_array[ids]
+                self.headloss_residual[ids] = np.select(
+                    [inactive[ids], status[ids] == int(LinkStatus.Active), status[ids] == int(LinkStatus.Opened)],
+                    [link_flow,
+                     head[end_node_ids] - (self.valve_setting_array[ids] + self.node_elevations[end_node_ids]),
+                     self.pipe_minor_loss_coefficients[ids]*abs(link_flow)**2 - head_diff_vector[ids]],
+                    default=self.headloss_residual[ids])
+
+            ids = self.fcv_id_array
+            if len(ids) > 0:
+                link_flow = flow[ids]
+                self.headloss_residual[ids] = np.select(
+                    [inactive[ids], status[ids] == int(LinkStatus.Active), status[ids] == int(LinkStatus.Opened)],
+                    [link_flow,
+                     link_flow - self.valve_setting_array[ids],
+                     np.sign(link_flow)*self.pipe_minor_loss_coefficients[ids]*abs(link_flow)**2 -
+                     head_diff_vector[ids]],
+                    default=self.headloss_residual[ids])
+
+            ids = self.tcv_id_array
+            if len(ids) > 0:
+                link_flow = flow[ids]
+                self.headloss_residual[ids] = np.select(
+                    [inactive[ids], status[ids] == int(LinkStatus.Active), status[ids] == int(LinkStatus.Opened)],
+                    [link_flow,
+                     np.sign(link_flow)*self.pipe_resistance_coefficients[ids]*abs(link_flow)**2 -
+                     head_diff_vector[ids],
+                     np.sign(link_flow)*self.pipe_minor_loss_coefficients[ids]*abs(link_flow)**2 -
+                     head_diff_vector[ids]],
+                    default=self.headloss_residual[ids])
         get_valve_headloss_residual()
         # print self.headloss_residual
         # raise RuntimeError('just stopping')
@@ -1083,116 +1302,246 @@ class HydraulicModel(object):
                 leak_demand[self._leak_idx[node_id]] = node.leak_demand
         return leak_demand
 
-    def initialize_results_dict(self):
-        # Data for results object
+    def get_network_inputs(self):
+        """
+        Get the network inputs at the current simulation time (required junction demands, tank heads,
+        and reservoir heads) as a single array. Used by predict_solution.
+
+        Returns
+        -------
+        u: numpy array
+        """
+        tank_head = [self.tank_head[node_id] for node_id in self._tank_ids]
+        reservoir_head = [self.reservoir_head[node_id] for node_id in self._reservoir_ids]
+        return np.concatenate((self.junction_demand, tank_head, reservoir_head))
+
+    def predict_solution(self, x1, u1, x0=None, u0=None):
+        """
+        Predict the solution at the current simulation time to warm start the newton solver.
+
+        The network inputs that are known at the current time are applied to the last solution: tank and
+        reservoir heads, junction demands (DD) or the relative change in the required junction demands (PDD),
+        zero heads at isolated junctions, and zero flows in closed and isolated links. If the solution at
+        the time before the last is also available, the change in the solution between the two previous
+        times is extrapolated with a secant step in the space of the network inputs. The extrapolation is
+        only used if the change in the inputs since the last time is (nearly) parallel to the change in the
+        inputs between the two previous times; step changes in demand patterns are not extrapolated.
+        This must be called after set_network_inputs_by_id.
+
+        Parameters
+        ----------
+        x1: numpy array
+            The last solution
+        u1: numpy array
+            The network inputs (see get_network_inputs) at the time of x1
+        x0: numpy array (optional)
+            The solution at the time solved before x1
+        u0: numpy array (optional)
+            The network inputs at the time of x0
+
+        Returns
+        -------
+        x: numpy array
+            The predicted solution
+        """
+        x = np.array(x1, dtype=float)
+        u = self.get_network_inputs()
+        if x0 is not None:
+            # relative changes, so that demands and heads are weighted equally
+            scale = np.abs(u1) + 1e-12
+            du_old = (u1 - u0)/scale
+            du_new = (u - u1)/scale
+            denom = du_old.dot(du_old)
+            if denom > 0.0:
+                ratio = min(max(du_new.dot(du_old)/denom, -1.0), 1.0)
+                if np.linalg.norm(du_new - ratio*du_old) <= 0.1*np.linalg.norm(du_new):
+                    x += ratio*(x1 - x0)
+
+        n_j = self.num_junctions
+        head = x[:self.num_nodes]
+        demand = x[self.num_nodes:2*self.num_nodes]
+        flow = x[2*self.num_nodes:(2*self.num_nodes+self.num_links)]
+
+        for node_id in self._tank_ids:
+            head[node_id] = self.tank_head[node_id]
+        for node_id in self._reservoir_ids:
+            head[node_id] = self.reservoir_head[node_id]
+
+        if self.mode == 'DD':
+            demand[:n_j] = self.junction_demand
+        else:
+            scale = np.ones(n_j)
+            nonzero = u1[:n_j] != 0
+            scale[nonzero] = self.junction_demand[nonzero]/u1[:n_j][nonzero]
+            demand[:n_j] = x1[self.num_nodes:self.num_nodes+n_j]*scale
+
+        head[:n_j][self.isolated_junction_array == 1] = 0.0
+        flow[(self.isolated_link_array == 1) | (self.closed_link_array == 0)] = 0.0
+
+        return x
+
+    def initialize_results_dict(self, sink=None):
+        """
+        Preallocate the arrays used to record results.
+
+        Results are stored in 2-D arrays (report time x node/link id). The number of rows is estimated
+        from the duration and the report timestep; the arrays are only grown if more report times are
+        saved than estimated (e.g., when the report timestep is 'ALL' and controls add intermediate times).
+
+        If a result sink is given (see wntr.sim.sinks), the arrays have a single row, which is passed
+        to the sink at each report time.
+
+        The float type, the status type, and whether the pressure and velocity are stored or computed
+        when they are accessed are set by the results options of the model (float_dtype, compact_status,
+        and lazy_derived). The derived results are always stored if a sink is given.
+        """
+        report_timestep = self._wn.options.time.report_timestep
+        if type(report_timestep) is str:
+            report_timestep = self._wn.options.time.hydraulic_timestep
+        remaining_time = max(self._wn.options.time.duration - self._wn.sim_time, 0)
+        num_rows = int(remaining_time // report_timestep) + 1
+        self._sink = sink
+        if sink is not None:
+            num_rows = 1
+            sink.setup([self._node_id_to_name[i] for i in self._node_ids],
+                       [self._link_id_to_name[i] for i in self._link_ids])
+
+        results_options = self._wn.options.results
+        float_dtype = np.dtype(results_options.float_dtype)
+        if float_dtype.kind != 'f':
+            raise ValueError('The results float_dtype must be a float type, e.g. "float64" or "float32"')
+        self._float_dtype = float_dtype
+        self._lazy_derived = results_options.lazy_derived and sink is None
+        # (row, ids) of the isolated junctions, whose pressure is zero (used if the pressure is derived)
+        self._isolated_junction_rows = []
+
+        self._num_saved_results = 0
         self._sim_results = {}
-        self._sim_results['node_name'] = []
-        self._sim_results['node_type'] = []
-        self._sim_results['node_times'] = []
-        self._sim_results['node_head'] = []
-        self._sim_results['node_demand'] = []
-        self._sim_results['node_pressure'] = []
-        self._sim_results['leak_demand'] = []
-        self._sim_results['link_name'] = []
-        self._sim_results['link_type'] = []
-        self._sim_results['link_times'] = []
-        self._sim_results['link_flowrate'] = []
-        self._sim_results['link_velocity'] = []
-        self._sim_results['link_status'] = []
+        self._sim_results['node_head'] = np.zeros((num_rows, self.num_nodes), dtype=float_dtype)
+        self._sim_results['node_demand'] = np.zeros((num_rows, self.num_nodes), dtype=float_dtype)
+        self._sim_results['leak_demand'] = np.zeros((num_rows, self.num_nodes), dtype=float_dtype)
+        self._sim_results['link_flowrate'] = np.zeros((num_rows, self.num_links), dtype=float_dtype)
+        if not self._lazy_derived:
+            self._sim_results['node_pressure'] = np.zeros((num_rows, self.num_nodes), dtype=float_dtype)
+            self._sim_results['link_velocity'] = np.zeros((num_rows, self.num_links), dtype=float_dtype)
+        status_dtype = np.int8 if results_options.compact_status else int
+        self._sim_results['link_status'] = np.zeros((num_rows, self.num_links), dtype=status_dtype)
+
+        # velocity = abs(flow) * velocity_coeff; pumps do not have a velocity
+        self._velocity_coeffs = np.zeros(self.num_links)
+        for link_id, diameter in self.pipe_diameters.items():
+            self._velocity_coeffs[link_id] = 4.0/(math.pi*diameter**2.0)
+        # pressures are only reported for junctions and tanks
+        self._pressure_node_mask = np.zeros(self.num_nodes)
+        self._pressure_node_mask[self._junction_ids] = 1.0
+        self._pressure_node_mask[self._tank_ids] = 1.0
+        self._leak_id_array = np.array(self._leak_ids, dtype=int)
+        self._max_flow_pump_ids = np.array([link_id for link_id in self._pump_ids
+                                            if self.max_pump_flows[link_id] is not None], dtype=int)
+        self._max_pump_flow_array = np.array([self.max_pump_flows[link_id] for link_id in self._max_flow_pump_ids],
+                                             dtype=float)
+
+    def _grow_results_arrays(self):
+        for key, value in self._sim_results.items():
+            self._sim_results[key] = np.concatenate((value, np.zeros_like(value)), axis=0)
 
     def save_results(self, x, results):
+        if self._sink is not None:
+            row = 0
+        else:
+            if self._num_saved_results >= self._sim_results['node_head'].shape[0]:
+                self._grow_results_arrays()
+            row = self._num_saved_results
+            self._num_saved_results += 1
+
         head = x[:self.num_nodes]
         demand = x[self.num_nodes:2*self.num_nodes]
         flow = x[2*self.num_nodes:(2*self.num_nodes+self.num_links)]
         leak_demand = x[(2*self.num_nodes+self.num_links):]
-        for node_id in self._junction_ids:
-            head_n = head[node_id]
-            self._sim_results['node_type'].append('Junction')
-            self._sim_results['node_head'].append(head_n)
-            self._sim_results['node_demand'].append(demand[node_id])
-            if node_id in self.isolated_junction_ids:
-                self._sim_results['node_pressure'].append(0.0)
-            else:
-                self._sim_results['node_pressure'].append(head_n - self.node_elevations[node_id])
-            if node_id in self._leak_ids:
-                leak_idx = self._leak_ids.index(node_id)
-                leak_demand_n = leak_demand[leak_idx]
-                self._sim_results['leak_demand'].append(leak_demand_n)
-            else:
-                self._sim_results['leak_demand'].append(0.0)
-        for node_id in self._tank_ids:
-            head_n = head[node_id]
-            demand_n = demand[node_id]
-            self._sim_results['node_type'].append('Tank')
-            self._sim_results['node_head'].append(head_n)
-            self._sim_results['node_demand'].append(demand_n)
-            self._sim_results['node_pressure'].append(head_n - self.node_elevations[node_id])
-            if node_id in self._leak_ids:
-                leak_idx = self._leak_ids.index(node_id)
-                leak_demand_n = leak_demand[leak_idx]
-                self._sim_results['leak_demand'].append(leak_demand_n)
-            else:
-                self._sim_results['leak_demand'].append(0.0)
-        for node_id in self._reservoir_ids:
-            demand_n = demand[node_id]
-            self._sim_results['node_type'].append('Reservoir')
-            self._sim_results['node_head'].append(head[node_id])
-            self._sim_results['node_demand'].append(demand_n)
-            self._sim_results['node_pressure'].append(0.0)
-            self._sim_results['leak_demand'].append(0.0)
-
-        for link_id in self._pipe_ids:
-            self._sim_results['link_type'].append(self.link_types[link_id].name)
-            self._sim_results['link_flowrate'].append(flow[link_id])
-            self._sim_results['link_velocity'].append(abs(flow[link_id])*4.0/(math.pi*self.pipe_diameters[link_id]**2.0))
-            self._sim_results['link_status'].append(self.link_status[link_id])
-        for link_id in self._pump_ids:
-            self._sim_results['link_type'].append(self.link_types[link_id].name)
-            self._sim_results['link_flowrate'].append(flow[link_id])
-            self._sim_results['link_velocity'].append(0.0)
-            self._sim_results['link_status'].append(self.link_status[link_id])
-            if self.max_pump_flows[link_id] is not None:
-                if flow[link_id]>self.max_pump_flows[link_id]:
-                    link_name = self._link_id_to_name[link_id]
-                    link = self._wn.get_link(link_name)
-                    start_node_name = link.start_node_name
-                    end_node_name = link.end_node_name
-                    start_node_id = self._node_name_to_id[start_node_name]
-                    end_node_id = self._node_name_to_id[end_node_name]
-                    start_head = head[start_node_id]
-                    end_head = head[end_node_id]
-                    warnings.warn('Pump '+link_name+' has exceeded its maximum flow.')
-                    logger.warning('Pump {0} has exceeded its maximum flow. Pump head: {1}; Pump flow: {2}; Max pump flow: {3}'.format(link_name,end_head-start_head, flow[link_id], self.max_pump_flows[link_id]))
-        for link_id in self._valve_ids:
-            self._sim_results['link_type'].append(self.link_types[link_id].name)
-            self._sim_results['link_flowrate'].append(flow[link_id])
-            self._sim_results['link_velocity'].append(abs(flow[link_id])*4.0/(math.pi*self.pipe_diameters[link_id]**2.0))
-            self._sim_results['link_status'].append(self.link_status[link_id])
+
+        self._sim_results['node_head'][row, :] = head
+        self._sim_results['node_demand'][row, :] = demand
+        if self._lazy_derived:
+            if self.isolated_junction_array.any():
+                self._isolated_junction_rows.append((row, np.flatnonzero(self.isolated_junction_array)))
+        else:
+            pressure = (head - self.node_elevations)*self._pressure_node_mask
+            pressure[:self.num_junctions] *= 1.0 - self.isolated_junction_array
+            self._sim_results['node_pressure'][row, :] = pressure
+        self._sim_results['leak_demand'][row, self._leak_id_array] = leak_demand
+
+        self._sim_results['link_flowrate'][row, :] = flow
+        if not self._lazy_derived:
+            self._sim_results['link_velocity'][row, :] = abs(flow)*self._velocity_coeffs
+        self._sim_results['link_status'][row, :] = self.link_status_array
+
+        exceeded = flow[self._max_flow_pump_ids] > self._max_pump_flow_array
+        for link_id in self._max_flow_pump_ids[exceeded]:
+            link_name = self._link_id_to_name[link_id]
+            start_head = head[self.link_start_nodes[link_id]]
+            end_head = head[self.link_end_nodes[link_id]]
+            warnings.warn('Pump '+link_name+' has exceeded its maximum flow.')
+            logger.warning('Pump {0} has exceeded its maximum flow. Pump head: {1}; Pump flow: {2}; Max pump flow: {3}'.format(link_name,end_head-start_head, flow[link_id], self.max_pump_flows[link_id]))
+
+        if self._sink is not None:
+            node = {'demand': self._sim_results['node_demand'][0],
+                    'head': self._sim_results['node_head'][0],
+                    'pressure': self._sim_results['node_pressure'][0],
+                    'leak_demand': self._sim_results['leak_demand'][0]}
+            link = {'flowrate': self._sim_results['link_flowrate'][0],
+                    'velocity': self._sim_results['link_velocity'][0],
+                    'status': self._sim_results['link_status'][0]}
+            self._sink.save(int(self._wn.sim_time), node, link)
 
     def get_results(self,results):
+        """
+        Store the saved results in results.node and results.link. The link status results are the
+        integer codes of the LinkStatus members (LinkStatus members compare equal to these codes).
+        """
+        if self._sink is not None:
+            self._sink.finalize(results)
+            return
         ntimes = len(results.time)
-        nnodes = self.num_nodes
-        nlinks = self.num_links
-        tmp_node_names = self._junction_ids+self._tank_ids+self._reservoir_ids
-        tmp_link_names = self._pipe_ids+self._pump_ids+self._valve_ids
-        node_names = [self._node_id_to_name[i] for i in tmp_node_names]
-        link_names = [self._link_id_to_name[i] for i in tmp_link_names]
+        node_names = [self._node_id_to_name[i] for i in self._node_ids]
+        link_names = [self._link_id_to_name[i] for i in self._link_ids]
+
+        def trim(value):
+            if value.shape[0] == ntimes:
+                return value
+            return value[:ntimes].copy()
+
+        if self._lazy_derived:
+            node_dictionary = ResultsDict()
+            link_dictionary = ResultsDict()
+            for key, sim_key in [('demand', 'node_demand'), ('head', 'node_head'), ('leak_demand', 'leak_demand')]:
+                node_dictionary[key] = pd.DataFrame(data=trim(self._sim_results[sim_key]), index=results.time,
+                                                    columns=node_names)
+            scale = self._pressure_node_mask.astype(self._float_dtype)
+            offset = (-self.node_elevations*scale).astype(self._float_dtype)
+            node_dictionary['pressure'] = DerivedResult('head', scale, offset=offset,
+                                                        zeros=list(self._isolated_junction_rows))
+            for key, sim_key in [('flowrate', 'link_flowrate'), ('status', 'link_status')]:
+                link_dictionary[key] = pd.DataFrame(data=trim(self._sim_results[sim_key]), index=results.time,
+                                                    columns=link_names)
+            link_dictionary['velocity'] = DerivedResult('flowrate', self._velocity_coeffs.astype(self._float_dtype),
+                                                        absolute=True)
+            results.node = node_dictionary
+            results.link = link_dictionary
+            return
 
         node_dictionary = {'demand': self._sim_results['node_demand'],
                            'head': self._sim_results['node_head'],
                            'pressure': self._sim_results['node_pressure'],
                            'leak_demand': self._sim_results['leak_demand']}
-                           #'type': self._sim_results['node_type']}
         for key,value in node_dictionary.items():
-            node_dictionary[key] = pd.DataFrame(data=np.array(value).reshape((ntimes,nnodes)), index=results.time, columns=node_names)
+            node_dictionary[key] = pd.DataFrame(data=trim(value), index=results.time, columns=node_names)
         results.node = node_dictionary 
         
         link_dictionary = {'flowrate':self._sim_results['link_flowrate'],
                            'velocity':self._sim_results['link_velocity'],
-                           #'type':self._sim_results['link_type'],
                            'status':self._sim_results['link_status']}
         for key, value in link_dictionary.items():
-            link_dictionary[key] = pd.DataFrame(data=np.array(value).reshape((ntimes, nlinks)), index=results.time, columns=link_names)
+            link_dictionary[key] = pd.DataFrame(data=trim(value), index=results.time, columns=link_names)
         results.link = link_dictionary 
         
     def set_network_inputs_by_id(self):
@@ -1217,23 +1566,22 @@ class HydraulicModel(object):
         for reservoir_name, reservoir in self._wn.nodes(Reservoir):
             reservoir_id = self._node_name_to_id[reservoir_name]
             self.reservoir_head[reservoir_id] = reservoir.head_timeseries(self._wn.sim_time)
-        for junction_name, junction in self._wn.nodes(Junction):
-            junction_id = self._node_name_to_id[junction_name]
-            #if junction_id in self.isolated_junction_ids:
-            #    self.junction_demand[junction_id] = 0.0
-            #else:
-            self.junction_demand[junction_id] = junction.demand_timeseries_list(self._wn.sim_time)
-            if junction._leak:
-                self.leak_status[junction_id] = junction.leak_status
+        # the junction ids follow the order of the junctions in the model (and of the compiled demands)
+        self.junction_demand[:] = self._wn.get_compiled_demands().at(self._wn.sim_time)
+        for node_id in self._leak_ids:
+            if node_id < self.num_junctions:
+                self.leak_status[node_id] = self._wn.get_node(self._node_id_to_name[node_id]).leak_status
         for link_name, link in self._wn.links():
             link_id = self._link_name_to_id[link_name]
             self.link_status[link_id] = link.status
+            self.link_status_array[link_id] = link.status
         for pipe_name, pipe in self._wn.links(Pipe):
             pipe_id = self._link_name_to_id[pipe_name]
             self.pipe_minor_loss_coefficients[pipe_id] = 8.0*pipe.minor_loss/(self._g*math.pi**2*pipe.diameter**4)
         for valve_name, valve in self._wn.valves():
             valve_id = self._link_name_to_id[valve_name]
             self.valve_settings[valve_id] = valve.setting
+            self.valve_setting_array[valve_id] = valve.setting
             self.pipe_minor_loss_coefficients[valve_id] = (8.0 * valve.minor_loss /
                                                            (self._g * math.pi ** 2 * valve.diameter ** 4))
             if valve.valve_type == 'TCV':
@@ -1281,34 +1629,47 @@ class HydraulicModel(object):
         demand = x[self.num_nodes:self.num_nodes*2]
         flow = x[self.num_nodes*2:(2*self.num_nodes+self.num_links)]
         leak_demand = x[(2*self.num_nodes+self.num_links):]
+        if self._wn._node_reg._columns is not None:
+            self._store_results_in_columns(head, demand, flow, leak_demand)
+            return
         node_name_to_id = self._node_name_to_id
         link_name_to_id = self._link_name_to_id
-        for name, node in self._wn.nodes(Junction):
+        leak_ids = self._leak_ids
+        # the simulation state is written to the node and link attributes directly, see 
+        # wntr.network.base._NODE_STATE_ATTRIBUTES
+        self._wn._node_reg._state_changed = True
+        self._wn._link_reg._state_changed = True
+        for name, node in self._wn.nodes():
             node_id = node_name_to_id[name]
-            node.head = head[node_id]
-            node.demand = demand[node_id]
-            if node._leak:
-                leak_idx = self._leak_ids.index(node_id)
-                node.leak_demand = leak_demand[leak_idx]
+            state = node.__dict__
+            state['_head'] = head[node_id]
+            state['_demand'] = demand[node_id]
+            if state['_leak']:
+                state['_leak_demand'] = leak_demand[leak_ids.index(node_id)]
             else:
-                node.leak_demand = 0.0
-        for name, node in self._wn.nodes(Tank):
-            node_id = node_name_to_id[name]
-            node.head = head[node_id]
-            node.demand = demand[node_id]
-            if node._leak:
-                leak_idx = self._leak_ids.index(node_id)
-                node.leak_demand = leak_demand[leak_idx]
-            else:
-                node.leak_demand = 0.0
-        for name, node in self._wn.nodes(Reservoir):
-            node_id = node_name_to_id[name]
-            node.head = head[node_id]
-            node.demand = demand[node_id]
-            node.leak_demand = 0.0
+                state['_leak_demand'] = 0.0
         for link_name, link in self._wn.links():
-            link_id = link_name_to_id[link_name]
-            link._flow = flow[link_id]
+            link.__dict__['_flow'] = flow[link_name_to_id[link_name]]
+
+    def _store_results_in_columns(self, head, demand, flow, leak_demand):
+        """Store the results in the node and link columns of the water network model (columnar storage)"""
+        node_columns = self._wn._node_reg._columns
+        link_columns = self._wn._link_reg._columns
+        key = (id(node_columns), node_columns._version, id(link_columns), link_columns._version)
+        column_rows = getattr(self, '_column_rows', None)
+        if column_rows is None or column_rows[0] != key:
+            # rows of the nodes and links in the order of their ids
+            node_rows = node_columns.get_rows([self._node_id_to_name[i] for i in range(self.num_nodes)])
+            link_rows = link_columns.get_rows([self._link_id_to_name[i] for i in range(self.num_links)])
+            column_rows = (key, node_rows, link_rows)
+            self._column_rows = column_rows
+        key, node_rows, link_rows = column_rows
+        node_columns.column('head')[node_rows] = head
+        node_columns.column('demand')[node_rows] = demand
+        node_leak_demand = np.zeros(self.num_nodes)
+        node_leak_demand[self._leak_ids] = leak_demand
+        node_columns.column('leak_demand')[node_rows] = node_leak_demand
+        link_columns.column('flow')[link_rows] = flow
 
     def compute_polynomial_coefficients(self, x1, x2, f1, f2, df1, df2):
         """
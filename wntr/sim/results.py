@@ -1,5 +1,17 @@
 import numpy as np
+import pandas as pd
 import datetime
+from collections import OrderedDict
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+from wntr.network.base import LinkStatus
+
+# Link status codes of the WNTRSimulator results (results.link['status']) and the LinkStatus they stand for
+LINK_STATUS_CODES = OrderedDict((int(status), status) for status in
+                                [LinkStatus.Closed, LinkStatus.Open, LinkStatus.Active, LinkStatus.CV])
 
 class SimulationResults(object):
     """
@@ -13,6 +25,10 @@ class SimulationResults(object):
         self.network_name = None
         self.link = None
         self.node = None
+        # Number of newton iterations used to solve each time (WNTRSimulator only)
+        self.solver_iterations = None
+        # Number of controls evaluated and skipped by the control managers at each time (WNTRSimulator only)
+        self.control_evaluations = None
         """
         self.time = None
         self.meta = {'quality_mode':None,
@@ -60,3 +76,93 @@ class SimulationResults(object):
         Ad[mask] = Ad_temp[mask]
 
         return Ad
+
+
+class DerivedResult(object):
+    """
+    Result computed from another result (in the same ResultsDict) when it is accessed.
+
+    The values are scale*source + offset, or scale*abs(source) + offset, 
+    with one scale and offset per element (column).
+
+    Parameters
+    ----------
+    source : string
+        Key of the source result
+    scale : numpy array
+        Scale of each element
+    offset : numpy array (optional)
+        Offset of each element (default = None)
+    absolute : bool (optional)
+        If True, the absolute value of the source is scaled (default = False)
+    zeros : list of tuples (optional)
+        (row, column indices) of the values that are set to zero, e.g. the 
+        pressure of isolated junctions (default = None)
+    """
+
+    def __init__(self, source, scale, offset=None, absolute=False, zeros=None):
+        self.source = source
+        self.scale = scale
+        self.offset = offset
+        self.absolute = absolute
+        if zeros is None:
+            zeros = []
+        self.zeros = zeros
+
+    def __repr__(self):
+        return "<DerivedResult: source='{}', absolute={}>".format(self.source, self.absolute)
+
+    def evaluate(self, results):
+        """Returns the DataFrame of the result, computed from the source in results"""
+        source = results[self.source]
+        values = source.values
+        if self.absolute:
+            values = np.abs(values)
+        values = values*self.scale
+        if self.offset is not None:
+            values += self.offset
+        for row, columns in self.zeros:
+            values[row, columns] = 0.0
+        return pd.DataFrame(data=values, index=source.index, columns=source.columns)
+
+
+class ResultsDict(MutableMapping):
+    """
+    Dictionary of result DataFrames (SimulationResults.node or SimulationResults.link) 
+    in which some results are derived from other results.
+
+    Values that are :class:`DerivedResult` objects are computed each time they are 
+    accessed, so they do not use memory between accesses; keep a reference to the 
+    returned DataFrame to reuse it. Use :meth:`is_derived` to check if a result is derived.
+    """
+
+    def __init__(self, results=None):
+        self._results = OrderedDict()
+        if results is not None:
+            self._results.update(results)
+
+    def __getitem__(self, key):
+        value = self._results[key]
+        if isinstance(value, DerivedResult):
+            return value.evaluate(self)
+        return value
+
+    def __setitem__(self, key, value):
+        self._results[key] = value
+
+    def __delitem__(self, key):
+        del self._results[key]
+
+    def __iter__(self):
+        return iter(self._results)
+
+    def __len__(self):
+        return len(self._results)
+
+    def __repr__(self):
+        return '<ResultsDict: {}>'.format(', '.join('{}{}'.format(key, ' (derived)' if self.is_derived(key) else '')
+                                                     for key in self._results))
+
+    def is_derived(self, key):
+        """Returns True if the result is computed when it is accessed"""
+        return isinstance(self._results[key], DerivedResult)
@@ -0,0 +1,388 @@
+"""
+The wntr.sim.sinks module includes result sinks, which receive the
+results of a simulation one report time at a time instead of having the
+simulator keep all results in memory.
+
+A sink is passed to :meth:`~wntr.sim.core.WNTRSimulator.run_sim` or
+:meth:`~wntr.sim.epanet.EpanetSimulator.run_sim` (sink=...). The simulator
+calls :meth:`ResultSink.setup` once with the node and link names,
+:meth:`ResultSink.save` at each report time, and
+:meth:`ResultSink.finalize` at the end of the simulation.
+"""
+import os
+import glob
+import numpy as np
+import pandas as pd
+
+from wntr.sim.results import SimulationResults
+
+
+class ResultSink(object):
+    """
+    Base class for result sinks.
+
+    Subclasses overload :meth:`setup`, :meth:`save`, and :meth:`finalize`.
+    """
+
+    def setup(self, node_names, link_names):
+        """
+        Called by the simulator before the first report time.
+
+        Parameters
+        ----------
+        node_names : list of strings
+            Names of the nodes, in the order of the node values passed to save
+        link_names : list of strings
+            Names of the links, in the order of the link values passed to save
+        """
+        self.node_names = list(node_names)
+        self.link_names = list(link_names)
+
+    def save(self, time, node, link):
+        """
+        Called by the simulator at each report time.
+
+        The arrays can be reused by the simulator after the call; a sink
+        must copy the values it keeps.
+
+        Parameters
+        ----------
+        time : int
+            Simulation time in seconds
+        node : dict
+            Node results (e.g., 'head', 'pressure'); each value is an array with one value per node
+        link : dict
+            Link results (e.g., 'flowrate'); each value is an array with one value per link
+        """
+        raise NotImplementedError
+
+    def finalize(self, results):
+        """
+        Called by the simulator at the end of the simulation.
+
+        The default implementation sets results.node and results.link to None.
+
+        Parameters
+        ----------
+        results : SimulationResults
+            Results returned by the simulator
+        """
+        results.node = None
+        results.link = None
+
+
+class ChunkedFileSink(ResultSink):
+    """
+    Result sink that appends the results to files in a directory.
+
+    The results are buffered in memory for chunk_size report times and then
+    written to one .npy file per result and chunk (e.g.,
+    node_pressure_000002.npy, report times x nodes). Use :meth:`read` to
+    load some or all of the results as DataFrames.
+
+    Parameters
+    ----------
+    directory : string
+        Directory of the files; it is created if it does not exist. The files
+        of a previous simulation (node_*.npy, link_*.npy, and time_*.npy) are
+        removed by setup.
+    chunk_size : int (optional)
+        Number of report times per file (default = 1024)
+    """
+
+    def __init__(self, directory, chunk_size=1024):
+        self.directory = directory
+        self.chunk_size = int(chunk_size)
+        self._buffers = None
+        self._times = None
+        self._num_buffered = 0
+        self._num_chunks = 0
+
+    def setup(self, node_names, link_names):
+        super(ChunkedFileSink, self).setup(node_names, link_names)
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        for pattern in ('node_*.npy', 'link_*.npy', 'time_*.npy'):
+            for filename in glob.glob(os.path.join(self.directory, pattern)):
+                os.remove(filename)
+        np.save(os.path.join(self.directory, 'node_names.npy'), np.array(self.node_names, dtype=str))
+        np.save(os.path.join(self.directory, 'link_names.npy'), np.array(self.link_names, dtype=str))
+        self._buffers = None
+        self._times = np.zeros(self.chunk_size, dtype=int)
+        self._num_buffered = 0
+        self._num_chunks = 0
+
+    def save(self, time, node, link):
+        if self._buffers is None:
+            self._buffers = {}
+            for prefix, values in (('node', node), ('link', link)):
+                for key, value in values.items():
+                    self._buffers[prefix + '_' + key] = np.zeros((self.chunk_size, len(value)),
+                                                                 dtype=np.asarray(value).dtype)
+        row = self._num_buffered
+        self._times[row] = time
+        for key, value in node.items():
+            self._buffers['node_' + key][row, :] = value
+        for key, value in link.items():
+            self._buffers['link_' + key][row, :] = value
+        self._num_buffered += 1
+        if self._num_buffered == self.chunk_size:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        suffix = '_{:06d}.npy'.format(self._num_chunks)
+        num_rows = self._num_buffered
+        np.save(os.path.join(self.directory, 'time' + suffix), self._times[:num_rows])
+        for key, buffer in self._buffers.items():
+            np.save(os.path.join(self.directory, key + suffix), buffer[:num_rows])
+        self._num_buffered = 0
+        self._num_chunks += 1
+
+    def finalize(self, results):
+        if self._num_buffered > 0:
+            self._write_chunk()
+        self._buffers = None
+        super(ChunkedFileSink, self).finalize(results)
+
+    def read(self, node_results=None, link_results=None):
+        """
+        Load the results written to the directory.
+
+        Parameters
+        ----------
+        node_results : list of strings (optional)
+            Node results to load, e.g. ['pressure']. If None, all node results are loaded (default = None)
+        link_results : list of strings (optional)
+            Link results to load, e.g. ['flowrate']. If None, all link results are loaded (default = None)
+
+        Returns
+        -------
+        SimulationResults
+        """
+        directory = self.directory
+        node_names = np.load(os.path.join(directory, 'node_names.npy')).tolist()
+        link_names = np.load(os.path.join(directory, 'link_names.npy')).tolist()
+        time_files = sorted(glob.glob(os.path.join(directory, 'time_*.npy')))
+        times = np.concatenate([np.load(f) for f in time_files]) if time_files else np.zeros(0, dtype=int)
+
+        def load(prefix, keys, names):
+            if keys is None:
+                keys = sorted(set(os.path.basename(f)[len(prefix)+1:-11]
+                                  for f in glob.glob(os.path.join(directory, prefix + '_*_[0-9]*.npy'))))
+            frames = {}
+            for key in keys:
+                chunks = [np.load(os.path.join(directory, '{}_{}_{:06d}.npy'.format(prefix, key, i)), mmap_mode='r')
+                          for i in range(len(time_files))]
+                if chunks:
+                    data = np.concatenate(chunks)
+                else:
+                    data = np.zeros((0, len(names)))
+                frames[key] = pd.DataFrame(data=data, index=times, columns=names)
+            return frames
+
+        results = SimulationResults()
+        results.time = times
+        results.node = load('node', node_results, node_names)
+        results.link = load('link', link_results, link_names)
+        return results
+
+
+class ReductionSink(ResultSink):
+    """
+    Result sink that only keeps running statistics of each result at each element.
+
+    The minimum, maximum, and mean (over the report times) are exact. The
+    percentiles are estimated with the P-square algorithm [JaCh85]_, which
+    keeps five markers per percentile and element, so the memory does not
+    depend on the number of report times.
+
+    At the end of the simulation, results.node and results.link contain a
+    DataFrame for each result, indexed by statistic ('min', 'max', 'mean',
+    and '50%', '95%', etc. for the percentiles), with one column per element.
+
+    Parameters
+    ----------
+    percentiles : list of floats (optional)
+        Percentiles, between 0 and 100 (default = None)
+    node_results : list of strings (optional)
+        Node results to reduce. If None, all node results are reduced (default = None)
+    link_results : list of strings (optional)
+        Link results to reduce. If None, all link results are reduced (default = None)
+
+    References
+    ----------
+    .. [JaCh85] Jain R, Chlamtac I. (1985). The P2 algorithm for dynamic
+       calculation of quantiles and histograms without storing observations.
+       Communications of the ACM, 28(10), 1076-1085
+    """
+
+    def __init__(self, percentiles=None, node_results=None, link_results=None):
+        if percentiles is None:
+            percentiles = []
+        for percentile in percentiles:
+            if percentile < 0 or percentile > 100:
+                raise ValueError('Percentiles must be between 0 and 100')
+        self.percentiles = list(percentiles)
+        self.node_results = node_results
+        self.link_results = link_results
+        self._stats = None
+        self._count = 0
+
+    def setup(self, node_names, link_names):
+        super(ReductionSink, self).setup(node_names, link_names)
+        self._stats = None
+        self._count = 0
+
+    def save(self, time, node, link):
+        if self._stats is None:
+            self._stats = {}
+            for prefix, values, keys in (('node', node, self.node_results), ('link', link, self.link_results)):
+                for key, value in values.items():
+                    if keys is None or key in keys:
+                        n = len(value)
+                        self._stats[(prefix, key)] = {'min': np.full(n, np.inf),
+                                                      'max': np.full(n, -np.inf),
+                                                      'sum': np.zeros(n),
+                                                      'percentiles': [_P2Quantile(p/100.0, n)
+                                                                      for p in self.percentiles]}
+        for (prefix, key), stats in self._stats.items():
+            value = np.asarray(node[key] if prefix == 'node' else link[key], dtype=float)
+            np.minimum(stats['min'], value, out=stats['min'])
+            np.maximum(stats['max'], value, out=stats['max'])
+            stats['sum'] += value
+            for quantile in stats['percentiles']:
+                quantile.add(value)
+        self._count += 1
+
+    def finalize(self, results):
+        results.node = {}
+        results.link = {}
+        if self._stats is None:
+            return
+        index = ['min', 'max', 'mean'] + ['{:g}%'.format(p) for p in self.percentiles]
+        for (prefix, key), stats in self._stats.items():
+            data = [stats['min'], stats['max'], stats['sum']/self._count]
+            data.extend(quantile.value() for quantile in stats['percentiles'])
+            if prefix == 'node':
+                results.node[key] = pd.DataFrame(data=np.array(data), index=index, columns=self.node_names)
+            else:
+                results.link[key] = pd.DataFrame(data=np.array(data), index=index, columns=self.link_names)
+
+
+class SubsetSink(ResultSink):
+    """
+    Result sink that only keeps the results of selected elements.
+
+    At the end of the simulation, results.node and results.link contain a
+    DataFrame for each result (report times x selected elements), as
+    returned by the simulator without a sink.
+
+    Parameters
+    ----------
+    node_names : list of strings (optional)
+        Nodes to keep. If None, all nodes are kept (default = None)
+    link_names : list of strings (optional)
+        Links to keep. If None, all links are kept (default = None)
+    node_results : list of strings (optional)
+        Node results to keep, e.g. ['pressure']. If None, all node results are kept (default = None)
+    link_results : list of strings (optional)
+        Link results to keep, e.g. ['flowrate']. If None, all link results are kept (default = None)
+    """
+
+    def __init__(self, node_names=None, link_names=None, node_results=None, link_results=None):
+        self.selected_node_names = None if node_names is None else list(node_names)
+        self.selected_link_names = None if link_names is None else list(link_names)
+        self.node_results = node_results
+        self.link_results = link_results
+
+    def setup(self, node_names, link_names):
+        super(SubsetSink, self).setup(node_names, link_names)
+        self._node_index = self._get_index(self.node_names, self.selected_node_names)
+        self._link_index = self._get_index(self.link_names, self.selected_link_names)
+        self._times = []
+        self._node_values = {}
+        self._link_values = {}
+
+    @staticmethod
+    def _get_index(names, selected_names):
+        if selected_names is None:
+            return np.arange(len(names))
+        name_to_index = dict((name, i) for i, name in enumerate(names))
+        missing = [name for name in selected_names if name not in name_to_index]
+        if missing:
+            raise KeyError('Elements not in the simulation: {}'.format(missing))
+        return np.array([name_to_index[name] for name in selected_names], dtype=int)
+
+    def save(self, time, node, link):
+        self._times.append(time)
+        for values, keys, index, saved in ((node, self.node_results, self._node_index, self._node_values),
+                                           (link, self.link_results, self._link_index, self._link_values)):
+            for key, value in values.items():
+                if keys is None or key in keys:
+                    saved.setdefault(key, []).append(np.asarray(value)[index])
+
+    def finalize(self, results):
+        node_names = [self.node_names[i] for i in self._node_index]
+        link_names = [self.link_names[i] for i in self._link_index]
+        results.node = dict((key, pd.DataFrame(data=np.array(values), index=self._times, columns=node_names))
+                            for key, values in self._node_values.items())
+        results.link = dict((key, pd.DataFrame(data=np.array(values), index=self._times, columns=link_names))
+                            for key, values in self._link_values.items())
+
+
+class _P2Quantile(object):
+    """
+    P-square estimate (see ReductionSink) of a quantile of each element of a series of arrays.
+
+    Parameters
+    ----------
+    p : float
+        Quantile, between 0 and 1
+    n : int
+        Number of elements
+    """
+
+    def __init__(self, p, n):
+        self.p = p
+        self._first = []  # the first five arrays
+        self._heights = None  # marker heights, 5 x n
+        self._positions = None  # marker positions, 5 x n
+        self._desired = np.array([0.0, 2*p, 4*p, 2+2*p, 4.0])
+        self._increments = np.array([0.0, p/2.0, p, (1+p)/2.0, 1.0])
+
+    def add(self, x):
+        if self._heights is None:
+            self._first.append(np.array(x, dtype=float))
+            if len(self._first) == 5:
+                self._heights = np.sort(np.array(self._first), axis=0)
+                self._positions = np.tile(np.arange(5.0)[:, np.newaxis], (1, self._heights.shape[1]))
+                self._first = []
+            return
+        q = self._heights
+        n = self._positions
+        np.minimum(q[0], x, out=q[0])
+        np.maximum(q[4], x, out=q[4])
+        # cell of x: the markers above it are moved up
+        k = (x >= q[1]).astype(int) + (x >= q[2]) + (x >= q[3])
+        n += np.arange(5)[:, np.newaxis] > k
+        self._desired += self._increments
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            move = ((d >= 1) & (n[i+1] - n[i] > 1)) | ((d <= -1) & (n[i-1] - n[i] < -1))
+            if not move.any():
+                continue
+            s = np.where(d >= 0, 1.0, -1.0)
+            parabolic = q[i] + s/(n[i+1] - n[i-1])*((n[i] - n[i-1] + s)*(q[i+1] - q[i])/(n[i+1] - n[i]) +
+                                                    (n[i+1] - n[i] - s)*(q[i] - q[i-1])/(n[i] - n[i-1]))
+            neighbor_q = np.where(s > 0, q[i+1], q[i-1])
+            neighbor_n = np.where(s > 0, n[i+1], n[i-1])
+            linear = q[i] + s*(neighbor_q - q[i])/(neighbor_n - n[i])
+            new_q = np.where((q[i-1] < parabolic) & (parabolic < q[i+1]), parabolic, linear)
+            q[i] = np.where(move, new_q, q[i])
+            n[i] += np.where(move, s, 0.0)
+
+    def value(self):
+        """Returns the estimates of the quantile (exact with fewer than five arrays)"""
+        if self._heights is None:
+            return np.percentile(np.array(self._first), self.p*100.0, axis=0)
+        return self._heights[2].copy()
@@ -2,6 +2,10 @@ import numpy as np
 import scipy.sparse as sp
 import warnings
 import logging
+try:
+    from sksparse.cholmod import cholesky as cholmod_cholesky
+except ImportError:
+    cholmod_cholesky = None
 
 warnings.filterwarnings("error",'Matrix is exactly singular', sp.linalg.MatrixRankWarning)
 np.set_printoptions(precision=3, threshold=10000, linewidth=300)
@@ -53,11 +57,139 @@ class NewtonSolver(object):
         else:
             self.bt_start_iter = self._options['BT_START_ITER']
 
+        if 'LINEAR_SOLVER' not in self._options:
+            self.linear_solver = 'SPSOLVE'
+        else:
+            self.linear_solver = self._options['LINEAR_SOLVER'].upper()
+        if self.linear_solver not in {'SPSOLVE', 'SPLU'}:
+            raise ValueError('LINEAR_SOLVER must be either "SPSOLVE" or "SPLU".')
+
+        if 'REUSE_FACTORIZATION' not in self._options:
+            self.reuse_factorization = False
+        else:
+            self.reuse_factorization = self._options['REUSE_FACTORIZATION']
+        if self.reuse_factorization and self.linear_solver != 'SPLU':
+            raise ValueError('REUSE_FACTORIZATION requires LINEAR_SOLVER = "SPLU".')
+
+        if 'REUSE_RATIO' not in self._options:
+            self.reuse_ratio = 0.5
+        else:
+            self.reuse_ratio = self._options['REUSE_RATIO']
+
+        # Cached sparsity structure of the jacobian in CSC format with the columns permuted by the
+        # COLAMD ordering; see _set_csc_structure
+        self._perm_c = None
+        self._csc_inverse = None
+        self._csc_indices = None
+        self._csc_indptr = None
+        self._jac_nnz = None
+
+        # Counters; these accumulate over all calls to solve
+        self.num_solves = 0
+        self.num_iterations = 0
+        self.num_factorizations = 0
+        self.num_reused_factorizations = 0
+
+    def _set_csc_structure(self, J, perm_c=None):
+        """
+        Compute the mapping from the (fixed) coo structure of the jacobian to the CSC structure
+        of the jacobian with its columns permuted by perm_c. Duplicate entries are summed.
+        """
+        n = J.shape[0]
+        rows = np.asarray(J.row, dtype=np.int64)
+        cols = np.asarray(J.col, dtype=np.int64)
+        if perm_c is not None:
+            cols = np.asarray(perm_c, dtype=np.int64)[cols]
+        keys = cols*n + rows
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        self._csc_inverse = inverse
+        self._csc_indices = (unique_keys % n).astype(np.int32)
+        self._csc_indptr = np.zeros(n+1, dtype=np.int32)
+        np.cumsum(np.bincount(unique_keys // n, minlength=n), out=self._csc_indptr[1:])
+        self._jac_nnz = J.nnz
+        self._perm_c = perm_c
+
+    def _factorize(self, J):
+        """
+        Compute the LU factorization of the jacobian. The first time this is called, the
+        COLAMD column ordering is computed and cached. All subsequent factorizations
+        reuse the cached ordering and the cached CSC structure.
+
+        Returns
+        -------
+        solve: function
+            A function that returns the solution of J*d = r for a given r
+        """
+        J = J.tocoo()
+        if self._jac_nnz != J.nnz or self._perm_c is None:
+            self._set_csc_structure(J)
+            A = sp.csc_matrix((np.bincount(self._csc_inverse, weights=J.data, minlength=len(self._csc_indices)),
+                               self._csc_indices, self._csc_indptr), shape=J.shape)
+            lu = sp.linalg.splu(A, permc_spec='COLAMD')
+            self._set_csc_structure(J, lu.perm_c)
+            self.num_factorizations += 1
+            return lu.solve
+
+        A = sp.csc_matrix((np.bincount(self._csc_inverse, weights=J.data, minlength=len(self._csc_indices)),
+                           self._csc_indices, self._csc_indptr), shape=J.shape)
+        A.has_sorted_indices = True
+        lu = sp.linalg.splu(A, permc_spec='NATURAL')
+        perm_c = self._perm_c
+        self.num_factorizations += 1
+
+        def solve(r):
+            return lu.solve(r)[perm_c]
+
+        return solve
+
+    def _solve_linear_system(self, J, r):
+        """
+        Solve J*d = -r with the full jacobian.
+
+        Returns
+        -------
+        d: numpy array or None
+            The newton step; None if J is singular
+        """
+        if self.linear_solver == 'SPLU':
+            try:
+                self._lu_solve = self._factorize(J)
+            except RuntimeError:
+                return None
+            self._lu_is_current = True
+            return -self._lu_solve(r)
+
+        try:
+            return -sp.linalg.spsolve(J.tocsr(),r,permc_spec='COLAMD',use_umfpack=False)
+        except sp.linalg.MatrixRankWarning:
+            return None
+
+    def _get_newton_step(self, Jacobian, x, r, r_norm):
+        """
+        Compute the newton step at x.
+
+        Returns
+        -------
+        d: numpy array or None
+            The newton step; None if the jacobian is singular
+        """
+        if (self.reuse_factorization and self._lu_solve is not None and
+                r_norm <= self.reuse_ratio*self._prev_r_norm):
+            # The residual is decreasing quickly; keep using the old factorization (chord step)
+            self._lu_is_current = False
+            self.num_reused_factorizations += 1
+            return -self._lu_solve(r)
+        return self._solve_linear_system(Jacobian(x), r)
+
     def solve(self, Residual, Jacobian, x0):
 
         x = np.array(x0)
 
         use_r_ = False
+        self._lu_solve = None
+        self._lu_is_current = False
+        self._prev_r_norm = None
+        self.num_solves += 1
 
         # MAIN NEWTON LOOP
         for outer_iter in range(self.maxiter):
@@ -74,13 +206,13 @@ class NewtonSolver(object):
             if r_norm < self.tol:
                 return [x, outer_iter, 1, 'Solved Successfully']
 
-            J = Jacobian(x).tocsr()
+            self.num_iterations += 1
 
             # Call Linear solver
-            try:
-                d = -sp.linalg.spsolve(J,r,permc_spec='COLAMD',use_umfpack=False)
-            except sp.linalg.MatrixRankWarning:
+            d = self._get_newton_step(Jacobian, x, r, r_norm)
+            if d is None:
                 return [x, outer_iter, 0, 'Jacobian is singular at iteration ' + str(outer_iter)]
+            self._prev_r_norm = r_norm
 
             # Backtracking
             alpha = 1.0
@@ -97,12 +229,174 @@ class NewtonSolver(object):
                         alpha = alpha*self.rho
 
                 if iter_bt+1 >= self.bt_maxiter:
+                    if not self._lu_is_current and self._lu_solve is not None:
+                        # The step from the old factorization was not good enough; refactorize at x
+                        self._lu_solve = None
+                        r_ = r
+                        new_norm = r_norm
+                        continue
                     return [x,outer_iter,0, 'Line search failed at iteration ' + str(outer_iter)]
                 # logger.debug('iter: {0:<4d} norm: {1:<10.2e} alpha: {2:<10.2e}'.format(outer_iter, new_norm, alpha))
+            elif not self._lu_is_current and self._lu_solve is not None:
+                # A step from the old factorization is only taken if it decreases the residual, even
+                # before the line search starts; otherwise the jacobian is refactorized at x
+                use_r_ = True
+                x_ = x + d
+                r_ = Residual(x_)
+                new_norm = np.max(abs(r_))
+                if new_norm < (1.0-0.0001)*r_norm:
+                    x = x_
+                else:
+                    self._lu_solve = None
+                    r_ = r
+                    new_norm = r_norm
             else:
+                use_r_ = False
                 x += d
             
         return [x, outer_iter, 0, 'Reached maximum number of iterations: ' + str(outer_iter)]
 
 
+class GGASolver(NewtonSolver):
+    """
+    Global Gradient Algorithm solver class.
+
+    Each newton step is computed with the approach of Todini and Pilati [1]: the demands, flows,
+    leak demands, and the heads of tanks, reservoirs, and isolated junctions are eliminated from the
+    linearized hydraulic equations, leaving a symmetric positive definite system in the junction
+    heads only. The reduced system is factorized with CHOLMOD if scikit-sparse is installed and with
+    SuperLU (symmetric mode, no pivoting) otherwise. The step is identical to the step of the
+    NewtonSolver, so the same line search and convergence criteria are used.
+
+    If a step cannot be computed from the reduced system (a link whose headloss equation does not
+    depend on its flow, e.g., an active PRV), the full system is solved for that step instead.
+
+    The solver uses the jacobian blocks (jac_A through jac_I) of the HydraulicModel. Only the blocks
+    that depend on the solution are updated at each iteration (see
+    HydraulicModel.update_jacobian_blocks); the jacobian is only assembled when the full system is solved.
+
+    References
+    ----------
+    [1] Todini E, Pilati S. (1988). A gradient algorithm for the analysis of pipe networks.
+    Computer Applications in Water Supply, Vol. 1, 1-20.
+    """
+
+    def __init__(self, num_nodes, num_links, num_leaks, model, options=None):
+        super(GGASolver, self).__init__(num_nodes, num_links, num_leaks, model, options)
+        if self.reuse_factorization:
+            raise ValueError('REUSE_FACTORIZATION is not supported by the GGA solver.')
+
+        start = model.link_start_node_array
+        end = model.link_end_node_array
+        # each link contributes to the (start, start), (start, end), (end, start), and (end, end)
+        # entries of the reduced matrix
+        self._link_rows = np.concatenate((start, start, end, end))
+        self._link_cols = np.concatenate((start, end, start, end))
+        self._leak_node_ids = np.array(model._leak_ids, dtype=int)
+
+        self._cholmod_factor = None
+        self._cholmod_free_nodes = None
+
+        self.num_full_system_steps = 0
+
+    def _factorize_reduced_system(self, M, free_nodes, symmetric):
+        """
+        Returns a function that solves M*y = b
+        """
+        self.num_factorizations += 1
+        if symmetric and cholmod_cholesky is not None:
+            # the symbolic analysis is only redone if the set of free nodes changes
+            if self._cholmod_factor is None or not np.array_equal(free_nodes, self._cholmod_free_nodes):
+                self._cholmod_factor = cholmod_cholesky(M)
+                self._cholmod_free_nodes = free_nodes
+            else:
+                self._cholmod_factor.cholesky_inplace(M)
+            return self._cholmod_factor
+        if symmetric:
+            lu = sp.linalg.splu(M, permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0.0,
+                                options=dict(SymmetricMode=True))
+        else:
+            lu = sp.linalg.splu(M, permc_spec='COLAMD')
+        return lu.solve
+
+    def _get_newton_step(self, Jacobian, x, r, r_norm):
+        model = self.model
+        # only the blocks used by the reduced system are updated; the jacobian is assembled for the
+        # full system only
+        model.update_jacobian_blocks(x)
+        n = self.num_nodes
+        nl = self.num_links
+
+        D = model.jac_D.data
+        E = model.jac_E.data
+        F_start = model.jac_F.data[:nl]
+        F_end = model.jac_F.data[nl:]
+        G = model.jac_G.data
+        H = model.jac_H.data
+
+        if np.any(G == 0):
+            self.num_full_system_steps += 1
+            return self._solve_linear_system(Jacobian(x), r)
+
+        r1 = r[:n]
+        r2 = r[n:2*n]
+        r3 = r[2*n:2*n+nl]
+        r4 = r[2*n+nl:]
+
+        free = E != 0
+        free_nodes = np.flatnonzero(free)
+        fixed = np.logical_not(free)
+
+        # heads of tanks, reservoirs, and isolated junctions
+        dH = np.zeros(n)
+        dH[fixed] = -r2[fixed]/D[fixed]
+
+        # S*dH = rhs is the linear system after eliminating demands, flows, and leak demands
+        rhs = -r1 + model.node_balance_matrix*(r3/G) + model.jac_C*r4
+        rhs[free] -= r2[free]/E[free]
+
+        rows = self._link_rows
+        cols = self._link_cols
+        vals = np.concatenate((F_start/G, F_end/G, -F_start/G, -F_end/G))
+        diag = np.zeros(n)
+        diag[free] = D[free]/E[free]
+        diag[self._leak_node_ids] += H
+        rows = np.concatenate((rows, free_nodes))
+        cols = np.concatenate((cols, free_nodes))
+        vals = np.concatenate((vals, diag[free_nodes]))
+
+        # drop the rows of fixed nodes and move the columns of fixed nodes to the right hand side
+        keep = free[rows]
+        rows = rows[keep]
+        cols = cols[keep]
+        vals = vals[keep]
+        fixed_cols = fixed[cols]
+        rhs -= np.bincount(rows[fixed_cols], weights=vals[fixed_cols]*dH[cols[fixed_cols]], minlength=n)
+        free_cols = np.logical_not(fixed_cols)
+        reduced_ndx = np.zeros(n, dtype=int)
+        reduced_ndx[free_nodes] = np.arange(len(free_nodes))
+        n_free = len(free_nodes)
+        # M = -S is positive definite
+        M = sp.coo_matrix((-vals[free_cols], (reduced_ndx[rows[free_cols]], reduced_ndx[cols[free_cols]])),
+                          shape=(n_free, n_free)).tocsc()
+
+        power_pumps = model.power_pump_id_array
+        symmetric = np.all((model.isolated_link_array[power_pumps] == 1) |
+                           (model.closed_link_array[power_pumps] == 0))
+
+        if n_free > 0:
+            try:
+                reduced_solve = self._factorize_reduced_system(M, free_nodes, symmetric)
+                dH[free] = reduced_solve(-rhs[free])
+            except RuntimeError:
+                return None
+            if not np.all(np.isfinite(dH)):
+                return None
+
+        dD = np.zeros(n)
+        dD[free] = (-r2[free] - D[free]*dH[free])/E[free]
+        dQ = (-r3 - F_start*dH[model.link_start_node_array] - F_end*dH[model.link_end_node_array])/G
+        dL = -r4 - H*dH[self._leak_node_ids]
+        dD[fixed] = (r1 + model.node_balance_matrix*dQ + model.jac_C*dL)[fixed]
 
+        return np.concatenate((dH, dD, dQ, dL))
@@ -372,5 +372,97 @@ class TestControlCombinations(unittest.TestCase):
         self.assertEqual(flag1, True)
 
 
+class TestIndexedControlManager(unittest.TestCase):
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def _run(self, inp_file, indexed):
+        import wntr.sim.core
+        ControlManager = self.wntr.network.ControlManager
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        if not indexed:
+            wntr.sim.core.ControlManager = lambda wn=None: ControlManager()
+        try:
+            results = self.wntr.sim.WNTRSimulator(wn).run_sim()
+        finally:
+            wntr.sim.core.ControlManager = ControlManager
+        return results
+
+    def test_results_match_unindexed(self):
+        for inp_file in [join(ex_datadir, 'Net1.inp'), join(test_datadir, 'control_comb.inp'),
+                         join(test_datadir, 'cv_controls.inp'), join(test_datadir, 'tank_controls_1.inp')]:
+            res1 = self._run(inp_file, True)
+            res2 = self._run(inp_file, False)
+            self.assertEqual(list(res1.solver_iterations.index), list(res2.solver_iterations.index))
+            self.assertEqual(abs(res1.node['head'] - res2.node['head']).max().max(), 0.0)
+            self.assertEqual(abs(res1.link['flowrate'] - res2.link['flowrate']).max().max(), 0.0)
+            self.assertEqual(res2.control_evaluations['skipped'].sum(), 0)
+            self.assertEqual(res1.control_evaluations.sum().sum(), res2.control_evaluations['evaluated'].sum())
+
+    def test_control_evaluations(self):
+        res = self._run(join(test_datadir, 'cv_controls.inp'), True)
+        self.assertEqual(list(res.control_evaluations.columns), ['evaluated', 'skipped'])
+        self.assertEqual(list(res.control_evaluations.index), list(res.solver_iterations.index))
+        self.assertGreater(res.control_evaluations['skipped'].sum(), 0)
+
+    def test_time_heap(self):
+        inp_file = join(test_datadir, 'time_controls.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        pipe1 = wn.get_link('pipe1')
+        action = self.wntr.network.ControlAction(pipe1, 'status', self.wntr.network.LinkStatus.closed)
+        control = self.wntr.network.controls.Control._time_control(wn, 5*3600, 'SIM_TIME', False, action)
+        manager = self.wntr.network.ControlManager(wn)
+        manager.register_control(control)
+
+        wn._prev_sim_time = 3600
+        wn.sim_time = 2*3600
+        self.assertEqual(manager.check(), [])
+        self.assertEqual(manager.num_evaluated, 0)
+        self.assertEqual(manager.num_skipped, 1)
+
+        wn.sim_time = 6*3600
+        self.assertEqual(manager.check(), [(control, 3600)])
+        self.assertEqual(manager.num_evaluated, 1)
+
+        # the control can not be activated after the previous solve passed the threshold
+        wn._prev_sim_time = 6*3600
+        wn.sim_time = 7*3600
+        self.assertEqual(manager.check(), [])
+        wn.sim_time = 8*3600
+        self.assertEqual(manager.check(), [])
+        self.assertEqual(manager.num_evaluated, 2)
+        self.assertEqual(manager.num_skipped, 2)
+
+    def test_value_conditions_skipped_until_changed(self):
+        inp_file = join(test_datadir, 'conditional_controls_1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        junction1 = wn.get_node('junction1')
+        junction1.head = 100.0
+        pipe1 = wn.get_link('pipe1')
+        action = self.wntr.network.ControlAction(pipe1, 'status', self.wntr.network.LinkStatus.closed)
+        condition = self.wntr.network.controls.ValueCondition(junction1, 'head', '<=', 99.0)
+        control = self.wntr.network.Control(condition, action)
+        manager = self.wntr.network.ControlManager(wn)
+        manager.register_control(control)
+
+        self.assertEqual(manager.check(), [])
+        self.assertEqual(manager.num_evaluated, 1)
+        # the condition is only evaluated again once the change of the junction is reported
+        junction1.head = 98.0
+        self.assertEqual(manager.check(), [])
+        self.assertEqual(manager.num_evaluated, 1)
+        manager.mark_changed([junction1])
+        self.assertEqual(manager.check(), [(control, 0)])
+        self.assertEqual(manager.check(), [(control, 0)])
+        self.assertEqual(manager.num_evaluated, 2)
+        self.assertEqual(manager.num_skipped, 2)
+
+
 if __name__ == '__main__':
     unittest.main()
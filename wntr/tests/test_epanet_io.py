@@ -232,5 +232,379 @@ class TestNet3InpUnitsResults(unittest.TestCase):
             for t in self.results2.link['flowrate'].index:
                 self.assertLessEqual(abs(self.results2.link['flowrate'].loc[t,link_name] - self.results.link['flowrate'].loc[t,link_name]), 0.00001)
 
+class TestMemmapBinFile(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+        import tempfile
+        self.tmp_dir = tempfile.mkdtemp()
+        self.bin_file = join(self.tmp_dir, 'tmp_memmap.bin')
+
+        inp_file = join(ex_datadir, 'Net3.inp')
+        self.wn = self.wntr.network.WaterNetworkModel(inp_file)
+        sim = self.wntr.sim.EpanetSimulator(self.wn)
+        self.results = sim.run_sim(file_prefix=join(self.tmp_dir, 'tmp_memmap'))
+
+    @classmethod
+    def tearDownClass(self):
+        import shutil
+        shutil.rmtree(self.tmp_dir)
+
+    def test_all_results(self):
+        with self.wntr.epanet.io.MemmapBinFile(self.bin_file) as reader:
+            self.assertEqual(reader.data.shape, (len(self.results.node['head'].index),))
+            results = reader.read()
+        for key, value in self.results.node.items():
+            self.assertLess(abs(results.node[key] - value.astype(float)).max().max(), 1e-4)
+        for key, value in self.results.link.items():
+            self.assertLess(abs(results.link[key] - value.astype(float)).max().max(), 1e-4)
+
+    def test_selection(self):
+        with self.wntr.epanet.io.MemmapBinFile(self.bin_file) as reader:
+            pressure = reader.get_results('pressure', ['10', '15'], start_time=3600, end_time=7200)
+            self.assertRaises(KeyError, reader.get_results, 'pressure', ['not a node'])
+        self.assertEqual(list(pressure.columns), ['10', '15'])
+        self.assertEqual(list(pressure.index), [3600, 4500, 5400, 6300, 7200])
+        expected = self.results.node['pressure'].loc[3600:7200, ['10', '15']]
+        self.assertLess(abs(pressure - expected.astype(float)).max().max(), 1e-4)
+
+    def test_iter_periods(self):
+        times = []
+        with self.wntr.epanet.io.MemmapBinFile(self.bin_file) as reader:
+            for t, values in reader.iter_periods(['head', 'flowrate'], nodes=['10'], links=['20'], end_time=3600):
+                times.append(t)
+                self.assertEqual(set(values.keys()), set(['head', 'flowrate']))
+                self.assertAlmostEqual(values['head'][0], self.results.node['head'].at[t, '10'], 4)
+                self.assertAlmostEqual(values['flowrate'][0], self.results.link['flowrate'].at[t, '20'], 4)
+        self.assertEqual(times, [0, 900, 1800, 2700, 3600])
+
+
+class TestInMemoryEpanetSimulator(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        import tempfile
+        self.wntr = wntr
+        self.tmp_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(self):
+        import shutil
+        shutil.rmtree(self.tmp_dir)
+
+    def _compare(self, wn, **kwds):
+        sim = self.wntr.sim.EpanetSimulator(wn, **kwds)
+        expected = sim.run_sim(file_prefix=join(self.tmp_dir, 'tmp_inmemory'))
+        results = sim.run_sim(in_memory=True)
+        for key, value in results.node.items():
+            self.assertEqual(list(value.index), list(expected.node[key].index))
+            self.assertLess(abs(value - expected.node[key].astype(float)).max().max(), 1e-3)
+        for key, value in results.link.items():
+            if key == 'status':
+                continue
+            self.assertLess(abs(value - expected.link[key].astype(float)).max().max(), 1e-3)
+        return results
+
+    def test_hydraulics(self):
+        inp_file = join(ex_datadir, 'Net3.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        wn.options.time.duration = 24*3600
+        results = self._compare(wn)
+        self.assertIn('pressure', results.node)
+        self.assertIn('quality', results.node)
+
+    def test_quality(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        self._compare(wn)
+
+    def test_result_types(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        result_types = [self.wntr.epanet.util.ResultType.pressure, self.wntr.epanet.util.ResultType.flowrate]
+        results = self._compare(wn, result_types=result_types)
+        self.assertEqual(list(results.node.keys()), ['pressure'])
+        self.assertEqual(list(results.link.keys()), ['flowrate'])
+
+class TestInpFileCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+    def setUp(self):
+        import tempfile
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.cache_dir)
+
+    def _cache_files(self):
+        import os
+        return sorted(f for f in os.listdir(self.cache_dir) if f.endswith('.pkl'))
+
+    def test_cached_model(self):
+        inp_file = join(ex_datadir, 'Net3.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        wn1 = self.wntr.network.WaterNetworkModel(inp_file, cache_dir=self.cache_dir)
+        self.assertEqual(len(self._cache_files()), 1)
+        wn2 = self.wntr.network.WaterNetworkModel(inp_file, cache_dir=self.cache_dir)
+        self.assertEqual(len(self._cache_files()), 1)
+        self.assertTrue(wn._compare(wn1))
+        self.assertTrue(wn._compare(wn2))
+        self.assertEqual(wn2.name, inp_file)
+
+        # references to the model are restored to the new model
+        self.assertIs(wn2._inpfile.wn, wn2)
+        self.assertIs(wn2._inpfile, wn2._inpfile.wn._inpfile)
+        self.assertIsNot(wn2.get_node('10'), wn1.get_node('10'))
+        wn2.get_node('10').elevation = 0.0
+        self.assertNotEqual(wn1.get_node('10').elevation, 0.0)
+
+        res = self.wntr.sim.WNTRSimulator(wn).run_sim()
+        res2 = self.wntr.sim.WNTRSimulator(wn2).run_sim()
+        self.assertAlmostEqual(abs(res.node['head'] - res2.node['head']).max().max(), 0.0, 10)
+
+    def test_multiple_files(self):
+        with open(join(ex_datadir, 'Net1.inp'), 'r') as f:
+            lines = f.readlines()
+        split = lines.index('[PUMPS]\n')
+        file1 = join(self.cache_dir, 'part1.inp')
+        file2 = join(self.cache_dir, 'part2.inp')
+        with open(file1, 'w') as f:
+            f.writelines(lines[:split])
+        with open(file2, 'w') as f:
+            f.writelines(lines[split:])
+
+        wn = self.wntr.epanet.InpFile().read([file1, file2])
+        wn1 = self.wntr.epanet.InpFile().read([file1, file2], cache_dir=self.cache_dir)
+        wn2 = self.wntr.epanet.InpFile().read([file1, file2], cache_dir=self.cache_dir)
+        self.assertTrue(wn._compare(wn1))
+        self.assertTrue(wn._compare(wn2))
+        self.assertEqual(len(self._cache_files()), 1)
+
+        # a change in any of the files invalidates the cache entry
+        with open(file2, 'w') as f:
+            f.writelines([line.replace('1500', '1600') for line in lines[split:]])
+        wn3 = self.wntr.epanet.InpFile().read([file1, file2], cache_dir=self.cache_dir)
+        self.assertEqual(len(self._cache_files()), 2)
+        self.assertFalse(wn._compare(wn3))
+
+        # a single file is a different entry
+        self.wntr.epanet.InpFile().read(join(ex_datadir, 'Net1.inp'), cache_dir=self.cache_dir)
+        self.assertEqual(len(self._cache_files()), 3)
+
+    def test_non_empty_model(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel()
+        wn.add_junction('extra', base_demand=0.01, elevation=10)
+        wn.options.time.duration = 7
+        self.wntr.epanet.InpFile().read(inp_file, wn=wn, cache_dir=self.cache_dir)
+        self.assertEqual(len(self._cache_files()), 0)
+        self.assertIn('extra', wn.node_name_list)
+
+        wn2 = self.wntr.network.WaterNetworkModel(inp_file, cache_dir=self.cache_dir)
+        self.assertEqual(len(self._cache_files()), 1)
+        self.assertNotIn('extra', wn2.node_name_list)
+        wn3 = self.wntr.network.WaterNetworkModel()
+        wn3.add_junction('extra', base_demand=0.01, elevation=10)
+        self.wntr.epanet.InpFile().read(inp_file, wn=wn3, cache_dir=self.cache_dir)
+        self.assertIn('extra', wn3.node_name_list)
+        self.assertEqual(wn3.num_nodes, wn2.num_nodes + 1)
+
+    def test_invalid_entry(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file, cache_dir=self.cache_dir)
+        cache_file = join(self.cache_dir, self._cache_files()[0])
+        with open(cache_file, 'wb') as f:
+            f.write(b'not a cache entry')
+        wn2 = self.wntr.network.WaterNetworkModel(inp_file, cache_dir=self.cache_dir)
+        self.assertTrue(wn._compare(wn2))
+        # the entry is rewritten
+        wn3 = self.wntr.network.WaterNetworkModel(inp_file, cache_dir=self.cache_dir)
+        self.assertTrue(wn._compare(wn3))
+        self.assertGreater(len(open(cache_file, 'rb').read()), 100)
+
+
+class TestCachedSections(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+    def setUp(self):
+        import tempfile
+        self.tmp_dir = tempfile.mkdtemp()
+        self.wn = self.wntr.network.WaterNetworkModel(join(ex_datadir, 'Net3.inp'))
+        self.wn.name = None  # no time stamp in the file
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, cache_sections):
+        inp_file = join(self.tmp_dir, 'cached.inp' if cache_sections else 'full.inp')
+        self.wn.write_inpfile(inp_file, cache_sections=cache_sections)
+        with open(inp_file, 'rb') as f:
+            return f.read()
+
+    def _assert_current(self):
+        self.assertEqual(self._write(True), self._write(False))
+
+    def test_changes(self):
+        self._assert_current()
+        pipes = self.wn._inpfile._section_cache['[PIPES]']
+        self._assert_current()
+        self.assertIs(self.wn._inpfile._section_cache['[PIPES]'], pipes)
+
+        junction = self.wn.get_node('10')
+        junction.elevation = junction.elevation + 1.0
+        self._assert_current()
+        self.assertIs(self.wn._inpfile._section_cache['[PIPES]'], pipes)
+        junction.coordinates = (1.0, 2.0)
+        junction.initial_quality = 0.5
+        junction.tag = 'A'
+        self._assert_current()
+
+        junction = self.wn.get_node('15')
+        junction.demand_timeseries_list[0].base_value = 0.01
+        junction.demand_timeseries_list.append((0.02, self.wn.get_pattern('2'), 'other'))
+        self._assert_current()
+
+        self.wn.get_link('20').roughness = 120
+        self.wn.get_link('40').vertices = [(1.0, 2.0)]
+        self._assert_current()
+        self.assertIsNot(self.wn._inpfile._section_cache['[PIPES]'], pipes)
+
+        self.wn.add_junction('new', base_demand=0.01, elevation=10, coordinates=(1, 2))
+        self.wn.add_pipe('new_pipe', 'new', '10')
+        self._assert_current()
+        self.wn.options.hydraulic.pattern = '2'
+        self._assert_current()
+        self.wn.write_inpfile(join(self.tmp_dir, 'cmh.inp'), units='CMH', cache_sections=True)
+        self.wn.write_inpfile(join(self.tmp_dir, 'cmh_full.inp'), units='CMH')
+        with open(join(self.tmp_dir, 'cmh.inp'), 'rb') as f1, open(join(self.tmp_dir, 'cmh_full.inp'), 'rb') as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+    def test_unchanged_rewrite(self):
+        text = self._write(True)
+        cache = dict(self.wn._inpfile._section_cache)
+        self.assertEqual(self._write(True), text)
+        for section, lines in self.wn._inpfile._section_cache.items():
+            self.assertIs(lines, cache[section])
+        self.assertEqual(self._write(False), text)
+
+    def test_remove_and_vertices(self):
+        self._assert_current()
+        self.wn.remove_link('20')
+        self._assert_current()
+        self.wn.get_link('40').vertices.append((1.0, 2.0))
+        self._assert_current()
+
+    def test_simulation_state(self):
+        self._assert_current()
+        state = self.wn._inpfile._section_state('[JUNCTIONS]', self.wn)
+        self.wn.options.time.duration = 3600
+        self.wntr.sim.WNTRSimulator(self.wn).run_sim()
+        self.assertEqual(self.wn._inpfile._section_state('[JUNCTIONS]', self.wn), state)
+
+    def test_copy(self):
+        import copy
+        self._assert_current()
+        wn2 = copy.deepcopy(self.wn)
+        self.assertIsNot(wn2._node_reg._cache_token, self.wn._node_reg._cache_token)
+
+    def test_checkpoint(self):
+        original = self._write(False)
+        self.wn.checkpoint()
+        self.wn.get_node('10').elevation = 0.0
+        self.wn.get_link('20').diameter = 0.1
+        self.assertNotEqual(self._write(True), original)
+        self.wn.restore_checkpoint()
+        self.assertEqual(self._write(True), original)
+
+
+class TestBulkRead(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+    def setUp(self):
+        self._bulk_read = self.wntr.epanet.InpFile._bulk_read
+
+    def tearDown(self):
+        self.wntr.epanet.InpFile._bulk_read = self._bulk_read
+
+    def _read(self, inp_file, bulk):
+        self.wntr.epanet.InpFile._bulk_read = bulk
+        return self.wntr.network.WaterNetworkModel(inp_file)
+
+    def _assert_same(self, wn1, wn2):
+        self.assertTrue(wn1._compare(wn2))
+        self.assertEqual(wn1.node_name_list, wn2.node_name_list)
+        self.assertEqual(wn1.link_name_list, wn2.link_name_list)
+        self.assertEqual(wn1._check_valves, wn2._check_valves)
+        self.assertEqual(wn1.options.hydraulic.pattern, wn2.options.hydraulic.pattern)
+        for name, node in wn1.nodes():
+            node2 = wn2.get_node(name)
+            self.assertEqual(node.coordinates, node2.coordinates)
+            if node.node_type == 'Junction':
+                demands1 = [(d.base_value, d.pattern_name, d.category) for d in node.demand_timeseries_list]
+                demands2 = [(d.base_value, d.pattern_name, d.category) for d in node2.demand_timeseries_list]
+                self.assertEqual(demands1, demands2)
+        for name, link in wn1.links():
+            link2 = wn2.get_link(name)
+            self.assertEqual(link.vertices, link2.vertices)
+            self.assertEqual(link.initial_status, link2.initial_status)
+            self.assertEqual((link.start_node_name, link.end_node_name), (link2.start_node_name, link2.end_node_name))
+        for name, pattern in wn1.patterns():
+            self.assertEqual(list(pattern.multipliers), list(wn2.get_pattern(name).multipliers))
+
+    def test_net6(self):
+        inp_file = join(ex_datadir, 'Net6.inp')
+        self._assert_same(self._read(inp_file, False), self._read(inp_file, True))
+
+    def test_sections(self):
+        import tempfile
+        import shutil
+        with open(join(ex_datadir, 'Net1.inp'), 'r') as f:
+            text = f.read()
+        text = text.replace(' 10              \t10              \t11              \t10530       \t18          \t100         \t0           \tOpen',
+                            ' 10              \t10              \t11              \t10530       \t18          \t100         \t0           \tCV')
+        text = text.replace(' 12              \t12              \t13              \t5280        \t10          \t100         \t0           \tOpen',
+                            ' 12              \t12              \t13              \t5280        \t10          \t100         \t0           \tClosed')
+        text = text.replace(' 13              \t695         \t100         \t                \t;', ' 13 695')
+        text = text.replace(' 21              \t700         \t150         \t                \t;', ' 21 700 150 2 ; junction 21')
+        text = text.replace('[VERTICES]\n', '[VERTICES]\n 10 1.5 2.5\n 10 3.5 4.5 ; second vertex\n 11 1.0\n')
+        text = text.replace('[DEMANDS]\n', '[DEMANDS]\n 12 50 2 ;residential\n 12 1.5e1\n 13 20 1\n')
+        text = text.replace('[PATTERNS]\n', '[PATTERNS]\n 2 1.0 2.0\n 2 3.0\n')
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            inp_file = join(tmp_dir, 'sections.inp')
+            with open(inp_file, 'w') as f:
+                f.write(text)
+            wn1 = self._read(inp_file, False)
+            wn2 = self._read(inp_file, True)
+        finally:
+            shutil.rmtree(tmp_dir)
+        self._assert_same(wn1, wn2)
+        self.assertTrue(wn2.get_link('10').cv)
+        self.assertEqual(wn2.get_link('12').initial_status, self.wntr.network.LinkStatus.Closed)
+        self.assertEqual(wn2.get_link('10').vertices, [(1.5, 2.5), (3.5, 4.5)])
+        self.assertEqual(len(wn2.get_node('12').demand_timeseries_list), 3)
+        self.assertEqual(wn2.get_node('12').demand_timeseries_list[1].category, 'residential')
+        self.assertEqual(wn2.get_node('21').demand_timeseries_list[0].pattern_name, '2')
+        self.assertEqual(list(wn2.get_pattern('2').multipliers), [1.0, 2.0, 3.0])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
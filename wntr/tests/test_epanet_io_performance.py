@@ -0,0 +1,134 @@
+from __future__ import print_function
+import unittest
+import io
+import os
+import time
+import shutil
+import tempfile
+from os.path import abspath, dirname, join
+
+testdir = dirname(abspath(str(__file__)))
+test_datadir = join(testdir,'networks_for_testing')
+ex_datadir = join(testdir,'..','..','examples','networks')
+
+# The benchmarks read and write a model with more than 100000 junctions and pipes; they
+# are skipped unless WNTR_BENCHMARKS is set. The models they compare are checked on the
+# example networks in test_epanet_io.
+run_benchmarks = bool(os.environ.get('WNTR_BENCHMARKS'))
+
+
+def replicate_inp(inp_file, copies, out_file):
+    """
+    Write an INP file with the junctions and pipes of inp_file replicated.
+
+    Copy i (i > 0) of each junction and pipe is named with the suffix '_i';
+    pipes connect the copies of their junctions (or the original tank or
+    reservoir). A vertex is added to each pipe and a demand to each junction.
+    """
+    with io.open(inp_file, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    junctions = set()
+    pipes = []
+    section = None
+    for line in lines:
+        words = line.split(';')[0].split()
+        if len(words) == 0:
+            continue
+        if words[0].startswith('['):
+            section = words[0].upper()
+        elif section == '[JUNCTIONS]':
+            junctions.add(words[0])
+        elif section == '[PIPES]':
+            pipes.append(words[0])
+    junctions = sorted(junctions)
+    suffixes = [''] + ['_{}'.format(i) for i in range(1, copies)]
+
+    out = []
+    section = None
+    for line in lines:
+        words = line.split(';')[0].split()
+        if len(words) > 0 and words[0].startswith('['):
+            section = words[0].upper()
+            out.append(line)
+            if section == '[VERTICES]':
+                out.extend('{}{}\t1.5\t2.5'.format(name, suffix) for suffix in suffixes for name in pipes)
+            elif section == '[DEMANDS]':
+                out.extend('{}{}\t0.25\tPATTERN-0\t;extra'.format(name, suffix) for suffix in suffixes
+                           for name in junctions)
+            continue
+        if len(words) == 0 or section not in ('[JUNCTIONS]', '[PIPES]', '[COORDINATES]') or \
+                (section == '[COORDINATES]' and words[0] not in junctions):
+            out.append(line)
+            continue
+        for suffix in suffixes:
+            copy = [words[0] + suffix] + words[1:]
+            if section == '[PIPES]':
+                for i in (1, 2):
+                    if copy[i] in junctions:
+                        copy[i] = copy[i] + suffix
+            out.append('\t'.join(copy))
+
+    with io.open(out_file, 'w', encoding='utf-8') as f:
+        f.write(u'\n'.join(out) + u'\n')
+
+
+@unittest.skipUnless(run_benchmarks, 'set WNTR_BENCHMARKS to run the benchmarks')
+class TestInpPerformance(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+        self.tmp_dir = tempfile.mkdtemp()
+        self.inp_file = join(self.tmp_dir, 'Net6_x30.inp')
+        replicate_inp(join(ex_datadir, 'Net6.inp'), 30, self.inp_file)
+        self._bulk_read = wntr.epanet.InpFile._bulk_read
+
+    @classmethod
+    def tearDownClass(self):
+        self.wntr.epanet.InpFile._bulk_read = self._bulk_read
+        shutil.rmtree(self.tmp_dir)
+
+    def _read(self, bulk):
+        self.wntr.epanet.InpFile._bulk_read = bulk
+        t0 = time.time()
+        wn = self.wntr.network.WaterNetworkModel(self.inp_file)
+        return wn, time.time() - t0
+
+    def test_bulk_read(self):
+        wn1, line_time = self._read(False)
+        wn2, bulk_time = self._read(True)
+        print('Net6 x 30 ({} junctions, {} pipes): per-line read {:.2f} s, bulk read {:.2f} s'.format(
+              wn2.num_junctions, wn2.num_pipes, line_time, bulk_time))
+        self.assertGreater(wn2.num_junctions + wn2.num_pipes, 100000)
+        self.assertEqual(wn1.node_name_list, wn2.node_name_list)
+        self.assertEqual(wn1.link_name_list, wn2.link_name_list)
+        self.assertTrue(wn1._compare(wn2))
+        self.assertLess(bulk_time, line_time)
+
+    def test_cached_write(self):
+        wn, read_time = self._read(True)
+        wn.name = None  # no time stamp in the file
+        out_file = join(self.tmp_dir, 'out.inp')
+        t0 = time.time()
+        wn.write_inpfile(out_file, cache_sections=True)
+        write_time = time.time() - t0
+        with open(out_file, 'rb') as f:
+            text = f.read()
+        t0 = time.time()
+        wn.write_inpfile(out_file, cache_sections=True)
+        cached_time = time.time() - t0
+        with open(out_file, 'rb') as f:
+            self.assertEqual(f.read(), text)
+        junction = wn.get_node(wn.junction_name_list[0])
+        junction.elevation = junction.elevation + 1.0
+        t0 = time.time()
+        wn.write_inpfile(out_file, cache_sections=True)
+        changed_time = time.time() - t0
+        print('Net6 x 30: write {:.2f} s, unchanged rewrite {:.2f} s, rewrite after a junction change {:.2f} s'.format(
+              write_time, cached_time, changed_time))
+        self.assertLess(cached_time, write_time)
+
+if __name__ == '__main__':
+    unittest.main()
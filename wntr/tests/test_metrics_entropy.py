@@ -5,6 +5,7 @@ import wntr
 
 testdir = dirname(abspath(str(__file__)))
 datadir = join(testdir, 'networks_for_testing')
+netdir = join(testdir, '..', '..', 'examples', 'networks')
 
 def test_layout1():
     inp_file = join(datadir,'Awumah_layout1.inp')
@@ -90,6 +91,68 @@ def test_layout8():
     error = abs((S_ave - expected_S_ave)/expected_S_ave)
     assert_less(error, 0.05) # 5% error
 
+def _net3_flow_graphs(hours):
+    inp_file = join(netdir, 'Net3.inp')
+    wn = wntr.network.WaterNetworkModel(inp_file)
+    wn.options.time.duration = 24*3600
+    sim = wntr.sim.WNTRSimulator(wn)
+    results = sim.run_sim()
+    flowrate = results.link['flowrate']
+    graphs = []
+    for hour in hours:
+        flow = flowrate.loc[hour*3600, :]
+        G = wn.get_graph()
+        G.weight_graph(link_attribute=flow)
+        # links without flow are not part of any path
+        G.remove_edges_from([(node1, node2, link_name) for (node1, node2, link_name, data) in 
+                             G.edges(keys=True, data=True) if data['weight'] == 0])
+        graphs.append(G)
+    return wn, flowrate, graphs
+
+def test_dynamic_programming():
+    wn, flowrate, graphs = _net3_flow_graphs([0, 10])
+    sources = ['Lake', 'River']
+    for G in graphs:
+        [S1, S_ave1] = wntr.metrics.hydraulic._entropy_simple_paths(G, sources, list(G.nodes()))
+        for collapse_series in [False, True]:
+            [S, S_ave] = wntr.metrics.entropy(G, sources=sources, collapse_series=collapse_series)
+            assert_set_equal(set(S.index), set(S1.index))
+            assert_true(S.isnull().equals(S1.isnull()))
+            assert_less(abs(S - S1).max(), 1e-10)
+            assert_less(abs(S_ave - S_ave1), 1e-10)
+
+def test_parallel_links():
+    inp_file = join(netdir,'Net1.inp')
+    wn = wntr.network.WaterNetworkModel(inp_file)
+    wn.add_pipe('110b', '2', '12')
+    wn.add_pipe('21b', '21', '22')
+    G = wn.get_graph()
+    flow = dict((name, 1.0 + i) for i, name in enumerate(wn.link_name_list))
+    G.weight_graph(link_attribute=flow)
+
+    [S1, S_ave1] = wntr.metrics.hydraulic._entropy_simple_paths(G, ['9', '2'], list(G.nodes()))
+    [S, S_ave] = wntr.metrics.entropy(G, sources=['9', '2'], collapse_series=True)
+    assert_less(abs(S - S1).max(), 1e-10)
+    assert_less(abs(S_ave - S_ave1), 1e-10)
+
+    # a cycle, the simple paths are enumerated
+    G.add_edge('23', '13', key='cycle', type='Pipe', weight=1.0)
+    [S, S_ave] = wntr.metrics.entropy(G, sources=['9', '2'])
+    [S1, S_ave1] = wntr.metrics.hydraulic._entropy_simple_paths(G, ['9', '2'], list(G.nodes()))
+    assert_less(abs(S - S1).max(), 1e-10)
+
+def test_entropy_timeseries():
+    wn, flowrate, graphs = _net3_flow_graphs([0, 5, 10, 15, 20])
+    [S, S_ave] = wntr.metrics.entropy_timeseries(flowrate, wn, collapse_series=True)
+    assert_list_equal(list(S.columns), wn.node_name_list)
+    assert_list_equal(list(S.index), list(flowrate.index))
+    for hour, G in zip([0, 5, 10, 15, 20], graphs):
+        [S1, S_ave1] = wntr.metrics.entropy(G)
+        S1 = S1[S.columns]
+        assert_true(S.loc[hour*3600, :].isnull().equals(S1.isnull()))
+        assert_less(abs(S.loc[hour*3600, :] - S1).max(), 1e-10)
+        assert_less(abs(S_ave.loc[hour*3600] - S_ave1), 1e-10)
+
 if __name__ == '__main__':
     test_layout1()
     test_layout8()
@@ -124,6 +124,51 @@ def test_extent_contaminated():
     error = abs((EC[12*3600] - expected)/expected)
     assert_less(error, 0.01) # 1% error
 
+def test_contamination_impact_ensemble():
+    import numpy as np
+    import pandas as pd
+    inp_file = join(net3dir,'Net3.inp')
+    wn = wntr.network.WaterNetworkModel(inp_file)
+    
+    # uneven report times
+    times = np.array([0, 300, 3600, 3900, 7200, 10800])
+    nodes = wn.junction_name_list
+    rng = np.random.RandomState(0)
+    demand = rng.rand(4, len(times), len(nodes)) - 0.2
+    quality = rng.rand(4, len(times), len(nodes))
+    flowrate = rng.randn(4, len(times), wn.num_pipes)
+    
+    impact = wntr.metrics.ContaminationImpact(wn, times, nodes)
+    assert_list_equal(list(impact.timestep), [300, 3300, 300, 3300, 3600, 3600])
+    MC = impact.mass_consumed(demand, quality)
+    VC = impact.volume_consumed(demand, quality, 0.5)
+    EC = impact.extent(quality, flowrate, 0.5)
+    assert_equal(MC.shape, demand.shape)
+    assert_equal(EC.shape, (4, len(times)))
+    
+    for i in range(4):
+        d = pd.DataFrame(demand[i], index=times, columns=nodes)
+        q = pd.DataFrame(quality[i], index=times, columns=nodes)
+        f = pd.DataFrame(flowrate[i], index=times, columns=wn.pipe_name_list)
+        assert_less(abs(wntr.metrics.mass_contaminant_consumed(d, q).values - MC[i]).max(), 1e-10)
+        assert_less(abs(wntr.metrics.volume_contaminant_consumed(d, q, 0.5).values - VC[i]).max(), 1e-10)
+        assert_less(abs(wntr.metrics.extent_contaminant(q, f, wn, 0.5).values - EC[i]).max(), 1e-8)
+        
+        # mass consumed uses the interval to the next report time
+        expected = demand[i,1]*3300*quality[i,1]*(demand[i,1] > 0)
+        assert_less(abs(MC[i,1] - expected).max(), 1e-10)
+        
+        # extent is the length of pipes that have been contaminated
+        ever = np.zeros(wn.num_pipes, dtype=bool)
+        for t in range(len(times)):
+            for j, name in enumerate(wn.pipe_name_list):
+                pipe = wn.get_link(name)
+                node = pipe.start_node_name if flowrate[i,t,j] > 0 else pipe.end_node_name
+                if node in nodes and quality[i,t,nodes.index(node)] > 0.5:
+                    ever[j] = True
+            length = sum(wn.get_link(name).length for j, name in enumerate(wn.pipe_name_list) if ever[j])
+            assert_less(abs(EC[i,t] - length), 1e-8)
+
 if __name__ == '__main__':
     test_average_expected_demand_net3_node101()
     test_population_net3()
@@ -131,3 +176,4 @@ if __name__ == '__main__':
     test_mass_consumed()
     test_volume_consumed()
     test_extent_contaminated()
+    test_contamination_impact_ensemble()
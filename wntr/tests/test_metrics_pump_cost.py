@@ -44,5 +44,46 @@ class TestPumpCost(unittest.TestCase):
 
         self.assertAlmostEqual(avg_cost_sum, 0.070484, 5)
 
+    def test_pump_energy(self):
+        import numpy as np
+        import pandas as pd
+        flowrate = self.results.link['flowrate']
+        head = self.results.node['head']
+        energy = self.wntr.metrics.pump_energy(flowrate, head, self.wn)
+        self.assertEqual(list(energy.columns), self.wn.pump_name_list)
+        for pump_name, pump in self.wn.pumps():
+            headloss = head.loc[:, pump.end_node_name] - head.loc[:, pump.start_node_name]
+            expected = 1000.0*9.81*headloss*flowrate.loc[:, pump_name]/0.75
+            self.assertTrue(np.allclose(energy.loc[:, pump_name], expected))
+
+        # ensemble of two scenarios, as stacked DataFrames and as arrays
+        stacked_flowrate = pd.concat({'a': flowrate, 'b': 2*flowrate})
+        stacked_head = pd.concat({'a': head, 'b': head})
+        stacked = self.wntr.metrics.pump_energy(stacked_flowrate, stacked_head, self.wn)
+        self.assertTrue(np.allclose(stacked.loc['a'].values, energy.values))
+        self.assertTrue(np.allclose(stacked.loc['b'].values, 2*energy.values))
+        arrays = self.wntr.metrics.pump_energy(
+            np.stack([flowrate.loc[:, self.wn.link_name_list].values]*3),
+            np.stack([head.loc[:, self.wn.node_name_list].values]*3), self.wn)
+        self.assertEqual(arrays.shape, (3, len(flowrate.index), self.wn.num_pumps))
+        self.assertTrue(np.allclose(arrays[2], energy.values))
+
+    def test_efficiency_curve(self):
+        import numpy as np
+        flowrate = self.results.link['flowrate']
+        head = self.results.node['head']
+        pump_name = self.wn.pump_name_list[0]
+        pump = self.wn.get_link(pump_name)
+        self.wn.add_curve('effic', 'EFFICIENCY', [(0.0, 50.0), (0.1, 80.0), (0.2, 60.0)])
+        pump.efficiency = self.wn.get_curve('effic')
+        try:
+            energy = self.wntr.metrics.pump_energy(flowrate, head, self.wn)
+        finally:
+            pump.efficiency = None
+        efficiency = np.interp(flowrate.loc[:, pump_name], [0.0, 0.1, 0.2], [0.5, 0.8, 0.6])
+        headloss = head.loc[:, pump.end_node_name] - head.loc[:, pump.start_node_name]
+        expected = 1000.0*9.81*headloss*flowrate.loc[:, pump_name]/efficiency
+        self.assertTrue(np.allclose(energy.loc[:, pump_name], expected))
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -160,5 +160,45 @@ def test_Net6():
     error = abs((Tmin - expected_Tmin)/expected_Tmin)
     assert_less(error, 0.1) # 10% error
 
+def test_ensemble():
+    import pandas as pd
+    inp_file = join(net6dir,'Net3.inp')
+    wn = wntr.network.WaterNetworkModel(inp_file)
+    wn.options.time.duration = 24*3600
+    sim = wntr.sim.WNTRSimulator(wn)
+    results = sim.run_sim()
+    head = results.node['head']
+    pressure = results.node['pressure']
+    demand = results.node['demand']
+    flowrate = results.link['flowrate']
+    todini = wntr.metrics.todini_index(head, pressure, demand, flowrate, wn, 30)
+
+    # element by element
+    POut = 0
+    PExp = 0
+    for name in wn.junction_name_list:
+        POut = POut + demand[name]*head[name]
+        PExp = PExp + demand[name]*(30 + head[name] - pressure[name])
+    PInRes = 0
+    for name in wn.reservoir_name_list:
+        PInRes = PInRes - demand[name]*head[name]
+    PInPump = 0
+    for name, pump in wn.pumps():
+        PInPump = PInPump + flowrate[name]*abs(head[pump.start_node_name] - head[pump.end_node_name])
+    expected = (POut - PExp)/(PInRes + PInPump - PExp)
+    assert_less(abs(todini - expected).max(), 1e-10)
+
+    # stacked DataFrames
+    stacked = [pd.concat({1: df, 2: df}) for df in [head, pressure, demand, flowrate]]
+    todini_stacked = wntr.metrics.todini_index(*(stacked + [wn, 30]))
+    assert_less(abs(todini_stacked.loc[2] - todini).max(), 1e-10)
+
+    # arrays (scenario, time, element)
+    arrays = [np.stack([df.loc[:, wn.node_name_list].values]*4) for df in [head, pressure, demand]]
+    arrays.append(np.stack([flowrate.loc[:, wn.link_name_list].values]*4))
+    todini_arrays = wntr.metrics.todini_index(*(arrays + [wn, 30]))
+    assert_equal(todini_arrays.shape, (4, len(head.index)))
+    assert_less(abs(todini_arrays[3] - todini.values).max(), 1e-10)
+
 if __name__ == '__main__':
     test_BWSN_Network_2()
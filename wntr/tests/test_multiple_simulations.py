@@ -191,5 +191,72 @@ class TestPickle(unittest.TestCase):
             for t in self.res1.node['pressure'].index:
                 self.assertAlmostEqual(self.res1.node['pressure'].at[t,node_name], self.res2.node['pressure'].at[t,node_name], 7)
 
+class TestIncrementalModelUpdate(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def _mutate(self, wn):
+        wn.split_pipe('pipe2', 'pipe2__B', 'leak1')
+        leak1 = wn.get_node('leak1')
+        leak1.add_leak(wn, area=3.14159/4.0*0.1**2, start_time=3600*4, end_time=3600*12)
+
+    def test_rebuild_structure(self):
+        import numpy as np
+        from wntr.sim.hydraulics import HydraulicModel
+
+        inp_file = join(ex_datadir, 'Net3.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        model = HydraulicModel(wn, 'PDD')
+        self.assertFalse(model.rebuild_structure())
+
+        wn.split_pipe('20', '20_B', '20_leak_node')
+        wn.get_node('20_leak_node').add_leak(wn, area=0.01)
+        wn.get_node('123').add_leak(wn, area=0.01)
+        wn.remove_link('329')
+        self.assertTrue(model.rebuild_structure())
+
+        expected = HydraulicModel(wn, 'PDD')
+        self.assertEqual(model._node_name_to_id, expected._node_name_to_id)
+        self.assertEqual(model._link_name_to_id, expected._link_name_to_id)
+        self.assertEqual(model._leak_ids, expected._leak_ids)
+        self.assertEqual(model.num_leaks, 2)
+        for attr in ['node_balance_matrix', 'link_headloss_matrix', 'jacobian']:
+            diff = abs(getattr(model, attr) - getattr(expected, attr))
+            self.assertEqual(diff.nnz, 0)
+            self.assertEqual(getattr(model, attr).shape, getattr(expected, attr).shape)
+        for attr in ['node_elevations', 'pipe_resistance_coefficients', 'pdd_poly1_coeffs_a',
+                     'pdd_poly2_coeffs_d', 'jacobian_rows', 'jacobian_cols']:
+            self.assertTrue(np.array_equal(getattr(model, attr), getattr(expected, attr)))
+
+    def test_rerun_after_split(self):
+        inp_file = join(test_datadir, 'leaks.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        sim = self.wntr.sim.WNTRSimulator(wn, mode='PDD')
+        sim.run_sim()
+        model = sim._model
+
+        wn.reset_initial_values()
+        self._mutate(wn)
+        res1 = sim.run_sim()
+        self.assertIs(sim._model, model)
+        self.assertIn('leak1', res1.node['head'].columns)
+
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        self._mutate(wn)
+        sim = self.wntr.sim.WNTRSimulator(wn, mode='PDD')
+        res2 = sim.run_sim()
+
+        for key in ['head', 'demand', 'leak_demand']:
+            self.assertEqual(list(res1.node[key].columns), list(res2.node[key].columns))
+            self.assertAlmostEqual(abs(res1.node[key] - res2.node[key]).max().max(), 0.0, 8)
+        self.assertAlmostEqual(abs(res1.link['flowrate'] - res2.link['flowrate']).max().max(), 0.0, 8)
+
 if __name__ == '__main__':
     unittest.main()
@@ -688,6 +688,302 @@ def test_add_get_remove_num():
            wn.num_sources]
     expected = [92,3,2,117,2,0,5,2,0]
     assert_list_equal(nums, expected)
-    
+
+class TestCheckpoint(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def _model(self):
+        inp_file = join(ex_datadir, 'Net3.inp')
+        return self.wntr.network.WaterNetworkModel(inp_file)
+
+    def _names(self, wn):
+        return (wn.node_name_list, wn.junction_name_list, wn.link_name_list, wn.pipe_name_list,
+                wn.pump_name_list, wn.control_name_list, wn.source_name_list)
+
+    def test_copy(self):
+        wn = self._model()
+        wn2 = wn.copy()
+        self.assertTrue(wn2._compare(wn))
+        self.assertEqual(self._names(wn2), self._names(wn))
+        wn2.get_link('20').length = 1.0
+        wn2.add_junction('new_junction')
+        self.assertNotEqual(wn.get_link('20').length, 1.0)
+        self.assertNotIn('new_junction', wn.node_name_list)
+        pipe = wn2.get_link('20')
+        self.assertIs(pipe.start_node, wn2.get_node(pipe.start_node_name))
+        self.assertIsNot(pipe.start_node, wn.get_node(pipe.start_node_name))
+
+    def test_copy_after_simulation(self):
+        wn = self._model()
+        self.wntr.sim.WNTRSimulator(wn).run_sim()
+        wn2 = wn.copy()
+        wn2.reset_initial_values()
+        results2 = self.wntr.sim.WNTRSimulator(wn2).run_sim()
+        results0 = self.wntr.sim.WNTRSimulator(self._model()).run_sim()
+        self.assertLess(abs(results2.node['head'] - results0.node['head']).max().max(), 1e-6)
+        self.assertLess(abs(results2.link['flowrate'] - results0.link['flowrate']).max().max(), 1e-6)
+
+    def test_restore_checkpoint(self):
+        wn = self._model()
+        wn0 = self._model()
+        names = self._names(wn)
+        wn.checkpoint()
+        self.assertTrue(wn.has_checkpoint)
+        for i in range(2):
+            wn.split_pipe('123', '123_B', 'leak_node')
+            wn.get_node('leak_node').add_leak(wn, area=0.01, start_time=3600, end_time=7200)
+            wn.get_link('10').add_outage(wn, 3600, 7200)
+            wn.get_node('101').demand_timeseries_list[0].base_value = 1.0
+            wn.get_node('103').demand_timeseries_list.append((0.1, None))
+            wn.get_link('20').diameter = 0.1
+            wn.remove_control(wn.control_name_list[0])
+            wn.remove_link('329')
+            wn.options.time.duration = 3600
+            wn.get_pattern('1').multipliers = [1.0]
+            wn.restore_checkpoint()
+            self.assertTrue(wn._compare(wn0))
+            self.assertEqual(self._names(wn), names)
+            self.assertEqual(wn.options.time.duration, wn0.options.time.duration)
+            self.assertEqual(len(wn.get_node('103').demand_timeseries_list), 1)
+            self.assertEqual(wn._node_reg.get_usage('123'), wn0._node_reg.get_usage('123'))
+            self.assertIsNone(wn._node_reg.get_usage('leak_node'))
+        wn.discard_checkpoint()
+        self.assertFalse(wn.has_checkpoint)
+        self.assertRaises(RuntimeError, wn.restore_checkpoint)
+
+    def test_restore_after_simulation(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        wn.checkpoint()
+        wn.get_node('22').add_leak(wn, area=0.005, start_time=3600)
+        results1 = self.wntr.sim.WNTRSimulator(wn).run_sim()
+        wn.restore_checkpoint()
+        self.assertEqual(wn.sim_time, 0)
+        results2 = self.wntr.sim.WNTRSimulator(wn).run_sim()
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        results3 = self.wntr.sim.WNTRSimulator(wn).run_sim()
+        self.assertGreater(abs(results1.node['head'] - results3.node['head']).max().max(), 1e-3)
+        self.assertAlmostEqual(abs(results2.node['head'] - results3.node['head']).max().max(), 0.0, 6)
+
+    def test_number_of_changes(self):
+        wn = self._model()
+        wn.checkpoint()
+        wn.get_node('15').add_leak(wn, area=0.01, start_time=3600)
+        # the node and the leak control
+        self.assertEqual(wn._node_reg._tracker.num_changes, 2)
+        wn.restore_checkpoint()
+        self.assertEqual(wn._node_reg._tracker.num_changes, 0)
+
+        # the simulation state (head, demand, flow) is not tracked, only the links
+        # changed by controls are
+        wn.options.time.duration = 4*3600
+        wn.checkpoint()
+        head = wn.get_node('1').head
+        self.wntr.sim.WNTRSimulator(wn).run_sim()
+        self.assertNotEqual(wn.get_node('1').head, head)
+        self.assertLess(wn._node_reg._tracker.num_changes, 10)
+        wn.restore_checkpoint()
+        self.assertEqual(wn.get_node('1').head, head)
+        self.assertIsNone(wn.get_node('10').head)
+        self.assertIsNone(wn.get_link('20').flow)
+
+
+class TestColumnarStorage(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def _run(self, columnar):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        if columnar:
+            wn.enable_columnar_storage()
+        wn.get_node('22').add_leak(wn, area=0.005, start_time=3600)
+        results = self.wntr.sim.WNTRSimulator(wn).run_sim()
+        return wn, results
+
+    def test_simulation(self):
+        wn1, results1 = self._run(False)
+        wn2, results2 = self._run(True)
+        self.assertTrue(wn2.columnar)
+        self.assertAlmostEqual(abs(results1.node['head'] - results2.node['head']).max().max(), 0.0, 10)
+        for name in wn1.node_name_list:
+            node1, node2 = wn1.get_node(name), wn2.get_node(name)
+            self.assertEqual(node1.head, node2.head)
+            self.assertEqual(node1.demand, node2.demand)
+            self.assertEqual(node1.leak_demand, node2.leak_demand)
+        for name in wn1.link_name_list:
+            self.assertEqual(wn1.get_link(name).flow, wn2.get_link(name).flow)
+        self.assertEqual(wn1.query_node_attribute('head', np.greater, 250.0),
+                         wn2.query_node_attribute('head', np.greater, 250.0))
+        self.assertEqual(wn1.query_link_attribute('flow'), wn2.query_link_attribute('flow'))
+        head = wn2.node_columns.get_values('head', ['22', '23'])
+        self.assertEqual(list(head), [wn2.get_node('22').head, wn2.get_node('23').head])
+
+        wn2.reset_initial_values()
+        self.assertIsNone(wn2.get_node('22').head)
+        self.assertIsNone(wn2.get_link('10').flow)
+        wn2.get_node('22').head = 1.0
+        wn2.disable_columnar_storage()
+        self.assertFalse(wn2.columnar)
+        self.assertEqual(wn2.get_node('22').head, 1.0)
+
+    def test_add_remove_and_checkpoint(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        wn.enable_columnar_storage()
+        wn.checkpoint()
+        wn.add_junction('new_junction', elevation=10.0)
+        wn.get_node('new_junction').head = 20.0
+        wn.get_node('10').head = 30.0
+        self.assertEqual(len(wn.node_columns), wn.num_nodes)
+        self.assertEqual(wn.get_node('new_junction').head, 20.0)
+        wn.remove_node('new_junction')
+        self.assertEqual(len(wn.node_columns), wn.num_nodes)
+        wn.restore_checkpoint()
+        self.assertEqual(len(wn.node_columns), wn.num_nodes)
+        self.assertIsNone(wn.get_node('10').head)
+
+        wn2 = wn.copy()
+        wn2.get_node('10').head = 40.0
+        self.assertIsNone(wn.get_node('10').head)
+
+    def test_restore_changed_columns(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        wn.enable_columnar_storage()
+        wn.get_node('11').head = 5.0
+        wn.checkpoint()
+        columns = wn.node_columns
+        self.assertEqual(columns._dirty, set())
+        wn.get_node('10').head = 30.0
+        self.assertEqual(columns._dirty, set(['head']))
+        self.assertFalse(columns._rows_changed)
+        demand = columns.column('demand')
+        wn.restore_checkpoint()
+        self.assertIs(wn.node_columns, columns)
+        self.assertIs(columns.column('demand'), demand)
+        self.assertIsNone(wn.get_node('10').head)
+        self.assertEqual(wn.get_node('11').head, 5.0)
+        self.assertEqual(columns._dirty, set(['demand']))
+
+        results1 = self.wntr.sim.WNTRSimulator(wn).run_sim()
+        wn.restore_checkpoint()
+        self.assertIsNone(wn.get_node('10').head)
+        results2 = self.wntr.sim.WNTRSimulator(wn).run_sim()
+        self.assertAlmostEqual(abs(results1.node['head'] - results2.node['head']).max().max(), 0.0, 10)
+
+class TestBulkAdd(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def _build(self, bulk, checkpoint=False, columnar=False):
+        wn = self.wntr.network.WaterNetworkModel()
+        wn.add_pattern('pat1', [1.0, 0.5])
+        wn.add_reservoir('r1', base_head=50.0)
+        if columnar:
+            wn.enable_columnar_storage()
+        if checkpoint:
+            wn.checkpoint()
+        names = ['j1', 'j2', 'j3']
+        base_demands = [0.01, 0.0, 0.02]
+        patterns = ['pat1', None, 'pat1']
+        elevations = [1.0, 2.0, 3.0]
+        pipes = [('p1', 'r1', 'j1', 100.0, 0.3, 100.0, 0.0, 'OPEN', False),
+                 ('p2', 'j1', 'j2', 200.0, 0.2, 120.0, 0.5, 'CLOSED', False),
+                 ('p3', 'j2', 'j3', 300.0, 0.1, 130.0, 0.0, self.wntr.network.LinkStatus.Open, True)]
+        if bulk:
+            wn.add_junctions(names, np.array(base_demands), patterns, elevations, demand_category='cat')
+            wn.add_pipes(*[list(column) for column in zip(*pipes)])
+        else:
+            for args in zip(names, base_demands, patterns, elevations):
+                wn.add_junction(*args, demand_category='cat')
+            for args in pipes:
+                wn.add_pipe(*args)
+        return wn
+
+    def _assert_same(self, wn1, wn2):
+        self.assertTrue(wn1._compare(wn2))
+        self.assertEqual(wn1.junction_name_list, wn2.junction_name_list)
+        self.assertEqual(wn1.pipe_name_list, wn2.pipe_name_list)
+        self.assertEqual(wn1._check_valves, wn2._check_valves)
+        for name, junction in wn1.junctions():
+            junction2 = wn2.get_node(name)
+            self.assertIsNot(junction.demand_timeseries_list, junction2.demand_timeseries_list)
+            self.assertEqual(junction.demand_timeseries_list.base_demand_list(),
+                             junction2.demand_timeseries_list.base_demand_list())
+            self.assertEqual(junction.demand_timeseries_list.pattern_list(),
+                             junction2.demand_timeseries_list.pattern_list())
+            self.assertEqual(junction.demand_timeseries_list.category_list(),
+                             junction2.demand_timeseries_list.category_list())
+            self.assertEqual(junction._leak_start_control_name, junction2._leak_start_control_name)
+        for name, pipe in wn1.pipes():
+            pipe2 = wn2.get_link(name)
+            self.assertEqual(pipe.start_node_name, pipe2.start_node_name)
+            self.assertEqual(pipe.end_node_name, pipe2.end_node_name)
+            self.assertEqual(pipe.status, pipe2.status)
+        for name in wn1.node_name_list:
+            self.assertEqual(list(wn1._node_reg.get_usage(name) or []), list(wn2._node_reg.get_usage(name) or []))
+        self.assertEqual(list(wn1._pattern_reg.get_usage('pat1')), list(wn2._pattern_reg.get_usage('pat1')))
+
+    def test_add_junctions_and_pipes(self):
+        wn1 = self._build(False)
+        wn2 = self._build(True)
+        self._assert_same(wn1, wn2)
+        self.assertEqual(wn2.get_link('p2').initial_status, self.wntr.network.LinkStatus.Closed)
+        self.assertTrue(wn2.get_link('p3').cv)
+        self.assertEqual(wn2.get_node('j3').demand_timeseries_list[0].base_value, 0.02)
+
+        # the elements do not share mutable attributes
+        wn2.get_node('j2').coordinates = (1.0, 2.0)
+        wn2.get_node('j3').demand_timeseries_list[0].base_value = 1.0
+        wn2.get_link('p3').vertices.append((0.0, 0.0))
+        self.assertEqual(wn2.get_node('j3').coordinates, [0, 0])
+        self.assertEqual(wn2.get_node('j1').demand_timeseries_list[0].base_value, 0.01)
+        self.assertEqual(wn2.get_link('p2').vertices, [])
+
+        res1 = self.wntr.sim.WNTRSimulator(wn1).run_sim()
+        res2 = self.wntr.sim.WNTRSimulator(self._build(True)).run_sim()
+        self.assertAlmostEqual(abs(res1.node['head'] - res2.node['head']).max().max(), 0.0, 10)
+
+    def test_add_with_checkpoint(self):
+        wn1 = self._build(False, checkpoint=True, columnar=True)
+        wn2 = self._build(True, checkpoint=True, columnar=True)
+        self._assert_same(wn1, wn2)
+        self.assertEqual(len(wn2.node_columns), wn2.num_nodes)
+        wn2.restore_checkpoint()
+        self.assertEqual(wn2.num_junctions, 0)
+        self.assertEqual(wn2.num_pipes, 0)
+
+    def test_columnar(self):
+        wn = self._build(True, columnar=True)
+        self.assertEqual(len(wn.node_columns), wn.num_nodes)
+        self.assertEqual(len(wn.link_columns), wn.num_links)
+
+    def test_invalid_length(self):
+        wn = self.wntr.network.WaterNetworkModel()
+        self.assertRaises(ValueError, wn.add_junctions, ['j1', 'j2'], [0.0])
+
 if __name__ == '__main__':
     unittest.main()
@@ -206,6 +206,42 @@ def test_Demands():
     nose.tools.assert_list_equal(demandlist1.category_list(), ['_base_demand','residential','residential'])    
     
 
+def test_CompiledDemands():
+    inp_file = join(net1dir, 'Net3.inp')
+    wn = wntr.network.WaterNetworkModel(inp_file)
+    wn.get_pattern('1').wrap = False
+    
+    def expected(times):
+        return np.array([[wn.get_node(name).demand_timeseries_list(t) for name in wn.junction_name_list]
+                         for t in times])
+    
+    demands = wn.get_compiled_demands()
+    nose.tools.assert_is(demands, wn.get_compiled_demands())
+    nose.tools.assert_list_equal(demands.junction_names, wn.junction_name_list)
+    times = np.arange(0, 4*24*3600, 5400)
+    nose.tools.assert_less(np.abs(demands.at(times) - expected(times)).max(), 1e-12)
+    nose.tools.assert_less(np.abs(demands.at(7200) - expected([7200])[0]).max(), 1e-12)
+    nose.tools.assert_less(np.abs(demands.get_values(0, 86400, 3600) - expected(range(0, 90000, 3600))).max(), 1e-12)
+    
+    # changes to demands and patterns are included
+    wn.checkpoint()
+    junction = wn.get_node('15')
+    junction.demand_timeseries_list[0].base_value = 0.1
+    junction.add_demand(0.2, '2', 'new')
+    wn.get_pattern('2').multipliers = np.ones(24)
+    wn.options.time.pattern_start = 3600
+    wn.add_junction('new_junction', base_demand=0.3, demand_pattern='1')
+    nose.tools.assert_list_equal(demands.junction_names, wn.junction_name_list)
+    nose.tools.assert_less(np.abs(demands.at(times) - expected(times)).max(), 1e-12)
+    
+    wn.restore_checkpoint()
+    nose.tools.assert_list_equal(demands.junction_names, wn.junction_name_list)
+    nose.tools.assert_less(np.abs(demands.at(times) - expected(times)).max(), 1e-12)
+    
+    exp_demand = wntr.metrics.expected_demand(wn)
+    nose.tools.assert_list_equal(list(exp_demand.columns), wn.junction_name_list)
+    nose.tools.assert_less(np.abs(exp_demand.values - expected(exp_demand.index)).max(), 1e-12)
+
 def test_Enums():
     pass
 
@@ -214,4 +250,5 @@ if __name__ == '__main__':
     test_Pattern()
     test_TimeSeries()
     test_Demands()
+    test_CompiledDemands()
     test_Enums()
\ No newline at end of file
@@ -1,6 +1,7 @@
 from nose.tools import *
 from os.path import abspath, dirname, join
 import numpy as np
+import networkx as nx
 import wntr
 
 testdir = dirname(abspath(str(__file__)))
@@ -54,5 +55,76 @@ def test_Net1_MultiDiGraph():
     assert_dict_contains_subset(node, G.node)
     assert_dict_contains_subset(edge, G.adj)
 
+def test_bridges():
+    inp_file = join(net1dir,'Net3.inp')
+    wn = wntr.network.WaterNetworkModel(inp_file)
+    G = wn.get_graph()
+    edges = list(G.edges(keys=True, data=True))
+    bridges = G.bridges()
+
+    # brute force: remove each link from an undirected copy of the graph
+    uG = G.to_undirected()
+    n = nx.number_connected_components(uG)
+    expected = []
+    for (node1, node2, link_name) in list(G.edges(keys=True)):
+        uG.remove_edge(node1, node2, key=link_name)
+        if nx.number_connected_components(uG) > n:
+            expected.append(link_name)
+        uG.add_edge(node1, node2, key=link_name)
+
+    assert_list_equal(bridges, expected)
+    assert_list_equal(list(G.edges(keys=True, data=True)), edges)
+
+def test_bridges_parallel_links():
+    inp_file = join(net1dir,'Net1.inp')
+    wn = wntr.network.WaterNetworkModel(inp_file)
+    assert_in('110', wn.get_graph().bridges())
+
+    wn.add_pipe('110b', '2', '12')
+    bridges = wn.get_graph().bridges()
+    assert_not_in('110', bridges)
+    assert_not_in('110b', bridges)
+    assert_set_equal(set(bridges), set(['9', '10']))
+
+def test_sparse_graph():
+    inp_file = join(net1dir,'Net3.inp')
+    wn = wntr.network.WaterNetworkModel(inp_file)
+    G = wn.get_graph()
+    sG = wn.get_sparse_graph()
+    assert_equal(sG.num_nodes, wn.num_nodes)
+    assert_equal(sG.num_links, wn.num_links)
+    assert_equal(sG.node_index['10'], wn.node_name_list.index('10'))
+    link = wn.get_link('20')
+    assert_equal(sG.start_node_index[sG.link_index['20']], sG.node_index[link.start_node_name])
+    assert_equal(sG.end_node_index[sG.link_index['20']], sG.node_index[link.end_node_name])
+
+    A = nx.to_scipy_sparse_matrix(G, nodelist=sG.node_names)
+    assert_equal(abs(sG.adjacency() - A).sum(), 0)
+    assert_equal(abs(sG.adjacency(directed=False, format='coo') - (A + A.T)).sum(), 0)
+    incidence = sG.incidence()
+    assert_equal(incidence.shape, (wn.num_links, wn.num_nodes))
+    assert_equal(abs(incidence.sum(axis=1)).sum(), 0)
+
+    assert_set_equal(set(sG.terminal_nodes()), set(G.terminal_nodes()))
+    assert_set_equal(set(sG.bridges()), set(G.bridges()))
+
+def test_weight_timeseries():
+    inp_file = join(net1dir,'Net3.inp')
+    wn = wntr.network.WaterNetworkModel(inp_file)
+    wn.options.time.duration = 6*3600
+    sim = wntr.sim.WNTRSimulator(wn)
+    results = sim.run_sim()
+    flowrate = results.link['flowrate']
+    sG = wn.get_sparse_graph()
+
+    matrices = sG.weight_timeseries(flowrate)
+    assert_equal(len(matrices), len(flowrate.index))
+    for t, A in zip(flowrate.index, matrices):
+        G = wn.get_graph()
+        G.weight_graph(link_attribute=flowrate.loc[t, :])
+        expected = nx.to_scipy_sparse_matrix(G, nodelist=sG.node_names, weight='weight')
+        assert_less(abs(A - expected).max(), 1e-12)
+        assert_equal(G.number_of_edges(), wn.num_links)
+
 if __name__ == '__main__':
     test_Net1()
@@ -0,0 +1,73 @@
+import unittest
+from os.path import abspath, dirname, join
+
+testdir = dirname(abspath(str(__file__)))
+test_datadir = join(testdir,'networks_for_testing')
+ex_datadir = join(testdir,'..','..','examples','networks')
+
+
+def total_demand(wn, results):
+    return results.node['demand'].loc[:, wn.junction_name_list].sum().sum()
+
+
+class TestScenarioEnsemble(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+        inp_file = join(ex_datadir, 'Net1.inp')
+        self.wn = self.wntr.network.WaterNetworkModel(inp_file)
+        self.wn.options.time.duration = 8*3600
+
+        ens = self.wntr.sim
+        self.scenarios = [ens.Scenario('base'),
+                          ens.Scenario('break', [ens.PipeBreak('12', area=0.005, start_time=2*3600,
+                                                               end_time=8*3600)]),
+                          ens.Scenario('leak', [ens.Leak('22', area=0.005, start_time=3600)]),
+                          ens.Scenario('outage', [ens.PumpOutage('9', 3600, 2*3600)]),
+                          ens.Scenario('demand', [ens.DemandScaling(1.5, ['12', '13'])])]
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def _run_serial(self, scenario):
+        import copy
+        wn = copy.deepcopy(self.wn)
+        scenario.apply(wn)
+        sim = self.wntr.sim.WNTRSimulator(wn, mode='PDD')
+        return sim.run_sim()
+
+    def test_parallel_results(self):
+        ensemble = self.wntr.sim.ScenarioEnsemble(self.wn, self.scenarios, mode='PDD',
+                                                  node_results=['pressure'], link_results=['flowrate'])
+        results = ensemble.run(max_workers=2)
+        self.assertEqual(set(results.keys()), set(s.name for s in self.scenarios))
+        for scenario in self.scenarios:
+            res = results[scenario.name]
+            self.assertEqual(list(res.node.keys()), ['pressure'])
+            self.assertEqual(list(res.link.keys()), ['flowrate'])
+            expected = self._run_serial(scenario)
+            self.assertAlmostEqual(abs(res.node['pressure'] - expected.node['pressure']).max().max(), 0.0, 8)
+            self.assertAlmostEqual(abs(res.link['flowrate'] - expected.link['flowrate']).max().max(), 0.0, 8)
+
+        # the base model is not modified
+        self.assertNotIn('12_leak_node', self.wn.node_name_list)
+
+    def test_metric(self):
+        ensemble = self.wntr.sim.ScenarioEnsemble(self.wn, self.scenarios, mode='PDD', metric=total_demand)
+        serial = ensemble.run(max_workers=1)
+        parallel = dict(ensemble.run_iter(max_workers=2))
+        for scenario in self.scenarios:
+            self.assertAlmostEqual(serial[scenario.name], parallel[scenario.name], 8)
+        self.assertGreater(serial['demand'], serial['base'])
+        self.assertLess(serial['leak'], serial['base'] + 1e-8)
+
+    def test_unique_names(self):
+        scenarios = [self.wntr.sim.Scenario('a'), self.wntr.sim.Scenario('a')]
+        self.assertRaises(ValueError, self.wntr.sim.ScenarioEnsemble, self.wn, scenarios)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import pickle
+from os.path import abspath, dirname, join
+from pandas.util.testing import assert_frame_equal
+
+testdir = dirname(abspath(str(__file__)))
+test_datadir = join(testdir,'networks_for_testing')
+ex_datadir = join(testdir,'..','..','examples','networks')
+
+
+class TestCompactResults(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+        self.results = self._run()
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    @classmethod
+    def _run(self, float_dtype='float64', compact_status=False, lazy_derived=False):
+        inp_file = join(ex_datadir, 'Net3.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        wn.options.time.duration = 24*3600
+        # isolate junction 15 from 6 to 12 hours
+        for name, time, status in [('close', 6, 'Closed'), ('open', 12, 'Open')]:
+            action = self.wntr.network.ControlAction(wn.get_link('151'), 'status',
+                                                     getattr(self.wntr.network.LinkStatus, status))
+            wn.add_control(name, self.wntr.network.Control._time_control(wn, time*3600, 'SIM_TIME', False, action))
+        wn.options.results.float_dtype = float_dtype
+        wn.options.results.compact_status = compact_status
+        wn.options.results.lazy_derived = lazy_derived
+        sim = self.wntr.sim.WNTRSimulator(wn)
+        return sim.run_sim()
+
+    def test_lazy_derived(self):
+        results = self._run(lazy_derived=True)
+        self.assertEqual(results.node['pressure'].loc[7*3600, '15'], 0.0)
+        self.assertTrue(results.node.is_derived('pressure'))
+        self.assertTrue(results.link.is_derived('velocity'))
+        self.assertFalse(results.node.is_derived('head'))
+        self.assertEqual(sorted(results.node.keys()), sorted(self.results.node.keys()))
+        self.assertEqual(sorted(results.link.keys()), sorted(self.results.link.keys()))
+        for key, value in self.results.node.items():
+            assert_frame_equal(results.node[key], value)
+        for key, value in self.results.link.items():
+            assert_frame_equal(results.link[key], value)
+
+        results = pickle.loads(pickle.dumps(results))
+        assert_frame_equal(results.node['pressure'], self.results.node['pressure'])
+
+    def test_compact(self):
+        results = self._run(float_dtype='float32', compact_status=True, lazy_derived=True)
+        for key, value in self.results.node.items():
+            self.assertEqual(results.node[key].values.dtype, 'float32')
+            self.assertTrue(abs(results.node[key].values - value.values).max() < 1e-3)
+        for key in ['flowrate', 'velocity']:
+            self.assertEqual(results.link[key].values.dtype, 'float32')
+            self.assertTrue(abs(results.link[key].values - self.results.link[key].values).max() < 1e-5)
+        status = results.link['status']
+        self.assertEqual(status.values.dtype, 'int8')
+        self.assertTrue((status.values == self.results.link['status'].values).all())
+        LinkStatus = self.wntr.network.LinkStatus
+        self.assertTrue(LinkStatus.Closed == status.at[7*3600, '151'])
+        self.assertTrue(LinkStatus.Open == self.results.link['status'].at[0, '151'])
+        self.assertFalse(LinkStatus.Closed == self.results.link['status'].at[0, '151'])
+        codes = self.wntr.sim.results.LINK_STATUS_CODES
+        self.assertIs(codes[status.at[7*3600, '151']], LinkStatus.Closed)
+        self.assertTrue(set(status.values.ravel()).issubset(codes))
+
+        self.assertRaises(ValueError, self._run, float_dtype='int32')
+
+
+if __name__ == '__main__':
+    unittest.main()
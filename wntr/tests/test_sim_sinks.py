@@ -0,0 +1,147 @@
+import unittest
+from os.path import abspath, dirname, join
+from pandas.util.testing import assert_frame_equal
+
+testdir = dirname(abspath(str(__file__)))
+test_datadir = join(testdir,'networks_for_testing')
+ex_datadir = join(testdir,'..','..','examples','networks')
+
+
+class TestWNTRSimulatorSinks(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+        inp_file = join(ex_datadir, 'Net3.inp')
+        self.wn = self.wntr.network.WaterNetworkModel(inp_file)
+        self.wn.options.time.duration = 24*3600
+        sim = self.wntr.sim.WNTRSimulator(self.wn)
+        self.results = sim.run_sim()
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def _run(self, sink):
+        self.wn.reset_initial_values()
+        sim = self.wntr.sim.WNTRSimulator(self.wn)
+        results = sim.run_sim(sink=sink)
+        # only the values of the last report time are kept by the hydraulic model
+        self.assertEqual(sim._model._sim_results['node_head'].shape[0], 1)
+        return results
+
+    def test_subset(self):
+        results = self._run(self.wntr.sim.SubsetSink())
+        for key, value in self.results.node.items():
+            assert_frame_equal(results.node[key], value)
+        for key, value in self.results.link.items():
+            assert_frame_equal(results.link[key], value)
+
+        results = self._run(self.wntr.sim.SubsetSink(['10', '15'], ['20'], ['pressure'], []))
+        self.assertEqual(list(results.node.keys()), ['pressure'])
+        self.assertEqual(results.link, {})
+        assert_frame_equal(results.node['pressure'], self.results.node['pressure'].loc[:, ['10', '15']])
+
+        self.assertRaises(KeyError, self._run, self.wntr.sim.SubsetSink(['missing']))
+
+    def test_reduction(self):
+        results = self._run(self.wntr.sim.ReductionSink(percentiles=[50, 95], link_results=['flowrate']))
+        self.assertEqual(sorted(results.link.keys()), ['flowrate'])
+        for key, value in self.results.node.items():
+            stats = results.node[key]
+            self.assertEqual(list(stats.index), ['min', 'max', 'mean', '50%', '95%'])
+            self.assertTrue((abs(stats.loc['min'] - value.min()) < 1e-10).all())
+            self.assertTrue((abs(stats.loc['max'] - value.max()) < 1e-10).all())
+            self.assertTrue((abs(stats.loc['mean'] - value.mean()) < 1e-8).all())
+            self.assertTrue((stats.loc['50%'] >= stats.loc['min'] - 1e-10).all())
+            self.assertTrue((stats.loc['95%'] <= stats.loc['max'] + 1e-10).all())
+
+    def test_chunked_files(self):
+        import os
+        import tempfile
+        import shutil
+        directory = tempfile.mkdtemp()
+        try:
+            sink = self.wntr.sim.ChunkedFileSink(directory, chunk_size=7)
+            results = self._run(sink)
+            self.assertIsNone(results.node)
+            num_times = len(self.results.node['head'].index)
+            self.assertEqual(len([f for f in os.listdir(directory) if f.startswith('time_')]), (num_times + 6)//7)
+            saved = sink.read()
+            for key, value in self.results.node.items():
+                assert_frame_equal(saved.node[key], value, check_index_type=False)
+            for key, value in self.results.link.items():
+                assert_frame_equal(saved.link[key], value, check_index_type=False)
+            saved = self.wntr.sim.ChunkedFileSink(directory).read(node_results=['head'], link_results=[])
+            self.assertEqual(list(saved.node.keys()), ['head'])
+            self.assertEqual(saved.link, {})
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestEpanetSimulatorSinks(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+        inp_file = join(ex_datadir, 'Net3.inp')
+        self.wn = self.wntr.network.WaterNetworkModel(inp_file)
+        self.wn.options.quality.mode = 'AGE'
+        sim = self.wntr.sim.EpanetSimulator(self.wn)
+        self.results = sim.run_sim(file_prefix='tmp_sinks')
+
+    @classmethod
+    def tearDownClass(self):
+        import os
+        for ext in ['.inp', '.rpt', '.bin']:
+            if os.path.exists('tmp_sinks' + ext):
+                os.remove('tmp_sinks' + ext)
+
+    def test_binary_file(self):
+        sim = self.wntr.sim.EpanetSimulator(self.wn)
+        results = sim.run_sim(file_prefix='tmp_sinks', sink=self.wntr.sim.SubsetSink())
+        for key, value in self.results.node.items():
+            self.assertTrue(abs(results.node[key].values - value.values).max() < 1e-6)
+        for key, value in self.results.link.items():
+            self.assertTrue(abs(results.link[key].values - value.values).max() < 1e-6)
+
+    def test_in_memory(self):
+        sim = self.wntr.sim.EpanetSimulator(self.wn)
+        results = sim.run_sim(in_memory=True)
+        sim = self.wntr.sim.EpanetSimulator(self.wn)
+        sink_results = sim.run_sim(in_memory=True, sink=self.wntr.sim.SubsetSink())
+        for key, value in results.node.items():
+            assert_frame_equal(sink_results.node[key], value, check_index_type=False)
+        for key, value in results.link.items():
+            assert_frame_equal(sink_results.link[key], value, check_index_type=False)
+
+        sim = self.wntr.sim.EpanetSimulator(self.wn)
+        stats = sim.run_sim(in_memory=True, sink=self.wntr.sim.ReductionSink(node_results=['quality'],
+                                                                              link_results=[]))
+        self.assertTrue((abs(stats.node['quality'].loc['max'] - results.node['quality'].max()) < 1e-8).all())
+
+
+class TestP2Quantile(unittest.TestCase):
+
+    def test_accuracy(self):
+        import numpy as np
+        from wntr.sim.sinks import _P2Quantile
+        rng = np.random.RandomState(0)
+        data = rng.gamma(2.0, 3.0, size=(2000, 20))
+        for p in [0.05, 0.5, 0.95]:
+            quantile = _P2Quantile(p, 20)
+            for row in data[:3]:
+                quantile.add(row)
+            self.assertTrue(np.allclose(quantile.value(), np.percentile(data[:3], p*100, axis=0)))
+            for row in data[3:]:
+                quantile.add(row)
+            exact = np.percentile(data, p*100, axis=0)
+            self.assertTrue((abs(quantile.value() - exact) < 0.05*exact).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
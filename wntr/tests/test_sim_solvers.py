@@ -0,0 +1,259 @@
+import unittest
+from os.path import abspath, dirname, join
+
+testdir = dirname(abspath(str(__file__)))
+test_datadir = join(testdir,'networks_for_testing')
+ex_datadir = join(testdir,'..','..','examples','networks')
+
+class TestNewtonSolverLinearSolvers(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        sim = self.wntr.sim.WNTRSimulator(wn)
+        self.res = sim.run_sim()
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def _compare(self, res, places):
+        for key in ['head', 'demand', 'pressure']:
+            diff = abs(res.node[key] - self.res.node[key]).max().max()
+            self.assertAlmostEqual(diff, 0.0, places)
+        diff = abs(res.link['flowrate'] - self.res.link['flowrate']).max().max()
+        self.assertAlmostEqual(diff, 0.0, places)
+
+    def test_splu(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        sim = self.wntr.sim.WNTRSimulator(wn)
+        res = sim.run_sim(solver_options={'LINEAR_SOLVER': 'SPLU'})
+        self._compare(res, 8)
+        self.assertEqual(sim.solver.num_factorizations, sim.solver.num_iterations)
+        self.assertEqual(sim.solver.num_reused_factorizations, 0)
+
+    def test_splu_with_reuse(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        sim = self.wntr.sim.WNTRSimulator(wn)
+        res = sim.run_sim(solver_options={'LINEAR_SOLVER': 'SPLU', 'REUSE_FACTORIZATION': True})
+        self._compare(res, 4)
+        self.assertGreater(sim.solver.num_reused_factorizations, 0)
+        self.assertEqual(sim.solver.num_factorizations + sim.solver.num_reused_factorizations,
+                         sim.solver.num_iterations)
+
+    def test_reuse_before_line_search(self):
+        # a step from the old factorization that increases the residual is not taken, even before the
+        # line search starts; the jacobian is refactorized instead
+        import numpy as np
+        import scipy.sparse as sp
+        from wntr.sim.solvers import NewtonSolver
+
+        def residual(x):
+            return np.arctan(2.0*x) - 0.2*x**3 - 2.0
+
+        def jacobian(x):
+            return sp.coo_matrix(2.0/(1.0 + 4.0*x**2) - 0.6*x**2)
+
+        solver = NewtonSolver(1, 0, 0, None, {'LINEAR_SOLVER': 'SPLU', 'REUSE_FACTORIZATION': True,
+                                              'BT_START_ITER': 1000, 'MAXITER': 50})
+        x, num_iter, status, message = solver.solve(residual, jacobian, np.array([2.0]))
+        self.assertEqual(status, 1, message)
+        self.assertLess(abs(residual(x)[0]), solver.tol)
+        self.assertGreater(solver.num_reused_factorizations, 0)
+
+    def test_reuse_requires_splu(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        sim = self.wntr.sim.WNTRSimulator(wn)
+        self.assertRaises(ValueError, sim.run_sim, solver_options={'REUSE_FACTORIZATION': True})
+
+    def test_gga(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        sim = self.wntr.sim.WNTRSimulator(wn)
+        res = sim.run_sim(solver_options={'SOLVER': 'GGA'})
+        self.assertIsInstance(sim.solver, self.wntr.sim.GGASolver)
+        self._compare(res, 8)
+
+    def test_solver_iterations(self):
+        # every solved time is included (report times and intermediate times added by controls)
+        for t in self.res.node['head'].index:
+            self.assertIn(t, self.res.solver_iterations.index)
+        self.assertTrue((self.res.solver_iterations >= 0).all())
+
+    def test_predictor(self):
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        sim = self.wntr.sim.WNTRSimulator(wn)
+        res = sim.run_sim(solver_options={'PREDICTOR': True})
+        self._compare(res, 4)
+        self.assertEqual(res.solver_iterations.sum(), sim.solver.num_iterations)
+
+    def test_adaptive_timestep(self):
+        # the tank levels change at every step of Net1, every hydraulic timestep is solved
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        sim = self.wntr.sim.WNTRSimulator(wn)
+        res = sim.run_sim(solver_options={'ADAPTIVE_TIMESTEP': True})
+        self._compare(res, 8)
+        self.assertEqual(list(res.solver_iterations.index), list(self.res.solver_iterations.index))
+
+
+class TestAdaptiveTimestep(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def _build(self):
+        wn = self.wntr.network.WaterNetworkModel()
+        wn.add_pattern('pat', [1.0, 1.2, 0.8, 0.5, 1.5, 1.1])
+        wn.add_reservoir('r1', base_head=60.0)
+        wn.add_junction('j1', base_demand=0.01, elevation=10.0, demand_pattern='pat')
+        wn.add_junction('j2', base_demand=0.02, elevation=5.0, demand_pattern='pat')
+        wn.add_junction('j3', base_demand=0.01, elevation=0.0)
+        wn.add_pipe('p1', 'r1', 'j1', length=1000, diameter=0.3, roughness=100)
+        wn.add_pipe('p2', 'j1', 'j2', length=1000, diameter=0.2, roughness=100)
+        wn.add_pipe('p3', 'j1', 'j3', length=1000, diameter=0.2, roughness=100)
+        wn.add_pipe('p4', 'j2', 'j3', length=1000, diameter=0.2, roughness=100)
+        wn.options.time.duration = 24*3600
+        wn.options.time.hydraulic_timestep = 900
+        wn.options.time.pattern_timestep = 2*3600
+        wn.options.time.report_timestep = 3*3600
+
+        controls = self.wntr.network.controls
+        p4 = wn.get_link('p4')
+        act = controls.ControlAction(p4, 'status', self.wntr.network.LinkStatus.Closed)
+        cond = controls.SimTimeCondition(wn, '=', 5*3600+100)
+        wn.add_control('close', controls.Control(cond, act))
+        act = controls.ControlAction(p4, 'status', self.wntr.network.LinkStatus.Open)
+        cond = controls.SimTimeCondition(wn, '=', 15*3600+450)
+        wn.add_control('open', controls.Control(cond, act))
+        return wn
+
+    def test_static_network(self):
+        sim = self.wntr.sim.WNTRSimulator(self._build())
+        res = sim.run_sim()
+        sim = self.wntr.sim.WNTRSimulator(self._build())
+        adaptive_res = sim.run_sim(solver_options={'ADAPTIVE_TIMESTEP': True})
+
+        self.assertEqual(list(res.node['head'].index), list(adaptive_res.node['head'].index))
+        for key in ['head', 'demand', 'pressure']:
+            self.assertAlmostEqual(abs(res.node[key] - adaptive_res.node[key]).max().max(), 0.0, 10)
+        self.assertAlmostEqual(abs(res.link['flowrate'] - adaptive_res.link['flowrate']).max().max(), 0.0, 10)
+        self.assertEqual(adaptive_res.link['flowrate'].at[9*3600, 'p4'], 0.0)
+        self.assertGreater(abs(adaptive_res.link['flowrate'].at[21*3600, 'p4']), 1e-4)
+
+        # report times, pattern steps, and control times are solved
+        solved_times = list(adaptive_res.solver_iterations.index)
+        self.assertEqual(solved_times, [0, 7200, 10800, 14400, 18100, 21600, 28800, 32400, 36000, 43200,
+                                        50400, 54000, 54450, 57600, 64800, 72000, 75600, 79200, 86400])
+        self.assertTrue(set(solved_times).issubset(set(res.solver_iterations.index)))
+
+    def test_moving_tanks(self):
+        # while a tank level changes, every hydraulic timestep is solved, so the results are the same as
+        # with the fixed timestep
+        inp_file = join(ex_datadir, 'Net1.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        wn.options.time.hydraulic_timestep = 900
+        res = self.wntr.sim.WNTRSimulator(wn).run_sim()
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        wn.options.time.hydraulic_timestep = 900
+        sim = self.wntr.sim.WNTRSimulator(wn)
+        adaptive_res = sim.run_sim(solver_options={'ADAPTIVE_TIMESTEP': True})
+
+        self.assertEqual(list(res.solver_iterations.index), list(adaptive_res.solver_iterations.index))
+        self.assertEqual(list(res.node['head'].index), list(adaptive_res.node['head'].index))
+        self.assertLess(abs(res.node['head'] - adaptive_res.node['head']).max().max(), 1e-6)
+        self.assertLess(abs(res.node['demand'] - adaptive_res.node['demand']).max().max(), 1e-6)
+        self.assertLess(abs(res.link['flowrate'] - adaptive_res.link['flowrate']).max().max(), 1e-6)
+        self.assertEqual(list(res.link['status']['9']), list(adaptive_res.link['status']['9']))
+
+
+class TestIsolatedJunctions(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def test_isolated_junctions_and_links(self):
+        wn = self.wntr.network.WaterNetworkModel()
+        wn.add_reservoir('r1', base_head=60.0)
+        wn.add_junction('j1', base_demand=0.01, elevation=10.0)
+        wn.add_junction('j2', base_demand=0.01, elevation=10.0)
+        wn.add_junction('j3', base_demand=0.01, elevation=10.0)
+        wn.add_pipe('p1', 'r1', 'j1', length=1000, diameter=0.3, roughness=100)
+        wn.add_pipe('p2', 'j1', 'j2', length=1000, diameter=0.3, roughness=100)
+        wn.add_pipe('p3', 'j2', 'j3', length=1000, diameter=0.3, roughness=100)
+        wn.add_pipe('p4', 'j2', 'j3', length=1000, diameter=0.3, roughness=100)
+        wn.options.time.duration = 4*3600
+        controls = self.wntr.network.controls
+        act = controls.ControlAction(wn.get_link('p2'), 'status', self.wntr.network.LinkStatus.Closed)
+        cond = controls.SimTimeCondition(wn, '=', 2*3600)
+        wn.add_control('close', controls.Control(cond, act))
+
+        sim = self.wntr.sim.WNTRSimulator(wn, mode='PDD')
+        res = sim.run_sim()
+        isolated_junctions, isolated_links = sim._get_isolated_junctions_and_links()
+        self.assertEqual(sorted(isolated_junctions), ['j2', 'j3'])
+        self.assertEqual(sorted(isolated_links), ['p2', 'p3', 'p4'])
+        self.assertGreater(res.node['demand'].at[3600, 'j3'], 0.0)
+        self.assertEqual(res.node['demand'].at[3*3600, 'j3'], 0.0)
+        self.assertGreater(res.node['demand'].at[3*3600, 'j1'], 0.0)
+
+        # the isolated junctions are not recomputed until a link status changes
+        self.assertIs(sim._get_isolated_junctions_and_links(), sim._isolated_junctions_and_links)
+
+
+class TestGGASolver(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        import wntr
+        self.wntr = wntr
+
+    @classmethod
+    def tearDownClass(self):
+        pass
+
+    def _run(self, mode, solver_options):
+        inp_file = join(test_datadir, 'leaks.inp')
+        wn = self.wntr.network.WaterNetworkModel(inp_file)
+        wn.split_pipe('pipe2', 'pipe2__B', 'leak1')
+        leak1 = wn.get_node('leak1')
+        leak1.add_leak(wn, area=3.14159/4.0*0.1**2, start_time=3600*4, end_time=3600*12)
+        sim = self.wntr.sim.WNTRSimulator(wn, mode=mode)
+        return sim.run_sim(solver_options=solver_options)
+
+    def test_gga_leaks_dd(self):
+        res1 = self._run('DD', {})
+        res2 = self._run('DD', {'SOLVER': 'GGA'})
+        for key in ['head', 'demand', 'leak_demand']:
+            self.assertAlmostEqual(abs(res1.node[key] - res2.node[key]).max().max(), 0.0, 8)
+        self.assertAlmostEqual(abs(res1.link['flowrate'] - res2.link['flowrate']).max().max(), 0.0, 8)
+
+    def test_gga_leaks_pdd(self):
+        res1 = self._run('PDD', {})
+        res2 = self._run('PDD', {'SOLVER': 'GGA'})
+        for key in ['head', 'demand', 'leak_demand']:
+            self.assertAlmostEqual(abs(res1.node[key] - res2.node[key]).max().max(), 0.0, 8)
+        self.assertAlmostEqual(abs(res1.link['flowrate'] - res2.link['flowrate']).max().max(), 0.0, 8)
+
+if __name__ == '__main__':
+    unittest.main()